@@ -7,8 +7,10 @@ KDJ指标插件
 """
 
 from loguru import logger
+import polars as pl
 from src.plugin.plugin_base import IndicatorPlugin
 from src.tech_analysis.indicator_manager import global_indicator_manager
+from src.tech_analysis.indicator_registry import global_indicator_registry
 
 
 class KDJIndicatorPlugin(IndicatorPlugin):
@@ -39,6 +41,9 @@ class KDJIndicatorPlugin(IndicatorPlugin):
     def supports_polars(self) -> bool:
         return True
     
+    def supports_lazy(self) -> bool:
+        return True
+    
     def calculate(self, data, **kwargs):
         """
         计算KDJ指标
@@ -73,11 +78,11 @@ class KDJIndicatorPlugin(IndicatorPlugin):
         委托给IndicatorManager统一计算
         
         Args:
-            data: 股票数据，polars DataFrame
+            data: 股票数据，polars DataFrame或LazyFrame
             **kwargs: 指标参数，包括windows(KDJ窗口列表)
             
         Returns:
-            Any: 包含KDJ指标的polars DataFrame
+            Any: 包含KDJ指标的polars DataFrame，输入为LazyFrame时返回LazyFrame
         """
         try:
             # 使用IndicatorManager统一计算
@@ -85,6 +90,10 @@ class KDJIndicatorPlugin(IndicatorPlugin):
             if not isinstance(windows, list):
                 windows = [windows]
             
+            if isinstance(data, pl.LazyFrame):
+                # LazyFrame输入直接返回查询计划，由调用方与其他指标合并到同一次collect
+                return global_indicator_registry.calculate_indicators(data, ['kdj'], windows=windows)
+            
             result_df = global_indicator_manager.calculate_indicator(
                 data, 'kdj', return_polars=True, windows=windows
             )
@@ -7,8 +7,10 @@ MACD指标插件
 """
 
 from loguru import logger
+import polars as pl
 from src.plugin.plugin_base import IndicatorPlugin
 from src.tech_analysis.indicator_manager import global_indicator_manager
+from src.tech_analysis.indicator_registry import global_indicator_registry
 
 
 class MACDIndicatorPlugin(IndicatorPlugin):
@@ -39,6 +41,9 @@ class MACDIndicatorPlugin(IndicatorPlugin):
     def supports_polars(self) -> bool:
         return True
     
+    def supports_lazy(self) -> bool:
+        return True
+    
     def calculate(self, data, **kwargs):
         """
         计算MACD指标
@@ -74,11 +79,11 @@ class MACDIndicatorPlugin(IndicatorPlugin):
         委托给IndicatorManager统一计算
         
         Args:
-            data: 股票数据，polars DataFrame
+            data: 股票数据，polars DataFrame或LazyFrame
             **kwargs: 指标参数，包括fast_period, slow_period, signal_period
             
         Returns:
-            Any: 包含MACD指标的polars DataFrame
+            Any: 包含MACD指标的polars DataFrame，输入为LazyFrame时返回LazyFrame
         """
         try:
             # 使用IndicatorManager统一计算
@@ -86,6 +91,13 @@ class MACDIndicatorPlugin(IndicatorPlugin):
             slow_period = kwargs.get('slow_period', 26)
             signal_period = kwargs.get('signal_period', 9)
             
+            if isinstance(data, pl.LazyFrame):
+                # LazyFrame输入直接返回查询计划，由调用方与其他指标合并到同一次collect
+                return global_indicator_registry.calculate_indicators(
+                    data, ['macd'],
+                    fast_period=fast_period, slow_period=slow_period, signal_period=signal_period
+                )
+            
             result_df = global_indicator_manager.calculate_indicator(
                 data, 'macd', return_polars=True,
                 fast_period=fast_period, slow_period=slow_period, signal_period=signal_period
@@ -7,8 +7,10 @@ RSI指标插件
 """
 
 from loguru import logger
+import polars as pl
 from src.plugin.plugin_base import IndicatorPlugin
 from src.tech_analysis.indicator_manager import global_indicator_manager
+from src.tech_analysis.indicator_registry import global_indicator_registry
 
 
 class RSIIndicatorPlugin(IndicatorPlugin):
@@ -39,6 +41,9 @@ class RSIIndicatorPlugin(IndicatorPlugin):
     def supports_polars(self) -> bool:
         return True
     
+    def supports_lazy(self) -> bool:
+        return True
+    
     def calculate(self, data, **kwargs):
         """
         计算RSI指标
@@ -73,11 +78,11 @@ class RSIIndicatorPlugin(IndicatorPlugin):
         委托给IndicatorManager统一计算
         
         Args:
-            data: 股票数据，polars DataFrame
+            data: 股票数据，polars DataFrame或LazyFrame
             **kwargs: 指标参数，包括windows(RSI窗口列表)
             
         Returns:
-            Any: 包含RSI指标的polars DataFrame
+            Any: 包含RSI指标的polars DataFrame，输入为LazyFrame时返回LazyFrame
         """
         try:
             # 使用IndicatorManager统一计算
@@ -85,6 +90,12 @@ class RSIIndicatorPlugin(IndicatorPlugin):
             if not isinstance(windows, list):
                 windows = [windows]
             
+            if isinstance(data, pl.LazyFrame):
+                # LazyFrame输入直接返回查询计划，由调用方与其他指标合并到同一次collect；
+                # 只保留RSI输出列，price_change、gain、loss等中间列不进入结果
+                plan = global_indicator_registry.calculate_indicators(data, ['rsi'], windows=windows)
+                return plan.select(pl.col(r'^rsi\d*$'))
+            
             result_df = global_indicator_manager.calculate_indicator(
                 data, 'rsi', return_polars=True, windows=windows
             )
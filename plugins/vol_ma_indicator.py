@@ -7,8 +7,10 @@
 """
 
 from loguru import logger
+import polars as pl
 from src.plugin.plugin_base import IndicatorPlugin
 from src.tech_analysis.indicator_manager import global_indicator_manager
+from src.tech_analysis.indicator_registry import global_indicator_registry
 
 
 class VolMAIndicatorPlugin(IndicatorPlugin):
@@ -39,6 +41,9 @@ class VolMAIndicatorPlugin(IndicatorPlugin):
     def supports_polars(self) -> bool:
         return True
     
+    def supports_lazy(self) -> bool:
+        return True
+    
     def calculate(self, data, **kwargs):
         """
         计算成交量MA指标
@@ -73,11 +78,11 @@ class VolMAIndicatorPlugin(IndicatorPlugin):
         委托给IndicatorManager统一计算
         
         Args:
-            data: 股票数据，polars DataFrame
+            data: 股票数据，polars DataFrame或LazyFrame
             **kwargs: 指标参数，包括windows(成交量MA窗口列表)
             
         Returns:
-            Any: 包含成交量MA指标的polars DataFrame
+            Any: 包含成交量MA指标的polars DataFrame，输入为LazyFrame时返回LazyFrame
         """
         try:
             # 使用IndicatorManager统一计算
@@ -85,6 +90,10 @@ class VolMAIndicatorPlugin(IndicatorPlugin):
             if not isinstance(windows, list):
                 windows = [windows]
             
+            if isinstance(data, pl.LazyFrame):
+                # LazyFrame输入直接返回查询计划，由调用方与其他指标合并到同一次collect
+                return global_indicator_registry.calculate_indicators(data, ['vol_ma'], windows=windows)
+            
             result_df = global_indicator_manager.calculate_indicator(
                 data, 'vol_ma', return_polars=True, windows=windows
             )
@@ -17,6 +17,8 @@ from src.alpha.factors.volume import VolumeFactors
 from src.alpha.factors.technical import TechnicalFactors
 from src.alpha.factors.risk import RiskFactors
 from src.alpha.evaluation.factor_evaluator import FactorEvaluator
+from src.alpha.risk.covariance_engine import pairwise_correlation
+from src.alpha.risk.portfolio_optimizer import max_ic_weights
 
 
 class AlphaCalculator:
@@ -156,8 +158,8 @@ class AlphaCalculator:
         if not valid_factors:
             return {}
         
-        # 计算相关性矩阵
-        correlation_matrix = np.corrcoef(factor_data)
+        # 计算相关性矩阵，因子预热期的缺失值按两两重叠的有效样本处理
+        correlation_matrix = pairwise_correlation(np.column_stack(factor_data))
         
         # 构建相关性字典
         correlation_dict = {}
@@ -168,13 +170,16 @@ class AlphaCalculator:
         
         return correlation_dict
     
-    def optimize_factor_weights(self, factor_names: List[str], target_returns: Optional[pl.Series] = None) -> Dict[str, float]:
+    def optimize_factor_weights(self, factor_names: List[str], target_returns: Optional[pl.Series] = None,
+                                method: str = 'correlation') -> Dict[str, float]:
         """
         优化因子权重
         
         Args:
             factor_names: 因子名称列表
             target_returns: 目标收益率序列
+            method: 'correlation'按与目标收益率相关系数的绝对值分配权重；
+                    'max_ic'考虑因子间的相关性，求使组合因子（标准化后加权）与目标收益率相关性最大的权重
             
         Returns:
             Dict[str, float]: 优化后的因子权重
@@ -206,10 +211,12 @@ class AlphaCalculator:
             return {}
         
         # 计算因子与目标收益率的相关性
-        correlations = []
-        for factor_values in factor_data:
-            corr = np.corrcoef(factor_values, target_returns.to_numpy())[0, 1]
-            correlations.append(abs(corr))
+        values = np.column_stack(factor_data + [target_returns.to_numpy()])
+        correlation_matrix = pairwise_correlation(values)
+        if method == 'max_ic':
+            optimized = max_ic_weights(correlation_matrix[-1, :-1], correlation_matrix[:-1, :-1])
+            return dict(zip(valid_factors, optimized.tolist()))
+        correlations = np.nan_to_num(np.abs(correlation_matrix[-1, :-1])).tolist()
         
         # 基于相关性计算权重
         total_corr = sum(correlations)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+面板因子引擎，在 (日期 × 股票) 长表面板上批量计算因子
+
+因子表达式（src.alpha.factors.panel_factors）中的时间序列算子编译为 .over(股票列)，
+截面算子编译为 .over(日期列)。Polars不支持嵌套的over，因此每个带分区的算子结果
+物化为一个临时列，并按依赖深度分层：同一层的全部算子放在一次with_columns中，
+所有层串成一个惰性查询计划，最后只选出因子列。多个因子共用的子表达式（如收益率、均线）只计算一次。
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+import polars as pl
+from loguru import logger
+
+from src.alpha.factors.panel_factors import (DATE, SYMBOL, ExprLike, PanelExpr, _as_expr, default_factor_library,
+                                             required_lookback)
+
+
+class PanelFactorEngine:
+    """
+    面板因子引擎类，对全市场面板按表达式批量计算因子
+    """
+
+    def __init__(self, panel, symbol_col: str = 'ts_code', date_col: str = 'date',
+                 factors: Optional[Dict[str, ExprLike]] = None):
+        """
+        初始化面板因子引擎
+
+        Args:
+            panel: 长表面板，每行一只股票一个交易日，可以是Polars DataFrame、LazyFrame或Pandas DataFrame
+            symbol_col: 股票代码列名
+            date_col: 日期列名
+            factors: 因子名 -> 因子表达式，默认使用default_factor_library()
+        """
+        if isinstance(panel, pd.DataFrame):
+            panel = pl.from_pandas(panel)
+        self.symbol_col = symbol_col
+        self.date_col = date_col
+        # 时间序列算子依赖股票内按日期升序
+        self.panel = panel.lazy().sort([symbol_col, date_col])
+        self.factors: Dict[str, PanelExpr] = {}
+        for name, expr in (default_factor_library() if factors is None else factors).items():
+            self.register(name, expr)
+
+    @classmethod
+    def from_symbols(cls, codes: Iterable[str], tdx_data_path: Optional[str] = None,
+                     store_path: Optional[str] = None, max_days: Optional[int] = None,
+                     **kwargs) -> 'PanelFactorEngine':
+        """
+        从列式存储或通达信日线文件加载多只股票，拼接为面板后创建引擎
+
+        Args:
+            codes: 股票代码列表
+            tdx_data_path: 通达信数据根目录
+            store_path: 列式存储目录
+            max_days: 每只股票只读取最近max_days条记录
+            **kwargs: 传给构造函数的其他参数
+
+        Returns:
+            PanelFactorEngine: 面板因子引擎
+        """
+        from src.tech_analysis.universe_calculator import load_universe_panel
+
+        panel = load_universe_panel(codes, tdx_data_path, store_path, max_days,
+                                    symbol_col=kwargs.get('symbol_col', 'ts_code'))
+        return cls(panel, **kwargs)
+
+    def register(self, name: str, expr: ExprLike):
+        """
+        注册（或覆盖）一个因子
+
+        Args:
+            name: 因子名
+            expr: 因子表达式，字符串视为列名
+        """
+        self.factors[name] = _as_expr(expr)
+
+    def lookback(self, names: Optional[List[str]] = None) -> Optional[int]:
+        """
+        计算一组因子需要的历史K线数
+
+        Args:
+            names: 因子名列表，None表示全部已注册因子
+
+        Returns:
+            Optional[int]: 各因子lookback的最大值，任一因子依赖全部历史时为None
+        """
+        names = list(self.factors) if names is None else names
+        lookbacks = [required_lookback(self.factors[name]) for name in names]
+        if None in lookbacks:
+            return None
+        return max(lookbacks, default=0)
+
+    def _partition(self, partition: Tuple[str, ...]) -> List[str]:
+        """把分区占位符替换为实际列名"""
+        mapping = {SYMBOL: self.symbol_col, DATE: self.date_col}
+        return [mapping.get(column, column) for column in partition]
+
+    def compile(self, names: Optional[List[str]] = None) -> Tuple[List[List[pl.Expr]], List[pl.Expr]]:
+        """
+        把因子表达式编译为分层的Polars表达式
+
+        Args:
+            names: 因子名列表，None表示全部已注册因子
+
+        Returns:
+            Tuple[List[List[pl.Expr]], List[pl.Expr]]: (各层的临时列表达式, 各因子的输出表达式)
+        """
+        names = list(self.factors) if names is None else names
+        compiled: Dict[str, Tuple[int, pl.Expr]] = {}
+        layers: List[List[pl.Expr]] = []
+
+        def visit(node: PanelExpr) -> Tuple[int, pl.Expr]:
+            if node.key in compiled:
+                return compiled[node.key]
+            if node.kind in ('column', 'literal'):
+                result = (0, node.func())
+            else:
+                inputs = [visit(child) for child in node.inputs]
+                level = max((child_level for child_level, _ in inputs), default=0)
+                expr = node.func(*(child_expr for _, child_expr in inputs))
+                if node.kind == 'window':
+                    # 带分区的算子物化为临时列，供更深一层的算子引用
+                    name = f'__pf{len(compiled)}'
+                    while len(layers) <= level:
+                        layers.append([])
+                    layers[level].append(expr.over(self._partition(node.partition)).alias(name))
+                    result = (level + 1, pl.col(name))
+                else:
+                    result = (level, expr)
+            compiled[node.key] = result
+            return result
+
+        outputs = []
+        for name in names:
+            if name not in self.factors:
+                raise KeyError(f"未注册的因子: {name}")
+            outputs.append(visit(self.factors[name])[1].alias(name))
+        return layers, outputs
+
+    def lazy(self, names: Optional[List[str]] = None, dtype: pl.DataType = pl.Float64,
+             panel: Optional[pl.LazyFrame] = None) -> pl.LazyFrame:
+        """
+        构建计算因子的单个惰性查询计划
+
+        Args:
+            names: 因子名列表，None表示全部已注册因子
+            dtype: 因子列的输出类型，全市场多年面板可用pl.Float32减半结果内存
+            panel: 已按股票、日期排序的面板，默认使用引擎的面板
+
+        Returns:
+            pl.LazyFrame: 包含股票代码、日期和各因子列的惰性查询
+        """
+        layers, outputs = self.compile(names)
+        query = self.panel if panel is None else panel
+        for layer in layers:
+            query = query.with_columns(layer)
+        return query.select(self.symbol_col, self.date_col,
+                            *[output.cast(dtype).fill_nan(None) for output in outputs])
+
+    def compute(self, names: Optional[List[str]] = None, dtype: pl.DataType = pl.Float64,
+                batch_size: Optional[int] = None) -> pl.DataFrame:
+        """
+        计算因子
+
+        Args:
+            names: 因子名列表，None表示全部已注册因子
+            dtype: 因子列的输出类型
+            batch_size: 每批计算的因子个数，None表示一次计算全部；
+                        分批时各批的临时列在批次结束后释放，峰值内存随批大小而非因子总数增长
+
+        Returns:
+            pl.DataFrame: 按股票、日期排序的因子面板
+        """
+        names = list(self.factors) if names is None else names
+        if not batch_size or batch_size >= len(names):
+            return self.lazy(names, dtype).collect()
+
+        panel = self.panel.collect().lazy()
+        result = None
+        for start in range(0, len(names), batch_size):
+            batch = self.lazy(names[start:start + batch_size], dtype, panel).collect()
+            result = batch if result is None else result.hstack(batch.drop(self.symbol_col, self.date_col))
+            logger.debug(f"面板因子计算进度: {min(start + batch_size, len(names))}/{len(names)}")
+        return result
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+面板因子评估器，在 (日期 × 股票) 长表面板上批量评估因子
+
+与逐序列计算一个合并相关系数的FactorEvaluator不同，这里的每项指标都按日期分组计算截面统计量：
+- 每日IC / Rank IC：一次group_by(日期)同时聚合全部因子的Pearson、Spearman相关系数
+- IC衰减：同一因子对多个持有期远期收益的IC
+- 分层收益：按日期截面排名把股票等数量分为n组，统计各组平均远期收益和多空收益
+- 换手：相邻两日顶层/底层组合的成员变化比例，以及因子排名的一阶自相关
+
+所有计算都是Polars表达式，不对日期做Python循环；每对(因子, 收益)只使用两者都有效的股票。
+"""
+
+from typing import Dict, List, Optional, Sequence, Union
+
+import pandas as pd
+import polars as pl
+from loguru import logger
+
+PanelLike = Union[pl.DataFrame, pl.LazyFrame, pd.DataFrame]
+
+
+class PanelFactorEvaluator:
+    """
+    面板因子评估器类，按日期截面批量计算IC、分层收益和换手
+    """
+
+    def __init__(self, symbol_col: str = 'ts_code', date_col: str = 'date', return_prefix: str = 'fwd_ret_'):
+        """
+        初始化面板因子评估器
+
+        Args:
+            symbol_col: 股票代码列名
+            date_col: 日期列名
+            return_prefix: 远期收益列名前缀，持有期h的远期收益列为 f'{return_prefix}{h}'
+        """
+        self.symbol_col = symbol_col
+        self.date_col = date_col
+        self.return_prefix = return_prefix
+
+    def _lazy(self, panel: PanelLike) -> pl.LazyFrame:
+        """统一转换为LazyFrame"""
+        if isinstance(panel, pd.DataFrame):
+            panel = pl.from_pandas(panel)
+        return panel.lazy()
+
+    def _return_col(self, horizon: int) -> str:
+        return f'{self.return_prefix}{horizon}'
+
+    def _factor_names(self, panel: pl.LazyFrame, factors: Optional[Sequence[str]]) -> List[str]:
+        """未指定因子时取除股票、日期和远期收益列外的全部数值列"""
+        schema = panel.collect_schema()
+        if factors is not None:
+            missing = [name for name in factors if name not in schema]
+            if missing:
+                raise KeyError(f"面板中不存在因子列: {missing}")
+            return list(factors)
+        return [name for name, dtype in schema.items()
+                if name not in (self.symbol_col, self.date_col)
+                and not name.startswith(self.return_prefix) and dtype.is_numeric()]
+
+    def _merge(self, factor_panel: PanelLike, returns: Optional[PanelLike]) -> pl.LazyFrame:
+        """
+        把远期收益面板按 (股票, 日期) 左连接到因子面板；returns为None时远期收益已在因子面板中
+
+        结果按日期排序，同一日期的行连续存放，按日期分组和截面排名都更快
+        """
+        panel = self._lazy(factor_panel)
+        if returns is None:
+            return panel.sort(self.date_col)
+        keys = [self.symbol_col, self.date_col]
+        schema = panel.collect_schema()
+        returns = self._lazy(returns)
+        return_cols = [name for name in returns.collect_schema().names() if name.startswith(self.return_prefix)]
+        returns = returns.select(
+            pl.col(self.symbol_col).cast(schema[self.symbol_col]),
+            pl.col(self.date_col).cast(schema[self.date_col]),
+            *return_cols,
+        )
+        return (panel.drop([name for name in return_cols if name in schema])
+                .join(returns, on=keys, how='left')
+                .sort(self.date_col))
+
+    @staticmethod
+    def _clean(name: str) -> pl.Expr:
+        """NaN统一视为缺失值"""
+        return pl.col(name).cast(pl.Float64).fill_nan(None)
+
+    def forward_returns(self, prices: PanelLike, horizons: Sequence[int] = (1, 5, 10, 20),
+                        price_col: str = 'close') -> pl.DataFrame:
+        """
+        计算各持有期的远期收益：第t日的h期远期收益为 close[t+h] / close[t] - 1（同一股票内）
+
+        Args:
+            prices: 包含股票代码、日期和价格列的面板
+            horizons: 持有期列表（交易日数）
+            price_col: 价格列名
+
+        Returns:
+            pl.DataFrame: 包含股票代码、日期和 f'{return_prefix}{h}' 各列的面板
+        """
+        price = pl.col(price_col).cast(pl.Float64)
+        return (self._lazy(prices)
+                .sort([self.symbol_col, self.date_col])
+                .select(self.symbol_col, self.date_col,
+                        *[(price.shift(-h).over(self.symbol_col) / price - 1).alias(self._return_col(h))
+                          for h in horizons])
+                .collect())
+
+    def _ic_query(self, panel: pl.LazyFrame, factors: List[str], return_col: str,
+                  min_count: int) -> pl.LazyFrame:
+        """
+        构建每日IC的惰性查询：一次按日期分组聚合全部因子，再拼成 (日期, 因子) 长表
+
+        聚合中只放普通的相关系数和计数表达式（包进struct或when会让Polars逐组求值，慢一个数量级），
+        有效股票数不足的日期在聚合后再置null
+        """
+        target = self._clean(return_col)
+        aggregations = []
+        for index, name in enumerate(factors):
+            value = self._clean(name)
+            valid = value.is_not_null() & target.is_not_null()
+            x, y = value.filter(valid), target.filter(valid)
+            aggregations += [pl.corr(x, y).alias(f'__ic{index}'),
+                             pl.corr(x, y, method='spearman').alias(f'__rank_ic{index}'),
+                             valid.sum().alias(f'__count{index}')]
+        daily = panel.group_by(self.date_col).agg(aggregations).cache()
+
+        def column(prefix: str, index: int) -> pl.Expr:
+            enough = pl.col(f'__count{index}') >= min_count
+            return pl.when(enough).then(pl.col(f'{prefix}{index}').fill_nan(None))
+
+        return pl.concat([daily.select(
+            self.date_col,
+            pl.lit(name).alias('factor'),
+            column('__ic', index).alias('ic'),
+            column('__rank_ic', index).alias('rank_ic'),
+            pl.col(f'__count{index}').alias('count'),
+        ) for index, name in enumerate(factors)])
+
+    def ic(self, factor_panel: PanelLike, returns: Optional[PanelLike] = None,
+           factors: Optional[Sequence[str]] = None, horizon: int = 1, min_count: int = 10) -> pl.DataFrame:
+        """
+        计算每日截面IC和Rank IC
+
+        Args:
+            factor_panel: 因子面板，包含股票代码、日期和因子列
+            returns: 远期收益面板（forward_returns的结果），None表示远期收益已在因子面板中
+            factors: 因子名列表，None表示全部因子列
+            horizon: 持有期
+            min_count: 当日有效股票数少于此值时IC为null
+
+        Returns:
+            pl.DataFrame: 每个 (日期, 因子) 一行，包含ic, rank_ic, count，按因子、日期排序
+        """
+        panel = self._merge(factor_panel, returns)
+        factors = self._factor_names(panel, factors)
+        return (self._ic_query(panel, factors, self._return_col(horizon), min_count)
+                .sort('factor', self.date_col)
+                .collect())
+
+    def ic_summary(self, daily_ic: pl.DataFrame) -> pl.DataFrame:
+        """
+        汇总每日IC
+
+        Args:
+            daily_ic: ic()或ic_decay(daily=True)的结果
+
+        Returns:
+            pl.DataFrame: 每个因子（及持有期）一行，包含IC/Rank IC的均值、标准差、IR、t值和IC为正的比例
+        """
+        keys = ['factor', 'horizon'] if 'horizon' in daily_ic.columns else ['factor']
+        statistics = []
+        for column in ('ic', 'rank_ic'):
+            value = pl.col(column).drop_nulls()
+            mean, std = value.mean(), value.std()
+            statistics += [
+                mean.alias(f'{column}_mean'),
+                std.alias(f'{column}_std'),
+                (mean / std).alias(f'{column}_ir'),
+                (mean / std * value.count().sqrt()).alias(f'{column}_t'),
+                (value > 0).mean().alias(f'{column}_positive_ratio'),
+            ]
+        return (daily_ic.group_by(keys, maintain_order=True)
+                .agg(*statistics, pl.col('ic').drop_nulls().count().alias('dates'))
+                .with_columns(pl.selectors.float().fill_nan(None)))
+
+    def ic_decay(self, factor_panel: PanelLike, returns: Optional[PanelLike] = None,
+                 factors: Optional[Sequence[str]] = None, horizons: Sequence[int] = (1, 5, 10, 20),
+                 min_count: int = 10, daily: bool = False) -> pl.DataFrame:
+        """
+        计算IC衰减：同一因子对不同持有期远期收益的IC
+
+        Args:
+            factor_panel: 因子面板
+            returns: 包含各持有期远期收益列的面板，None表示远期收益已在因子面板中
+            factors: 因子名列表，None表示全部因子列
+            horizons: 持有期列表
+            min_count: 当日有效股票数少于此值时IC为null
+            daily: True时返回每日IC，否则返回按 (因子, 持有期) 汇总的结果
+
+        Returns:
+            pl.DataFrame: 每日IC（多一列horizon）或ic_summary格式的汇总
+        """
+        panel = self._merge(factor_panel, returns)
+        factors = self._factor_names(panel, factors)
+        schema = panel.collect_schema()
+        missing = [h for h in horizons if self._return_col(h) not in schema]
+        if missing:
+            raise KeyError(f"面板中缺少持有期 {missing} 的远期收益列")
+        # 各持有期共用同一个输入计划，拼接后一次执行
+        panel = panel.cache()
+        queries = [self._ic_query(panel, factors, self._return_col(h), min_count)
+                   .with_columns(pl.lit(h).alias('horizon')) for h in horizons]
+        daily_ic = pl.concat(queries).sort('factor', 'horizon', self.date_col).collect()
+        return daily_ic if daily else self.ic_summary(daily_ic)
+
+    def _quantile(self, name: str, n_quantiles: int, valid: pl.Expr) -> pl.Expr:
+        """
+        按日期截面排名把有效股票等数量分为1..n组，相同因子值分在同一组
+        """
+        value = pl.when(valid).then(self._clean(name))
+        rank = value.rank('min').over(self.date_col).cast(pl.Int64)
+        count = value.count().over(self.date_col).cast(pl.Int64)
+        return ((rank - 1) * n_quantiles // count + 1).cast(pl.Int8)
+
+    def quantile_returns(self, factor_panel: PanelLike, returns: Optional[PanelLike] = None,
+                         factors: Optional[Sequence[str]] = None, horizon: int = 1,
+                         n_quantiles: int = 5) -> pl.DataFrame:
+        """
+        计算每日分层收益
+
+        Args:
+            factor_panel: 因子面板
+            returns: 远期收益面板，None表示远期收益已在因子面板中
+            factors: 因子名列表，None表示全部因子列
+            horizon: 持有期
+            n_quantiles: 分层数，第n组为因子值最大的一组
+
+        Returns:
+            pl.DataFrame: 每个 (因子, 日期, 分组) 一行，包含等权平均远期收益mean_return和股票数count
+        """
+        panel = self._merge(factor_panel, returns)
+        factors = self._factor_names(panel, factors)
+        return_col = self._return_col(horizon)
+        target = self._clean(return_col)
+        # 所有因子的分组在一次with_columns中算出，再按因子分别聚合，拼接后一次执行
+        grouped = panel.select(
+            self.date_col, target.alias(return_col),
+            *[self._quantile(name, n_quantiles, target.is_not_null()).alias(name) for name in factors],
+        ).cache()
+        queries = [grouped.filter(pl.col(name).is_not_null())
+                   .group_by(self.date_col, pl.col(name).alias('quantile'))
+                   .agg(pl.col(return_col).mean().alias('mean_return'), pl.len().alias('count'))
+                   .select(pl.lit(name).alias('factor'), self.date_col, 'quantile', 'mean_return', 'count')
+                   for name in factors]
+        return pl.concat(queries).sort('factor', self.date_col, 'quantile').collect()
+
+    def quantile_summary(self, daily_quantiles: pl.DataFrame) -> pl.DataFrame:
+        """
+        汇总分层收益
+
+        Args:
+            daily_quantiles: quantile_returns()的结果
+
+        Returns:
+            pl.DataFrame: 每个因子一行，包含各组平均收益q1..qn和多空收益long_short（第n组减第1组的逐日差的均值）
+        """
+        n_quantiles = int(daily_quantiles['quantile'].max() or 0)
+        wide = daily_quantiles.pivot(on='quantile', index=['factor', self.date_col], values='mean_return',
+                                     sort_columns=True)
+        wide = wide.rename({str(q): f'q{q}' for q in range(1, n_quantiles + 1) if str(q) in wide.columns})
+        quantile_cols = [name for name in wide.columns if name.startswith('q')]
+        long_short = (pl.col(f'q{n_quantiles}') - pl.col('q1')) if n_quantiles > 1 else pl.lit(None)
+        return (wide.group_by('factor', maintain_order=True)
+                .agg(*[pl.col(name).mean() for name in quantile_cols],
+                     long_short.mean().alias('long_short'),
+                     (long_short.mean() / long_short.std()).alias('long_short_ir')))
+
+    def turnover(self, factor_panel: PanelLike, factors: Optional[Sequence[str]] = None,
+                 n_quantiles: int = 5) -> pl.DataFrame:
+        """
+        计算每日换手
+
+        顶层（底层）换手为当日第n组（第1组）中前一交易日不在该组的股票比例；
+        因子自相关为当日与前一交易日因子值在截面上的Spearman相关系数，越低说明因子排名变化越快
+
+        Args:
+            factor_panel: 因子面板
+            factors: 因子名列表，None表示全部因子列
+            n_quantiles: 分层数
+
+        Returns:
+            pl.DataFrame: 每个 (因子, 日期) 一行，包含top_turnover, bottom_turnover, rank_autocorr
+        """
+        panel = self._lazy(factor_panel).sort([self.symbol_col, self.date_col])
+        factors = self._factor_names(panel, factors)
+        # Polars不支持嵌套的over：先物化分组和滞后因子值，再取前一条记录的分组，最后按行算出成员标记
+        panel = panel.with_columns(
+            *[self._quantile(name, n_quantiles, self._clean(name).is_not_null()).alias(f'__q{index}')
+              for index, name in enumerate(factors)],
+            *[self._clean(name).shift(1).over(self.symbol_col).alias(f'__lag{index}')
+              for index, name in enumerate(factors)],
+        ).with_columns(
+            pl.col(f'__q{index}').shift(1).over(self.symbol_col).alias(f'__prev_q{index}')
+            for index in range(len(factors))
+        )
+        columns, aggregations = [], []
+        for index, name in enumerate(factors):
+            value, lag = self._clean(name), pl.col(f'__lag{index}')
+            quantile, previous = pl.col(f'__q{index}'), pl.col(f'__prev_q{index}')
+            both = value.is_not_null() & lag.is_not_null()
+            # 组合成员和留在组合中的标记按行算出，分组时只做求和与相关系数
+            for group, label in ((n_quantiles, 'top'), (1, 'bottom')):
+                members = (quantile == group) & previous.is_not_null()
+                columns += [members.alias(f'__{label}{index}'),
+                            (members & (previous == group)).alias(f'__{label}_stay{index}')]
+            columns += [pl.when(both).then(value).alias(f'__x{index}'), pl.when(both).then(lag).alias(f'__y{index}')]
+            for label in ('top', 'bottom'):
+                aggregations += [pl.col(f'__{label}{index}').sum(), pl.col(f'__{label}_stay{index}').sum()]
+            aggregations.append(pl.corr(pl.col(f'__x{index}').drop_nulls(), pl.col(f'__y{index}').drop_nulls(),
+                                        method='spearman').alias(f'__autocorr{index}'))
+        daily = panel.with_columns(columns).group_by(self.date_col).agg(aggregations).cache()
+
+        def changed(label: str, index: int) -> pl.Expr:
+            return (1 - pl.col(f'__{label}_stay{index}') / pl.col(f'__{label}{index}')).fill_nan(None)
+
+        return pl.concat([daily.select(
+            self.date_col,
+            pl.lit(name).alias('factor'),
+            changed('top', index).alias('top_turnover'),
+            changed('bottom', index).alias('bottom_turnover'),
+            pl.col(f'__autocorr{index}').fill_nan(None).alias('rank_autocorr'),
+        ) for index, name in enumerate(factors)]).sort('factor', self.date_col).collect()
+
+    def evaluate(self, factor_panel: PanelLike, prices: Optional[PanelLike] = None,
+                 factors: Optional[Sequence[str]] = None, horizons: Sequence[int] = (1, 5, 10, 20),
+                 n_quantiles: int = 5, price_col: str = 'close', min_count: int = 10) -> Dict[str, pl.DataFrame]:
+        """
+        综合评估：每日IC及汇总、IC衰减、分层收益及汇总、换手
+
+        Args:
+            factor_panel: 因子面板
+            prices: 价格面板，用于计算远期收益；None表示因子面板中已有价格列price_col
+            factors: 因子名列表，None表示全部因子列
+            horizons: 持有期列表，IC、分层收益使用第一个持有期
+            n_quantiles: 分层数
+            price_col: 价格列名
+            min_count: 当日有效股票数少于此值时IC为null
+
+        Returns:
+            Dict[str, pl.DataFrame]: daily_ic, ic_summary, ic_decay, quantile_returns, quantile_summary, turnover
+        """
+        factor_panel = self._lazy(factor_panel)
+        if factors is None:
+            factors = [name for name in self._factor_names(factor_panel, None) if name != price_col]
+        returns = self.forward_returns(factor_panel if prices is None else prices, horizons, price_col)
+        panel = self._merge(factor_panel, returns).collect()
+        first = horizons[0]
+
+        # 第一个持有期的每日IC直接取自IC衰减的结果
+        decay = self.ic_decay(panel, factors=factors, horizons=horizons, min_count=min_count, daily=True)
+        daily_ic = decay.filter(pl.col('horizon') == first).drop('horizon')
+        quantiles = self.quantile_returns(panel, factors=factors, horizon=first, n_quantiles=n_quantiles)
+        logger.info(f"面板因子评估完成: {len(factors)}个因子, {panel.height}行")
+        return {
+            'daily_ic': daily_ic,
+            'ic_summary': self.ic_summary(daily_ic),
+            'ic_decay': self.ic_summary(decay),
+            'quantile_returns': quantiles,
+            'quantile_summary': self.quantile_summary(quantiles),
+            'turnover': self.turnover(panel, factors=factors, n_quantiles=n_quantiles),
+        }
@@ -0,0 +1,520 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+面板因子表达式
+
+因子写成由列、逐元素运算、时间序列算子（ts_*，按股票分组、沿时间计算）和截面算子
+（cs_*，按日期分组、在全市场上计算）组成的表达式树，由PanelFactorEngine编译为一个
+Polars惰性查询计划，在 (日期 × 股票) 长表面板上一次求值。
+
+时间序列算子要求面板在股票内按日期升序排列，这由引擎保证；窗口不足时结果为null。
+每个算子记录自己需要的历史K线数（lookback），required_lookback汇总整棵表达式树，
+增量计算时只需加载这么多历史即可得到与全历史计算相同的最新截面。
+"""
+
+import math
+from typing import Callable, Dict, Optional, Sequence, Tuple, Union
+
+import polars as pl
+
+
+# 分区占位符，由引擎替换为实际的股票代码列和日期列
+SYMBOL = '__symbol__'
+DATE = '__date__'
+
+# 递推EMA的初值影响衰减到此比例以下所需的期数计为其lookback
+EWM_TOLERANCE = 1e-8
+
+
+class PanelExpr:
+    """
+    面板因子表达式节点
+
+    kind为'column'（原始列）、'literal'（常量）、'map'（逐元素运算，编译时内联）
+    或'window'（带over分区的算子，编译时物化为临时列）。key是节点的规范化描述，
+    相同key的节点在一次编译中只计算一次。lookback是节点自身在输入之外还需要的
+    历史K线数，None表示依赖全部历史（如累计和）。
+    """
+
+    __slots__ = ('kind', 'func', 'inputs', 'partition', 'key', 'lookback')
+
+    def __init__(self, kind: str, func: Optional[Callable[..., pl.Expr]], inputs: Tuple['PanelExpr', ...],
+                 key: str, partition: Tuple[str, ...] = (), lookback: Optional[int] = 0):
+        self.kind = kind
+        self.func = func
+        self.inputs = inputs
+        self.partition = partition
+        self.key = key
+        self.lookback = lookback
+
+    def __repr__(self) -> str:
+        return self.key
+
+    def __add__(self, other):
+        return _map('add', lambda a, b: a + b, self, other)
+
+    def __radd__(self, other):
+        return _map('add', lambda a, b: a + b, other, self)
+
+    def __sub__(self, other):
+        return _map('sub', lambda a, b: a - b, self, other)
+
+    def __rsub__(self, other):
+        return _map('sub', lambda a, b: a - b, other, self)
+
+    def __mul__(self, other):
+        return _map('mul', lambda a, b: a * b, self, other)
+
+    def __rmul__(self, other):
+        return _map('mul', lambda a, b: a * b, other, self)
+
+    def __truediv__(self, other):
+        return _map('div', lambda a, b: a / b, self, other)
+
+    def __rtruediv__(self, other):
+        return _map('div', lambda a, b: a / b, other, self)
+
+    def __neg__(self):
+        return _map('neg', lambda a: -a, self)
+
+    def __abs__(self):
+        return _map('abs', lambda a: a.abs(), self)
+
+    # 与Polars表达式一样，==和!=生成逐元素比较节点，节点本身不可哈希
+    __hash__ = None
+
+    def __eq__(self, other):
+        return _map('eq', lambda a, b: a == b, self, other)
+
+    def __ne__(self, other):
+        return _map('ne', lambda a, b: a != b, self, other)
+
+    def __gt__(self, other):
+        return _map('gt', lambda a, b: a > b, self, other)
+
+    def __ge__(self, other):
+        return _map('ge', lambda a, b: a >= b, self, other)
+
+    def __lt__(self, other):
+        return _map('lt', lambda a, b: a < b, self, other)
+
+    def __le__(self, other):
+        return _map('le', lambda a, b: a <= b, self, other)
+
+    def __and__(self, other):
+        return _map('and', lambda a, b: a & b, self, other)
+
+    def __or__(self, other):
+        return _map('or', lambda a, b: a | b, self, other)
+
+
+ExprLike = Union[PanelExpr, str, int, float, None]
+
+
+def col(name: str) -> PanelExpr:
+    """引用面板中的原始列"""
+    return PanelExpr('column', lambda: pl.col(name), (), f'col({name!r})')
+
+
+def _as_expr(value: ExprLike) -> PanelExpr:
+    """把列名、常量统一为表达式节点（字符串视为列名）"""
+    if isinstance(value, PanelExpr):
+        return value
+    if isinstance(value, str):
+        return col(value)
+    return PanelExpr('literal', lambda: pl.lit(value), (), repr(value))
+
+
+def _map(op: str, func: Callable[..., pl.Expr], *args: ExprLike, params: Tuple = ()) -> PanelExpr:
+    inputs = tuple(_as_expr(arg) for arg in args)
+    return PanelExpr('map', func, inputs, f"{op}({', '.join([*map(repr, inputs), *map(repr, params)])})")
+
+
+def _window(op: str, func: Callable[..., pl.Expr], partition: Tuple[str, ...], *args: ExprLike,
+            params: Tuple = (), lookback: Optional[int] = 0) -> PanelExpr:
+    inputs = tuple(_as_expr(arg) for arg in args)
+    key = f"{op}({', '.join([*map(repr, inputs), *map(repr, params)])})"
+    if partition[1:]:
+        key += f" by {partition[1:]}"
+    return PanelExpr('window', func, inputs, key, partition, lookback)
+
+
+def _ts(op: str, func: Callable[..., pl.Expr], *args: ExprLike, params: Tuple = (),
+        lookback: Optional[int] = 0) -> PanelExpr:
+    return _window(op, func, (SYMBOL,), *args, params=params, lookback=lookback)
+
+
+def _cs(op: str, func: Callable[..., pl.Expr], *args: ExprLike, group: Optional[str] = None,
+        params: Tuple = ()) -> PanelExpr:
+    partition = (DATE, group) if group else (DATE,)
+    return _window(op, func, partition, *args, params=params)
+
+
+# ---------------------------------------------------------------------------
+# 逐元素运算
+# ---------------------------------------------------------------------------
+
+def log(x: ExprLike) -> PanelExpr:
+    """自然对数"""
+    return _map('log', lambda a: a.log(), x)
+
+
+def sign(x: ExprLike) -> PanelExpr:
+    """符号函数"""
+    return _map('sign', lambda a: a.sign(), x)
+
+
+def sqrt(x: ExprLike) -> PanelExpr:
+    """平方根"""
+    return _map('sqrt', lambda a: a.sqrt(), x)
+
+
+def maximum(a: ExprLike, b: ExprLike) -> PanelExpr:
+    """逐元素最大值"""
+    return _map('maximum', lambda x, y: pl.max_horizontal(x, y), a, b)
+
+
+def minimum(a: ExprLike, b: ExprLike) -> PanelExpr:
+    """逐元素最小值"""
+    return _map('minimum', lambda x, y: pl.min_horizontal(x, y), a, b)
+
+
+def where(condition: ExprLike, then: ExprLike, otherwise: ExprLike) -> PanelExpr:
+    """条件选择"""
+    return _map('where', lambda c, a, b: pl.when(c).then(a).otherwise(b), condition, then, otherwise)
+
+
+def safe_div(a: ExprLike, b: ExprLike) -> PanelExpr:
+    """除法，分母为0时结果为null"""
+    return _map('safe_div', lambda x, y: pl.when(y != 0).then(x / y), a, b)
+
+
+# ---------------------------------------------------------------------------
+# 时间序列算子（按股票分组，沿时间计算）
+# ---------------------------------------------------------------------------
+
+def ts_delay(x: ExprLike, n: int = 1) -> PanelExpr:
+    """n期前的值"""
+    return _ts('ts_delay', lambda a: a.shift(n), x, params=(n,), lookback=n)
+
+
+def ts_delta(x: ExprLike, n: int = 1) -> PanelExpr:
+    """与n期前的差"""
+    return _ts('ts_delta', lambda a: a.diff(n), x, params=(n,), lookback=n)
+
+
+def ts_return(x: ExprLike, n: int = 1) -> PanelExpr:
+    """n期收益率 (x - x[n期前]) / x[n期前]"""
+    return _ts('ts_return', lambda a: (a - a.shift(n)) / a.shift(n), x, params=(n,), lookback=n)
+
+
+def ts_sum(x: ExprLike, n: int) -> PanelExpr:
+    """n期滚动和"""
+    return _ts('ts_sum', lambda a: a.rolling_sum(n), x, params=(n,), lookback=n - 1)
+
+
+def ts_mean(x: ExprLike, n: int) -> PanelExpr:
+    """n期滚动均值"""
+    return _ts('ts_mean', lambda a: a.rolling_mean(n), x, params=(n,), lookback=n - 1)
+
+
+def ts_std(x: ExprLike, n: int) -> PanelExpr:
+    """n期滚动总体标准差（与np.std一致，ddof=0）"""
+    return _ts('ts_std', lambda a: a.rolling_std(n, ddof=0), x, params=(n,), lookback=n - 1)
+
+
+def ts_min(x: ExprLike, n: int) -> PanelExpr:
+    """n期滚动最小值"""
+    return _ts('ts_min', lambda a: a.rolling_min(n), x, params=(n,), lookback=n - 1)
+
+
+def ts_max(x: ExprLike, n: int) -> PanelExpr:
+    """n期滚动最大值"""
+    return _ts('ts_max', lambda a: a.rolling_max(n), x, params=(n,), lookback=n - 1)
+
+
+def ts_rank(x: ExprLike, n: int) -> PanelExpr:
+    """当前值在最近n期中的分位（1/n ~ 1）"""
+    return _ts('ts_rank', lambda a: a.rolling_rank(n) / n, x, params=(n,), lookback=n - 1)
+
+
+def ts_cumsum(x: ExprLike) -> PanelExpr:
+    """累计和"""
+    return _ts('ts_cumsum', lambda a: a.cum_sum(), x, lookback=None)
+
+
+def ts_count(x: ExprLike) -> PanelExpr:
+    """截至当前的非空值个数"""
+    return _ts('ts_count', lambda a: a.is_not_null().cum_sum(), x, lookback=None)
+
+
+def _ewm_memory(alpha: float) -> int:
+    """递推指数平均的初值权重 (1-alpha)^k 降到EWM_TOLERANCE以下所需的期数"""
+    return math.ceil(math.log(EWM_TOLERANCE) / math.log(1 - alpha))
+
+
+def ts_ewm(x: ExprLike, alpha: float, seed: Optional[float] = None) -> PanelExpr:
+    """
+    递推指数平均 y = alpha*x + (1-alpha)*y[前一期]，以首个非空值为初值；
+    给定seed时首个非空值替换为seed（如KDJ的初值50）
+    """
+    def ewm(a: pl.Expr) -> pl.Expr:
+        if seed is not None:
+            a = pl.when(a.is_not_null().cum_sum() == 1).then(pl.lit(seed)).otherwise(a)
+        return a.ewm_mean(alpha=alpha, adjust=False)
+    params = (alpha,) if seed is None else (alpha, seed)
+    return _ts('ts_ewm', ewm, x, params=params, lookback=_ewm_memory(alpha))
+
+
+def ts_ema(x: ExprLike, period: int) -> PanelExpr:
+    """
+    以前period个非空值的均值为初值、alpha = 2/(period+1) 递推的EMA，
+    与单股因子类中calculate_ema的定义一致
+    """
+    def ema(a: pl.Expr) -> pl.Expr:
+        count = a.is_not_null().cum_sum()
+        seeded = pl.when(count == period).then(a.rolling_mean(period)).when(count > period).then(a)
+        return seeded.ewm_mean(alpha=2 / (period + 1), adjust=False)
+    return _ts('ts_ema', ema, x, params=(period,), lookback=period - 1 + _ewm_memory(2 / (period + 1)))
+
+
+def ts_corr(x: ExprLike, y: ExprLike, n: int) -> PanelExpr:
+    """n期滚动相关系数"""
+    return _ts('ts_corr', lambda a, b: pl.rolling_corr(a, b, window_size=n), x, y, params=(n,), lookback=n - 1)
+
+
+def ts_cov(x: ExprLike, y: ExprLike, n: int) -> PanelExpr:
+    """n期滚动协方差（ddof=1）"""
+    return _ts('ts_cov', lambda a, b: pl.rolling_cov(a, b, window_size=n), x, y, params=(n,), lookback=n - 1)
+
+
+def required_lookback(expr: ExprLike) -> Optional[int]:
+    """
+    计算表达式需要的历史K线数：沿每条路径累加各算子的lookback，取最大值
+
+    Args:
+        expr: 因子表达式
+
+    Returns:
+        Optional[int]: 得到某一日的因子值需要此前多少根K线，None表示依赖全部历史
+    """
+    memo: Dict[str, Optional[int]] = {}
+
+    def visit(node: PanelExpr) -> Optional[int]:
+        if node.key not in memo:
+            own = node.lookback
+            children = [visit(child) for child in node.inputs]
+            if own is None or None in children:
+                memo[node.key] = None
+            else:
+                memo[node.key] = own + max(children, default=0)
+        return memo[node.key]
+
+    return visit(_as_expr(expr))
+
+
+# ---------------------------------------------------------------------------
+# 截面算子（按日期分组，在全市场或行业内计算）
+# ---------------------------------------------------------------------------
+
+def _valid(a: pl.Expr) -> pl.Expr:
+    """截面统计前把NaN视为缺失"""
+    return a.fill_nan(None)
+
+
+def cs_rank(x: ExprLike, group: Optional[str] = None) -> PanelExpr:
+    """截面百分位排名（0 ~ 1]，缺失值不参与排名"""
+    return _cs('cs_rank', lambda a: _valid(a).rank('average') / _valid(a).count(), x, group=group)
+
+
+def cs_mean(x: ExprLike, group: Optional[str] = None) -> PanelExpr:
+    """截面均值"""
+    return _cs('cs_mean', lambda a: _valid(a).mean(), x, group=group)
+
+
+def cs_demean(x: ExprLike, group: Optional[str] = None) -> PanelExpr:
+    """减去截面（或行业内）均值"""
+    return _cs('cs_demean', lambda a: _valid(a) - _valid(a).mean(), x, group=group)
+
+
+def cs_zscore(x: ExprLike, group: Optional[str] = None) -> PanelExpr:
+    """截面标准化 (x - 均值) / 标准差"""
+    return _cs('cs_zscore', lambda a: (_valid(a) - _valid(a).mean()) / _valid(a).std(), x, group=group)
+
+
+def cs_winsorize(x: ExprLike, n_mad: float = 3.0, group: Optional[str] = None) -> PanelExpr:
+    """
+    截面MAD去极值：把超出 中位数 ± n_mad × 1.4826 × MAD 的值截断到边界
+    """
+    def winsorize(a: pl.Expr) -> pl.Expr:
+        a = _valid(a)
+        median = a.median()
+        mad = (a - median).abs().median() * 1.4826
+        return a.clip(median - n_mad * mad, median + n_mad * mad)
+    return _cs('cs_winsorize', winsorize, x, group=group, params=(n_mad,))
+
+
+def _cs_beta(y: PanelExpr, q: PanelExpr, group: Optional[str]) -> PanelExpr:
+    """截面上y对已去均值的q的回归系数，只用y非空的样本"""
+    def beta(a: pl.Expr, b: pl.Expr) -> pl.Expr:
+        a = _valid(a)
+        return (a * b).sum() / pl.when(a.is_not_null()).then(b * b).sum()
+    return _cs('cs_beta', beta, y, q, group=group)
+
+
+def cs_neutralize(x: ExprLike, exposures: Sequence[ExprLike] = (), group: Optional[str] = None) -> PanelExpr:
+    """
+    截面中性化：每个日期上把x对行业哑变量（group列）和数值暴露（如对数市值）做带截距的最小二乘，返回残差
+
+    行业哑变量通过在 (日期, 行业) 内去均值消去；多个数值暴露先逐个施密特正交化，
+    再依次从x中剔除在各正交暴露上的投影，结果与一次多元回归的残差相同。
+
+    Args:
+        x: 待中性化的因子
+        exposures: 数值暴露列表
+        group: 行业列名，None表示只做全市场回归
+
+    Returns:
+        PanelExpr: 中性化后的因子
+    """
+    residual = cs_demean(x, group)
+    orthogonal = []
+    for exposure in exposures:
+        q = cs_demean(exposure, group)
+        for basis in orthogonal:
+            q = q - _cs_beta(q, basis, group) * basis
+        orthogonal.append(q)
+    for basis in orthogonal:
+        residual = residual - _cs_beta(residual, basis, group) * basis
+    return residual
+
+
+# ---------------------------------------------------------------------------
+# 默认因子库：与src/alpha/factors下单股因子类同名同定义（预热期为null而非0），另加截面因子
+# ---------------------------------------------------------------------------
+
+def _rsi(close: PanelExpr, n: int) -> PanelExpr:
+    delta = ts_delta(close, 1)
+    avg_gain = ts_mean(where(delta > 0, delta, 0.0), n)
+    avg_loss = ts_mean(where(delta < 0, -delta, 0.0), n)
+    return where(avg_loss == 0, 100.0, 100 - 100 / (1 + avg_gain / avg_loss))
+
+
+def _kdj(high: PanelExpr, low: PanelExpr, close: PanelExpr, n: int = 14) -> Tuple[PanelExpr, PanelExpr]:
+    highest = ts_delay(ts_max(high, n), 1)
+    lowest = ts_delay(ts_min(low, n), 1)
+    rsv = where(highest == lowest, 0.0, (close - lowest) / (highest - lowest) * 100)
+    # 第一个有效K线上K、D取50，此后按 2/3、1/3 平滑
+    k = ts_ewm(rsv, 1 / 3, seed=50.0)
+    d = ts_ewm(k, 1 / 3)
+    return k, d
+
+
+def _cross(fast: PanelExpr, slow: PanelExpr) -> PanelExpr:
+    prev_fast, prev_slow = ts_delay(fast, 1), ts_delay(slow, 1)
+    golden = (fast > slow) & (prev_fast <= prev_slow)
+    dead = (fast < slow) & (prev_fast >= prev_slow)
+    return where(golden, 1.0, where(dead, -1.0, 0.0))
+
+
+def _masked_std(x: PanelExpr, mask: PanelExpr, n: int) -> PanelExpr:
+    """最近n期中满足mask的值的总体标准差"""
+    count = ts_sum(where(mask, 1.0, 0.0), n)
+    total = ts_sum(where(mask, x, 0.0), n)
+    total_sq = ts_sum(where(mask, x * x, 0.0), n)
+    mean = total / count
+    return where(count > 0, sqrt(maximum(total_sq / count - mean * mean, 0.0)), 0.0)
+
+
+def default_factor_library() -> Dict[str, PanelExpr]:
+    """
+    默认面板因子库
+
+    与单股因子类的区别：预热期为null而非0；beta以全市场等权平均收益为市场收益（单股类以传入的基准指数为市场，未提供时以自身为代理，恒为1）。
+
+    Returns:
+        Dict[str, PanelExpr]: 因子名 -> 因子表达式
+    """
+    open_, high, low, close, volume = col('open'), col('high'), col('low'), col('close'), col('volume')
+    prev_close = ts_delay(close, 1)
+    pct_return = ts_return(close, 1)
+    log_return = log(close / prev_close)
+    factors: Dict[str, PanelExpr] = {}
+
+    # 价格动量
+    for name, n in (('momentum_1m', 20), ('momentum_3m', 60), ('momentum_6m', 120), ('momentum_12m', 240)):
+        factors[name] = ts_return(close, n)
+    factors['rsi_14'] = _rsi(close, 14)
+    factors['rsi_21'] = _rsi(close, 21)
+    macd = ts_ema(close, 12) - ts_ema(close, 26)
+    factors['macd'] = macd
+    factors['macd_signal'] = ts_ema(macd, 9)
+    factors['macd_hist'] = macd - factors['macd_signal']
+    kdj_k, kdj_d = _kdj(high, low, close)
+    factors['kdj_k'] = kdj_k
+    factors['kdj_d'] = kdj_d
+    factors['kdj_j'] = 3 * kdj_k - 2 * kdj_d
+    factors['kdj_crossover'] = _cross(kdj_k, kdj_d)
+
+    # 波动率（窗口不含当前K线，与单股类一致）
+    true_range = maximum(maximum(high - low, abs(high - prev_close)), abs(low - prev_close))
+    factors['atr_14'] = ts_delay(ts_mean(true_range, 14), 1)
+    factors['atr_21'] = ts_delay(ts_mean(true_range, 21), 1)
+    factors['volatility_20'] = ts_delay(ts_std(log_return, 20), 1) * 252 ** 0.5
+    factors['volatility_60'] = ts_delay(ts_std(log_return, 60), 1) * 252 ** 0.5
+    garman_klass = sqrt(0.5 * log(high / low) * log(high / low)
+                        - (2 * 0.6931471805599453 - 1) * log(close / open_) * log(close / open_))
+    factors['gk_volatility_20'] = ts_delay(ts_mean(garman_klass, 20), 1) * 252 ** 0.5
+    factors['gk_volatility_60'] = ts_delay(ts_mean(garman_klass, 60), 1) * 252 ** 0.5
+    recent_vol = ts_delay(ts_std(log_return, 20), 1)
+    past_vol = ts_delay(ts_std(log_return, 40), 21)
+    factors['volatility_trend'] = where(past_vol > 0, (recent_vol - past_vol) / past_vol, 0.0)
+
+    # 成交量
+    volume_change = safe_div(ts_delta(volume, 1), ts_delay(volume, 1))
+    factors['volume_change'] = volume_change
+    factors['volume_change_5'] = ts_delay(ts_mean(volume_change, 5), 1)
+    factors['volume_change_20'] = ts_delay(ts_mean(volume_change, 20), 1)
+    factors['volume_momentum_10'] = ts_return(volume, 10)
+    factors['volume_momentum_20'] = ts_return(volume, 20)
+    obv = ts_cumsum(where(close > prev_close, volume, where(close < prev_close, -volume, 0.0)))
+    factors['obv'] = obv
+    factors['obv_ma10'] = ts_delay(ts_mean(obv, 10), 1)
+    factors['obv_ma20'] = ts_delay(ts_mean(obv, 20), 1)
+    factors['volume_price_correlation'] = ts_delay(ts_corr(volume, pct_return, 20), 1)
+    factors['volume_weighted_price'] = ts_delay(safe_div(ts_sum(close * volume, 20), ts_sum(volume, 20)), 1)
+
+    # 技术指标
+    ma20 = ts_delay(ts_mean(close, 20), 1)
+    std20 = ts_delay(ts_std(close, 20), 1)
+    factors['bollinger_ma20'] = ma20
+    factors['bollinger_upper'] = ma20 + 2 * std20
+    factors['bollinger_lower'] = ma20 - 2 * std20
+    factors['bollinger_width'] = 4 * std20 / ma20
+    factors['bollinger_position'] = safe_div(close - ma20, 4 * std20)
+    for n in (5, 10, 20, 60):
+        factors[f'ma{n}'] = ts_delay(ts_mean(close, n), 1)
+    factors['ma_crossover_5_20'] = _cross(factors['ma5'], factors['ma20'])
+    factors['ma_crossover_10_60'] = _cross(factors['ma10'], factors['ma60'])
+    factors['rsi_momentum'] = ts_delta(factors['rsi_14'], 14)
+
+    # 风险
+    market_return = cs_mean(pct_return)
+    lagged_return, lagged_market = ts_delay(pct_return, 1), ts_delay(market_return, 1)
+    market_var = ts_std(lagged_market, 20) * ts_std(lagged_market, 20)
+    factors['beta'] = safe_div(ts_cov(lagged_return, lagged_market, 20) * (19 / 20), market_var)
+    highest, lowest = ts_delay(ts_max(close, 20), 1), ts_delay(ts_min(close, 20), 1)
+    factors['max_drawdown_20'] = (lowest - highest) / highest
+    sharpe_std = ts_delay(ts_std(pct_return, 20), 1)
+    factors['sharpe_ratio_20'] = where(sharpe_std > 0, ts_delay(ts_mean(pct_return, 20), 1) / sharpe_std * 252 ** 0.5, 0.0)
+    factors['downside_risk_20'] = ts_delay(_masked_std(pct_return, pct_return < 0, 20), 1) * 252 ** 0.5
+
+    # 截面因子
+    factors['reversal_5_rank'] = cs_rank(-ts_return(close, 5))
+    factors['momentum_1m_rank'] = cs_rank(factors['momentum_1m'])
+    factors['momentum_3m_zscore'] = cs_zscore(cs_winsorize(factors['momentum_3m']))
+    factors['volatility_20_rank'] = cs_rank(factors['volatility_20'])
+    factors['momentum_3m_neutral'] = cs_neutralize(cs_winsorize(factors['momentum_3m']),
+                                                   exposures=[factors['volatility_20'], factors['beta']])
+    return factors
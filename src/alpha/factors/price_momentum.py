@@ -8,6 +8,8 @@
 import polars as pl
 import numpy as np
 
+from src.alpha.factors.rolling_moments import seeded_ema, trailing_max, trailing_mean, trailing_min
+
 
 class PriceMomentumFactors:
     """
@@ -45,89 +47,60 @@ class PriceMomentumFactors:
         """
         计算动量因子
         """
-        close = self.data['close'].to_numpy()
-        
-        # 短期动量（1个月）
-        momentum_1m = np.zeros_like(close)
-        for i in range(20, len(close)):
-            momentum_1m[i] = (close[i] - close[i-20]) / close[i-20]
-        
-        # 中期动量（3个月）
-        momentum_3m = np.zeros_like(close)
-        for i in range(60, len(close)):
-            momentum_3m[i] = (close[i] - close[i-60]) / close[i-60]
+        close = self.data['close'].to_numpy().astype(np.float64)
         
-        # 长期动量（6个月）
-        momentum_6m = np.zeros_like(close)
-        for i in range(120, len(close)):
-            momentum_6m[i] = (close[i] - close[i-120]) / close[i-120]
+        def momentum(period):
+            values = np.zeros_like(close)
+            if len(close) > period:
+                values[period:] = (close[period:] - close[:-period]) / close[:-period]
+            return values
         
-        # 动量反转（12个月）
-        momentum_12m = np.zeros_like(close)
-        for i in range(240, len(close)):
-            momentum_12m[i] = (close[i] - close[i-240]) / close[i-240]
-        
-        # 添加到DataFrame
+        # 添加到DataFrame：短期（1个月）、中期（3个月）、长期（6个月）动量和动量反转（12个月）
         self.data = self.data.with_columns(
-            pl.Series('momentum_1m', momentum_1m),
-            pl.Series('momentum_3m', momentum_3m),
-            pl.Series('momentum_6m', momentum_6m),
-            pl.Series('momentum_12m', momentum_12m)
+            pl.Series('momentum_1m', momentum(20)),
+            pl.Series('momentum_3m', momentum(60)),
+            pl.Series('momentum_6m', momentum(120)),
+            pl.Series('momentum_12m', momentum(240))
         )
     
     def _calculate_rsi_momentum(self):
         """
         计算RSI动量因子
         """
-        close = self.data['close'].to_numpy()
+        close = self.data['close'].to_numpy().astype(np.float64)
         
-        # 计算RSI
+        # 计算RSI：gain/loss[i]为第i根到第i+1根K线的涨跌，第i根K线的窗口为 gain[i-n:i]
         delta = np.diff(close)
         gain = np.where(delta > 0, delta, 0)
         loss = np.where(delta < 0, -delta, 0)
         
-        # 14日RSI
-        rsi_14 = np.zeros_like(close)
-        for i in range(14, len(close)):
-            avg_gain = np.mean(gain[i-14:i])
-            avg_loss = np.mean(loss[i-14:i])
-            if avg_loss == 0:
-                rsi_14[i] = 100
-            else:
-                rs = avg_gain / avg_loss
-                rsi_14[i] = 100 - (100 / (1 + rs))
-        
-        # 21日RSI
-        rsi_21 = np.zeros_like(close)
-        for i in range(21, len(close)):
-            avg_gain = np.mean(gain[i-21:i])
-            avg_loss = np.mean(loss[i-21:i])
-            if avg_loss == 0:
-                rsi_21[i] = 100
-            else:
-                rs = avg_gain / avg_loss
-                rsi_21[i] = 100 - (100 / (1 + rs))
+        def rsi(period):
+            values = np.zeros_like(close)
+            avg_gain = trailing_mean(np.append(gain, 0), period)
+            avg_loss = trailing_mean(np.append(loss, 0), period)
+            valid = np.arange(len(close)) >= period
+            values[valid] = 100
+            ratio = valid & (avg_loss != 0)
+            values[ratio] = 100 - 100 / (1 + avg_gain[ratio] / avg_loss[ratio])
+            return values
         
         # 添加到DataFrame
         self.data = self.data.with_columns(
-            pl.Series('rsi_14', rsi_14),
-            pl.Series('rsi_21', rsi_21)
+            pl.Series('rsi_14', rsi(14)),
+            pl.Series('rsi_21', rsi(21))
         )
     
     def _calculate_macd_momentum(self):
         """
         计算MACD动量因子
         """
-        close = self.data['close'].to_numpy()
+        close = self.data['close'].to_numpy().astype(np.float64)
         
-        # 计算EMA
+        # 计算EMA：以前period个值的均值为初值
         def calculate_ema(values, period):
-            ema = np.zeros_like(values)
-            ema[period-1] = np.mean(values[:period])
-            multiplier = 2 / (period + 1)
-            for i in range(period, len(values)):
-                ema[i] = (values[i] - ema[i-1]) * multiplier + ema[i-1]
-            return ema
+            if len(values) < period:
+                return np.zeros_like(values)
+            return seeded_ema(values, 2 / (period + 1), period - 1, np.mean(values[:period]))
         
         # 计算MACD
         ema12 = calculate_ema(close, 12)
@@ -147,38 +120,20 @@ class PriceMomentumFactors:
         """
         计算随机动量因子
         """
-        high = self.data['high'].to_numpy()
-        low = self.data['low'].to_numpy()
-        close = self.data['close'].to_numpy()
-        
-        # 计算KDJ指标
-        k = np.zeros_like(close)
-        d = np.zeros_like(close)
-        j = np.zeros_like(close)
-        
-        for i in range(14, len(close)):
-            # 计算RSV
-            highest = np.max(high[i-14:i])
-            lowest = np.min(low[i-14:i])
-            if highest == lowest:
-                rsv = 0
-            else:
-                rsv = (close[i] - lowest) / (highest - lowest) * 100
-            
-            # 计算K
-            if i == 14:
-                k[i] = 50
-            else:
-                k[i] = k[i-1] * 2/3 + rsv * 1/3
-            
-            # 计算D
-            if i == 14:
-                d[i] = 50
-            else:
-                d[i] = d[i-1] * 2/3 + k[i] * 1/3
-            
-            # 计算J
-            j[i] = 3 * k[i] - 2 * d[i]
+        high = self.data['high'].to_numpy().astype(np.float64)
+        low = self.data['low'].to_numpy().astype(np.float64)
+        close = self.data['close'].to_numpy().astype(np.float64)
+        
+        # 计算RSV：第i根K线的最高、最低价取此前14日
+        highest = trailing_max(high, 14)
+        lowest = trailing_min(low, 14)
+        spread = highest - lowest
+        rsv = np.divide(close - lowest, spread, out=np.zeros_like(close), where=spread != 0) * 100
+        
+        # 计算KDJ指标：K、D从第14根K线的50开始以1/3的权重递推
+        k = seeded_ema(rsv, 1 / 3, 14, 50)
+        d = seeded_ema(k, 1 / 3, 14, 50)
+        j = 3 * k - 2 * d
         
         # 添加到DataFrame
         self.data = self.data.with_columns(
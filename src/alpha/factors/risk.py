@@ -5,8 +5,36 @@
 风险因子计算模块
 """
 
+from typing import Optional
+
 import polars as pl
 import numpy as np
+from loguru import logger
+
+from src.alpha.factors.rolling_moments import (
+    simple_returns, trailing_cov_var, trailing_masked_std, trailing_max, trailing_mean, trailing_min, trailing_std
+)
+
+# 默认基准指数：沪深300
+DEFAULT_BENCHMARK_CODE = 'sh000300'
+
+
+def load_benchmark_index(index_code: str = DEFAULT_BENCHMARK_CODE, tdx_data_path: Optional[str] = None,
+                         store_path: Optional[str] = None) -> pl.DataFrame:
+    """
+    加载基准指数日线，优先读取列式存储，其次读取通达信指数日线文件（如 {tdx_data_path}/sh/lday/sh000300.day）
+
+    Args:
+        index_code: 指数代码
+        tdx_data_path: 通达信数据根目录
+        store_path: 列式存储目录
+
+    Returns:
+        pl.DataFrame: 包含date, close的DataFrame
+    """
+    from src.tech_analysis.universe_calculator import load_symbol_frame
+
+    return load_symbol_frame(index_code, tdx_data_path, store_path).select('date', 'close')
 
 
 class RiskFactors:
@@ -14,14 +42,16 @@ class RiskFactors:
     风险因子计算类
     """
     
-    def __init__(self, data):
+    def __init__(self, data, benchmark=None):
         """
         初始化风险因子计算类
         
         Args:
             data: Polars DataFrame，包含价格数据
+            benchmark: 基准指数，包含date, close的DataFrame，或与data逐行对齐的收盘价序列
         """
         self.data = data
+        self.benchmark = benchmark
     
     def calculate(self, **params) -> pl.DataFrame:
         """
@@ -29,39 +59,73 @@ class RiskFactors:
         
         Args:
             **params: 计算参数
+                benchmark: 基准指数，覆盖构造时传入的基准
+                benchmark_code: 未提供基准时从数据源加载的指数代码，默认沪深300
+                tdx_data_path: 通达信数据根目录
+                store_path: 列式存储目录
             
         Returns:
             pl.DataFrame: 包含计算结果的DataFrame
         """
+        benchmark = params.get('benchmark', self.benchmark)
+        if benchmark is None and (params.get('tdx_data_path') or params.get('store_path')):
+            benchmark_code = params.get('benchmark_code', DEFAULT_BENCHMARK_CODE)
+            try:
+                benchmark = load_benchmark_index(benchmark_code, params.get('tdx_data_path'),
+                                                 params.get('store_path'))
+            except (OSError, ValueError, pl.exceptions.PolarsError) as e:
+                logger.warning(f"加载基准指数 {benchmark_code} 失败，Beta以自身为市场代理: {e}")
+        
         # 计算各种风险因子
-        self._calculate_beta()
+        self._calculate_beta(benchmark)
         self._calculate_max_drawdown()
         self._calculate_sharpe_ratio()
         self._calculate_downside_risk()
         
         return self.data
     
-    def _calculate_beta(self):
+    def _benchmark_close(self, benchmark) -> Optional[np.ndarray]:
         """
-        计算Beta系数
+        把基准指数对齐到self.data的每一行
+        
+        DataFrame基准按日期左连接，股票有而指数缺失的日期沿用前一个指数收盘价；
+        数组基准视为已与self.data逐行对齐
+        """
+        if benchmark is None:
+            return None
+        if isinstance(benchmark, (pl.DataFrame, pl.LazyFrame)):
+            if 'date' not in self.data.columns:
+                logger.warning("数据缺少date列，无法按日期对齐基准指数，Beta以自身为市场代理")
+                return None
+            index = benchmark.lazy().select(
+                pl.col('date').cast(self.data.schema['date']),
+                pl.col('close').cast(pl.Float64).alias('benchmark_close'),
+            )
+            aligned = (self.data.lazy().select('date').with_row_index('__row')
+                       .join(index, on='date', how='left').sort('__row')
+                       .select(pl.col('benchmark_close').forward_fill().backward_fill()).collect())
+            close = aligned['benchmark_close'].to_numpy()
+        else:
+            close = np.asarray(benchmark, dtype=np.float64)
+        if len(close) != self.data.height or np.isnan(close).all():
+            logger.warning("基准指数与数据无法对齐，Beta以自身为市场代理")
+            return None
+        return close
+    
+    def _calculate_beta(self, benchmark=None):
         """
-        close = self.data['close'].to_numpy()
+        计算Beta系数：此前20日个股收益率对基准指数收益率的回归系数 cov/var
         
-        # 计算收益率
-        returns = np.zeros_like(close)
-        for i in range(1, len(close)):
-            returns[i] = (close[i] - close[i-1]) / close[i-1]
+        Args:
+            benchmark: 基准指数，None时以自身为市场代理（Beta恒为1）
+        """
+        returns = simple_returns(self.data['close'].to_numpy())
         
-        # 计算市场收益率（这里使用自身作为市场代理）
-        market_returns = returns.copy()
+        benchmark_close = self._benchmark_close(benchmark)
+        market_returns = returns if benchmark_close is None else simple_returns(benchmark_close)
         
-        # 计算Beta系数
-        beta = np.zeros_like(close)
-        for i in range(20, len(close)):
-            cov = np.cov(returns[i-20:i], market_returns[i-20:i])[0, 1]
-            var = np.var(market_returns[i-20:i])
-            if var > 0:
-                beta[i] = cov / var
+        covariance, variance = trailing_cov_var(returns, market_returns, 20)
+        beta = np.divide(covariance, variance, out=np.zeros_like(covariance), where=variance > 0)
         
         # 添加到DataFrame
         self.data = self.data.with_columns(
@@ -72,15 +136,11 @@ class RiskFactors:
         """
         计算最大回撤
         """
-        close = self.data['close'].to_numpy()
+        close = self.data['close'].to_numpy().astype(np.float64)
         
-        max_drawdown = np.zeros_like(close)
-        for i in range(20, len(close)):
-            window = close[i-20:i]
-            peak = np.max(window)
-            trough = np.min(window)
-            if peak > 0:
-                max_drawdown[i] = (trough - peak) / peak
+        peak = trailing_max(close, 20)
+        trough = trailing_min(close, 20)
+        max_drawdown = np.divide(trough - peak, peak, out=np.zeros_like(peak), where=peak > 0)
         
         # 添加到DataFrame
         self.data = self.data.with_columns(
@@ -91,21 +151,13 @@ class RiskFactors:
         """
         计算夏普比率
         """
-        close = self.data['close'].to_numpy()
-        
-        # 计算收益率
-        returns = np.zeros_like(close)
-        for i in range(1, len(close)):
-            returns[i] = (close[i] - close[i-1]) / close[i-1]
+        returns = simple_returns(self.data['close'].to_numpy())
         
         # 计算夏普比率（假设无风险利率为0）
-        sharpe_ratio = np.zeros_like(close)
-        for i in range(20, len(close)):
-            window_returns = returns[i-20:i]
-            mean_return = np.mean(window_returns)
-            std_return = np.std(window_returns)
-            if std_return > 0:
-                sharpe_ratio[i] = mean_return / std_return * np.sqrt(252)
+        mean_return = trailing_mean(returns, 20)
+        std_return = trailing_std(returns, 20)
+        sharpe_ratio = np.divide(mean_return, std_return, out=np.zeros_like(std_return),
+                                 where=std_return > 0) * np.sqrt(252)
         
         # 添加到DataFrame
         self.data = self.data.with_columns(
@@ -116,20 +168,10 @@ class RiskFactors:
         """
         计算下行风险
         """
-        close = self.data['close'].to_numpy()
-        
-        # 计算收益率
-        returns = np.zeros_like(close)
-        for i in range(1, len(close)):
-            returns[i] = (close[i] - close[i-1]) / close[i-1]
+        returns = simple_returns(self.data['close'].to_numpy())
         
-        # 计算下行风险
-        downside_risk = np.zeros_like(close)
-        for i in range(20, len(close)):
-            window_returns = returns[i-20:i]
-            negative_returns = window_returns[window_returns < 0]
-            if len(negative_returns) > 0:
-                downside_risk[i] = np.std(negative_returns) * np.sqrt(252)
+        # 只统计窗口内的负收益
+        downside_risk = trailing_masked_std(returns, returns < 0, 20) * np.sqrt(252)
         
         # 添加到DataFrame
         self.data = self.data.with_columns(
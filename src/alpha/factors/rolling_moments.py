@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+单股因子的滚动窗口内核
+
+因子类的约定：第i根K线的窗口因子只使用此前的window个值 values[i-window:i]，
+不足window个值的位置填0。这里的内核按同样约定输出与输入等长的数组：
+- 滚动和/均值/标准差/协方差由前缀和的差分得到（和、平方和、交叉乘积和），每根K线O(1)
+- 滚动最大/最小值在sliding_window_view的只读视图上按窗口归约，不复制数据
+- 递推EMA交给Polars的ewm_mean
+
+前缀和差分会放大浮点误差：计算前先减去全序列均值，方差小于前缀和累计误差量级的窗口视为方差为0，
+与逐窗口np.std只差最后几位有效数字，且价格不变的窗口（停牌、一字板）不会得到虚假的极小标准差。
+"""
+
+from typing import Tuple
+
+import numpy as np
+import polars as pl
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 方差小于 前缀平方和 × 此值 时视为0，覆盖前缀和差分的累计舍入误差
+_VARIANCE_TOLERANCE = 64 * np.finfo(np.float64).eps
+
+
+def _prefix_sums(values: np.ndarray) -> np.ndarray:
+    """带前导0的前缀和，prefix[k] = sum(values[:k])"""
+    prefix = np.empty(len(values) + 1, dtype=np.float64)
+    prefix[0] = 0.0
+    np.cumsum(values, out=prefix[1:])
+    return prefix
+
+
+def _trailing(prefix: np.ndarray, window: int) -> np.ndarray:
+    """由前缀和得到 out[i] = sum(values[i-window:i])，i < window 处为0"""
+    out = np.zeros(len(prefix) - 1, dtype=np.float64)
+    if 0 < window < len(prefix) - 1:
+        out[window:] = prefix[window:-1] - prefix[:-window - 1]
+    return out
+
+
+def _variance(sum_: np.ndarray, sum_sq: np.ndarray, count, prefix_sq: np.ndarray) -> np.ndarray:
+    """由窗口内的和与平方和得到总体方差，低于舍入误差量级的方差置0"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = sum_ / count
+        variance = sum_sq / count - mean * mean
+    variance[~(variance > _VARIANCE_TOLERANCE * prefix_sq[-1])] = 0.0
+    return variance
+
+
+def trailing_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    计算此前window个值的滚动和
+
+    Args:
+        values: 输入序列
+        window: 窗口大小
+
+    Returns:
+        np.ndarray: 与输入等长，out[i] = sum(values[i-window:i])，i < window 处为0
+    """
+    return _trailing(_prefix_sums(np.asarray(values, dtype=np.float64)), window)
+
+
+def trailing_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    计算此前window个值的滚动均值
+
+    Args:
+        values: 输入序列
+        window: 窗口大小
+
+    Returns:
+        np.ndarray: 与输入等长，i < window 处为0
+    """
+    return trailing_sum(values, window) / window
+
+
+def trailing_std(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    计算此前window个值的滚动总体标准差（ddof=0，与np.std一致）
+
+    Args:
+        values: 输入序列
+        window: 窗口大小
+
+    Returns:
+        np.ndarray: 与输入等长，i < window 处为0
+    """
+    x = np.asarray(values, dtype=np.float64)
+    if len(x) == 0:
+        return x.copy()
+    centered = x - x.mean()
+    prefix_sq = _prefix_sums(centered * centered)
+    variance = _variance(_trailing(_prefix_sums(centered), window), _trailing(prefix_sq, window),
+                         window, prefix_sq)
+    return np.sqrt(variance)
+
+
+def trailing_cov_var(x: np.ndarray, y: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    计算此前window个值上x与y的滚动总体协方差以及y的滚动总体方差，用于回归系数 cov/var
+
+    Args:
+        x: 输入序列
+        y: 与x等长的输入序列
+        window: 窗口大小
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (协方差, y的方差)，均与输入等长，i < window 处为0
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if len(x) == 0:
+        return x.copy(), y.copy()
+    dx, dy = x - x.mean(), y - y.mean()
+    sum_x = _trailing(_prefix_sums(dx), window)
+    sum_y = _trailing(_prefix_sums(dy), window)
+    covariance = _trailing(_prefix_sums(dx * dy), window) / window - sum_x * sum_y / (window * window)
+    prefix_sq = _prefix_sums(dy * dy)
+    return covariance, _variance(sum_y, _trailing(prefix_sq, window), window, prefix_sq)
+
+
+def trailing_masked_std(values: np.ndarray, mask: np.ndarray, window: int) -> np.ndarray:
+    """
+    计算此前window个值中mask为True的那部分值的总体标准差，例如下行风险只统计负收益
+
+    Args:
+        values: 输入序列
+        mask: 与values等长的布尔序列
+        window: 窗口大小
+
+    Returns:
+        np.ndarray: 与输入等长，窗口内没有选中值或 i < window 处为0
+    """
+    x = np.asarray(values, dtype=np.float64)
+    mask = np.asarray(mask, dtype=bool)
+    if not mask.any():
+        return np.zeros(len(x), dtype=np.float64)
+    centered = np.where(mask, x - x[mask].mean(), 0.0)
+    count = _trailing(_prefix_sums(mask), window)
+    prefix_sq = _prefix_sums(centered * centered)
+    variance = _variance(_trailing(_prefix_sums(centered), window), _trailing(prefix_sq, window),
+                         np.where(count > 0, count, 1.0), prefix_sq)
+    return np.sqrt(variance)
+
+
+def trailing_max(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    计算此前window个值的滚动最大值
+
+    Args:
+        values: 输入序列
+        window: 窗口大小
+
+    Returns:
+        np.ndarray: 与输入等长，i < window 处为0
+    """
+    x = np.asarray(values, dtype=np.float64)
+    out = np.zeros(len(x), dtype=np.float64)
+    if 0 < window < len(x):
+        out[window:] = sliding_window_view(x[:-1], window).max(axis=1)
+    return out
+
+
+def trailing_min(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    计算此前window个值的滚动最小值
+
+    Args:
+        values: 输入序列
+        window: 窗口大小
+
+    Returns:
+        np.ndarray: 与输入等长，i < window 处为0
+    """
+    x = np.asarray(values, dtype=np.float64)
+    out = np.zeros(len(x), dtype=np.float64)
+    if 0 < window < len(x):
+        out[window:] = sliding_window_view(x[:-1], window).min(axis=1)
+    return out
+
+
+def seeded_ema(values: np.ndarray, alpha: float, start: int, seed: float) -> np.ndarray:
+    """
+    从start处的初值开始递推EMA：out[start] = seed，out[i] = alpha*values[i] + (1-alpha)*out[i-1]
+
+    Args:
+        values: 输入序列
+        alpha: 平滑系数
+        start: 初值所在位置
+        seed: 初值
+
+    Returns:
+        np.ndarray: 与输入等长，start之前为0
+    """
+    x = np.asarray(values, dtype=np.float64)
+    out = np.zeros(len(x), dtype=np.float64)
+    if start < len(x):
+        series = pl.Series(np.concatenate(([seed], x[start + 1:])))
+        out[start:] = series.ewm_mean(alpha=alpha, adjust=False).to_numpy()
+    return out
+
+
+def simple_returns(close: np.ndarray) -> np.ndarray:
+    """
+    计算简单收益率，首个值为0
+
+    Args:
+        close: 收盘价序列
+
+    Returns:
+        np.ndarray: 与输入等长的收益率
+    """
+    close = np.asarray(close, dtype=np.float64)
+    returns = np.zeros_like(close)
+    returns[1:] = (close[1:] - close[:-1]) / close[:-1]
+    return returns
+
+
+def log_returns(close: np.ndarray) -> np.ndarray:
+    """
+    计算对数收益率，首个值为0
+
+    Args:
+        close: 收盘价序列
+
+    Returns:
+        np.ndarray: 与输入等长的对数收益率
+    """
+    close = np.asarray(close, dtype=np.float64)
+    returns = np.zeros_like(close)
+    returns[1:] = np.log(close[1:] / close[:-1])
+    return returns
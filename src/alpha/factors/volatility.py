@@ -8,6 +8,8 @@
 import polars as pl
 import numpy as np
 
+from src.alpha.factors.rolling_moments import log_returns, trailing_mean, trailing_std
+
 
 class VolatilityFactors:
     """
@@ -45,23 +47,20 @@ class VolatilityFactors:
         """
         计算平均真实波幅(ATR)
         """
-        high = self.data['high'].to_numpy()
-        low = self.data['low'].to_numpy()
-        close = self.data['close'].to_numpy()
+        high = self.data['high'].to_numpy().astype(np.float64)
+        low = self.data['low'].to_numpy().astype(np.float64)
+        close = self.data['close'].to_numpy().astype(np.float64)
         
         # 计算真实波幅(TR)
         tr = np.zeros_like(close)
-        for i in range(1, len(close)):
-            tr[i] = max(high[i] - low[i], abs(high[i] - close[i-1]), abs(low[i] - close[i-1]))
+        if len(close) > 1:
+            prev_close = close[:-1]
+            tr[1:] = np.maximum.reduce([high[1:] - low[1:], np.abs(high[1:] - prev_close),
+                                        np.abs(low[1:] - prev_close)])
         
         # 计算ATR
-        atr_14 = np.zeros_like(close)
-        for i in range(14, len(close)):
-            atr_14[i] = np.mean(tr[i-14:i])
-        
-        atr_21 = np.zeros_like(close)
-        for i in range(21, len(close)):
-            atr_21[i] = np.mean(tr[i-21:i])
+        atr_14 = trailing_mean(tr, 14)
+        atr_21 = trailing_mean(tr, 21)
         
         # 添加到DataFrame
         self.data = self.data.with_columns(
@@ -73,21 +72,11 @@ class VolatilityFactors:
         """
         计算历史波动率
         """
-        close = self.data['close'].to_numpy()
-        
-        # 计算收益率
-        returns = np.zeros_like(close)
-        for i in range(1, len(close)):
-            returns[i] = np.log(close[i] / close[i-1])
+        returns = log_returns(self.data['close'].to_numpy())
         
         # 计算历史波动率
-        volatility_20 = np.zeros_like(close)
-        for i in range(20, len(close)):
-            volatility_20[i] = np.std(returns[i-20:i]) * np.sqrt(252)
-        
-        volatility_60 = np.zeros_like(close)
-        for i in range(60, len(close)):
-            volatility_60[i] = np.std(returns[i-60:i]) * np.sqrt(252)
+        volatility_20 = trailing_std(returns, 20) * np.sqrt(252)
+        volatility_60 = trailing_std(returns, 60) * np.sqrt(252)
         
         # 添加到DataFrame
         self.data = self.data.with_columns(
@@ -99,26 +88,20 @@ class VolatilityFactors:
         """
         计算Garman-Klass波动率
         """
-        high = self.data['high'].to_numpy()
-        low = self.data['low'].to_numpy()
-        open_ = self.data['open'].to_numpy()
-        close = self.data['close'].to_numpy()
+        high = self.data['high'].to_numpy().astype(np.float64)
+        low = self.data['low'].to_numpy().astype(np.float64)
+        open_ = self.data['open'].to_numpy().astype(np.float64)
+        close = self.data['close'].to_numpy().astype(np.float64)
         
         # 计算Garman-Klass波动率
         gk_volatility = np.zeros_like(close)
-        for i in range(1, len(close)):
-            log_high_low = np.log(high[i] / low[i])
-            log_close_open = np.log(close[i] / open_[i])
-            gk_volatility[i] = np.sqrt(0.5 * log_high_low**2 - (2 * np.log(2) - 1) * log_close_open**2)
+        log_high_low = np.log(high[1:] / low[1:])
+        log_close_open = np.log(close[1:] / open_[1:])
+        gk_volatility[1:] = np.sqrt(0.5 * log_high_low**2 - (2 * np.log(2) - 1) * log_close_open**2)
         
         # 计算20日和60日移动平均
-        gk_volatility_20 = np.zeros_like(close)
-        for i in range(20, len(close)):
-            gk_volatility_20[i] = np.mean(gk_volatility[i-20:i]) * np.sqrt(252)
-        
-        gk_volatility_60 = np.zeros_like(close)
-        for i in range(60, len(close)):
-            gk_volatility_60[i] = np.mean(gk_volatility[i-60:i]) * np.sqrt(252)
+        gk_volatility_20 = trailing_mean(gk_volatility, 20) * np.sqrt(252)
+        gk_volatility_60 = trailing_mean(gk_volatility, 60) * np.sqrt(252)
         
         # 添加到DataFrame
         self.data = self.data.with_columns(
@@ -130,21 +113,18 @@ class VolatilityFactors:
         """
         计算波动率趋势因子
         """
-        close = self.data['close'].to_numpy()
+        returns = log_returns(self.data['close'].to_numpy())
         
-        # 计算收益率
-        returns = np.zeros_like(close)
-        for i in range(1, len(close)):
-            returns[i] = np.log(close[i] / close[i-1])
+        # 计算最近20日和之前40日的波动率：第i根K线的之前40日窗口是 returns[i-60:i-20]，
+        # 即第i-20根K线的此前40日窗口
+        recent_vol = trailing_std(returns, 20)
+        past_vol = np.zeros_like(returns)
+        past_vol[20:] = trailing_std(returns, 40)[:-20]
         
         # 计算波动率趋势
-        volatility_trend = np.zeros_like(close)
-        for i in range(60, len(close)):
-            # 计算最近20日和之前40日的波动率
-            recent_vol = np.std(returns[i-20:i])
-            past_vol = np.std(returns[i-60:i-20])
-            if past_vol > 0:
-                volatility_trend[i] = (recent_vol - past_vol) / past_vol
+        volatility_trend = np.divide(recent_vol - past_vol, past_vol, out=np.zeros_like(past_vol),
+                                     where=past_vol > 0)
+        volatility_trend[:60] = 0
         
         # 添加到DataFrame
         self.data = self.data.with_columns(
@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+协方差引擎，在 日期 × 股票 的收益率矩阵上计算全市场协方差/相关系数矩阵
+
+缺失值（停牌）填0后，窗口内的计算分为两部分：
+- 所有股票共同的交叉乘积由一次对称矩阵乘法（BLAS syrk）得到；窗口内没有缺失的股票之间，
+  两两重叠样本就是整个窗口，由交叉乘积和各列的和即得协方差
+- 窗口内有缺失的股票按列分块，用有效值掩码的矩阵乘法得到两两重叠的样本数、样本和，
+  修正这些股票所在的行和列，结果与逐对只取共同有效样本计算（pandas DataFrame.cov）一致
+
+A股停牌股票通常只占少数，修正的计算量与缺失股票数成正比。上述公式与数据的平移无关，
+因此引擎把整段收益率按各股票的全样本均值平移一次，滚动窗口前进时交叉乘积和列和只需加上新进入的行、
+减去移出的行（秩k更新），不必每个窗口重新做矩阵乘法。
+
+指数加权（halflife）时各交易日的权重为 0.5^(距窗口末尾的天数/halflife)，
+按可靠性权重做无偏修正，min_periods比较的是有效样本数 (Σw)^2/Σw^2。
+"""
+
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import polars as pl
+from loguru import logger
+
+# 滚动窗口连续做秩k更新的最大次数，超过后重新计算交叉乘积，限制舍入误差的累积
+_MAX_INCREMENTAL_UPDATES = 250
+# 窗口内有缺失的股票超过此比例时，滚动计算同时维护两两重叠的加权和，避免每个窗口按块做矩阵乘法
+_PAIRWISE_STATE_FRACTION = 0.125
+
+
+def _window_weights(length: int, halflife: Optional[float]) -> Optional[np.ndarray]:
+    """窗口内各交易日的指数衰减权重，最后一天为1；halflife为None时返回None（等权）"""
+    if halflife is None:
+        return None
+    if halflife <= 0:
+        raise ValueError(f"halflife必须为正数: {halflife}")
+    return 0.5 ** (np.arange(length - 1, -1, -1) / halflife)
+
+
+def _pairwise_moments(x: np.ndarray, valid: np.ndarray, weights: Optional[np.ndarray], min_periods: int,
+                      block_size: int, correlation: bool = False,
+                      gram: Optional[Tuple[Optional[np.ndarray], ...]] = None,
+                      observations: bool = False) -> Tuple[np.ndarray, Optional[np.ndarray], float]:
+    """
+    按两两重叠的有效样本计算协方差（或相关系数）矩阵
+
+    Args:
+        x: 日期 × 股票 的数据，缺失值填0（可以整体平移，结果不变）
+        valid: 有效值掩码
+        weights: 各日期的权重，None表示等权
+        min_periods: 两只股票重叠的有效样本数少于此值时结果为NaN
+        block_size: 修正有缺失股票时每块的列数
+        correlation: 为True时返回相关系数（方差也按重叠样本计算）
+        gram: 已算好的 (加权交叉乘积 Σw·x·x', 加权列和 Σw·x, 重叠加权和 Σw·x·m', 重叠权重和 Σw·m·m',
+            重叠权重平方和 Σw²·m·m')，后三项可以为None（在修正有缺失股票时按块计算），None表示全部在此计算
+        observations: 是否返回中心化后的观测值（用于估计收缩强度）
+
+    Returns:
+        Tuple[np.ndarray, Optional[np.ndarray], float]:
+            (矩阵, 按各股票有效样本均值中心化并填0、按权重缩放后的观测值, 有效样本数)
+    """
+    length, count = x.shape
+    w = np.ones(length) if weights is None else np.asarray(weights, dtype=np.float64)
+    root = None if weights is None else np.sqrt(w)
+    total = w.sum()
+    total_sq = total if weights is None else float((w * w).sum())
+    effective = total * total / total_sq if total > 0 else 0.0
+
+    overlap = pair_counts = pair_counts_sq = None
+    if gram is None:
+        scaled = x if root is None else x * root[:, None]
+        cross, sums = scaled.T @ scaled, w @ x
+    else:
+        cross, sums, overlap, pair_counts, pair_counts_sq = gram
+        cross = cross.copy()
+
+    centered = None
+    if observations:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.nan_to_num(sums / (w @ valid))
+        centered = np.where(valid, x - mean, 0.0)
+        if root is not None:
+            centered *= root[:, None]
+        if total > 0:
+            centered *= np.sqrt(effective / total)
+
+    if effective < max(min_periods, 2):
+        return np.full((count, count), np.nan), centered, effective
+
+    incomplete = np.flatnonzero(~valid.all(axis=0))
+    raw_cross = cross[:, incomplete]
+
+    # 无缺失股票之间：重叠样本即整个窗口，共用一个分母
+    matrix = cross
+    matrix -= np.outer(sums, sums / total)
+    matrix /= total - total_sq / total
+    if correlation:
+        std = np.sqrt(np.diag(matrix))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            matrix /= std[:, None]
+            matrix /= std[None, :]
+
+    if len(incomplete):
+        weighted_x = x if weights is None else x * w[:, None]
+        mask = valid.astype(np.float64)
+        weighted_mask = mask if weights is None else mask * w[:, None]
+        for start in range(0, len(incomplete), block_size):
+            block = incomplete[start:start + block_size]
+            block_mask = mask[:, block]
+            # overlap_sums[i, j]: i在两者重叠样本上的加权和；counts[i, j]: 重叠样本的权重和
+            if overlap is not None:
+                overlap_sums = overlap[:, block]
+                block_sums = overlap[block, :].T
+                counts = pair_counts[:, block]
+                counts_sq = counts if weights is None else pair_counts_sq[:, block]
+            else:
+                overlap_sums = weighted_x.T @ block_mask
+                block_sums = (weighted_x[:, block].T @ mask).T
+                counts = weighted_mask.T @ block_mask
+                counts_sq = counts if weights is None else (weighted_mask * w[:, None]).T @ block_mask
+            with np.errstate(divide='ignore', invalid='ignore'):
+                denominator = counts - counts_sq / counts
+                block_matrix = (raw_cross[:, start:start + len(block)]
+                                - overlap_sums * block_sums / counts) / denominator
+                if correlation:
+                    squares = (weighted_x * x).T @ block_mask
+                    block_squares = ((weighted_x[:, block] * x[:, block]).T @ mask).T
+                    variance = (squares - overlap_sums * overlap_sums / counts) / denominator
+                    block_variance = (block_squares - block_sums * block_sums / counts) / denominator
+                    block_matrix /= np.sqrt(variance * block_variance)
+                effective_counts = counts * counts / counts_sq
+            block_matrix[~(effective_counts >= min_periods) | ~(denominator > 0)] = np.nan
+            matrix[:, block] = block_matrix
+            matrix[block, :] = block_matrix.T
+    if correlation:
+        np.fill_diagonal(matrix, np.where(np.isfinite(np.diag(matrix)), 1.0, np.nan))
+    return matrix, centered, effective
+
+
+def _prepare(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """缺失值掩码，以及按各列有效值均值中心化、缺失值填0的数据"""
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.nan_to_num(np.where(valid, values, 0.0).sum(axis=0) / valid.sum(axis=0))
+    return np.where(valid, values - mean, 0.0), valid
+
+
+def pairwise_covariance(values: np.ndarray, min_periods: int = 2, weights: Optional[np.ndarray] = None,
+                        block_size: int = 512) -> np.ndarray:
+    """
+    按两两重叠的有效样本计算协方差矩阵（与pandas DataFrame.cov一致）
+
+    Args:
+        values: 观测 × 变量 的数据，缺失值为NaN
+        min_periods: 重叠的有效样本数少于此值时结果为NaN
+        weights: 各观测的权重，None表示等权
+        block_size: 修正有缺失变量时每块的列数
+
+    Returns:
+        np.ndarray: 协方差矩阵
+    """
+    x, valid = _prepare(values)
+    return _pairwise_moments(x, valid, weights, min_periods, block_size)[0]
+
+
+def pairwise_correlation(values: np.ndarray, min_periods: int = 2, weights: Optional[np.ndarray] = None,
+                         block_size: int = 512) -> np.ndarray:
+    """
+    按两两重叠的有效样本计算相关系数矩阵（与pandas DataFrame.corr一致）
+
+    Args:
+        values: 观测 × 变量 的数据，缺失值为NaN
+        min_periods: 重叠的有效样本数少于此值时结果为NaN
+        weights: 各观测的权重，None表示等权
+        block_size: 修正有缺失变量时每块的列数
+
+    Returns:
+        np.ndarray: 相关系数矩阵
+    """
+    x, valid = _prepare(values)
+    return _pairwise_moments(x, valid, weights, min_periods, block_size, correlation=True)[0]
+
+
+def _fill_missing(sample: np.ndarray, target) -> np.ndarray:
+    """重叠样本不足而缺失的协方差取收缩目标的值"""
+    finite = np.isfinite(sample)
+    return sample if finite.all() else np.where(finite, sample, target)
+
+
+def _shrink_to_identity(sample: np.ndarray, mu: float, intensity: float) -> np.ndarray:
+    """(1 - intensity) * S + intensity * mu * I"""
+    shrunk = sample * (1 - intensity)
+    shrunk.flat[::len(sample) + 1] += intensity * mu
+    return shrunk
+
+
+def _ledoit_wolf(sample: np.ndarray, observations: np.ndarray, length: float) -> Tuple[np.ndarray, float]:
+    """Ledoit-Wolf (2004)，收缩目标为等方差对角阵"""
+    p = len(sample)
+    mu = np.trace(sample) / p
+    sample = _fill_missing(sample, 0.0)
+    squared_sum = float(np.vdot(sample, sample))
+    # ||S - mu*I||^2 = ||S||^2 - p*mu^2
+    distance = squared_sum - p * mu * mu
+    # Σ_t ||y_t y_t' - S||^2 / T^2，利用 S = Y'Y/T 化简为 Σ_t ||y_t||^4 / T^2 - ||S||^2 / T
+    squared_norms = np.einsum('ij,ij->i', observations, observations)
+    error = (squared_norms @ squared_norms) / length ** 2 - squared_sum / length
+    intensity = 0.0 if distance <= 0 else float(np.clip(min(error, distance) / distance, 0.0, 1.0))
+    return _shrink_to_identity(sample, mu, intensity), intensity
+
+
+def _oas(sample: np.ndarray, observations: np.ndarray, length: float) -> Tuple[np.ndarray, float]:
+    """Oracle Approximating Shrinkage (Chen et al. 2010)，收缩目标为等方差对角阵"""
+    p = len(sample)
+    mu = np.trace(sample) / p
+    sample = _fill_missing(sample, 0.0)
+    alpha = float(np.vdot(sample, sample)) / (p * p)
+    denominator = (length + 1) * (alpha - mu * mu / p)
+    intensity = 1.0 if denominator == 0 else float(np.clip((alpha + mu * mu) / denominator, 0.0, 1.0))
+    return _shrink_to_identity(sample, mu, intensity), intensity
+
+
+def _constant_correlation(sample: np.ndarray, observations: np.ndarray, length: float) -> Tuple[np.ndarray, float]:
+    """Ledoit-Wolf (2003)，收缩目标为保留各自方差、相关系数取平均值的矩阵"""
+    p = len(sample)
+    variance = np.diag(sample)
+    std = np.sqrt(variance)
+    scale = np.outer(std, std)
+    finite = np.isfinite(sample)
+    mean_correlation = 0.0 if p < 2 else float(
+        ((sample / scale)[finite].sum() - p) / max(finite.sum() - p, 1))
+    target = mean_correlation * scale
+    np.fill_diagonal(target, variance)
+    sample = _fill_missing(sample, target)
+
+    squared = observations * observations
+    squared_norms = squared.sum(axis=1)
+    pi = (squared_norms @ squared_norms) / length - (sample ** 2).sum()
+    pi_diagonal = (squared * squared).sum(axis=0) / length - variance ** 2
+    # theta[i, j] = mean_t (y_ti^2 - s_ii)(y_ti y_tj - s_ij)
+    theta = (squared * observations).T @ observations / length - variance[:, None] * sample
+    ratio = std[None, :] / std[:, None]
+    rho = pi_diagonal.sum() + mean_correlation * ((theta * ratio).sum() - np.trace(theta))
+    gamma = ((target - sample) ** 2).sum()
+    intensity = 0.0 if gamma == 0 else float(np.clip((pi - rho) / gamma / length, 0.0, 1.0))
+    return (1 - intensity) * sample + intensity * target, intensity
+
+
+SHRINKAGE_METHODS: Dict[str, Callable[[np.ndarray, np.ndarray, float], Tuple[np.ndarray, float]]] = {
+    'ledoit_wolf': _ledoit_wolf,
+    'oas': _oas,
+    'constant_correlation': _constant_correlation,
+}
+
+
+def shrink_covariance(covariance: np.ndarray, observations: np.ndarray, length: float,
+                      method: str = 'ledoit_wolf') -> Tuple[np.ndarray, float]:
+    """
+    对样本协方差矩阵做收缩估计
+
+    方差无效（样本不足）的股票所在行列保持NaN；其余股票之间因重叠样本不足而缺失的协方差取收缩目标的值。
+
+    Args:
+        covariance: 样本协方差矩阵
+        observations: 中心化后的观测值（日期 × 股票，缺失值为0），用于估计收缩强度
+        length: 观测的（有效）样本数
+        method: 'ledoit_wolf'、'oas' 或 'constant_correlation'
+
+    Returns:
+        Tuple[np.ndarray, float]: (收缩后的协方差矩阵, 收缩强度)
+    """
+    if method not in SHRINKAGE_METHODS:
+        raise ValueError(f"不支持的收缩方法: {method}")
+    usable = np.flatnonzero(np.isfinite(np.diag(covariance)) & (np.diag(covariance) > 0))
+    if len(usable) == len(covariance):
+        return SHRINKAGE_METHODS[method](covariance, observations, length)
+    result = np.full(covariance.shape, np.nan)
+    if len(usable) == 0:
+        return result, 0.0
+    shrunk, intensity = SHRINKAGE_METHODS[method](covariance.take(usable, axis=0).take(usable, axis=1),
+                                                  observations.take(usable, axis=1), length)
+    result[np.ix_(usable, usable)] = shrunk
+    return result, intensity
+
+
+def covariance_to_correlation(covariance: np.ndarray) -> np.ndarray:
+    """
+    协方差矩阵转换为相关系数矩阵
+
+    Args:
+        covariance: 协方差矩阵
+
+    Returns:
+        np.ndarray: 相关系数矩阵
+    """
+    std = np.sqrt(np.diag(covariance))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = covariance / np.outer(std, std)
+    np.fill_diagonal(correlation, np.where(std > 0, 1.0, np.nan))
+    return correlation
+
+
+class CovarianceEngine:
+    """
+    协方差引擎类，计算滚动窗口和指数加权的全市场协方差矩阵，支持收缩估计和按窗口缓存
+    """
+
+    def __init__(self, returns: np.ndarray, symbols: Optional[List[str]] = None, dates=None,
+                 min_periods: int = 20, block_size: int = 512, cache_size: int = 16):
+        """
+        初始化协方差引擎
+
+        Args:
+            returns: 日期 × 股票 的收益率矩阵，停牌等缺失值为NaN
+            symbols: 股票代码列表，与列对应
+            dates: 日期序列，与行对应
+            min_periods: 两只股票重叠的有效样本数少于此值时协方差为NaN
+            block_size: 修正有缺失股票时每块的列数，控制临时矩阵的内存
+            cache_size: 缓存的协方差矩阵个数（每个矩阵占 股票数^2 × 8 字节）
+        """
+        self.returns = np.asarray(returns, dtype=np.float64)
+        if self.returns.ndim != 2:
+            raise ValueError("收益率矩阵必须是二维的 日期 × 股票 数组")
+        self.symbols = list(symbols) if symbols is not None else [str(i) for i in range(self.returns.shape[1])]
+        self.dates = dates
+        self.min_periods = min_periods
+        self.block_size = block_size
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[Tuple, Tuple[np.ndarray, Optional[float]]]' = OrderedDict()
+        self.shrinkage_intensity: Optional[float] = None
+        # 按全样本均值平移、缺失值填0的收益率，以及上一个窗口的 (start, end, halflife, 各项加权和, 更新次数)
+        self._shifted, self._valid = _prepare(self.returns)
+        self._gram_state: Optional[Tuple] = None
+
+    @classmethod
+    def from_prices(cls, close: np.ndarray, symbols: Optional[List[str]] = None, dates=None,
+                    **kwargs) -> 'CovarianceEngine':
+        """
+        由收盘价矩阵创建引擎
+
+        第t行的收益率为第t日收盘价相对此前最近一个有效收盘价的涨跌幅，复牌首日的收益率包含停牌期间的价格变化；
+        第0行和当日停牌为NaN，行号与收盘价矩阵一致（可直接使用PortfolioBacktestEngine.close的日期下标）。
+
+        Args:
+            close: 日期 × 股票 的收盘价矩阵，停牌为NaN
+            symbols: 股票代码列表
+            dates: 日期序列
+            **kwargs: 传给构造函数的其他参数
+
+        Returns:
+            CovarianceEngine: 协方差引擎
+        """
+        close = np.asarray(close, dtype=np.float64)
+        valid = ~np.isnan(close)
+        last_valid = np.maximum.accumulate(np.where(valid, np.arange(len(close))[:, None], 0), axis=0)
+        previous = close[last_valid, np.arange(close.shape[1])]
+        returns = np.full(close.shape, np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns[1:] = close[1:] / previous[:-1] - 1.0
+        returns[1:][~valid[1:]] = np.nan
+        return cls(returns, symbols, dates, **kwargs)
+
+    @classmethod
+    def from_panel(cls, panel, symbol_col: str = 'ts_code', date_col: str = 'date', price_col: str = 'close',
+                   **kwargs) -> 'CovarianceEngine':
+        """
+        由多股票长表面板创建引擎
+
+        Args:
+            panel: 长表面板，可以是Polars DataFrame、LazyFrame或Pandas DataFrame
+            symbol_col: 股票代码列名
+            date_col: 日期列名
+            price_col: 价格列名
+            **kwargs: 传给构造函数的其他参数
+
+        Returns:
+            CovarianceEngine: 协方差引擎
+        """
+        if isinstance(panel, pd.DataFrame):
+            panel = pl.from_pandas(panel)
+        wide = (panel.lazy()
+                .select(date_col, pl.col(symbol_col).cast(pl.String), pl.col(price_col).cast(pl.Float64))
+                .collect()
+                .pivot(on=symbol_col, index=date_col, values=price_col)
+                .sort(date_col))
+        symbols = wide.columns[1:]
+        return cls.from_prices(wide.drop(date_col).to_numpy(), symbols, wide[date_col], **kwargs)
+
+    def _window(self, end: Optional[int], window: Optional[int]) -> Tuple[int, int]:
+        """规范化窗口为 [start, end) 行下标"""
+        length = len(self.returns)
+        end = length if end is None else end
+        if not 0 < end <= length:
+            raise ValueError(f"窗口末尾超出范围: {end}")
+        start = 0 if window is None else max(0, end - window)
+        return start, end
+
+    def _gram(self, start: int, end: int, halflife: Optional[float]) -> Tuple[Optional[np.ndarray], ...]:
+        """
+        窗口 [start, end) 的加权交叉乘积和列和，缺失较多时还包括两两重叠的加权和与权重和
+
+        与上一个窗口的halflife相同、且窗口向后移动的行数少于窗口长度一半时，在上一个窗口的结果上做秩k更新：
+        指数加权时先整体乘以衰减因子，再加上新进入的行、减去移出的行。
+        """
+        state = self._gram_state
+        if (state is not None and state[2] == halflife and state[0] <= start and state[1] <= end
+                and state[4] < _MAX_INCREMENTAL_UPDATES
+                and (end - state[1]) + (start - state[0]) < (end - start) / 2):
+            previous_start, previous_end, _, sums, updates = state
+            if halflife is not None and end > previous_end:
+                decay = 0.5 ** ((end - previous_end) / halflife)
+                for index, value in enumerate(sums):
+                    if value is not None:
+                        value *= decay * decay if index == 4 else decay
+            cross, column_sums, overlap, counts, counts_sq = sums
+            # 新进入的行权重为正、移出的行权重为负，合并成一次矩阵乘法
+            rows = np.r_[previous_end:end, previous_start:start]
+            if len(rows):
+                w = np.r_[np.ones(end - previous_end), -np.ones(start - previous_start)]
+                if halflife is not None:
+                    w *= 0.5 ** ((end - 1 - rows) / halflife)
+                x = self._shifted[rows]
+                weighted_x = x * w[:, None]
+                cross += weighted_x.T @ x
+                column_sums += w @ x
+                if overlap is not None:
+                    mask = self._valid[rows].astype(np.float64)
+                    overlap += weighted_x.T @ mask
+                    counts += (mask * w[:, None]).T @ mask
+                    if counts_sq is not None:
+                        counts_sq += (mask * (w * np.abs(w))[:, None]).T @ mask
+            updates += 1
+        else:
+            x = self._shifted[start:end]
+            weights = _window_weights(end - start, halflife)
+            scaled = x if weights is None else x * np.sqrt(weights)[:, None]
+            sums = [scaled.T @ scaled, x.sum(axis=0) if weights is None else weights @ x, None, None, None]
+            valid = self._valid[start:end]
+            if (~valid.all(axis=0)).sum() > _PAIRWISE_STATE_FRACTION * valid.shape[1]:
+                mask = valid.astype(np.float64)
+                weighted_mask = mask if weights is None else mask * weights[:, None]
+                sums[2] = (x if weights is None else x * weights[:, None]).T @ mask
+                sums[3] = weighted_mask.T @ mask
+                if weights is not None:
+                    sums[4] = (weighted_mask * weights[:, None]).T @ mask
+            sums = tuple(sums)
+            updates = 0
+        self._gram_state = (start, end, halflife, sums, updates)
+        return sums
+
+    def _compute(self, end: Optional[int], window: Optional[int], halflife: Optional[float],
+                 shrinkage: Optional[str], correlation: bool) -> Tuple[np.ndarray, Optional[float]]:
+        """计算（或从缓存取得）一个窗口的矩阵"""
+        start, end = self._window(end, window)
+        key = (start, end, halflife, shrinkage, correlation)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        weights = _window_weights(end - start, halflife)
+        # 收缩估计在协方差上进行，相关系数由收缩后的协方差换算
+        matrix, observations, effective = _pairwise_moments(
+            self._shifted[start:end], self._valid[start:end], weights, self.min_periods, self.block_size,
+            correlation=correlation and shrinkage is None, gram=self._gram(start, end, halflife),
+            observations=shrinkage is not None)
+        intensity = None
+        if shrinkage is not None:
+            matrix, intensity = shrink_covariance(matrix, observations, effective, shrinkage)
+            if correlation:
+                matrix = covariance_to_correlation(matrix)
+        matrix.setflags(write=False)
+        logger.debug(f"协方差窗口 [{start}, {end}) 计算完成: {matrix.shape[0]}只股票")
+
+        self._cache[key] = (matrix, intensity)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return matrix, intensity
+
+    def covariance(self, end: Optional[int] = None, window: Optional[int] = None,
+                   halflife: Optional[float] = None, shrinkage: Optional[str] = None) -> np.ndarray:
+        """
+        计算窗口内的协方差矩阵
+
+        Args:
+            end: 窗口末尾（不含）的行下标，None表示全部数据
+            window: 窗口长度，None表示从第0行开始
+            halflife: 指数加权的半衰期（交易日），None表示等权
+            shrinkage: 收缩估计方法（'ledoit_wolf'、'oas'、'constant_correlation'），None表示样本协方差
+
+        Returns:
+            np.ndarray: 股票 × 股票 的协方差矩阵（只读，重复请求同一窗口时直接返回缓存）
+        """
+        matrix, self.shrinkage_intensity = self._compute(end, window, halflife, shrinkage, False)
+        return matrix
+
+    def correlation(self, end: Optional[int] = None, window: Optional[int] = None,
+                    halflife: Optional[float] = None, shrinkage: Optional[str] = None) -> np.ndarray:
+        """
+        计算窗口内的相关系数矩阵
+
+        不做收缩时方差按两两重叠样本计算（与pandas DataFrame.corr一致），收缩时由收缩后的协方差换算。
+
+        Args:
+            end: 窗口末尾（不含）的行下标，None表示全部数据
+            window: 窗口长度，None表示从第0行开始
+            halflife: 指数加权的半衰期（交易日），None表示等权
+            shrinkage: 收缩估计方法，None表示样本相关系数
+
+        Returns:
+            np.ndarray: 股票 × 股票 的相关系数矩阵（只读）
+        """
+        matrix, self.shrinkage_intensity = self._compute(end, window, halflife, shrinkage, True)
+        return matrix
+
+    def rolling(self, window: int, step: int = 1, start: Optional[int] = None,
+                halflife: Optional[float] = None, shrinkage: Optional[str] = None) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        逐个窗口计算滚动协方差矩阵
+
+        Args:
+            window: 窗口长度
+            step: 相邻窗口末尾相隔的行数
+            start: 第一个窗口末尾（不含）的行下标，默认为window
+            halflife: 指数加权的半衰期，None表示等权
+            shrinkage: 收缩估计方法，None表示样本协方差
+
+        Yields:
+            Tuple[int, np.ndarray]: (窗口末尾行下标, 协方差矩阵)
+        """
+        first = window if start is None else start
+        for end in range(max(first, 1), len(self.returns) + 1, step):
+            yield end, self.covariance(end, window, halflife, shrinkage)
+
+    def to_frame(self, matrix: np.ndarray) -> pl.DataFrame:
+        """
+        把矩阵转换为带股票代码的DataFrame
+
+        Args:
+            matrix: 股票 × 股票 的矩阵
+
+        Returns:
+            pl.DataFrame: 第一列为股票代码，其余各列以股票代码为列名
+        """
+        return pl.DataFrame({'symbol': self.symbols}).hstack(
+            pl.DataFrame(np.asarray(matrix), schema=self.symbols, orient='row'))
+
+    def clear_cache(self):
+        """
+        清空缓存的矩阵
+        """
+        self._cache.clear()
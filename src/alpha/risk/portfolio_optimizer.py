@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+组合优化器，根据协方差矩阵（src.alpha.risk.covariance_engine）计算组合权重
+
+支持的方法：
+- min_variance：最小方差
+- mean_variance：均值-方差，最大化 μ'w - (λ/2)·w'Σw
+- risk_parity：风险平价（各股票风险贡献相等）
+- equal：等权
+
+只有预算约束（long_only=False且不设单只上限）时最小方差和均值-方差用闭式解；
+只做多或设置单只权重上限时用加速投影梯度法（FISTA），每步投影到带上限的单纯形上（排序后O(n log n)精确求解）；
+迭代中定期按当前的有效集（权重为0、达到上限和其余股票）在等式约束下求闭式解，满足KKT条件即得到精确解并提前结束。
+风险平价用牛顿法求解 min ½y'Σy - Σb·log(y)，再把y归一化为权重。
+逐日调仓时相邻两日的最优权重很接近，优化器保存上一次的解作为下一次的初值（warm start），
+通常只需几次迭代即可收敛。
+
+另提供max_ic_weights，按因子IC的协方差（或因子间的相关系数）求使组合IC信息比率（或组合与收益率的相关性）最大的因子权重。
+"""
+
+from typing import Callable, Optional, Union
+
+import numpy as np
+from loguru import logger
+
+from src.alpha.risk.covariance_engine import CovarianceEngine
+
+OPTIMIZATION_METHODS = ('min_variance', 'mean_variance', 'risk_parity', 'equal')
+# 绝对值小于此值的权重视为0，避免数值误差产生的极小持仓
+_NEGLIGIBLE_WEIGHT = 1e-10
+# FISTA每隔多少次迭代按有效集尝试求精确解（第1次迭代即尝试，warm start时有效集通常不变）
+_POLISH_INTERVAL = 10
+
+
+def project_capped_simplex(values: np.ndarray, upper: Optional[float] = None, total: float = 1.0) -> np.ndarray:
+    """
+    欧氏投影到 {w: 0 <= w <= upper, Σw = total}
+
+    投影结果为 clip(values - τ, 0, upper)，Σ随τ分段线性单调递减，
+    在排序后的全部断点上求出Σ的值即可确定τ所在的线段，再线性插值。
+
+    Args:
+        values: 待投影向量
+        upper: 单个分量的上限，None表示不设上限
+        total: 分量之和
+    Returns:
+        np.ndarray: 投影结果
+    """
+    n = len(values)
+    if upper is not None and upper * n < total:
+        raise ValueError(f"权重上限{upper}过小，{n}个分量无法满足总和{total}")
+    ordered = np.sort(values)
+    suffix = np.concatenate((np.cumsum(ordered[::-1])[::-1], [0.0]))
+    breakpoints = ordered if upper is None else np.sort(np.concatenate((ordered, ordered - upper)))
+
+    def clipped_sum(tau: np.ndarray) -> np.ndarray:
+        # Σ max(v - τ, 0) - Σ max(v - upper - τ, 0)
+        above = np.searchsorted(ordered, tau, side='right')
+        result = suffix[above] - (n - above) * tau
+        if upper is not None:
+            capped = np.searchsorted(ordered, tau + upper, side='right')
+            result -= suffix[capped] - (n - capped) * (tau + upper)
+        return result
+
+    sums = clipped_sum(breakpoints)
+    # sums随断点递减；找到 sums[k] >= total > sums[k+1] 的线段
+    k = np.searchsorted(-sums, -total, side='right') - 1
+    if k < 0:
+        tau = breakpoints[0] - (total - sums[0]) / n
+    elif k >= len(breakpoints) - 1:
+        tau = breakpoints[-1]
+    else:
+        left, right = breakpoints[k], breakpoints[k + 1]
+        span = sums[k] - sums[k + 1]
+        tau = left if span <= 0 else left + (sums[k] - total) / span * (right - left)
+    result = values - tau
+    np.clip(result, 0.0, upper, out=result)
+    return result
+
+
+def max_ic_weights(ic_mean: np.ndarray, ic_covariance: np.ndarray, long_only: bool = False) -> np.ndarray:
+    """
+    最大化IC信息比率的因子权重 w ∝ Σ_IC^{-1}·mean(IC)
+
+    传入因子间的相关系数矩阵和各因子与目标收益率的相关系数时，得到使组合因子与收益率相关性最大的权重
+    （作用于标准化后的因子）。
+
+    Args:
+        ic_mean: 各因子的平均IC（或与目标收益率的相关系数）
+        ic_covariance: 因子IC的协方差矩阵（或因子间的相关系数矩阵）
+        long_only: 是否要求权重非负（在非负约束下求解）
+
+    Returns:
+        np.ndarray: 绝对值之和为1的因子权重，无法求解时为等权
+    """
+    ic_mean = np.nan_to_num(np.asarray(ic_mean, dtype=np.float64))
+    ic_covariance = np.asarray(ic_covariance, dtype=np.float64)
+    n = len(ic_mean)
+    ic_covariance = np.where(np.isfinite(ic_covariance), ic_covariance, np.eye(n))
+    if long_only:
+        # 最大化 μ'w/sqrt(w'Σw)（w>=0）等价于 min ½w'Σw - μ'w（w>=0）后归一化
+        weights = _fista(ic_covariance, ic_mean, lambda w: np.clip(w, 0.0, None),
+                         np.full(n, 1.0 / n), 1e-10, 5000)[0]
+    else:
+        try:
+            weights = np.linalg.solve(ic_covariance + 1e-12 * np.eye(n), ic_mean)
+        except np.linalg.LinAlgError:
+            weights = np.linalg.lstsq(ic_covariance, ic_mean, rcond=None)[0]
+    scale = np.abs(weights).sum()
+    return weights / scale if scale > 0 else np.full(n, 1.0 / n)
+
+
+def _positive_definite(covariance: np.ndarray) -> np.ndarray:
+    """
+    按两两重叠样本估计的协方差矩阵不一定半正定，此时优化问题非凸（风险平价的牛顿法不收敛）；
+    Cholesky分解失败时把特征值截断到不小于最大特征值的1e-10倍
+    """
+    try:
+        np.linalg.cholesky(covariance)
+        return covariance
+    except np.linalg.LinAlgError:
+        values, vectors = np.linalg.eigh(covariance)
+        values = np.maximum(values, 1e-10 * max(values[-1], 1e-300))
+        return (vectors * values) @ vectors.T
+
+
+def _project_upper(values: np.ndarray, upper: float, total: float = 1.0) -> np.ndarray:
+    """欧氏投影到 {w <= upper, Σw = total}（允许负权重）：令 z = upper - w，即投影到 {z >= 0, Σz = n·upper - total}"""
+    return upper - project_capped_simplex(upper - values, None, len(values) * upper - total)
+
+
+def _active_set_solution(quadratic: np.ndarray, linear: np.ndarray, weights: np.ndarray,
+                         lower: Optional[float], upper: Optional[float], rounds: int = 5) -> Optional[np.ndarray]:
+    """
+    从weights的有效集出发求 min ½w'Qw - c'w（Σw = 1, lower <= w <= upper）的精确解
+
+    处于下限、上限的分量固定，其余分量在等式约束下求闭式解 w_F = Q_FF^{-1}(c_F - Q_FU·u - ν1)；
+    解越界的分量固定到边界、乘子符号不对的固定分量放开，最多调整rounds轮。
+    解在边界之内且KKT条件成立时返回该解，否则返回None。
+    """
+    at_lower = np.zeros(len(weights), dtype=bool) if lower is None else weights <= lower
+    at_upper = np.zeros(len(weights), dtype=bool) if upper is None else weights >= upper
+    for _ in range(rounds):
+        free = np.flatnonzero(~(at_lower | at_upper))
+        if len(free) == 0:
+            return None
+        candidate = np.zeros(len(weights))
+        if lower is not None:
+            candidate[at_lower] = lower
+        if upper is not None:
+            candidate[at_upper] = upper
+        block = quadratic.take(free, axis=0)
+        rhs = np.column_stack((linear[free] - block @ candidate, np.ones(len(free))))
+        try:
+            solved = np.linalg.solve(block.take(free, axis=1), rhs)
+        except np.linalg.LinAlgError:
+            return None
+        nu = (solved[:, 0].sum() - (1.0 - candidate.sum())) / solved[:, 1].sum()
+        candidate[free] = solved[:, 0] - nu * solved[:, 1]
+        below = free[candidate[free] < lower] if lower is not None else free[:0]
+        above = free[candidate[free] > upper] if upper is not None else free[:0]
+        if len(below) or len(above):
+            at_lower[below] = True
+            at_upper[above] = True
+            continue
+        # 固定分量的KKT条件：处于下限时 g_i + ν >= 0，处于上限时 g_i + ν <= 0
+        gradient = quadratic @ candidate - linear + nu
+        slack = 1e-9 * (np.abs(gradient).max() + abs(nu))
+        release = (at_lower & (gradient < -slack)) | (at_upper & (gradient > slack))
+        if not release.any():
+            return candidate
+        at_lower &= ~release
+        at_upper &= ~release
+    return None
+
+
+def _fista(quadratic: np.ndarray, linear: np.ndarray, project: Callable[[np.ndarray], np.ndarray],
+           start: np.ndarray, tolerance: float, max_iterations: int,
+           polish: Optional[Callable[[np.ndarray], Optional[np.ndarray]]] = None):
+    """
+    加速投影梯度法求解 min ½w'Qw - c'w，w在project的可行域内
+
+    步长取1/||Q||_F（||Q||_F不小于最大特征值），按梯度方向重启动量。
+    给出polish时每隔_POLISH_INTERVAL次迭代用它尝试由当前迭代点得到精确解，成功即返回。
+
+    Returns:
+        Tuple[np.ndarray, int]: (解, 迭代次数)
+    """
+    step = 1.0 / max(float(np.sqrt(np.vdot(quadratic, quadratic))), 1e-300)
+    weights = project(start)
+    momentum = weights
+    t = 1.0
+    for iteration in range(1, max_iterations + 1):
+        updated = project(momentum - step * (quadratic @ momentum - linear))
+        if polish is not None and iteration % _POLISH_INTERVAL == 1:
+            exact = polish(updated)
+            if exact is not None:
+                return exact, iteration
+        change = updated - weights
+        if np.abs(change).max() < tolerance:
+            return updated, iteration
+        t_next = (1.0 + np.sqrt(1.0 + 4.0 * t * t)) / 2.0
+        if np.vdot(momentum - updated, change) > 0:
+            # 动量方向与下降方向相反时重启
+            t_next, momentum = 1.0, updated
+        else:
+            momentum = updated + (t - 1.0) / t_next * change
+        weights, t = updated, t_next
+    return weights, max_iterations
+
+
+class PortfolioOptimizer:
+    """
+    组合优化器类，在候选股票上求解组合权重，并可作为PortfolioBacktestEngine的资金分配函数
+    """
+
+    def __init__(self, method: str = 'min_variance', long_only: bool = True, max_weight: Optional[float] = None,
+                 risk_aversion: float = 1.0, risk_budget: Optional[np.ndarray] = None,
+                 tolerance: float = 1e-8, max_iterations: int = 1000):
+        """
+        初始化组合优化器
+
+        Args:
+            method: 优化方法，见OPTIMIZATION_METHODS
+            long_only: 是否只做多（权重非负）
+            max_weight: 单只股票的权重上限，None表示不设上限
+            risk_aversion: 均值-方差的风险厌恶系数λ
+            risk_budget: 风险平价的各股票风险预算（与全部股票等长），None表示等风险贡献
+            tolerance: 迭代收敛阈值（相邻两次迭代权重的最大变化）
+            max_iterations: 最大迭代次数
+        """
+        if method not in OPTIMIZATION_METHODS:
+            raise ValueError(f"不支持的优化方法: {method}")
+        self.method = method
+        self.long_only = long_only
+        self.max_weight = max_weight
+        self.risk_aversion = risk_aversion
+        self.risk_budget = risk_budget
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        # 上一次的完整权重向量，用作下一次求解的初值
+        self._previous: Optional[np.ndarray] = None
+        self.iterations = 0
+
+    def reset(self):
+        """
+        清除保存的上一次解
+        """
+        self._previous = None
+
+    def _start(self, selected: np.ndarray, count: int) -> np.ndarray:
+        """在所选股票上的初值：上一次的解（新加入的股票取平均权重），没有时为等权"""
+        start = np.full(len(selected), 1.0 / len(selected))
+        if self._previous is not None and len(self._previous) == count:
+            previous = self._previous[selected]
+            held = previous > 0
+            if held.any():
+                start = np.where(held, previous, previous[held].mean())
+                start /= start.sum()
+        return start
+
+    def _solve_quadratic(self, covariance: np.ndarray, linear: np.ndarray, start: np.ndarray) -> np.ndarray:
+        """min ½·λ·w'Σw - μ'w，Σw = 1（及非负、上限约束）"""
+        quadratic = covariance * self.risk_aversion
+        n = len(linear)
+        if not self.long_only and self.max_weight is None:
+            # 只有预算约束时的闭式解：w = Q^{-1}(μ - γ1)，γ使Σw = 1
+            try:
+                inverse_ones = np.linalg.solve(quadratic, np.ones(n))
+                inverse_linear = np.linalg.solve(quadratic, linear)
+            except np.linalg.LinAlgError:
+                inverse_ones = np.linalg.lstsq(quadratic, np.ones(n), rcond=None)[0]
+                inverse_linear = np.linalg.lstsq(quadratic, linear, rcond=None)[0]
+            gamma = (inverse_linear.sum() - 1.0) / inverse_ones.sum()
+            self.iterations = 0
+            return inverse_linear - gamma * inverse_ones
+
+        upper = self.max_weight
+        if upper is not None and upper * n < 1.0:
+            # 上限过小时放宽到等权
+            upper = 1.0 / n
+        if self.long_only:
+            def project(w: np.ndarray) -> np.ndarray:
+                return project_capped_simplex(w, upper)
+        else:
+            def project(w: np.ndarray) -> np.ndarray:
+                return _project_upper(w, upper)
+        lower = 0.0 if self.long_only else None
+
+        def polish(w: np.ndarray) -> Optional[np.ndarray]:
+            return _active_set_solution(quadratic, linear, w, lower, upper)
+
+        weights, self.iterations = _fista(quadratic, linear, project, start, self.tolerance, self.max_iterations,
+                                          polish)
+        return weights
+
+    def _solve_risk_parity(self, covariance: np.ndarray, budget: np.ndarray, start: np.ndarray) -> np.ndarray:
+        """牛顿法求解 min ½y'Σy - b'log(y)，最优解处各股票的风险贡献 y_i(Σy)_i = b_i"""
+        budget = budget / budget.sum()
+        # 初值按方向上的最优尺度缩放：s = sqrt(Σb / w'Σw)
+        y = start * np.sqrt(1.0 / max(start @ covariance @ start, 1e-300))
+        for iteration in range(1, self.max_iterations + 1):
+            marginal = covariance @ y
+            gradient = marginal - budget / y
+            hessian = covariance + np.diag(budget / (y * y))
+            try:
+                direction = np.linalg.solve(hessian, gradient)
+            except np.linalg.LinAlgError:
+                direction = gradient / np.diag(hessian)
+            # 回溯保证y为正
+            step = 1.0
+            decreasing = direction > 0
+            if decreasing.any():
+                step = min(1.0, 0.95 * float(np.min(y[decreasing] / direction[decreasing])))
+            y = y - step * direction
+            if np.abs(step * direction / y).max() < self.tolerance:
+                break
+        self.iterations = iteration
+        return y / y.sum()
+
+    def optimize(self, covariance: np.ndarray, expected_returns: Optional[np.ndarray] = None,
+                 candidates: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        求解组合权重
+
+        协方差无效（样本不足）的候选股票不参与优化；缺失的两两协方差按0处理，矩阵不正定时截断负特征值。
+        没有可优化的股票时返回候选股票等权。
+
+        Args:
+            covariance: 全部股票的协方差矩阵
+            expected_returns: 全部股票的预期收益（均值-方差使用），缺失值按0处理
+            candidates: 候选股票布尔掩码，None表示全部股票
+
+        Returns:
+            np.ndarray: 与全部股票等长的权重，非候选股票为0，权重和为1
+        """
+        count = len(covariance)
+        candidates = np.ones(count, dtype=bool) if candidates is None else np.asarray(candidates, dtype=bool)
+        weights = np.zeros(count)
+        if not candidates.any():
+            return weights
+
+        variance = np.diag(covariance)
+        selected = np.flatnonzero(candidates & np.isfinite(variance) & (variance > 0))
+        if self.method == 'equal' or len(selected) == 0:
+            if self.method != 'equal':
+                logger.debug("候选股票的协方差均无效，使用等权")
+            weights[candidates] = 1.0 / candidates.sum()
+            return weights
+
+        sub = covariance.take(selected, axis=0).take(selected, axis=1)
+        if not np.isfinite(sub).all():
+            sub = np.nan_to_num(sub)
+        sub = _positive_definite(sub)
+        start = self._start(selected, count)
+
+        if self.method == 'risk_parity':
+            budget = np.ones(len(selected)) if self.risk_budget is None else \
+                np.nan_to_num(np.asarray(self.risk_budget, dtype=np.float64)[selected])
+            weights[selected] = self._solve_risk_parity(sub, np.maximum(budget, 1e-12), start)
+        else:
+            linear = np.zeros(len(selected))
+            if self.method == 'mean_variance' and expected_returns is not None:
+                linear = np.nan_to_num(np.asarray(expected_returns, dtype=np.float64)[selected])
+            weights[selected] = self._solve_quadratic(sub, linear, start)
+        weights[np.abs(weights) < _NEGLIGIBLE_WEIGHT] = 0.0
+        weights /= weights.sum()
+
+        self._previous = weights.copy()
+        return weights
+
+    def allocation_function(self, engine: CovarianceEngine, window: int = 120, halflife: Optional[float] = None,
+                            shrinkage: Optional[str] = 'ledoit_wolf',
+                            expected_returns: Union[None, np.ndarray, Callable[[int], np.ndarray]] = None):
+        """
+        生成PortfolioBacktestEngine的资金分配函数
+
+        第t个交易日使用截至当日（含）的window日收益率估计协方差，与回测引擎以当日收盘价成交的约定一致。
+
+        Args:
+            engine: 协方差引擎，行下标与回测引擎的日期下标一致（CovarianceEngine.from_prices(engine.close)）
+            window: 协方差窗口长度
+            halflife: 指数加权的半衰期，None表示等权
+            shrinkage: 收缩估计方法，None表示样本协方差
+            expected_returns: 均值-方差的预期收益：日期 × 股票 的数组、按日期下标返回数组的函数，
+                              None表示使用窗口内的平均收益率
+
+        Returns:
+            AllocationFunction: (当前日期下标, 候选股票布尔掩码, 截至当日的收盘价面板) -> 各股票权重
+        """
+        self.reset()
+
+        def allocate(date_index: int, candidates: np.ndarray, close_history: np.ndarray) -> np.ndarray:
+            end = date_index + 1
+            covariance = engine.covariance(end, window, halflife, shrinkage)
+            expected = None
+            if self.method == 'mean_variance':
+                if expected_returns is None:
+                    returns = engine.returns[max(0, end - window):end]
+                    valid = ~np.isnan(returns)
+                    expected = np.where(valid, returns, 0.0).sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+                elif callable(expected_returns):
+                    expected = expected_returns(date_index)
+                else:
+                    expected = expected_returns[date_index]
+            return self.optimize(covariance, expected, candidates)
+
+        return allocate
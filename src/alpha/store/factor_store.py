@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+因子值存储，按日增量更新
+
+目录结构（Hive风格分区，每个因子一个目录，目录下按年份分区）：
+
+    root/
+      manifest.json                       # 各因子的定义哈希、lookback、首末日期
+      factor=momentum_1m/
+        year=2023/part-20230103-20231229.parquet
+        year=2024/part-20240102-20240105.parquet
+        year=2024/part-20240108-20240108.parquet
+      factor=rsi_14/
+        ...
+
+每个文件只有 (股票代码, 日期, 因子值) 三列，按日期排序，因子值为null的行不写入。
+定义哈希由因子表达式的规范化描述（PanelExpr.key）得到，表达式变化时该因子整体重算；
+否则每日只计算上次更新之后的新日期：按因子的required_lookback截取每只股票最近的历史K线，
+在这段窗口上用PanelFactorEngine求值，只写出新日期的截面。依赖全部历史的因子（如OBV这类累计和）
+无法截取窗口，每次更新都在引擎加载的全部历史上重算。
+
+读取时按因子目录扫描，年份分区和日期统计信息用于谓词下推，只读取需要的因子列和日期范围。
+"""
+
+import hashlib
+import json
+import shutil
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import polars as pl
+from loguru import logger
+
+from src.alpha.factors.panel_factors import ExprLike, _as_expr, required_lookback
+
+MANIFEST_FILE = 'manifest.json'
+
+DateLike = Union[date, str]
+
+
+def definition_hash(expr: ExprLike) -> str:
+    """
+    计算因子定义的哈希
+
+    Args:
+        expr: 因子表达式
+
+    Returns:
+        str: 表达式规范化描述的SHA-1摘要
+    """
+    return hashlib.sha1(_as_expr(expr).key.encode('utf-8')).hexdigest()
+
+
+def _as_date(value: Optional[DateLike]) -> Optional[date]:
+    """把 'YYYY-MM-DD' 字符串或datetime统一为date"""
+    if value is None or type(value) is date:
+        return value
+    if isinstance(value, datetime):
+        return value.date()
+    return date.fromisoformat(value)
+
+
+class FactorStore:
+    """
+    因子值存储类，按因子/年份分区保存Parquet，记录每个因子的定义哈希和最后计算日期
+    """
+
+    def __init__(self, root: Union[str, Path], symbol_col: str = 'ts_code', date_col: str = 'date',
+                 dtype: pl.DataType = pl.Float64, compact_threshold: int = 20, compression: str = 'zstd'):
+        """
+        初始化因子值存储
+
+        Args:
+            root: 存储根目录，不存在时创建
+            symbol_col: 股票代码列名
+            date_col: 日期列名
+            dtype: 因子值的存储类型，pl.Float32可减半磁盘占用
+            compact_threshold: 一个年份分区内的文件数超过此值时合并为一个文件
+            compression: Parquet压缩算法
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.symbol_col = symbol_col
+        self.date_col = date_col
+        self.dtype = dtype
+        self.compact_threshold = compact_threshold
+        self.compression = compression
+        self.manifest: Dict[str, Dict[str, Any]] = self._load_manifest()
+
+    # ------------------------------------------------------------------
+    # 元数据
+    # ------------------------------------------------------------------
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        path = self.root / MANIFEST_FILE
+        if not path.exists():
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_manifest(self):
+        # 先写临时文件再替换，避免中断时留下不完整的元数据
+        path = self.root / MANIFEST_FILE
+        temp = path.with_suffix('.tmp')
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        temp.replace(path)
+
+    def factors(self) -> List[str]:
+        """
+        列出已存储的因子
+
+        Returns:
+            List[str]: 因子名列表
+        """
+        return sorted(self.manifest)
+
+    def info(self) -> pl.DataFrame:
+        """
+        汇总各因子的存储状态
+
+        Returns:
+            pl.DataFrame: 每个因子一行，包含lookback、首末日期、行数和更新时间
+        """
+        rows = [{'factor': name, 'lookback': entry['lookback'], 'first_date': _as_date(entry['first_date']),
+                 'last_date': _as_date(entry['last_date']), 'rows': entry['rows'],
+                 'updated_at': entry['updated_at'], 'hash': entry['hash']}
+                for name, entry in sorted(self.manifest.items())]
+        return pl.DataFrame(rows, schema={'factor': pl.String, 'lookback': pl.Int64, 'first_date': pl.Date,
+                                          'last_date': pl.Date, 'rows': pl.Int64, 'updated_at': pl.String,
+                                          'hash': pl.String})
+
+    def last_date(self, name: str) -> Optional[date]:
+        """
+        查询因子的最后计算日期
+
+        Args:
+            name: 因子名
+
+        Returns:
+            Optional[date]: 最后计算日期，未存储时为None
+        """
+        entry = self.manifest.get(name)
+        return _as_date(entry['last_date']) if entry else None
+
+    def plan(self, factors: Dict[str, ExprLike], as_of: Optional[DateLike] = None) -> Dict[str, Any]:
+        """
+        根据元数据规划一次更新需要的工作
+
+        Args:
+            factors: 因子名 -> 因子表达式
+            as_of: 数据的最新日期，默认今天；最后计算日期不早于此日期的因子视为已是最新
+
+        Returns:
+            Dict[str, Any]: rebuild（未存储、定义变化或依赖全部历史，需要全历史重算的因子）、
+                            incremental（只需计算新日期的因子）、up_to_date（无需计算的因子），
+                            以及max_days（每只股票至少需要加载的K线数，有因子需要重算时为None表示全部历史）
+        """
+        as_of = _as_date(as_of) or date.today()
+        rebuild, incremental, up_to_date = [], [], []
+        max_days = 0
+        for name, expr in factors.items():
+            entry = self.manifest.get(name)
+            lookback = required_lookback(expr)
+            if entry is None or entry['hash'] != definition_hash(expr) or lookback is None:
+                rebuild.append(name)
+            elif _as_date(entry['last_date']) >= as_of:
+                up_to_date.append(name)
+            else:
+                incremental.append(name)
+                # 新K线数不超过自然日数
+                max_days = max(max_days, lookback + (as_of - _as_date(entry['last_date'])).days)
+        return {'rebuild': rebuild, 'incremental': incremental, 'up_to_date': up_to_date,
+                'max_days': None if rebuild else max_days}
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    def _factor_dir(self, name: str, root: Optional[Path] = None) -> Path:
+        return (root or self.root) / f'factor={name}'
+
+    def _write_partitions(self, name: str, frame: pl.DataFrame, factor_dir: Path) -> List[Path]:
+        """
+        把单个因子的 (股票, 日期, 值) 按年份写入分区目录
+
+        Returns:
+            List[Path]: 写入了新文件的年份分区目录
+        """
+        frame = (frame.select(pl.col(self.symbol_col).cast(pl.String), self.date_col,
+                              pl.col(name).cast(self.dtype))
+                 .drop_nulls(name)
+                 .sort(self.date_col, maintain_order=True))
+        touched = []
+        frame = frame.with_columns(pl.col(self.date_col).dt.year().alias('__year'))
+        for (year,), part in frame.partition_by('__year', as_dict=True, maintain_order=True,
+                                                include_key=False).items():
+            partition = factor_dir / f'year={year}'
+            partition.mkdir(parents=True, exist_ok=True)
+            first, last = part[self.date_col].min(), part[self.date_col].max()
+            # 以日期范围命名，中断后重跑同一范围会覆盖而不是重复写入
+            part.write_parquet(partition / f'part-{first:%Y%m%d}-{last:%Y%m%d}.parquet',
+                               compression=self.compression)
+            touched.append(partition)
+        return touched
+
+    def _record(self, name: str, expr: ExprLike, first_date: Optional[date], last_date: date, rows: int):
+        self.manifest[name] = {
+            'hash': definition_hash(expr),
+            'definition': _as_expr(expr).key,
+            'lookback': required_lookback(expr),
+            'first_date': first_date.isoformat() if first_date else None,
+            'last_date': last_date.isoformat(),
+            'rows': rows,
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        self._save_manifest()
+
+    def write(self, name: str, expr: ExprLike, frame: pl.DataFrame, last_date: Optional[date] = None):
+        """
+        用全历史计算结果替换一个因子的全部存储
+
+        Args:
+            name: 因子名
+            expr: 因子表达式，用于记录定义哈希和lookback
+            frame: 包含股票代码、日期和因子列的结果
+            last_date: 计算所用数据的最新日期，默认为结果中的最大日期
+        """
+        # 先写到临时目录再替换，中断时旧数据保持完整
+        staging = self._factor_dir(name, self.root / '.staging')
+        if staging.exists():
+            shutil.rmtree(staging)
+        self._write_partitions(name, frame, staging)
+        target = self._factor_dir(name)
+        if target.exists():
+            shutil.rmtree(target)
+        if staging.exists():
+            staging.rename(target)
+        values = frame.select(pl.col(self.date_col).filter(pl.col(name).is_not_null()))[self.date_col]
+        self._record(name, expr, values.min(), last_date or frame[self.date_col].max(), len(values))
+
+    def append(self, name: str, frame: pl.DataFrame, last_date: Optional[date] = None):
+        """
+        追加一个因子在新日期上的值
+
+        Args:
+            name: 因子名，必须已存储
+            frame: 包含股票代码、日期和因子列的结果，只应包含最后计算日期之后的行
+            last_date: 计算所用数据的最新日期，默认为结果中的最大日期
+        """
+        entry = self.manifest[name]
+        touched = self._write_partitions(name, frame, self._factor_dir(name))
+        for partition in touched:
+            if len(list(partition.glob('*.parquet'))) > self.compact_threshold:
+                self._compact_partition(partition)
+        rows = frame[name].is_not_null().sum()
+        entry['first_date'] = entry['first_date'] or (
+            frame.filter(pl.col(name).is_not_null())[self.date_col].min().isoformat() if rows else None)
+        entry['last_date'] = (last_date or frame[self.date_col].max()).isoformat()
+        entry['rows'] += rows
+        entry['updated_at'] = datetime.now().isoformat(timespec='seconds')
+        self._save_manifest()
+
+    def _compact_partition(self, partition: Path):
+        """把一个年份分区内的多个文件合并为一个"""
+        files = sorted(partition.glob('*.parquet'))
+        if len(files) <= 1:
+            return
+        frame = pl.read_parquet(files).sort(self.date_col, maintain_order=True)
+        first, last = frame[self.date_col].min(), frame[self.date_col].max()
+        target = partition / f'part-{first:%Y%m%d}-{last:%Y%m%d}.parquet'
+        temp = partition / '.compact.tmp'
+        frame.write_parquet(temp, compression=self.compression)
+        for file in files:
+            file.unlink()
+        temp.replace(target)
+        logger.debug(f"合并分区 {partition}: {len(files)}个文件")
+
+    def compact(self, names: Optional[Sequence[str]] = None):
+        """
+        合并因子各年份分区内的小文件
+
+        Args:
+            names: 因子名列表，None表示全部因子
+        """
+        for name in (self.factors() if names is None else names):
+            for partition in sorted(self._factor_dir(name).glob('year=*')):
+                self._compact_partition(partition)
+
+    def drop(self, name: str):
+        """
+        删除一个因子的全部存储
+
+        Args:
+            name: 因子名
+        """
+        factor_dir = self._factor_dir(name)
+        if factor_dir.exists():
+            shutil.rmtree(factor_dir)
+        if self.manifest.pop(name, None) is not None:
+            self._save_manifest()
+
+    def _history_window(self, panel: pl.LazyFrame, last_date: date, lookback: int) -> pl.LazyFrame:
+        """
+        截取增量计算需要的面板：从各只有新K线的股票在首根新K线之前第lookback根K线的日期中
+        最早的一个开始。按日期而不是按股票截取，窗口内每个日期的截面完整
+        """
+        day = pl.col(self.date_col)
+        is_new = day > last_date
+        cutoff = (panel
+                  .with_columns(pl.int_range(pl.len()).over(self.symbol_col).alias('__position'),
+                                (~is_new).sum().over(self.symbol_col).cast(pl.Int64).alias('__old'),
+                                is_new.any().over(self.symbol_col).alias('__has_new'))
+                  .filter(pl.col('__has_new') & (pl.col('__position') >= pl.col('__old') - lookback))
+                  .select(day.min())
+                  .collect()
+                  .item())
+        if cutoff is None:
+            return panel.filter(is_new)
+        return panel.filter(day >= cutoff)
+
+    def update(self, engine, names: Optional[Sequence[str]] = None, batch_size: int = 10) -> Dict[str, int]:
+        """
+        用引擎中的面板更新因子存储
+
+        未存储、定义变化和依赖全部历史的因子在引擎的全部面板上重算并整体替换（引擎应加载全部历史）；
+        其余因子只在最后计算日期之后的新日期上计算，所需历史由各因子的lookback决定。
+
+        Args:
+            engine: PanelFactorEngine，面板需覆盖plan()给出的max_days
+            names: 要更新的因子名，None表示引擎中的全部因子
+            batch_size: 重算时每批计算的因子个数
+
+        Returns:
+            Dict[str, int]: 因子名 -> 本次写入的非空行数
+        """
+        names = list(engine.factors) if names is None else list(names)
+        latest = engine.panel.select(pl.col(self.date_col).max()).collect().item()
+        if latest is None:
+            return {}
+        plan = self.plan({name: engine.factors[name] for name in names}, latest)
+        written: Dict[str, int] = {name: 0 for name in plan['up_to_date']}
+
+        for start in range(0, len(plan['rebuild']), batch_size):
+            batch = plan['rebuild'][start:start + batch_size]
+            result = engine.compute(batch, self.dtype).with_columns(pl.col(self.symbol_col).cast(pl.String))
+            for name in batch:
+                self.write(name, engine.factors[name], result.select(self.symbol_col, self.date_col, name), latest)
+                written[name] = self.manifest[name]['rows']
+            logger.info(f"重算因子 {', '.join(batch)}: {result.height}行")
+
+        # 最后计算日期相同的因子一起增量计算，共用一次截取和子表达式
+        groups: Dict[date, List[str]] = {}
+        for name in plan['incremental']:
+            groups.setdefault(self.last_date(name), []).append(name)
+        for last_date, group in sorted(groups.items()):
+            window = self._history_window(engine.panel, last_date, engine.lookback(group))
+            result = (engine.lazy(group, self.dtype, window)
+                      .filter(pl.col(self.date_col) > last_date)
+                      .collect())
+            for name in group:
+                frame = result.select(self.symbol_col, self.date_col, name)
+                rows_before = self.manifest[name]['rows']
+                self.append(name, frame, latest)
+                written[name] = self.manifest[name]['rows'] - rows_before
+            logger.info(f"增量计算{len(group)}个因子 {last_date} 之后的 "
+                        f"{result[self.date_col].n_unique()}个交易日: {result.height}行")
+        return written
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+
+    def scan(self, name: str) -> pl.LazyFrame:
+        """
+        惰性扫描一个因子
+
+        Args:
+            name: 因子名
+
+        Returns:
+            pl.LazyFrame: 股票代码、日期、因子列以及year分区列
+        """
+        if name not in self.manifest:
+            raise KeyError(f"未存储的因子: {name}")
+        return pl.scan_parquet(self._factor_dir(name), hive_partitioning=True)
+
+    def read_panel(self, factors: Optional[Sequence[str]] = None, start: Optional[DateLike] = None,
+                   end: Optional[DateLike] = None, symbols: Optional[Sequence[str]] = None) -> pl.DataFrame:
+        """
+        读取因子面板，只扫描所需因子的目录，年份分区和日期范围下推到文件扫描
+
+        Args:
+            factors: 因子名列表，None表示全部已存储因子
+            start: 开始日期（含）
+            end: 结束日期（含）
+            symbols: 股票代码列表，None表示全部股票
+
+        Returns:
+            pl.DataFrame: 按股票、日期排序的宽表，股票在某日没有某因子值时为null
+        """
+        factors = self.factors() if factors is None else list(factors)
+        if not factors:
+            raise ValueError("没有可读取的因子")
+        start, end = _as_date(start), _as_date(end)
+        predicates = []
+        if start is not None:
+            predicates += [pl.col('year') >= start.year, pl.col(self.date_col) >= start]
+        if end is not None:
+            predicates += [pl.col('year') <= end.year, pl.col(self.date_col) <= end]
+        # 股票列表用半连接筛选：is_in谓词下推到Parquet读取时逐行求值，比读出后连接慢一个数量级
+        selected = None if symbols is None else pl.LazyFrame({self.symbol_col: list(symbols)},
+                                                             schema={self.symbol_col: pl.String})
+
+        query = None
+        for name in factors:
+            frame = self.scan(name)
+            if predicates:
+                frame = frame.filter(*predicates)
+            if selected is not None:
+                frame = frame.join(selected, on=self.symbol_col, how='semi')
+            frame = frame.select(self.symbol_col, self.date_col, name)
+            query = frame if query is None else query.join(frame, on=[self.symbol_col, self.date_col],
+                                                           how='full', coalesce=True)
+        return query.sort(self.symbol_col, self.date_col).collect()
+
+    def read_cross_section(self, factors: Optional[Sequence[str]] = None, on: Optional[DateLike] = None,
+                           symbols: Optional[Sequence[str]] = None) -> pl.DataFrame:
+        """
+        读取某一日的因子截面
+
+        Args:
+            factors: 因子名列表，None表示全部已存储因子
+            on: 日期，默认为这些因子最后计算日期中最早的一个
+            symbols: 股票代码列表，None表示全部股票
+
+        Returns:
+            pl.DataFrame: 该日各股票的因子值
+        """
+        factors = self.factors() if factors is None else list(factors)
+        on = _as_date(on) or min(self.last_date(name) for name in factors)
+        return self.read_panel(factors, on, on, symbols)
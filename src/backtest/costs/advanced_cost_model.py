@@ -7,6 +7,10 @@
 
 from typing import Dict, Any, Optional
 
+import numpy as np
+
+from src.backtest.costs.cost_model import ArrayLike, fill_cost_arrays, resolve_cost_params, round_trip_cost_arrays
+
 
 class AdvancedCostModel:
     """
@@ -103,6 +107,60 @@ class AdvancedCostModel:
         self.market = market
         self.params = self._get_market_defaults(market)
     
+    def _market_params(self, markets: Optional[ArrayLike]) -> Dict[str, Any]:
+        """
+        获取逐笔交易的成本参数
+
+        当前市场使用self.params（包含set_params的修改），其他市场使用_get_market_defaults的默认参数
+
+        Args:
+            markets: 每笔交易所属的市场，None表示全部为当前市场
+
+        Returns:
+            Dict[str, Any]: 成本参数，markets不为None时每个值为与交易数等长的数组
+        """
+        if markets is None:
+            return self.params
+        unique_markets, inverse = np.unique(np.asarray(markets), return_inverse=True)
+        tables = [resolve_cost_params(self.params if market == self.market else self._get_market_defaults(market))
+                  for market in unique_markets.tolist()]
+        return {name: np.array([table[name] for table in tables], dtype=np.float64)[inverse]
+                for name in tables[0]}
+
+    def calculate_costs(self, shares: ArrayLike, buy_prices: ArrayLike, sell_prices: ArrayLike,
+                        markets: Optional[ArrayLike] = None) -> Dict[str, np.ndarray]:
+        """
+        批量计算交易成本
+
+        Args:
+            shares: 交易股数数组
+            buy_prices: 买入价格数组
+            sell_prices: 卖出价格数组
+            markets: 每笔交易所属的市场，None表示全部为当前市场
+
+        Returns:
+            Dict[str, np.ndarray]: total_cost及各成本分项，见round_trip_cost_arrays
+        """
+        return round_trip_cost_arrays(self._market_params(markets), shares, buy_prices, sell_prices)
+
+    def calculate_fill_costs(self, shares: ArrayLike, prices: ArrayLike, sides: ArrayLike,
+                             markets: Optional[ArrayLike] = None,
+                             include_slippage: bool = True) -> Dict[str, np.ndarray]:
+        """
+        批量计算单边成交成本
+
+        Args:
+            shares: 成交股数数组
+            prices: 成交价格数组
+            sides: 成交方向数组
+            markets: 每笔成交所属的市场，None表示全部为当前市场
+            include_slippage: 是否计入滑点
+
+        Returns:
+            Dict[str, np.ndarray]: total_cost及各成本分项，见fill_cost_arrays
+        """
+        return fill_cost_arrays(self._market_params(markets), shares, prices, sides, include_slippage)
+
     def calculate_cost(self, shares: float, buy_price: float, sell_price: float, trade_type: str = 'stock') -> Dict[str, Any]:
         """
         计算交易成本
@@ -116,86 +174,41 @@ class AdvancedCostModel:
         Returns:
             Dict[str, Any]: 详细的交易成本明细
         """
-        # 获取参数
-        commission_rate = self.params.get('commission_rate', 0.0003)
-        min_commission = self.params.get('min_commission', 5.0)
-        slippage = self.params.get('slippage', 0.0001)
-        tax_rate = self.params.get('tax_rate', 0.001)
-        transfer_fee = self.params.get('transfer_fee', 0.0)
-        handling_fee = self.params.get('handling_fee', 0.0)
-        regulatory_fee = self.params.get('regulatory_fee', 0.0)
-        stamp_tax_threshold = self.params.get('stamp_tax_threshold', 0)
-        
-        # 计算交易金额
-        buy_amount = shares * buy_price
-        sell_amount = shares * sell_price
-        
-        # 计算佣金
-        buy_commission = max(buy_amount * commission_rate, min_commission)
-        sell_commission = max(sell_amount * commission_rate, min_commission)
-        
-        # 计算印花税（仅卖出时收取）
-        stamp_tax = 0
-        if sell_amount > stamp_tax_threshold:
-            stamp_tax = sell_amount * tax_rate
-        
-        # 计算过户费
-        buy_transfer_fee = buy_amount * transfer_fee
-        sell_transfer_fee = sell_amount * transfer_fee
-        
-        # 计算经手费
-        buy_handling_fee = buy_amount * handling_fee
-        sell_handling_fee = sell_amount * handling_fee
-        
-        # 计算证管费
-        buy_regulatory_fee = buy_amount * regulatory_fee
-        sell_regulatory_fee = sell_amount * regulatory_fee
-        
-        # 计算滑点成本
-        slippage_cost = shares * (sell_price - buy_price) * slippage
-        
-        # 计算总成本
-        total_cost = (
-            buy_commission + sell_commission + stamp_tax +
-            buy_transfer_fee + sell_transfer_fee +
-            buy_handling_fee + sell_handling_fee +
-            buy_regulatory_fee + sell_regulatory_fee +
-            slippage_cost
-        )
+        costs = round_trip_cost_arrays(self.params, shares, buy_price, sell_price)
         
         # 构建成本明细
         cost_details = {
-            'total_cost': total_cost,
+            'total_cost': costs['total_cost'],
             'buy_costs': {
-                'commission': buy_commission,
-                'transfer_fee': buy_transfer_fee,
-                'handling_fee': buy_handling_fee,
-                'regulatory_fee': buy_regulatory_fee
+                'commission': costs['buy_commission'],
+                'transfer_fee': costs['buy_transfer_fee'],
+                'handling_fee': costs['buy_handling_fee'],
+                'regulatory_fee': costs['buy_regulatory_fee']
             },
             'sell_costs': {
-                'commission': sell_commission,
-                'transfer_fee': sell_transfer_fee,
-                'handling_fee': sell_handling_fee,
-                'regulatory_fee': sell_regulatory_fee,
-                'stamp_tax': stamp_tax
+                'commission': costs['sell_commission'],
+                'transfer_fee': costs['sell_transfer_fee'],
+                'handling_fee': costs['sell_handling_fee'],
+                'regulatory_fee': costs['sell_regulatory_fee'],
+                'stamp_tax': costs['stamp_tax']
             },
             'other_costs': {
-                'slippage': slippage_cost
+                'slippage': costs['slippage']
             },
             'breakdown': {
-                'commission': buy_commission + sell_commission,
-                'stamp_tax': stamp_tax,
-                'transfer_fee': buy_transfer_fee + sell_transfer_fee,
-                'handling_fee': buy_handling_fee + sell_handling_fee,
-                'regulatory_fee': buy_regulatory_fee + sell_regulatory_fee,
-                'slippage': slippage_cost
+                'commission': costs['buy_commission'] + costs['sell_commission'],
+                'stamp_tax': costs['stamp_tax'],
+                'transfer_fee': costs['buy_transfer_fee'] + costs['sell_transfer_fee'],
+                'handling_fee': costs['buy_handling_fee'] + costs['sell_handling_fee'],
+                'regulatory_fee': costs['buy_regulatory_fee'] + costs['sell_regulatory_fee'],
+                'slippage': costs['slippage']
             },
             'trade_info': {
                 'shares': shares,
                 'buy_price': buy_price,
                 'sell_price': sell_price,
-                'buy_amount': buy_amount,
-                'sell_amount': sell_amount,
+                'buy_amount': shares * buy_price,
+                'sell_amount': shares * sell_price,
                 'market': self.market,
                 'trade_type': trade_type
             }
@@ -5,7 +5,145 @@
 交易成本模型，用于计算交易成本
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, Mapping, Union
+
+import numpy as np
+
+
+ArrayLike = Union[float, np.ndarray]
+
+# 各费用参数的默认值，参数缺失时使用（CostModel默认不收取过户费、经手费和证管费）
+DEFAULT_COST_PARAMS = {
+    'commission_rate': 0.0003,
+    'min_commission': 5.0,
+    'slippage': 0.0001,
+    'tax_rate': 0.001,
+    'transfer_fee': 0.0,
+    'handling_fee': 0.0,
+    'regulatory_fee': 0.0,
+    'stamp_tax_threshold': 0,
+}
+
+
+def resolve_cost_params(params: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    补全成本参数，缺失项取DEFAULT_COST_PARAMS中的默认值
+
+    Args:
+        params: 成本参数，值可以是标量或与交易数等长的数组
+
+    Returns:
+        Dict[str, Any]: 完整的成本参数
+    """
+    return {name: params.get(name, default) for name, default in DEFAULT_COST_PARAMS.items()}
+
+
+def _as_float_array(values: ArrayLike) -> ArrayLike:
+    """标量保持为Python标量（逐笔调用时避免0维数组的开销），其余转换为float64数组"""
+    return values if isinstance(values, (int, float)) else np.asarray(values, dtype=np.float64)
+
+
+def _maximum(values: ArrayLike, floor: ArrayLike) -> ArrayLike:
+    return np.maximum(values, floor) if isinstance(values, np.ndarray) else max(values, floor)
+
+
+def _where(condition: Any, values: ArrayLike, other: float) -> ArrayLike:
+    return np.where(condition, values, other) if isinstance(condition, np.ndarray) else (values if condition else other)
+
+
+def _scalar_where(condition: bool, values: float, other: float) -> float:
+    return values if condition else other
+
+
+def round_trip_cost_arrays(params: Mapping[str, Any], shares: ArrayLike, buy_prices: ArrayLike,
+                           sell_prices: ArrayLike) -> Dict[str, np.ndarray]:
+    """
+    批量计算往返交易（买入后卖出）成本
+
+    佣金买卖双边各自不低于最低佣金，印花税仅对超过起征点的卖出金额收取，
+    过户费、经手费和证管费双边收取，滑点按 股数 × 价差 × 滑点率 计算。
+    交易与参数均为标量时走逐笔快速路径：只换用Python的max和条件表达式，不构造数组，
+    公式和运算顺序不变，逐笔调用与批量调用的结果逐位相同。
+
+    Args:
+        params: 成本参数，值可以是标量或与交易数等长的数组
+        shares: 交易股数
+        buy_prices: 买入价格
+        sell_prices: 卖出价格
+
+    Returns:
+        Dict[str, np.ndarray]: total_cost及各成本分项，输入均为标量时各值为标量
+                               （buy_commission、sell_commission、stamp_tax、buy_transfer_fee、sell_transfer_fee、
+                               buy_handling_fee、sell_handling_fee、buy_regulatory_fee、sell_regulatory_fee、slippage）
+    """
+    params = resolve_cost_params(params)
+    if all(isinstance(value, (int, float)) for value in (shares, buy_prices, sell_prices, *params.values())):
+        maximum, where = max, _scalar_where
+    else:
+        shares = np.asarray(shares, dtype=np.float64)
+        buy_prices = np.asarray(buy_prices, dtype=np.float64)
+        sell_prices = np.asarray(sell_prices, dtype=np.float64)
+        maximum, where = np.maximum, np.where
+    buy_amount = shares * buy_prices
+    sell_amount = shares * sell_prices
+
+    costs = {
+        'buy_commission': maximum(buy_amount * params['commission_rate'], params['min_commission']),
+        'sell_commission': maximum(sell_amount * params['commission_rate'], params['min_commission']),
+        'stamp_tax': where(sell_amount > params['stamp_tax_threshold'], sell_amount * params['tax_rate'], 0.0),
+        'buy_transfer_fee': buy_amount * params['transfer_fee'],
+        'sell_transfer_fee': sell_amount * params['transfer_fee'],
+        'buy_handling_fee': buy_amount * params['handling_fee'],
+        'sell_handling_fee': sell_amount * params['handling_fee'],
+        'buy_regulatory_fee': buy_amount * params['regulatory_fee'],
+        'sell_regulatory_fee': sell_amount * params['regulatory_fee'],
+        'slippage': shares * (sell_prices - buy_prices) * params['slippage'],
+    }
+    costs['total_cost'] = (
+        costs['buy_commission'] + costs['sell_commission'] + costs['stamp_tax'] +
+        costs['buy_transfer_fee'] + costs['sell_transfer_fee'] +
+        costs['buy_handling_fee'] + costs['sell_handling_fee'] +
+        costs['buy_regulatory_fee'] + costs['sell_regulatory_fee'] +
+        costs['slippage']
+    )
+    return costs
+
+
+def fill_cost_arrays(params: Mapping[str, Any], shares: ArrayLike, prices: ArrayLike, sides: ArrayLike,
+                     include_slippage: bool = True) -> Dict[str, np.ndarray]:
+    """
+    批量计算单边成交成本
+
+    Args:
+        params: 成本参数，值可以是标量或与成交数等长的数组
+        shares: 成交股数
+        prices: 成交价格
+        sides: 成交方向，'buy'/'sell' 字符串或 1/-1 信号值
+        include_slippage: 是否按 成交金额 × 滑点率 计入滑点（成交价格已包含滑点时应为False）
+
+    Returns:
+        Dict[str, np.ndarray]: total_cost及各成本分项，输入均为标量时各值为标量（commission、stamp_tax、transfer_fee、handling_fee、
+                               regulatory_fee、slippage）
+    """
+    params = resolve_cost_params(params)
+    amount = _as_float_array(shares) * _as_float_array(prices)
+    if isinstance(sides, str):
+        is_sell = sides == 'sell'
+    else:
+        sides = np.asarray(sides)
+        is_sell = sides == 'sell' if sides.dtype.kind in 'US' else sides < 0
+
+    costs = {
+        'commission': _maximum(amount * params['commission_rate'], params['min_commission']),
+        'stamp_tax': _where(is_sell & (amount > params['stamp_tax_threshold']), amount * params['tax_rate'], 0.0),
+        'transfer_fee': amount * params['transfer_fee'],
+        'handling_fee': amount * params['handling_fee'],
+        'regulatory_fee': amount * params['regulatory_fee'],
+        'slippage': amount * params['slippage'] if include_slippage else amount * 0.0,
+    }
+    costs['total_cost'] = (costs['commission'] + costs['stamp_tax'] + costs['transfer_fee'] +
+                           costs['handling_fee'] + costs['regulatory_fee'] + costs['slippage'])
+    return costs
 
 
 class CostModel:
@@ -34,6 +172,37 @@ class CostModel:
         """
         self.params.update(params)
     
+    def calculate_costs(self, shares: ArrayLike, buy_prices: ArrayLike,
+                        sell_prices: ArrayLike) -> Dict[str, np.ndarray]:
+        """
+        批量计算交易成本
+
+        Args:
+            shares: 交易股数数组
+            buy_prices: 买入价格数组
+            sell_prices: 卖出价格数组
+
+        Returns:
+            Dict[str, np.ndarray]: total_cost及各成本分项，见round_trip_cost_arrays
+        """
+        return round_trip_cost_arrays(self.params, shares, buy_prices, sell_prices)
+
+    def calculate_fill_costs(self, shares: ArrayLike, prices: ArrayLike, sides: ArrayLike,
+                             include_slippage: bool = True) -> Dict[str, np.ndarray]:
+        """
+        批量计算单边成交成本
+
+        Args:
+            shares: 成交股数数组
+            prices: 成交价格数组
+            sides: 成交方向数组
+            include_slippage: 是否计入滑点
+
+        Returns:
+            Dict[str, np.ndarray]: total_cost及各成本分项，见fill_cost_arrays
+        """
+        return fill_cost_arrays(self.params, shares, prices, sides, include_slippage)
+
     def calculate_cost(self, shares: float, buy_price: float, sell_price: float) -> float:
         """
         计算交易成本
@@ -46,25 +215,4 @@ class CostModel:
         Returns:
             float: 交易成本
         """
-        commission_rate = self.params.get('commission_rate', 0.0003)
-        min_commission = self.params.get('min_commission', 5.0)
-        slippage = self.params.get('slippage', 0.0001)
-        tax_rate = self.params.get('tax_rate', 0.001)
-        
-        # 计算佣金
-        buy_amount = shares * buy_price
-        sell_amount = shares * sell_price
-        
-        buy_commission = max(buy_amount * commission_rate, min_commission)
-        sell_commission = max(sell_amount * commission_rate, min_commission)
-        
-        # 计算印花税（仅卖出时收取）
-        stamp_tax = sell_amount * tax_rate
-        
-        # 计算滑点成本
-        slippage_cost = shares * (sell_price - buy_price) * slippage
-        
-        # 总交易成本
-        total_cost = buy_commission + sell_commission + stamp_tax + slippage_cost
-        
-        return total_cost
+        return round_trip_cost_arrays(self.params, shares, buy_price, sell_price)['total_cost']
@@ -9,7 +9,9 @@ from typing import Dict, Any, List
 import polars as pl
 from loguru import logger
 
+from src.backtest.engine.backtest_result import BacktestResult
 from src.backtest.engine.base_engine import BaseBacktestEngine
+from src.backtest.engine.vectorized_backtest_engine import VectorizedBacktestEngine
 
 
 class BacktestEngine(BaseBacktestEngine):
@@ -44,6 +46,8 @@ class BacktestEngine(BaseBacktestEngine):
         
         self.trades = []
         self.equity_curve = []
+        # 逐K线指标状态从头累积，避免同一策略实例重复回测时沿用上一次的滚动窗口
+        self.strategy.reset_state()
         
         current_capital = initial_capital
         position = 0
@@ -152,10 +156,50 @@ class BacktestEngine(BaseBacktestEngine):
             'objective': objective
         }
     
+    def sweep_parameters(self, param_ranges: Dict[str, List[float]], initial_capital: float = 1000000.0,
+                         objective: str = 'total_return', max_workers: int = None,
+                         early_stop_fraction: float = None) -> Dict[str, Any]:
+        """
+        多进程参数扫描，适合万级参数组合
+
+        与optimize_strategy不同，行情数据只写入一次共享内存，组合惰性生成，
+        每个组合只保留汇总指标，结果为列式结果表；不会修改当前策略的参数
+
+        Args:
+            param_ranges: 参数范围
+            initial_capital: 初始资金
+            objective: 优化目标
+            max_workers: 进程数，None表示使用CPU核心数
+            early_stop_fraction: 提前终止使用的前段数据比例，None表示不提前终止
+
+        Returns:
+            Dict[str, Any]: 包含best_params、best_value、results（Polars DataFrame）和objective
+        """
+        from src.backtest.engine.parameter_sweep import ParameterSweepEngine
+
+        if not self.strategy:
+            logger.error("未设置策略")
+            return {}
+
+        sweep = ParameterSweepEngine(self.pl_df, self.strategy.__class__, self.cost_model)
+        results = sweep.run(param_ranges, initial_capital, objective, max_workers=max_workers,
+                            early_stop_fraction=early_stop_fraction)
+        best_params, best_value = sweep.best_params(results, list(param_ranges.keys()), objective)
+
+        return {
+            'best_params': best_params,
+            'best_value': best_value,
+            'results': results,
+            'objective': objective
+        }
+    
     def _run_parallel_backtests(self, param_combinations: List[Dict[str, float]], initial_capital: float, max_workers: int) -> List[Dict[str, Any]]:
         """
         并行运行回测
         
+        策略支持批量信号（generate_signals_batch）时，所有参数组合在一次批量评估中完成，
+        结果不含逐笔交易和权益曲线；否则每组参数在线程池中单独回测，结果为列式的BacktestResult
+        
         Args:
             param_combinations: 参数组合列表
             initial_capital: 初始资金
@@ -166,6 +210,13 @@ class BacktestEngine(BaseBacktestEngine):
         """
         import concurrent.futures
         
+        batch_engine = VectorizedBacktestEngine(self.pl_df)
+        batch_engine.set_strategy(self.strategy.__class__())
+        batch_engine.set_cost_model(self.cost_model)
+        batch_results = batch_engine.run_backtest_batch(param_combinations, initial_capital)
+        if batch_results is not None:
+            return batch_results
+        
         results = []
         
         def run_single_backtest(params):
@@ -176,9 +227,8 @@ class BacktestEngine(BaseBacktestEngine):
             engine_copy.set_strategy(strategy_copy)
             engine_copy.set_cost_model(self.cost_model)
             
-            result = engine_copy.run_backtest(initial_capital)
-            result['params'] = params
-            return result
+            # 以列式结果保存，大量参数组合同时驻留内存时不再持有逐行字典
+            return BacktestResult.from_results(engine_copy.run_backtest(initial_capital), params)
         
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
             future_to_param = {executor.submit(run_single_backtest, params): params for params in param_combinations}
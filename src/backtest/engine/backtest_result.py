@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+列式回测结果，用于紧凑保存与持久化大量回测结果
+
+引擎返回的回测结果字典中，equity_curve和trades可能是逐行字典列表，参数扫描同时保存成千上万个结果时，
+这些小字典是主要的内存开销。BacktestResult把它们压缩为列：
+
+- 日期：相对1970-01-01的int32天数（与Polars Date的物理表示一致），非Date类型的时间列保留其int64物理值
+- 权益与现金：float64数组
+- 交易记录：列式Polars DataFrame（结构数组），日期同样转为整数偏移，signal转为int8（1买入/-1卖出/0持有），
+  signal含其他自定义标签时整列按Categorical保存；其余字符串列转为Categorical
+
+BacktestResult实现只读Mapping接口，result['total_return']、result.get('performance')等旧用法不变；
+result['equity_curve']和result['trades']按需还原为Polars DataFrame，to_dict()仅在界面展示时转换为逐行字典。
+
+save_backtest_results/load_backtest_results把一组结果写入目录下的三个Parquet文件
+（summary、equity、trades，以result_id关联），参数扫描的结果可以在之后直接分析而无需重新回测。
+"""
+
+import json
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+import polars as pl
+
+from src.backtest.strategies.base_strategy import SIGNAL_CODES
+
+SUMMARY_FILE = 'summary.parquet'
+EQUITY_FILE = 'equity.parquet'
+TRADES_FILE = 'trades.parquet'
+
+_SIGNAL_NAMES = {code: name for name, code in SIGNAL_CODES.items()}
+
+
+def _compact_dates(dates: pl.Series) -> np.ndarray:
+    """
+    把日期列转换为整数偏移
+
+    Args:
+        dates: 日期列
+
+    Returns:
+        np.ndarray: Date类型为int32天数，其余时间类型为int64物理值
+    """
+    physical = dates.to_physical().to_numpy()
+    return physical.astype(np.int32 if dates.dtype == pl.Date else np.int64)
+
+
+def _restore_dates(offsets: np.ndarray, dtype: pl.DataType, name: str = 'date') -> pl.Series:
+    """
+    由整数偏移还原日期列
+
+    Args:
+        offsets: 整数偏移
+        dtype: 原日期类型
+        name: 列名
+
+    Returns:
+        pl.Series: 日期列
+    """
+    return pl.Series(name, offsets).cast(dtype)
+
+
+def _as_frame(rows: Any) -> pl.DataFrame:
+    """把DataFrame或逐行字典列表统一为Polars DataFrame"""
+    if isinstance(rows, pl.DataFrame):
+        return rows
+    if rows is None or len(rows) == 0:
+        return pl.DataFrame()
+    return pl.DataFrame(rows, infer_schema_length=None)
+
+
+@dataclass(eq=False)
+class BacktestResult(Mapping):
+    """
+    列式回测结果类
+    """
+    strategy_name: str
+    initial_capital: float
+    final_equity: float
+    total_return: float
+    dates: np.ndarray
+    equity: np.ndarray
+    date_dtype: pl.DataType = pl.Date
+    cash: Optional[np.ndarray] = None
+    trades_columns: pl.DataFrame = field(default_factory=pl.DataFrame)
+    performance: Dict[str, Any] = field(default_factory=dict)
+    params: Dict[str, Any] = field(default_factory=dict)
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    _KEYS = ('initial_capital', 'final_equity', 'total_return', 'trades', 'equity_curve',
+             'performance', 'strategy_name', 'params')
+
+    @classmethod
+    def from_results(cls, results: Dict[str, Any], params: Optional[Dict[str, Any]] = None) -> 'BacktestResult':
+        """
+        由引擎返回的回测结果字典构建列式结果
+
+        Args:
+            results: 回测结果字典，equity_curve/trades可以是Polars DataFrame或逐行字典列表
+            params: 参数组合，默认取results中的params
+
+        Returns:
+            BacktestResult: 列式回测结果
+        """
+        if isinstance(results, BacktestResult):
+            return results
+
+        equity_curve = _as_frame(results.get('equity_curve'))
+        if equity_curve.is_empty():
+            date_dtype, dates = pl.Date, np.empty(0, dtype=np.int32)
+            equity = np.empty(0)
+        else:
+            date_dtype = equity_curve['date'].dtype
+            dates = _compact_dates(equity_curve['date'])
+            equity = equity_curve['equity'].cast(pl.Float64).to_numpy()
+        cash = equity_curve['cash'].cast(pl.Float64).to_numpy() if 'cash' in equity_curve.columns else None
+
+        trades = _as_frame(results.get('trades'))
+        if not trades.is_empty():
+            # 只有全部为buy/sell/hold的signal列才编码为int8，自定义标签按普通字符串列处理，保证可以原样还原
+            encode_signal = ('signal' in trades.columns and trades.schema['signal'] == pl.Utf8
+                             and trades['signal'].drop_nulls().is_in(list(SIGNAL_CODES)).all())
+            compact = []
+            for name, dtype in trades.schema.items():
+                column = pl.col(name)
+                if name == 'signal' and encode_signal:
+                    compact.append(column.replace_strict(SIGNAL_CODES, return_dtype=pl.Int8))
+                elif name == 'date' and dtype == pl.Date:
+                    compact.append(column.to_physical())
+                elif dtype == pl.Utf8:
+                    compact.append(column.cast(pl.Categorical))
+                else:
+                    compact.append(column)
+            trades = trades.select(compact)
+
+        return cls(
+            strategy_name=results.get('strategy_name', ''),
+            initial_capital=float(results.get('initial_capital', equity[0] if len(equity) else 0.0)),
+            final_equity=float(results.get('final_equity', equity[-1] if len(equity) else 0.0)),
+            total_return=float(results.get('total_return', 0.0)),
+            dates=dates,
+            equity=equity,
+            date_dtype=date_dtype,
+            cash=cash,
+            trades_columns=trades,
+            performance=dict(results.get('performance') or {}),
+            params=dict(params if params is not None else results.get('params') or {}),
+            extra={key: value for key, value in results.items() if key not in cls._KEYS},
+        )
+
+    def equity_frame(self) -> pl.DataFrame:
+        """
+        还原权益曲线
+
+        Returns:
+            pl.DataFrame: 列为date、equity（及cash）
+        """
+        columns = {'date': _restore_dates(self.dates, self.date_dtype), 'equity': self.equity}
+        if self.cash is not None:
+            columns['cash'] = self.cash
+        return pl.DataFrame(columns)
+
+    def trades_frame(self) -> pl.DataFrame:
+        """
+        还原交易记录
+
+        Returns:
+            pl.DataFrame: 与引擎输出相同列的交易记录
+        """
+        trades = self.trades_columns
+        if trades.is_empty():
+            return trades
+        restored = []
+        for name, dtype in trades.schema.items():
+            column = pl.col(name)
+            if name == 'signal' and dtype == pl.Int8:
+                restored.append(column.replace_strict(_SIGNAL_NAMES, default=column.cast(pl.Utf8),
+                                                      return_dtype=pl.Utf8))
+            elif name == 'date':
+                restored.append(column.cast(self.date_dtype))
+            elif dtype == pl.Categorical:
+                restored.append(column.cast(pl.Utf8))
+            else:
+                restored.append(column)
+        return trades.select(restored)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        转换为逐行字典形式的回测结果，仅用于界面展示等需要行式数据的场景
+
+        Returns:
+            Dict[str, Any]: equity_curve和trades为字典列表的回测结果
+        """
+        return {
+            **self.extra,
+            'initial_capital': self.initial_capital,
+            'final_equity': self.final_equity,
+            'total_return': self.total_return,
+            'trades': self.trades_frame().to_dicts(),
+            'equity_curve': self.equity_frame().to_dicts(),
+            'performance': self.performance,
+            'strategy_name': self.strategy_name,
+            'params': self.params,
+        }
+
+    def nbytes(self) -> int:
+        """
+        估算列式数据占用的内存
+
+        Returns:
+            int: 字节数
+        """
+        size = self.dates.nbytes + self.equity.nbytes + self.trades_columns.estimated_size()
+        return size + (self.cash.nbytes if self.cash is not None else 0)
+
+    def __getitem__(self, key: str) -> Any:
+        if key == 'equity_curve':
+            return self.equity_frame()
+        if key == 'trades':
+            return self.trades_frame()
+        if key in self._KEYS:
+            return getattr(self, key)
+        return self.extra[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._KEYS
+        yield from self.extra
+
+    def __len__(self) -> int:
+        return len(self._KEYS) + len(self.extra)
+
+    def save(self, path: Union[str, Path]) -> None:
+        """
+        保存为Parquet目录
+
+        Args:
+            path: 目录路径
+        """
+        save_backtest_results([self], path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'BacktestResult':
+        """
+        从Parquet目录读取单个回测结果
+
+        Args:
+            path: 目录路径
+
+        Returns:
+            BacktestResult: 回测结果
+        """
+        return load_backtest_results(path)[0]
+
+
+def _scalar_metrics(performance: Dict[str, Any]) -> Dict[str, Any]:
+    """只保留可写入Parquet列的标量绩效指标"""
+    return {key: (float(value) if isinstance(value, (np.floating, np.integer)) else value)
+            for key, value in performance.items() if isinstance(value, (int, float, str, bool, np.number))}
+
+
+def save_backtest_results(results: Sequence[Union[BacktestResult, Dict[str, Any]]],
+                          path: Union[str, Path]) -> Path:
+    """
+    把一组回测结果保存为Parquet目录
+
+    目录下包含：
+    - summary.parquet：每个结果一行，含result_id、strategy_name、资金与收益、params（JSON）
+      以及展开为perf_前缀列的标量绩效指标
+    - equity.parquet：result_id、date、equity（及cash）的长表
+    - trades.parquet：result_id加交易记录各列的长表
+
+    Args:
+        results: 回测结果列表，可以是BacktestResult或引擎返回的字典
+        path: 目录路径
+
+    Returns:
+        Path: 目录路径
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    summary_rows, equity_frames, trade_frames = [], [], []
+    for result_id, result in enumerate(results):
+        result = BacktestResult.from_results(result)
+        summary_rows.append({
+            'result_id': result_id,
+            'strategy_name': result.strategy_name,
+            'initial_capital': result.initial_capital,
+            'final_equity': result.final_equity,
+            'total_return': result.total_return,
+            'params': json.dumps(result.params, ensure_ascii=False, default=str),
+            **{f'perf_{key}': value for key, value in _scalar_metrics(result.performance).items()},
+        })
+        equity = result.equity_frame().with_columns(pl.lit(result_id, dtype=pl.UInt32).alias('result_id'))
+        equity_frames.append(equity.select('result_id', pl.exclude('result_id')))
+        if not result.trades_columns.is_empty():
+            trades = result.trades_frame().with_columns(pl.lit(result_id, dtype=pl.UInt32).alias('result_id'))
+            trade_frames.append(trades.select('result_id', pl.exclude('result_id')))
+
+    pl.DataFrame(summary_rows, infer_schema_length=None).write_parquet(path / SUMMARY_FILE)
+    if equity_frames:
+        pl.concat(equity_frames, how='diagonal_relaxed').write_parquet(path / EQUITY_FILE)
+    if trade_frames:
+        pl.concat(trade_frames, how='diagonal_relaxed').write_parquet(path / TRADES_FILE)
+    return path
+
+
+def load_backtest_summary(path: Union[str, Path]) -> pl.DataFrame:
+    """
+    读取回测结果汇总表，params展开为列，无需读取权益与交易数据
+
+    Args:
+        path: save_backtest_results写入的目录
+
+    Returns:
+        pl.DataFrame: 每个结果一行的汇总表
+    """
+    summary = pl.read_parquet(Path(path) / SUMMARY_FILE)
+    params = pl.DataFrame([json.loads(text) for text in summary['params']], infer_schema_length=None)
+    return pl.concat([summary.drop('params'), params], how='horizontal') if params.width else summary
+
+
+def load_backtest_results(path: Union[str, Path], result_ids: Optional[List[int]] = None) -> List[BacktestResult]:
+    """
+    从Parquet目录读取回测结果
+
+    Args:
+        path: save_backtest_results写入的目录
+        result_ids: 只读取指定的结果，默认全部
+
+    Returns:
+        List[BacktestResult]: 回测结果列表，顺序与result_id一致
+    """
+    path = Path(path)
+    summary = pl.read_parquet(path / SUMMARY_FILE)
+    if result_ids is not None:
+        summary = summary.filter(pl.col('result_id').is_in(result_ids))
+
+    def read_grouped(file_name: str) -> Dict[int, pl.DataFrame]:
+        if not (path / file_name).exists():
+            return {}
+        frame = pl.scan_parquet(path / file_name)
+        if result_ids is not None:
+            frame = frame.filter(pl.col('result_id').is_in(result_ids))
+        return {key[0]: group.drop('result_id')
+                for key, group in frame.collect().partition_by('result_id', as_dict=True, maintain_order=True).items()}
+
+    equities = read_grouped(EQUITY_FILE)
+    trades = read_grouped(TRADES_FILE)
+    metric_columns = [name for name in summary.columns if name.startswith('perf_')]
+
+    results = []
+    for row in summary.sort('result_id').iter_rows(named=True):
+        result_id = row['result_id']
+        performance = {name[len('perf_'):]: row[name] for name in metric_columns if row[name] is not None}
+        results.append(BacktestResult.from_results({
+            'strategy_name': row['strategy_name'],
+            'initial_capital': row['initial_capital'],
+            'final_equity': row['final_equity'],
+            'total_return': row['total_return'],
+            'equity_curve': equities.get(result_id, pl.DataFrame()),
+            'trades': trades.get(result_id, pl.DataFrame()),
+            'performance': performance,
+        }, json.loads(row['params'])))
+    return results
@@ -5,16 +5,18 @@
 回测引擎基类，提供数据转换和通用组件初始化的统一逻辑
 """
 
-from typing import Any, Union, Dict, List
+from typing import Any, Union, Dict, List, Optional
 import polars as pl
 import pandas as pd
 import itertools
+import numpy as np
 from loguru import logger
 
 from src.backtest.costs.cost_model import CostModel
+from src.backtest.engine.backtest_result import BacktestResult
 from src.backtest.performance.performance_analyzer import PerformanceAnalyzer
 from src.backtest.visualization.backtest_visualizer import BacktestVisualizer
-from src.backtest.strategies.base_strategy import BaseStrategy
+from src.backtest.strategies.base_strategy import BaseStrategy, SIGNAL_CODES
 
 
 DataFrameType = Union[pl.DataFrame, pl.LazyFrame, pd.DataFrame, Any]
@@ -55,6 +57,33 @@ class BaseBacktestEngine:
             return data
         return pl.DataFrame(data)
 
+    @staticmethod
+    def generate_signal_array(strategy: BaseStrategy, data: pl.DataFrame) -> np.ndarray:
+        """
+        获取策略在整段数据上的信号数组，策略不支持向量化时回退为逐K线生成
+
+        Args:
+            strategy: 策略对象
+            data: 按时间升序排列的完整行情数据
+
+        Returns:
+            np.ndarray: 与data等长的信号数组（1买入，-1卖出，0持有）
+        """
+        signals = strategy.generate_signals(data)
+
+        if isinstance(signals, pl.Expr):
+            signals = data.select(signals.alias('signal'))['signal'].to_numpy()
+        elif signals is None:
+            logger.debug(f"策略{strategy.name}未实现generate_signals，回退为逐K线生成信号")
+            strategy.reset_state()
+            rows = data.iter_rows(named=True)
+            signals = [SIGNAL_CODES.get(strategy.generate_signal(row, i), 0) for i, row in enumerate(rows)]
+
+        signals = np.nan_to_num(np.asarray(signals, dtype=np.float64)).astype(np.int8)
+        if len(signals) != data.height:
+            raise ValueError(f"信号长度{len(signals)}与数据长度{data.height}不一致")
+        return signals
+
     def init_common_components(self) -> None:
         """初始化通用组件（供子类在 __init__ 末尾调用）。"""
         self.cost_model = CostModel()
@@ -91,6 +120,17 @@ class BaseBacktestEngine:
         """
         return self.backtest_results
 
+    def get_backtest_result(self) -> Optional[BacktestResult]:
+        """
+        获取列式回测结果，适合在参数扫描中大量保存或写入Parquet
+
+        Returns:
+            Optional[BacktestResult]: 列式回测结果，尚未运行回测时为None
+        """
+        if not self.backtest_results:
+            return None
+        return BacktestResult.from_results(self.backtest_results)
+
     def visualize_backtest(self) -> Any:
         """
         可视化回测结果
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+事件驱动回测引擎，按K线撮合订单簿中的挂单
+
+与按收盘价成交的信号引擎不同，本引擎使用orders模块中的市价单、限价单、止损单和止损限价单：
+挂单保存在按价格索引的订单簿（OrderBook）中，每根K线只撮合触发价落在 [最低价, 最高价] 内的订单，
+成交后再按A股交易规则确定实际成交数量：
+
+- T+1：当日买入的股份次日才可卖出
+- 整手交易：买入数量按每手100股向下取整，卖出零股只能在清仓时一次卖出
+- 涨跌停：全天封涨停（最低价达到涨停价）时买单不成交，全天封跌停（最高价达到跌停价）时卖单不成交
+- 成交量约束：每只股票每根K线的成交量不超过该K线成交量的 max_volume_ratio，超出部分保留挂单，形成部分成交
+- 资金不足以买入一手、或无持仓可卖的订单直接撤销
+
+回测按交易日推进：先撮合当日全部股票的挂单，再按收盘价估值，最后调用K线回调；
+回调中提交的订单从下一根K线开始参与撮合。
+"""
+
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import polars as pl
+from loguru import logger
+
+from src.backtest.costs.cost_model import resolve_cost_params
+from src.backtest.engine.base_engine import BaseBacktestEngine
+from src.backtest.orders.order import Order
+from src.backtest.orders.order_book import OrderBook
+
+
+# K线回调：(引擎, 日期, {股票代码: K线字典}) -> None
+BarCallback = Callable[['EventDrivenBacktestEngine', Any, Dict[str, Dict[str, float]]], None]
+
+LOT_SIZE = 100
+
+
+def price_limit_ratio(symbol: str) -> float:
+    """
+    按股票代码确定涨跌停幅度
+
+    创业板（300/301）与科创板（688/689）为20%，北交所（4/8/92开头或.BJ后缀）为30%，其余为10%
+
+    Args:
+        symbol: 股票代码，可带交易所前缀或后缀
+
+    Returns:
+        float: 涨跌停幅度
+    """
+    code = re.sub(r'\D', '', symbol)
+    if symbol.upper().endswith('.BJ') or symbol.lower().startswith('bj') or code.startswith(('4', '8', '92')):
+        return 0.3
+    if code.startswith(('300', '301', '688', '689')):
+        return 0.2
+    return 0.1
+
+
+class EventDrivenBacktestEngine(BaseBacktestEngine):
+    """
+    事件驱动回测引擎类，提供基于订单簿撮合的回测功能
+    """
+
+    def __init__(self, data_dict: Dict[str, Any], max_volume_ratio: float = 0.25,
+                 enforce_price_limit: bool = True):
+        """
+        初始化事件驱动回测引擎
+
+        Args:
+            data_dict: 股票数据字典，键为股票代码，值为Polars DataFrame、LazyFrame或Pandas DataFrame，
+                       需包含date和close列，open/high/low缺失时以close代替，volume缺失时不限制成交量
+            max_volume_ratio: 单根K线成交量占该K线成交量的上限
+            enforce_price_limit: 是否执行涨跌停不成交规则
+        """
+        super().__init__()
+        self.max_volume_ratio = max_volume_ratio
+        self.enforce_price_limit = enforce_price_limit
+        self.order_book = OrderBook()
+        self.bar_callback: Optional[BarCallback] = None
+
+        self.cash = 0.0
+        self.positions: Dict[str, float] = {}
+        self.sellable: Dict[str, float] = {}
+        self.last_close: Dict[str, float] = {}
+        self._fills: List[tuple] = []
+
+        self.bars = self._build_bars(data_dict)
+
+    def _build_bars(self, data_dict: Dict[str, Any]) -> pl.DataFrame:
+        """
+        把各股票K线合并为按 (日期, 股票代码) 排序的长表，并附上前收盘价
+
+        Args:
+            data_dict: 股票数据字典
+
+        Returns:
+            pl.DataFrame: 列为date、symbol、open、high、low、close、volume、prev_close
+        """
+        frames = []
+        for symbol, data in data_dict.items():
+            df = self.convert_to_polars(data).sort('date')
+            close = pl.col('close').cast(pl.Float64)
+            frames.append(df.select(
+                'date',
+                pl.lit(symbol).alias('symbol'),
+                *[(pl.col(name).cast(pl.Float64) if name in df.columns else close).alias(name)
+                  for name in ('open', 'high', 'low')],
+                close.alias('close'),
+                (pl.col('volume').cast(pl.Float64) if 'volume' in df.columns
+                 else pl.lit(np.inf)).alias('volume'),
+                close.shift(1).alias('prev_close'),
+            ))
+        if not frames:
+            return pl.DataFrame()
+        return pl.concat(frames).sort('date', 'symbol', maintain_order=True)
+
+    def set_bar_callback(self, callback: BarCallback) -> None:
+        """
+        设置K线回调，每个交易日撮合与估值完成后调用，可在其中提交或撤销订单
+
+        Args:
+            callback: 回调函数，接收 (引擎, 日期, {股票代码: K线字典})
+        """
+        self.bar_callback = callback
+
+    def submit_order(self, order: Order) -> None:
+        """
+        提交订单，订单从下一根K线开始参与撮合（回测开始前提交的订单从第一根K线开始）
+
+        Args:
+            order: 订单对象
+        """
+        self.order_book.submit(order)
+
+    def cancel_order(self, order_id: str) -> bool:
+        """
+        撤销订单
+
+        Args:
+            order_id: 订单ID
+
+        Returns:
+            bool: 是否撤销成功
+        """
+        return self.order_book.cancel(order_id)
+
+    def _fill_cost(self, side: str, quantity: float, price: float) -> float:
+        """
+        计算单笔成交的费用
+
+        滑点已体现在按开盘价/触发价确定的成交价格中，不再单独计费。
+
+        Args:
+            side: 交易方向
+            quantity: 成交数量
+            price: 成交价格
+
+        Returns:
+            float: 交易费用
+        """
+        return float(self.cost_model.calculate_fill_costs(quantity, price, side, include_slippage=False)['total_cost'])
+
+    def _execute_fill(self, date, order: Order, price: float, capacity: float) -> float:
+        """
+        按交易规则确定成交数量并更新订单、资金与持仓
+
+        Args:
+            date: 交易日期
+            order: 订单对象
+            price: 撮合价格
+            capacity: 本根K线剩余可成交量
+
+        Returns:
+            float: 实际成交数量，0表示本根K线未成交
+        """
+        symbol = order.symbol
+        remaining = order.remaining_quantity
+        if order.side == 'buy':
+            params = resolve_cost_params(self.cost_model.params)
+            fee_rate = (params['commission_rate'] + params['transfer_fee']
+                        + params['handling_fee'] + params['regulatory_fee'])
+            affordable = (self.cash - params['min_commission']) / (price * (1 + fee_rate))
+            quantity = min(remaining, capacity, affordable) // LOT_SIZE * LOT_SIZE
+            if quantity <= 0:
+                if affordable < LOT_SIZE or remaining < LOT_SIZE:
+                    order.cancel()
+                return 0.0
+            amount = quantity * price
+            cost = self._fill_cost('buy', quantity, price)
+            self.cash -= amount + cost
+            self.positions[symbol] = self.positions.get(symbol, 0.0) + quantity
+        else:
+            position = self.positions.get(symbol, 0.0)
+            if position <= 0:
+                order.cancel()
+                return 0.0
+            if remaining < LOT_SIZE and remaining < position:
+                order.cancel()
+                return 0.0
+            quantity = min(remaining, self.sellable.get(symbol, 0.0), capacity)
+            if quantity < position:
+                # 零股只能在清仓时卖出
+                quantity = quantity // LOT_SIZE * LOT_SIZE
+            if quantity <= 0:
+                return 0.0
+            amount = quantity * price
+            cost = self._fill_cost('sell', quantity, price)
+            self.cash += amount - cost
+            self.positions[symbol] = position - quantity
+            self.sellable[symbol] -= quantity
+            if self.positions[symbol] <= 0:
+                del self.positions[symbol]
+
+        order.execute(price, quantity)
+        self._fills.append((date, symbol, order.order_id, order.side, order.order_type, price, quantity,
+                            cost, self.cash, self.positions.get(symbol, 0.0)))
+        return quantity
+
+    def _match_bar(self, date, symbol: str, open_price: float, high: float, low: float,
+                   volume: float, prev_close: Optional[float]) -> None:
+        """
+        撮合单只股票在一根K线上的挂单
+
+        Args:
+            date: 交易日期
+            symbol: 股票代码
+            open_price: 开盘价
+            high: 最高价
+            low: 最低价
+            volume: 成交量
+            prev_close: 前收盘价，首根K线为None
+        """
+        candidates = self.order_book.match(symbol, open_price, high, low)
+        if not candidates:
+            return
+
+        buy_locked = sell_locked = False
+        if self.enforce_price_limit and prev_close is not None:
+            ratio = price_limit_ratio(symbol)
+            buy_locked = low >= round(prev_close * (1 + ratio), 2)
+            sell_locked = high <= round(prev_close * (1 - ratio), 2)
+
+        capacity = volume * self.max_volume_ratio
+        for order, price in candidates:
+            locked = buy_locked if order.side == 'buy' else sell_locked
+            if not locked and capacity > 0:
+                capacity -= self._execute_fill(date, order, price, capacity)
+            if order.is_active:
+                self.order_book.add(order)
+
+    def run_backtest(self, initial_capital: float = 1000000.0, **params) -> Dict[str, Any]:
+        """
+        运行事件驱动回测
+
+        Args:
+            initial_capital: 初始资金
+            **params: 回测参数
+
+        Returns:
+            Dict[str, Any]: 回测结果，trades（逐笔成交）、equity_curve和orders为Polars DataFrame
+        """
+        if self.bars.is_empty():
+            logger.error("没有K线数据")
+            return {}
+
+        self.cash = initial_capital
+        self.positions, self.sellable, self.last_close = {}, {}, {}
+        self._fills = []
+
+        dates = self.bars['date']
+        boundaries = np.flatnonzero(np.diff(dates.to_physical().to_numpy())) + 1
+        starts = np.concatenate([[0], boundaries])
+        ends = np.concatenate([boundaries, [self.bars.height]])
+        symbols = self.bars['symbol'].to_list()
+        columns = {name: self.bars[name].to_list() for name in ('open', 'high', 'low', 'close', 'volume')}
+        prev_close = self.bars['prev_close'].to_list()
+
+        equity = np.empty(len(starts))
+        cash = np.empty(len(starts))
+        for t, (start, end) in enumerate(zip(starts, ends)):
+            date = dates[int(start)]
+            # T+1：上一交易日及之前买入的持仓在新交易日变为可卖
+            self.sellable = dict(self.positions)
+            for row in range(start, end):
+                symbol = symbols[row]
+                self._match_bar(date, symbol, columns['open'][row], columns['high'][row], columns['low'][row],
+                                columns['volume'][row], prev_close[row])
+                self.last_close[symbol] = columns['close'][row]
+
+            cash[t] = self.cash
+            equity[t] = self.cash + sum(shares * self.last_close[symbol]
+                                        for symbol, shares in self.positions.items())
+
+            if self.bar_callback is not None:
+                bars = {symbols[row]: {name: columns[name][row] for name in columns}
+                        for row in range(start, end)}
+                self.bar_callback(self, date, bars)
+
+        self.equity_curve = pl.DataFrame({'date': dates.gather(starts), 'equity': equity, 'cash': cash})
+        self.trades = pl.DataFrame(self._fills, orient='row', schema={
+            'date': dates.dtype, 'symbol': pl.Utf8, 'order_id': pl.Utf8, 'signal': pl.Utf8,
+            'order_type': pl.Utf8, 'price': pl.Float64, 'shares': pl.Float64, 'cost': pl.Float64,
+            'capital': pl.Float64, 'position': pl.Float64,
+        })
+
+        final_equity = float(equity[-1])
+        total_return = (final_equity - initial_capital) / initial_capital * 100
+        performance = self.performance_analyzer.analyze(self.equity_curve, self.trades, symbol_column='symbol')
+
+        self.backtest_results = {
+            'initial_capital': initial_capital,
+            'final_equity': final_equity,
+            'total_return': total_return,
+            'trades': self.trades,
+            'equity_curve': self.equity_curve,
+            'orders': pl.DataFrame([order.to_dict() for order in self.order_book.orders.values()]),
+            'positions': dict(self.positions),
+            'performance': performance
+        }
+
+        logger.info(f"事件驱动回测完成: {len(self._fills)}笔成交, 总收益率 = {total_return:.2f}%")
+        return self.backtest_results
@@ -9,9 +9,10 @@ from typing import Dict, Any, List
 import polars as pl
 from loguru import logger
 import concurrent.futures
-from functools import lru_cache
 
+from src.backtest.engine.backtest_result import BacktestResult
 from src.backtest.engine.base_engine import BaseBacktestEngine
+from src.backtest.engine.vectorized_backtest_engine import VectorizedBacktestEngine
 
 
 class OptimizedBacktestEngine(BaseBacktestEngine):
@@ -32,10 +33,12 @@ class OptimizedBacktestEngine(BaseBacktestEngine):
         if 'date' in self.pl_df.columns:
             self.pl_df = self.pl_df.sort('date')
 
-    @lru_cache(maxsize=1000)
     def _get_signal(self, data_tuple, index):
         """
-        缓存策略信号生成结果
+        生成策略信号
+        
+        不对结果做缓存：策略（如MAStrategy）在generate_signal中维护价格历史，
+        以OHLCV元组为键的缓存命中时会跳过状态更新并返回过期信号
         
         Args:
             data_tuple: 数据元组，用于缓存键
@@ -68,6 +71,8 @@ class OptimizedBacktestEngine(BaseBacktestEngine):
         
         self.trades = []
         self.equity_curve = []
+        # 逐K线指标状态从头累积，避免同一策略实例重复回测时沿用上一次的滚动窗口
+        self.strategy.reset_state()
         
         current_capital = initial_capital
         position = 0
@@ -150,6 +155,9 @@ class OptimizedBacktestEngine(BaseBacktestEngine):
         """
         并行运行回测
         
+        策略支持批量信号（generate_signals_batch）时，所有参数组合在一次批量评估中完成，
+        结果不含逐笔交易和权益曲线；否则每组参数在线程池中单独回测，结果为列式的BacktestResult
+        
         Args:
             param_combinations: 参数组合列表
             initial_capital: 初始资金
@@ -158,6 +166,13 @@ class OptimizedBacktestEngine(BaseBacktestEngine):
         Returns:
             List[Dict[str, Any]]: 回测结果列表
         """
+        batch_engine = VectorizedBacktestEngine(self.pl_df)
+        batch_engine.set_strategy(self.strategy.__class__())
+        batch_engine.set_cost_model(self.cost_model)
+        batch_results = batch_engine.run_backtest_batch(param_combinations, initial_capital)
+        if batch_results is not None:
+            return batch_results
+        
         results = []
         
         def run_single_backtest(params):
@@ -168,9 +183,8 @@ class OptimizedBacktestEngine(BaseBacktestEngine):
             engine_copy.set_strategy(strategy_copy)
             engine_copy.set_cost_model(self.cost_model)
             
-            result = engine_copy.run_backtest(initial_capital)
-            result['params'] = params
-            return result
+            # 以列式结果保存，大量参数组合同时驻留内存时不再持有逐行字典
+            return BacktestResult.from_results(engine_copy.run_backtest(initial_capital), params)
         
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
             future_to_param = {executor.submit(run_single_backtest, params): params for params in param_combinations}
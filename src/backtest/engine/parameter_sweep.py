@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多进程参数扫描引擎
+
+- 行情数据只在主进程写入一次共享内存，子进程在初始化时按名称映射为只读NumPy视图，
+  不随每个任务序列化传输
+- 参数组合按笛卡尔积惰性生成，按块提交，进程池中同时在途的块数有上限，
+  万级组合也不会预先物化全部组合
+- 每块组合通过VectorizedBacktestEngine.run_backtest_batch一次评估（策略需实现generate_signals_batch），
+  不支持批量信号的策略回退为逐组合回测
+- 策略is_valid_params判定无效的组合（如短周期不小于长周期）在生成时跳过
+- 每个组合只返回汇总指标，结果按列流式追加，最终汇总为一张Polars结果表
+- 可选提前终止：先在数据前段评估组合，目标值落在已完成组合前段得分低分位的组合不再做全量回测
+"""
+
+import itertools
+import math
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
+
+import numpy as np
+import polars as pl
+from loguru import logger
+
+from src.backtest.costs.cost_model import CostModel
+from src.backtest.engine.vectorized_backtest_engine import VectorizedBacktestEngine
+from src.backtest.strategies.base_strategy import BaseStrategy
+
+
+# 结果表中每个组合的汇总指标列
+SWEEP_METRICS = ['total_return', 'final_equity', 'annual_return', 'sharpe_ratio', 'max_drawdown',
+                 'volatility', 'winning_rate', 'trades_count']
+
+# 目标值越小越好的优化目标
+MINIMIZE_OBJECTIVES = frozenset({'max_drawdown'})
+
+# 子进程内的共享数据，由_init_sweep_worker设置
+_worker_state: Dict[str, Any] = {}
+
+
+def iter_param_combinations(param_ranges: Dict[str, List[Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    惰性生成参数组合
+
+    Args:
+        param_ranges: 参数范围，键为参数名，值为候选值列表
+
+    Yields:
+        Dict[str, Any]: 单个参数组合
+    """
+    param_names = list(param_ranges.keys())
+    for combo in itertools.product(*(param_ranges[name] for name in param_names)):
+        yield dict(zip(param_names, combo))
+
+
+def count_param_combinations(param_ranges: Dict[str, List[Any]]) -> int:
+    """
+    计算参数组合总数
+
+    Args:
+        param_ranges: 参数范围
+
+    Returns:
+        int: 组合总数
+    """
+    return math.prod(len(values) for values in param_ranges.values())
+
+
+def objective_score(metrics: Dict[str, Any], objective: str) -> float:
+    """
+    将汇总指标转换为越大越好的目标得分
+
+    Args:
+        metrics: 汇总指标
+        objective: 优化目标，与BaseBacktestEngine._select_best_params一致
+
+    Returns:
+        float: 目标得分，缺失时为-inf
+    """
+    value = metrics.get(objective if objective in SWEEP_METRICS else 'total_return')
+    if value is None or not np.isfinite(value):
+        return -float('inf')
+    return -value if objective in MINIMIZE_OBJECTIVES else value
+
+
+class SharedMarketData:
+    """
+    共享内存中的行情数据
+
+    所有数值和时间列以float64/int64按列连续存放在一块共享内存中，
+    子进程通过name和列元数据重建零拷贝的NumPy视图
+    """
+
+    def __init__(self, df: pl.DataFrame):
+        """
+        将行情数据写入共享内存
+
+        Args:
+            df: 行情数据，只保留数值列和时间列
+        """
+        self.columns = []
+        arrays = []
+        for name, dtype in df.schema.items():
+            if dtype.is_numeric():
+                arrays.append(df[name].cast(pl.Float64).fill_null(np.nan).to_numpy())
+                self.columns.append((name, 'float64', None))
+            elif dtype.is_temporal():
+                arrays.append(df[name].to_physical().cast(pl.Int64).to_numpy())
+                self.columns.append((name, 'int64', dtype))
+            else:
+                logger.debug(f"参数扫描共享数据跳过非数值列: {name}")
+
+        self.rows = df.height
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, 8 * self.rows * len(arrays)))
+        for i, values in enumerate(arrays):
+            view = np.ndarray(self.rows, dtype=values.dtype, buffer=self.shm.buf, offset=8 * self.rows * i)
+            view[:] = values
+
+    @property
+    def spec(self) -> Tuple[str, int, list]:
+        """子进程重建数据所需的描述信息"""
+        return self.shm.name, self.rows, self.columns
+
+    @staticmethod
+    def attach(spec: Tuple[str, int, list]) -> Tuple[shared_memory.SharedMemory, pl.DataFrame]:
+        """
+        在子进程中映射共享内存并重建DataFrame
+
+        Args:
+            spec: SharedMarketData.spec
+
+        Returns:
+            Tuple[SharedMemory, pl.DataFrame]: 共享内存句柄（需保持引用）与行情数据
+        """
+        name, rows, columns = spec
+        # spawn子进程与主进程共用资源跟踪器，共享内存由主进程在扫描结束后统一释放
+        shm = shared_memory.SharedMemory(name=name)
+
+        series = []
+        for i, (column, kind, dtype) in enumerate(columns):
+            view = np.ndarray(rows, dtype=np.dtype(kind), buffer=shm.buf, offset=8 * rows * i)
+            view.flags.writeable = False
+            s = pl.Series(column, view)
+            series.append(s.cast(dtype) if dtype is not None else s)
+        return shm, pl.DataFrame(series)
+
+    def close(self) -> None:
+        """释放共享内存"""
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _init_sweep_worker(spec: Tuple[str, int, list], polars_threads: int) -> None:
+    """
+    子进程初始化函数：映射共享行情数据，限制线程数并降低日志级别
+    """
+    os.environ['POLARS_MAX_THREADS'] = str(polars_threads)
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+    shm, df = SharedMarketData.attach(spec)
+    _worker_state['shm'] = shm
+    _worker_state['data'] = df
+
+
+def _summary_metrics(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    从单个回测结果中提取汇总指标
+
+    Returns:
+        Dict[str, Any]: 汇总指标
+    """
+    performance = result.get('performance', {})
+    metrics = {name: performance.get(name) for name in SWEEP_METRICS}
+    metrics['total_return'] = result.get('total_return')
+    metrics['final_equity'] = result.get('final_equity')
+    return metrics
+
+
+def _evaluate_params(df: pl.DataFrame, strategy_class: Type[BaseStrategy], params: Dict[str, Any],
+                     cost_model: CostModel, initial_capital: float) -> Dict[str, Any]:
+    """
+    对单个参数组合运行向量化回测并提取汇总指标（策略不支持批量信号时使用）
+
+    Returns:
+        Dict[str, Any]: 汇总指标
+    """
+    strategy = strategy_class()
+    strategy.set_params(params)
+    engine = VectorizedBacktestEngine(df)
+    engine.set_strategy(strategy)
+    engine.set_cost_model(cost_model)
+    return _summary_metrics(engine.run_backtest(initial_capital))
+
+
+def _evaluate_block(df: pl.DataFrame, strategy_class: Type[BaseStrategy], param_sets: List[Dict[str, Any]],
+                    cost_model: CostModel, initial_capital: float) -> List[Dict[str, Any]]:
+    """
+    评估一组参数组合：优先以信号矩阵批量回测，策略不支持批量信号时逐组合回测
+
+    Returns:
+        List[Dict[str, Any]]: 与param_sets一一对应的汇总指标
+    """
+    if not param_sets:
+        return []
+    engine = VectorizedBacktestEngine(df)
+    engine.set_strategy(strategy_class())
+    engine.set_cost_model(cost_model)
+    results = engine.run_backtest_batch(param_sets, initial_capital)
+    if results is not None:
+        return [_summary_metrics(result) for result in results]
+    return [_evaluate_params(df, strategy_class, params, cost_model, initial_capital) for params in param_sets]
+
+
+def _evaluate_chunk(chunk: List[Dict[str, Any]], strategy_class: Type[BaseStrategy], cost_model: CostModel,
+                    initial_capital: float, objective: str, prefix_rows: int,
+                    prune_below: Optional[float], data: Optional[pl.DataFrame] = None) -> List[Dict[str, Any]]:
+    """
+    评估一块参数组合
+
+    prefix_rows > 0 时先在前prefix_rows行上批量回测，得分低于prune_below的组合标记为已剪枝，
+    其余组合再一起做全量回测
+
+    Returns:
+        List[Dict[str, Any]]: 每个组合一行结果
+    """
+    df = data if data is not None else _worker_state['data']
+    prefix_scores: List[Optional[float]] = [None] * len(chunk)
+    if prefix_rows > 0:
+        prefix_metrics = _evaluate_block(df.head(prefix_rows), strategy_class, chunk, cost_model, initial_capital)
+        prefix_scores = [objective_score(metrics, objective) for metrics in prefix_metrics]
+
+    kept = [k for k, score in enumerate(prefix_scores)
+            if prune_below is None or score is None or score >= prune_below]
+    full_metrics = dict(zip(kept, _evaluate_block(df, strategy_class, [chunk[k] for k in kept],
+                                                  cost_model, initial_capital)))
+
+    rows = []
+    for k, params in enumerate(chunk):
+        row = dict(params)
+        row['prefix_score'] = prefix_scores[k]
+        if k in full_metrics:
+            row.update(full_metrics[k])
+            row['pruned'] = False
+        else:
+            row.update({name: None for name in SWEEP_METRICS})
+            row['pruned'] = True
+        rows.append(row)
+    return rows
+
+
+class ParameterSweepEngine:
+    """
+    多进程参数扫描引擎类
+    """
+
+    def __init__(self, data, strategy_class: Type[BaseStrategy], cost_model: Optional[CostModel] = None):
+        """
+        初始化参数扫描引擎
+
+        Args:
+            data: 股票数据，可以是Polars DataFrame、LazyFrame或Pandas DataFrame
+            strategy_class: 策略类，需可无参构造并可被子进程导入
+            cost_model: 成本模型，默认CostModel()
+        """
+        self.pl_df = VectorizedBacktestEngine.convert_to_polars(data)
+        if 'date' in self.pl_df.columns:
+            self.pl_df = self.pl_df.sort('date')
+        self.strategy_class = strategy_class
+        self.cost_model = cost_model or CostModel()
+
+    def run(self, param_ranges: Dict[str, List[Any]], initial_capital: float = 1000000.0,
+            objective: str = 'total_return', max_workers: Optional[int] = None, chunk_size: int = 256,
+            early_stop_fraction: Optional[float] = None, early_stop_quantile: float = 0.5,
+            early_stop_warmup: int = 200, polars_threads: int = 1) -> pl.DataFrame:
+        """
+        运行参数扫描
+
+        Args:
+            param_ranges: 参数范围
+            initial_capital: 初始资金
+            objective: 优化目标：'total_return'、'sharpe_ratio'或'max_drawdown'
+            max_workers: 进程数，None表示使用CPU核心数；1表示在当前进程内顺序计算
+            chunk_size: 每个任务包含的参数组合数，每块组合一次批量评估
+            early_stop_fraction: 提前终止使用的前段数据比例，None表示不提前终止
+            early_stop_quantile: 前段得分低于该分位数的组合被剪枝
+            early_stop_warmup: 开始剪枝前至少需要完成的组合数
+            polars_threads: 每个子进程的Polars线程数
+
+        Returns:
+            pl.DataFrame: 结果表，每行一个有效参数组合，包含参数列、SWEEP_METRICS、prefix_score和pruned
+        """
+        grid_size = count_param_combinations(param_ranges)
+        probe = self.strategy_class()
+        total = sum(1 for params in iter_param_combinations(param_ranges) if probe.is_valid_params(params))
+        prefix_rows = int(self.pl_df.height * early_stop_fraction) if early_stop_fraction else 0
+        if max_workers is None:
+            max_workers = os.cpu_count() or 4
+        max_workers = max(1, min(max_workers, math.ceil(total / chunk_size) or 1))
+
+        combinations = (params for params in iter_param_combinations(param_ranges) if probe.is_valid_params(params))
+        chunks = iter(lambda: list(itertools.islice(combinations, chunk_size)), [])
+        columns: Dict[str, list] = {}
+        prefix_scores: List[float] = []
+
+        def prune_threshold() -> Optional[float]:
+            if prefix_rows <= 0 or len(prefix_scores) < early_stop_warmup:
+                return None
+            return float(np.quantile(prefix_scores, early_stop_quantile))
+
+        def collect(rows: List[Dict[str, Any]]) -> None:
+            for row in rows:
+                for key, value in row.items():
+                    columns.setdefault(key, []).append(value)
+                if row['prefix_score'] is not None and np.isfinite(row['prefix_score']):
+                    prefix_scores.append(row['prefix_score'])
+
+        start_time = time.perf_counter()
+        args = (self.strategy_class, self.cost_model, initial_capital, objective, prefix_rows)
+
+        if max_workers == 1:
+            for chunk in chunks:
+                collect(_evaluate_chunk(chunk, *args, prune_threshold(), data=self.pl_df))
+        else:
+            shared = SharedMarketData(self.pl_df)
+            try:
+                # Polars的线程池与fork不兼容，使用spawn启动子进程
+                mp_context = multiprocessing.get_context('spawn')
+                with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context,
+                                         initializer=_init_sweep_worker,
+                                         initargs=(shared.spec, polars_threads)) as executor:
+                    pending = set()
+                    for chunk in chunks:
+                        pending.add(executor.submit(_evaluate_chunk, chunk, *args, prune_threshold()))
+                        # 限制在途任务数，使剪枝阈值随已完成结果更新，也避免一次性提交全部组合
+                        if len(pending) >= 2 * max_workers:
+                            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                            for future in done:
+                                collect(future.result())
+                    for future in pending:
+                        collect(future.result())
+            finally:
+                shared.close()
+
+        results = pl.DataFrame(columns) if columns else pl.DataFrame()
+        pruned = int(results['pruned'].sum()) if results.height else 0
+        elapsed = time.perf_counter() - start_time
+        logger.info(f"参数扫描完成: {results.height}/{total}个组合（跳过无效组合{grid_size - total}个）, 剪枝{pruned}个, "
+                    f"耗时{elapsed:.2f}秒, 进程数{max_workers}")
+        return results
+
+    @staticmethod
+    def best_params(results: pl.DataFrame, param_names: List[str], objective: str = 'total_return') -> Tuple[Dict[str, Any], float]:
+        """
+        从结果表中选出最佳参数，未剪枝的组合参与比较
+
+        Args:
+            results: run返回的结果表
+            param_names: 参数名列表
+            objective: 优化目标
+
+        Returns:
+            Tuple[Dict[str, Any], float]: (最佳参数, 最佳目标值)
+        """
+        column = objective if objective in SWEEP_METRICS else 'total_return'
+        candidates = results.filter(~pl.col('pruned') & pl.col(column).is_not_null() & pl.col(column).is_not_nan())
+        if candidates.is_empty():
+            return {}, 0
+        best = candidates.sort(column, descending=objective not in MINIMIZE_OBJECTIVES).row(0, named=True)
+        return {name: best[name] for name in param_names}, best[column]
@@ -3,14 +3,55 @@
 
 """
 组合回测引擎，用于执行多股票组合策略回测
+
+所有股票先一次性对齐到共同的日期索引上，形成 日期 × 股票 的稠密面板（停牌日收盘价为NaN），
+回测沿时间轴按整数下标推进，每个交易日对全部股票做一次数组运算，不再按日期过滤每只股票的数据。
+
+支持两种资金管理方式：
+- 分仓模式（rebalance_frequency=0）：初始资金按分配权重划入各股票的独立分仓，
+  各分仓按本股票信号全仓买入/卖出
+- 调仓模式（rebalance_frequency>0）：所有股票共用一个现金池，每隔rebalance_frequency个交易日，
+  在信号处于持有状态且可交易的股票之间按分配权重做横截面再平衡
+
+分配权重可以等权、由set_allocation_function设置的函数给出，
+或由组合优化器（最小方差、均值-方差、风险平价）按滚动协方差求解。
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, Callable, List, Optional
+import numpy as np
 import polars as pl
 from loguru import logger
 
+from src.alpha.risk.covariance_engine import CovarianceEngine
+from src.alpha.risk.portfolio_optimizer import PortfolioOptimizer
 from src.backtest.engine.base_engine import BaseBacktestEngine
-from src.backtest.strategies.base_strategy import BaseStrategy
+from src.backtest.strategies.base_strategy import BaseStrategy, SIGNAL_BUY, SIGNAL_SELL
+from src.backtest.strategies.signal_kernels import forward_fill_signals
+
+
+# 分配函数：(当前日期下标, 候选股票布尔掩码, 截至当日的收盘价面板) -> 各股票目标权重
+AllocationFunction = Callable[[int, np.ndarray, np.ndarray], np.ndarray]
+
+# 由组合优化器按滚动协方差求解权重的分配策略
+OPTIMIZED_ALLOCATIONS = ('min_variance', 'mean_variance', 'risk_parity')
+
+
+def equal_weight_allocation(date_index: int, candidates: np.ndarray, close_history: np.ndarray) -> np.ndarray:
+    """
+    等权分配
+
+    Args:
+        date_index: 当前日期在面板中的下标
+        candidates: 候选股票布尔掩码
+        close_history: 截至当日的收盘价面板（日期 × 股票）
+
+    Returns:
+        np.ndarray: 各股票权重，候选股票等权、其余为0
+    """
+    count = candidates.sum()
+    if count == 0:
+        return np.zeros(len(candidates))
+    return candidates / count
 
 
 class PortfolioBacktestEngine(BaseBacktestEngine):
@@ -27,12 +68,39 @@ class PortfolioBacktestEngine(BaseBacktestEngine):
         """
         super().__init__()
         self.data_dict = {
-            stock_code: self.convert_to_polars(data)
+            stock_code: self.convert_to_polars(data).sort('date')
             for stock_code, data in data_dict.items()
         }
         self.strategy_dict = {}
         self.positions = {}
         self.strategies = {}
+        self.allocation_function: Optional[AllocationFunction] = None
+        # 本次回测使用的组合优化分配函数
+        self._optimizer_allocation: Optional[AllocationFunction] = None
+
+        self.symbols: List[str] = list(self.data_dict.keys())
+        self.dates = pl.Series('date', [])
+        self.close = np.empty((0, len(self.symbols)))
+        self.row_positions: Dict[str, np.ndarray] = {}
+        self._build_panel()
+
+    def _build_panel(self) -> None:
+        """
+        将所有股票的收盘价对齐到共同日期索引，构建 日期 × 股票 的收盘价矩阵
+
+        同时记录每只股票自身各行在共同日期索引中的下标，用于把单股信号放回面板
+        """
+        if not self.symbols:
+            return
+
+        self.dates = pl.concat([data['date'] for data in self.data_dict.values()]).unique().sort()
+        date_index = self.dates.to_frame().with_row_index('row')
+
+        self.close = np.full((len(self.dates), len(self.symbols)), np.nan)
+        for column, (stock_code, data) in enumerate(self.data_dict.items()):
+            rows = data.select('date').join(date_index, on='date', how='left', maintain_order='left')['row'].to_numpy()
+            self.row_positions[stock_code] = rows
+            self.close[rows, column] = data['close'].cast(pl.Float64).to_numpy()
 
     def set_strategy(self, stock_code: str, strategy: BaseStrategy):
         """
@@ -43,114 +111,112 @@ class PortfolioBacktestEngine(BaseBacktestEngine):
             strategy: 策略对象
         """
         self.strategies[stock_code] = strategy
-    
-    def run_backtest(self, initial_capital: float = 1000000.0, allocation_strategy: str = 'equal', **params) -> Dict[str, Any]:
+
+    def set_allocation_function(self, allocation_function: AllocationFunction) -> None:
+        """
+        设置资金分配函数，配合 allocation_strategy='custom' 使用
+
+        分配函数接收 (当前日期下标, 候选股票布尔掩码, 截至当日的收盘价面板)，
+        返回与股票数等长的权重数组。负权重按0处理，权重和超过1时按比例缩放，不足1的部分保留为现金。
+
+        Args:
+            allocation_function: 分配函数
+        """
+        self.allocation_function = allocation_function
+
+    def _signal_panel(self) -> np.ndarray:
+        """
+        生成 日期 × 股票 的信号矩阵，停牌日和未设置策略的股票信号为0
+
+        Returns:
+            np.ndarray: 信号矩阵
+        """
+        signals = np.zeros(self.close.shape, dtype=np.int8)
+        for column, stock_code in enumerate(self.symbols):
+            strategy = self.strategies.get(stock_code)
+            if strategy is None:
+                continue
+            stock_signals = self.generate_signal_array(strategy, self.data_dict[stock_code])
+            signals[self.row_positions[stock_code], column] = stock_signals
+        return signals
+
+    def _allocation_weights(self, allocation_strategy: str, date_index: int, candidates: np.ndarray) -> np.ndarray:
+        """
+        计算候选股票的目标权重
+
+        Args:
+            allocation_strategy: 资金分配策略
+            date_index: 当前日期下标
+            candidates: 候选股票布尔掩码
+
+        Returns:
+            np.ndarray: 归一化后的权重，非候选股票为0，权重和不超过1
+        """
+        if allocation_strategy == 'custom':
+            weights = np.asarray(self.allocation_function(date_index, candidates, self.close[:date_index + 1]),
+                                 dtype=np.float64)
+        elif allocation_strategy in OPTIMIZED_ALLOCATIONS:
+            weights = self._optimizer_allocation(date_index, candidates, self.close[:date_index + 1])
+        else:
+            weights = equal_weight_allocation(date_index, candidates, self.close[:date_index + 1])
+
+        weights = np.where(candidates, np.nan_to_num(np.clip(weights, 0.0, None)), 0.0)
+        total = weights.sum()
+        return weights / total if total > 1.0 else weights
+
+    def run_backtest(self, initial_capital: float = 1000000.0, allocation_strategy: str = 'equal',
+                     rebalance_frequency: int = 0, **params) -> Dict[str, Any]:
         """
         运行组合回测
-        
+
         Args:
             initial_capital: 初始资金
-            allocation_strategy: 资金分配策略，可选值：'equal'（等权分配）、'value'（价值权重）
-            **params: 回测参数
-            
+            allocation_strategy: 资金分配策略，可选值：'equal'（等权分配）、'custom'（使用set_allocation_function设置的分配函数）、
+                                 'min_variance'、'mean_variance'、'risk_parity'（组合优化器）
+            rebalance_frequency: 调仓间隔（交易日数），0表示分仓模式、不做横截面再平衡
+            **params: 回测参数；组合优化器使用 covariance_window（协方差窗口，默认120）、halflife、
+                      shrinkage（默认'ledoit_wolf'）、max_weight、risk_aversion
+
         Returns:
-            Dict[str, Any]: 回测结果
+            Dict[str, Any]: 回测结果，trades和equity_curve为Polars DataFrame
         """
         if not self.strategies:
             logger.error("未设置策略")
             return {}
-        
-        self.trades = []
-        self.equity_curve = []
-        self.positions = {stock: 0 for stock in self.data_dict.keys()}
-        
-        current_capital = initial_capital
-        stock_capitals = {}
-        
-        stock_count = len(self.data_dict)
-        for stock in self.data_dict.keys():
-            stock_capitals[stock] = initial_capital / stock_count
-        
-        all_dates = set()
-        for stock, data in self.data_dict.items():
-            dates = data['date'].to_list()
-            all_dates.update(dates)
-        
-        sorted_dates = sorted(all_dates)
-        
-        for date in sorted_dates:
-            daily_trades = []
-            
-            for stock_code, data in self.data_dict.items():
-                stock_data = data.filter(pl.col('date') == date)
-                if stock_data.is_empty():
-                    continue
-                
-                current_data = stock_data.to_dict(as_series=False)
-                current_data = {k: v[0] for k, v in current_data.items()}
-                
-                strategy = self.strategies.get(stock_code)
-                if strategy:
-                    signal = strategy.generate_signal(current_data, 0)
-                    
-                    if signal == 'buy' and self.positions[stock_code] == 0:
-                        current_price = current_data['close']
-                        shares = stock_capitals[stock_code] / current_price
-                        self.positions[stock_code] = shares
-                        stock_capitals[stock_code] = 0
-                        
-                        trade = {
-                            'date': date,
-                            'stock_code': stock_code,
-                            'signal': 'buy',
-                            'price': current_price,
-                            'shares': shares,
-                            'capital': stock_capitals[stock_code],
-                            'position': self.positions[stock_code]
-                        }
-                        daily_trades.append(trade)
-                    elif signal == 'sell' and self.positions[stock_code] > 0:
-                        sell_price = current_data['close']
-                        stock_capitals[stock_code] = self.positions[stock_code] * sell_price
-                        cost = self.cost_model.calculate_cost(self.positions[stock_code], current_data['close'], sell_price)
-                        stock_capitals[stock_code] -= cost
-                        
-                        trade = {
-                            'date': date,
-                            'stock_code': stock_code,
-                            'signal': 'sell',
-                            'price': sell_price,
-                            'shares': self.positions[stock_code],
-                            'capital': stock_capitals[stock_code],
-                            'position': 0,
-                            'cost': cost
-                        }
-                        daily_trades.append(trade)
-                        
-                        self.positions[stock_code] = 0
-            
-            self.trades.extend(daily_trades)
-            
-            current_equity = current_capital
-            for stock_code, position in self.positions.items():
-                if position > 0:
-                    stock_data = self.data_dict[stock_code].filter(pl.col('date') == date)
-                    if not stock_data.is_empty():
-                        close_price = stock_data['close'][0]
-                        current_equity += position * close_price
-            
-            current_equity += sum(stock_capitals.values())
-            
-            self.equity_curve.append({
-                'date': date,
-                'equity': current_equity
-            })
-        
-        final_equity = self.equity_curve[-1]['equity'] if self.equity_curve else initial_capital
+        if allocation_strategy not in ('equal', 'custom') + OPTIMIZED_ALLOCATIONS:
+            logger.error(f"不支持的资金分配策略: {allocation_strategy}")
+            return {}
+        if allocation_strategy == 'custom' and self.allocation_function is None:
+            logger.error("未设置资金分配函数")
+            return {}
+        if allocation_strategy in OPTIMIZED_ALLOCATIONS:
+            optimizer = PortfolioOptimizer(allocation_strategy, max_weight=params.get('max_weight'),
+                                           risk_aversion=params.get('risk_aversion', 1.0))
+            self._optimizer_allocation = optimizer.allocation_function(
+                CovarianceEngine.from_prices(self.close, self.symbols, self.dates),
+                window=params.get('covariance_window', 120), halflife=params.get('halflife'),
+                shrinkage=params.get('shrinkage', 'ledoit_wolf'))
+
+        signals = self._signal_panel()
+        # 停牌日按最近成交价估值，上市前价格记为0
+        rows = np.where(np.isnan(self.close), 0, np.arange(len(self.close))[:, None])
+        np.maximum.accumulate(rows, axis=0, out=rows)
+        valuation = np.nan_to_num(np.take_along_axis(self.close, rows, axis=0))
+
+        if rebalance_frequency > 0:
+            equity, cash, trades = self._run_rebalance(signals, valuation, initial_capital,
+                                                       allocation_strategy, rebalance_frequency)
+        else:
+            equity, cash, trades = self._run_sleeves(signals, valuation, initial_capital, allocation_strategy)
+
+        self.equity_curve = pl.DataFrame({'date': self.dates, 'equity': equity, 'cash': cash})
+        self.trades = self._build_trades(trades)
+
+        final_equity = float(equity[-1]) if len(equity) else initial_capital
         total_return = (final_equity - initial_capital) / initial_capital * 100
-        
-        performance = self.performance_analyzer.analyze(self.equity_curve, self.trades)
-        
+
+        performance = self.performance_analyzer.analyze(self.equity_curve, self.trades, symbol_column='stock_code')
+
         self.backtest_results = {
             'initial_capital': initial_capital,
             'final_equity': final_equity,
@@ -160,6 +226,159 @@ class PortfolioBacktestEngine(BaseBacktestEngine):
             'performance': performance,
             'strategy_names': {stock: strategy.name for stock, strategy in self.strategies.items()}
         }
-        
+
         logger.info(f"组合回测完成: 总收益率 = {total_return:.2f}%")
-        return self.backtest_results
\ No newline at end of file
+        return self.backtest_results
+
+    def _run_sleeves(self, signals: np.ndarray, valuation: np.ndarray, initial_capital: float,
+                     allocation_strategy: str) -> tuple:
+        """
+        分仓模式：各股票在独立分仓内按信号全仓买入/卖出
+
+        Args:
+            signals: 信号矩阵
+            valuation: 前向填充后的估值价格矩阵
+            initial_capital: 初始资金
+            allocation_strategy: 资金分配策略
+
+        Returns:
+            tuple: (权益序列, 现金序列, 交易记录列表)
+        """
+        num_dates, num_stocks = self.close.shape
+        weights = self._allocation_weights(allocation_strategy, 0, np.ones(num_stocks, dtype=bool))
+        sleeves = initial_capital * weights
+        unallocated = initial_capital - sleeves.sum()
+        position = np.zeros(num_stocks)
+        entry_price = np.zeros(num_stocks)
+        equity = np.empty(num_dates)
+        cash = np.empty(num_dates)
+        trades = []
+
+        for t in range(num_dates):
+            price = self.close[t]
+
+            buy_idx = np.flatnonzero((signals[t] == SIGNAL_BUY) & (position == 0))
+            if len(buy_idx):
+                shares = sleeves[buy_idx] / price[buy_idx]
+                position[buy_idx] = shares
+                entry_price[buy_idx] = price[buy_idx]
+                sleeves[buy_idx] = 0
+                trades.append((t, buy_idx, 'buy', price[buy_idx], shares, sleeves[buy_idx], shares,
+                               np.full(len(buy_idx), np.nan)))
+
+            sell_idx = np.flatnonzero((signals[t] == SIGNAL_SELL) & (position > 0))
+            if len(sell_idx):
+                shares = position[sell_idx]
+                costs = self.cost_model.calculate_costs(shares, entry_price[sell_idx], price[sell_idx])['total_cost']
+                sleeves[sell_idx] = shares * price[sell_idx] - costs
+                position[sell_idx] = 0
+                trades.append((t, sell_idx, 'sell', price[sell_idx], shares, sleeves[sell_idx],
+                               np.zeros(len(sell_idx)), costs))
+
+            cash[t] = unallocated + sleeves.sum()
+            equity[t] = cash[t] + position @ valuation[t]
+
+        self.positions = dict(zip(self.symbols, position.tolist()))
+        return equity, cash, trades
+
+    def _run_rebalance(self, signals: np.ndarray, valuation: np.ndarray, initial_capital: float,
+                       allocation_strategy: str, rebalance_frequency: int) -> tuple:
+        """
+        调仓模式：共用现金池，定期在持有状态的股票之间做横截面再平衡
+
+        停牌股票不参与调仓，其市值保持锁定；先卖出超配部分，再用可用现金买入低配部分，
+        现金不足时按比例缩减买入量。交易成本在卖出时按成本模型计算。
+
+        Args:
+            signals: 信号矩阵
+            valuation: 前向填充后的估值价格矩阵
+            initial_capital: 初始资金
+            allocation_strategy: 资金分配策略
+            rebalance_frequency: 调仓间隔（交易日数）
+
+        Returns:
+            tuple: (权益序列, 现金序列, 交易记录列表)
+        """
+        num_dates, num_stocks = self.close.shape
+        state = forward_fill_signals(signals)
+        tradable = ~np.isnan(self.close)
+        position = np.zeros(num_stocks)
+        entry_price = np.zeros(num_stocks)
+        current_cash = initial_capital
+        equity = np.empty(num_dates)
+        cash = np.empty(num_dates)
+        trades = []
+
+        for t in range(num_dates):
+            if t % rebalance_frequency == 0:
+                price = self.close[t]
+                can_trade = tradable[t]
+                market_value = position * valuation[t]
+                budget = current_cash + market_value[can_trade].sum()
+
+                candidates = (state[t] == SIGNAL_BUY) & can_trade
+                weights = self._allocation_weights(allocation_strategy, t, candidates)
+                target = np.zeros(num_stocks)
+                target[candidates] = weights[candidates] * budget / price[candidates]
+                delta = np.where(can_trade, target - position, 0.0)
+
+                sell_idx = np.flatnonzero(delta < 0)
+                if len(sell_idx):
+                    shares = -delta[sell_idx]
+                    costs = self.cost_model.calculate_costs(shares, entry_price[sell_idx],
+                                                            price[sell_idx])['total_cost']
+                    current_cash += (shares * price[sell_idx] - costs).sum()
+                    position[sell_idx] -= shares
+                    trades.append((t, sell_idx, 'sell', price[sell_idx], shares,
+                                   np.full(len(sell_idx), current_cash), position[sell_idx].copy(), costs))
+
+                buy_idx = np.flatnonzero(delta > 0)
+                if len(buy_idx) and current_cash > 0:
+                    shares = delta[buy_idx]
+                    spend = shares @ price[buy_idx]
+                    if spend > current_cash:
+                        shares = shares * (current_cash / spend)
+                        spend = current_cash
+                    held = position[buy_idx]
+                    entry_price[buy_idx] = (entry_price[buy_idx] * held + price[buy_idx] * shares) / (held + shares)
+                    position[buy_idx] = held + shares
+                    current_cash -= spend
+                    trades.append((t, buy_idx, 'buy', price[buy_idx], shares,
+                                   np.full(len(buy_idx), current_cash), position[buy_idx].copy(),
+                                   np.full(len(buy_idx), np.nan)))
+
+            cash[t] = current_cash
+            equity[t] = current_cash + position @ valuation[t]
+
+        self.positions = dict(zip(self.symbols, position.tolist()))
+        return equity, cash, trades
+
+    def _build_trades(self, trades: list) -> pl.DataFrame:
+        """
+        将按交易日批量记录的交易拼接为列式交易记录
+
+        Args:
+            trades: (日期下标, 股票下标数组, 方向, 价格, 股数, 交易后资金, 交易后持仓, 成本) 列表
+
+        Returns:
+            pl.DataFrame: 交易记录，列为date、stock_code、signal、price、shares、capital、position、cost
+        """
+        if not trades:
+            return pl.DataFrame(schema={
+                'date': self.dates.dtype, 'stock_code': pl.Utf8, 'signal': pl.Utf8, 'price': pl.Float64,
+                'shares': pl.Float64, 'capital': pl.Float64, 'position': pl.Float64, 'cost': pl.Float64,
+            })
+
+        date_rows = np.concatenate([np.full(len(t[1]), t[0]) for t in trades])
+        stock_idx = np.concatenate([t[1] for t in trades])
+        symbols = np.array(self.symbols, dtype=object)
+        return pl.DataFrame({
+            'date': self.dates.gather(date_rows),
+            'stock_code': symbols[stock_idx].tolist(),
+            'signal': [t[2] for t in trades for _ in range(len(t[1]))],
+            'price': np.concatenate([t[3] for t in trades]),
+            'shares': np.concatenate([t[4] for t in trades]),
+            'capital': np.concatenate([t[5] for t in trades]),
+            'position': np.concatenate([t[6] for t in trades]),
+            'cost': np.concatenate([t[7] for t in trades]),
+        }).with_columns(pl.col('cost').fill_nan(None))
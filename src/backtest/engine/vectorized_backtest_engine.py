@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+向量化回测引擎，策略一次性给出整段信号数组，引擎以数组运算计算成交、资金、持仓和权益
+
+成交规则与BacktestEngine逐K线回测完全一致：
+- 空仓时出现买入信号，以收盘价全仓买入
+- 持仓时出现卖出信号，以收盘价全部卖出，并扣除成本模型计算的交易成本
+因此"是否持仓"等价于"最近一次非持有信号是否为买入"，可由信号前向填充直接得到，
+只有资金复利需要按交易（而非按K线）顺序递推。
+
+批量参数评估时，策略一次给出 (K线数, 参数组合数) 的信号矩阵，
+持仓状态、成交和权益沿参数轴一起计算，资金复利按"第k笔交易"递推、每步覆盖全部组合。
+"""
+
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import polars as pl
+from loguru import logger
+
+from src.backtest.engine.base_engine import BaseBacktestEngine
+from src.backtest.strategies.base_strategy import SIGNAL_BUY
+from src.backtest.strategies.signal_kernels import forward_fill_signals
+
+
+class VectorizedBacktestEngine(BaseBacktestEngine):
+    """
+    向量化回测引擎类，交易记录和权益曲线以列式Polars DataFrame返回
+    """
+
+    def __init__(self, data):
+        """
+        初始化向量化回测引擎
+
+        Args:
+            data: 股票数据，可以是Polars DataFrame、LazyFrame或Pandas DataFrame
+        """
+        super().__init__()
+        self.pl_df = self.convert_to_polars(data)
+
+        if 'date' in self.pl_df.columns:
+            self.pl_df = self.pl_df.sort('date')
+
+    def run_backtest(self, initial_capital: float = 1000000.0, **params) -> Dict[str, Any]:
+        """
+        运行回测
+
+        Args:
+            initial_capital: 初始资金
+            **params: 回测参数
+
+        Returns:
+            Dict[str, Any]: 回测结果，trades和equity_curve为Polars DataFrame
+        """
+        if not self.strategy:
+            logger.error("未设置策略")
+            return {}
+
+        dates = self.pl_df['date']
+        close = self.pl_df['close'].cast(pl.Float64).to_numpy()
+        signals = self.generate_signal_array(self.strategy, self.pl_df)
+
+        # 持仓状态：最近一次非持有信号为买入
+        in_position = forward_fill_signals(signals) == SIGNAL_BUY
+        previous = np.concatenate([[False], in_position[:-1]])
+        entry_idx = np.flatnonzero(in_position & ~previous)
+        exit_idx = np.flatnonzero(~in_position & previous)
+
+        # 资金复利只在交易之间递推
+        entry_price = close[entry_idx]
+        exit_price = close[exit_idx]
+        shares = np.empty(len(entry_idx))
+        costs = np.empty(len(exit_idx))
+        capital_after_exit = np.empty(len(exit_idx))
+        capital = initial_capital
+        for k in range(len(entry_idx)):
+            shares[k] = capital / entry_price[k]
+            if k < len(exit_idx):
+                costs[k] = self.cost_model.calculate_cost(shares[k], entry_price[k], exit_price[k])
+                capital = shares[k] * exit_price[k] - costs[k]
+                capital_after_exit[k] = capital
+
+        # 权益：持仓K线为 当笔股数 × 收盘价，空仓K线为最近一次卖出后的资金
+        trade_id = np.cumsum(in_position & ~previous) - 1
+        exit_count = np.cumsum(~in_position & previous)
+        cash = np.concatenate([[initial_capital], capital_after_exit])[exit_count]
+        position_shares = np.where(in_position, shares[np.maximum(trade_id, 0)] if len(shares) else 0.0, 0.0)
+        equity = np.where(in_position, position_shares * close, cash)
+
+        self.equity_curve = pl.DataFrame({'date': dates, 'equity': equity})
+        self.trades = self._build_trades(dates, entry_idx, exit_idx, entry_price, exit_price,
+                                         shares, costs, capital_after_exit)
+
+        final_equity = float(equity[-1]) if len(equity) else initial_capital
+        total_return = (final_equity - initial_capital) / initial_capital * 100
+
+        performance = self.performance_analyzer.analyze_arrays(equity, entry_price, exit_price, shares)
+
+        self.backtest_results = {
+            'initial_capital': initial_capital,
+            'final_equity': final_equity,
+            'total_return': total_return,
+            'trades': self.trades,
+            'equity_curve': self.equity_curve,
+            'performance': performance,
+            'strategy_name': self.strategy.name
+        }
+
+        logger.info(f"向量化回测完成: 总收益率 = {total_return:.2f}%")
+        return self.backtest_results
+
+    def run_backtest_batch(self, param_sets: List[Dict[str, Any]], initial_capital: float = 1000000.0,
+                           batch_size: int = 512) -> Optional[List[Dict[str, Any]]]:
+        """
+        批量回测多组参数，每组参数的结果与单独运行run_backtest一致
+
+        Args:
+            param_sets: 参数组合列表
+            initial_capital: 初始资金
+            batch_size: 每批同时计算的参数组合数，限制 K线数 × 组合数 的矩阵内存
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: 每组参数的结果（不含交易记录和权益曲线），
+                                            策略不支持批量信号时返回None
+        """
+        if not self.strategy:
+            logger.error("未设置策略")
+            return None
+
+        close = self.pl_df['close'].cast(pl.Float64).to_numpy()
+        results = []
+        for start in range(0, len(param_sets), batch_size):
+            batch = param_sets[start:start + batch_size]
+            signals = self.strategy.generate_signals_batch(self.pl_df, batch)
+            if signals is None:
+                return None
+
+            performance = self._evaluate_signal_matrix(close, signals, initial_capital)
+            results.extend(self._batch_results(performance, batch, initial_capital))
+
+        logger.info(f"批量回测完成: {len(results)}组参数")
+        return results
+
+    def _batch_results(self, performance: Dict[str, np.ndarray], param_sets: List[Dict[str, Any]],
+                       initial_capital: float) -> List[Dict[str, Any]]:
+        """
+        将批量绩效数组拆分为与run_backtest结果格式一致的逐组合结果
+
+        Args:
+            performance: _evaluate_signal_matrix的返回值
+            param_sets: 与绩效数组列一一对应的参数组合
+            initial_capital: 初始资金
+
+        Returns:
+            List[Dict[str, Any]]: 每组参数的结果
+        """
+        results = []
+        for k, params in enumerate(param_sets):
+            metrics = {name: values[k].item() for name, values in performance.items()}
+            final_equity = metrics.pop('final_equity')
+            results.append({
+                'initial_capital': initial_capital,
+                'final_equity': final_equity,
+                'total_return': (final_equity - initial_capital) / initial_capital * 100,
+                'performance': metrics,
+                'strategy_name': self.strategy.name,
+                'params': params
+            })
+        return results
+
+    def _evaluate_signal_matrix(self, close: np.ndarray, signals: np.ndarray,
+                                initial_capital: float) -> Dict[str, np.ndarray]:
+        """
+        由信号矩阵计算所有组合的绩效
+
+        Args:
+            close: 收盘价序列
+            signals: 信号矩阵，形状为 (K线数, 组合数)
+            initial_capital: 初始资金
+
+        Returns:
+            Dict[str, np.ndarray]: 各绩效指标及final_equity，每个值为长度等于组合数的数组
+        """
+        simulation = self._simulate_signal_matrix(close, signals, initial_capital)
+        equity = simulation['equity']
+        performance = self.performance_analyzer.analyze_batch(
+            equity, simulation['entry_prices'], simulation['exit_prices'], simulation['shares'],
+            simulation['entry_counts'], simulation['exit_counts'])
+        performance['final_equity'] = equity[-1]
+        return performance
+
+    def _simulate_signal_matrix(self, close: np.ndarray, signals: np.ndarray,
+                                initial_capital: float) -> Dict[str, np.ndarray]:
+        """
+        由信号矩阵计算所有组合的成交与权益曲线
+
+        Args:
+            close: 收盘价序列
+            signals: 信号矩阵，形状为 (K线数, 组合数)
+            initial_capital: 初始资金
+
+        Returns:
+            Dict[str, np.ndarray]: equity为 (K线数, 组合数) 的权益矩阵；
+                                   entry_rows/exit_rows/entry_prices/exit_prices/shares/costs/capital_after_exit
+                                   为 (最大交易笔数, 组合数) 的逐笔矩阵；entry_counts/exit_counts为各组合买卖次数
+        """
+        num_bars, num_combos = signals.shape
+        in_position = forward_fill_signals(signals) == SIGNAL_BUY
+        previous = np.vstack([np.zeros((1, num_combos), dtype=bool), in_position[:-1]])
+        entries = in_position & ~previous
+        exits = ~in_position & previous
+
+        # 第k笔买入/卖出所在的K线，按组合分列、不足部分为-1
+        entry_rows, entry_counts = self._trade_rows(entries)
+        exit_rows, exit_counts = self._trade_rows(exits, len(entry_rows))
+        entry_prices = np.where(entry_rows >= 0, close[entry_rows], np.nan)
+        exit_prices = np.where(exit_rows >= 0, close[exit_rows], np.nan)
+
+        max_trades = len(entry_rows)
+        shares = np.zeros((max_trades, num_combos))
+        costs = np.full((max_trades, num_combos), np.nan)
+        capital_after_exit = np.zeros((max_trades, num_combos))
+        capital = np.full(num_combos, float(initial_capital))
+        for k in range(max_trades):
+            has_entry = k < entry_counts
+            shares[k] = np.where(has_entry, capital / np.where(has_entry, entry_prices[k], 1.0), 0.0)
+            sold = np.flatnonzero(k < exit_counts)
+            if len(sold):
+                costs[k, sold] = self.cost_model.calculate_costs(shares[k, sold], entry_prices[k, sold],
+                                                                 exit_prices[k, sold])['total_cost']
+                capital[sold] = shares[k, sold] * exit_prices[k, sold] - costs[k, sold]
+            capital_after_exit[k] = capital
+
+        # 权益：持仓K线为 当笔股数 × 收盘价，空仓K线为最近一次卖出后的资金
+        trade_id = np.maximum(np.cumsum(entries, axis=0) - 1, 0)
+        exit_id = np.cumsum(exits, axis=0)
+        cash = np.vstack([np.full((1, num_combos), float(initial_capital)), capital_after_exit])
+        held = np.take_along_axis(shares, trade_id, axis=0) if max_trades else np.zeros_like(close[:, None])
+        equity = np.where(in_position, held * close[:, None],
+                          np.take_along_axis(cash, exit_id, axis=0))
+
+        return {
+            'equity': equity,
+            'entry_rows': entry_rows,
+            'exit_rows': exit_rows,
+            'entry_prices': entry_prices,
+            'exit_prices': exit_prices,
+            'shares': shares,
+            'costs': costs,
+            'capital_after_exit': capital_after_exit,
+            'entry_counts': entry_counts,
+            'exit_counts': exit_counts,
+        }
+
+    @staticmethod
+    def _trade_rows(events: np.ndarray, min_count: int = 0) -> tuple:
+        """
+        将 (K线数, 组合数) 的事件矩阵转换为按笔排列的K线下标矩阵
+
+        Args:
+            events: 事件矩阵
+            min_count: 结果矩阵的最少行数
+
+        Returns:
+            tuple: (形状为 (最大笔数, 组合数) 的K线下标矩阵，不足部分为-1; 各组合事件数)
+        """
+        combos, rows = np.nonzero(events.T)
+        counts = events.sum(axis=0)
+        max_count = max(int(counts.max()) if len(counts) else 0, min_count)
+        ordinal = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+        matrix = np.full((max_count, events.shape[1]), -1, dtype=np.int64)
+        matrix[ordinal, combos] = rows
+        return matrix, counts
+
+    @staticmethod
+    def _build_trades(dates: pl.Series, entry_idx: np.ndarray, exit_idx: np.ndarray,
+                      entry_price: np.ndarray, exit_price: np.ndarray, shares: np.ndarray,
+                      costs: np.ndarray, capital_after_exit: np.ndarray) -> pl.DataFrame:
+        """
+        构建列式交易记录，列与BacktestEngine的交易字典一致，买入行的cost为空
+
+        Returns:
+            pl.DataFrame: 按时间排序的交易记录
+        """
+        exits = len(exit_idx)
+        buys = pl.DataFrame({
+            'row': entry_idx,
+            'signal': pl.Series(['buy'] * len(entry_idx), dtype=pl.String),
+            'price': entry_price,
+            'shares': shares,
+            'capital': np.zeros(len(entry_idx)),
+            'position': shares,
+            'cost': np.full(len(entry_idx), np.nan),
+        })
+        sells = pl.DataFrame({
+            'row': exit_idx,
+            'signal': pl.Series(['sell'] * exits, dtype=pl.String),
+            'price': exit_price,
+            'shares': shares[:exits],
+            'capital': capital_after_exit,
+            'position': np.zeros(exits),
+            'cost': costs,
+        })
+        trades = pl.concat([buys, sells]).sort('row')
+        return trades.select(
+            dates.gather(trades['row']).alias('date'),
+            pl.exclude('row'),
+        ).with_columns(pl.col('cost').fill_nan(None))
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+滚动前向（walk-forward）参数优化
+
+将行情数据切分为滚动或锚定的 训练/测试 窗口：在每个训练窗口上批量评估全部参数组合，
+用BaseBacktestEngine._select_best_params选出最佳参数，再在紧随其后的测试窗口上样本外回测，
+各测试窗口的权益首尾相接，得到拼接后的样本外权益曲线。
+
+- 每组参数的信号只在完整历史上计算一次并缓存，所有窗口按行切片复用，
+  窗口重叠部分的指标不重复计算，窗口开头也不会因指标预热而丢失信号
+- 各训练窗口的参数评估互不依赖，在线程池中并行执行（批量评估的主体是NumPy运算）
+- 测试窗口的资金依次结转，窗口最后一根K线强制平仓并扣除交易成本
+- 参数网格先经策略is_valid_params过滤；训练窗口未选出参数时沿用上一窗口的参数
+"""
+
+import concurrent.futures
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import polars as pl
+from loguru import logger
+
+from src.backtest.engine.parameter_sweep import iter_param_combinations
+from src.backtest.engine.vectorized_backtest_engine import VectorizedBacktestEngine
+from src.backtest.strategies.base_strategy import SIGNAL_SELL
+
+
+class WalkForwardOptimizer(VectorizedBacktestEngine):
+    """
+    滚动前向参数优化器类
+    """
+
+    def __init__(self, data):
+        """
+        初始化滚动前向优化器
+
+        Args:
+            data: 股票数据，可以是Polars DataFrame、LazyFrame或Pandas DataFrame
+        """
+        super().__init__(data)
+        self._signal_cache: Dict[Tuple, np.ndarray] = {}
+
+    def generate_windows(self, train_size: int, test_size: int, step: Optional[int] = None,
+                         anchored: bool = False) -> List[Tuple[int, int, int, int]]:
+        """
+        生成训练/测试窗口
+
+        Args:
+            train_size: 训练窗口K线数（锚定模式下为首个训练窗口的长度）
+            test_size: 测试窗口K线数
+            step: 窗口滚动步长，默认等于test_size，使测试窗口首尾相接
+            anchored: 是否锚定训练窗口起点（训练窗口逐步扩大）
+
+        Returns:
+            List[Tuple[int, int, int, int]]: (训练起点, 训练终点, 测试起点, 测试终点) 行下标，区间左闭右开
+        """
+        step = step or test_size
+        total = self.pl_df.height
+        windows = []
+        offset = 0
+        while offset + train_size < total:
+            train_start = 0 if anchored else offset
+            train_end = offset + train_size
+            windows.append((train_start, train_end, train_end, min(train_end + test_size, total)))
+            offset += step
+        return windows
+
+    def _signal_matrix(self, param_sets: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        获取参数组合在完整历史上的信号矩阵，已计算过的参数组合直接从缓存读取
+
+        Args:
+            param_sets: 参数组合列表
+
+        Returns:
+            np.ndarray: 形状为 (K线数, 参数组合数) 的信号矩阵
+        """
+        keys = [tuple(sorted(params.items())) for params in param_sets]
+        missing = [params for key, params in zip(keys, param_sets) if key not in self._signal_cache]
+        if missing:
+            signals = self.strategy.generate_signals_batch(self.pl_df, missing)
+            if signals is None:
+                # 策略不支持批量信号时逐组参数生成
+                columns = []
+                for params in missing:
+                    strategy = self.strategy.__class__()
+                    strategy.set_params({**self.strategy.params, **params})
+                    columns.append(self.generate_signal_array(strategy, self.pl_df))
+                signals = np.column_stack(columns)
+            for k, params in enumerate(missing):
+                self._signal_cache[tuple(sorted(params.items()))] = signals[:, k]
+        return np.column_stack([self._signal_cache[key] for key in keys])
+
+    def _optimize_window(self, close: np.ndarray, signals: np.ndarray, param_sets: List[Dict[str, Any]],
+                         window: Tuple[int, int, int, int], objective: str, initial_capital: float,
+                         batch_size: int) -> Tuple[Dict[str, Any], float]:
+        """
+        在单个训练窗口上评估全部参数组合并选出最佳参数
+
+        Returns:
+            Tuple[Dict[str, Any], float]: (最佳参数, 最佳目标值)
+        """
+        train_start, train_end = window[0], window[1]
+        results = []
+        for start in range(0, len(param_sets), batch_size):
+            columns = slice(start, start + batch_size)
+            performance = self._evaluate_signal_matrix(close[train_start:train_end],
+                                                        signals[train_start:train_end, columns], initial_capital)
+            results.extend(self._batch_results(performance, param_sets[columns], initial_capital))
+        return self._select_best_params(results, objective)
+
+    def run_walk_forward(self, param_ranges: Dict[str, List[Any]], train_size: int, test_size: int,
+                         step: Optional[int] = None, anchored: bool = False, objective: str = 'total_return',
+                         initial_capital: float = 1000000.0, max_workers: int = 4,
+                         batch_size: int = 512) -> Dict[str, Any]:
+        """
+        运行滚动前向优化
+
+        Args:
+            param_ranges: 参数范围
+            train_size: 训练窗口K线数
+            test_size: 测试窗口K线数
+            step: 窗口滚动步长，默认等于test_size
+            anchored: 是否锚定训练窗口起点
+            objective: 优化目标，与optimize_strategy一致
+            initial_capital: 初始资金
+            max_workers: 并行优化训练窗口的最大线程数
+            batch_size: 每批同时评估的参数组合数
+
+        Returns:
+            Dict[str, Any]: 回测结果，包含windows（各窗口最佳参数与样本内外表现）、
+                            拼接后的样本外equity_curve与trades（Polars DataFrame）及其performance
+        """
+        if not self.strategy:
+            logger.error("未设置策略")
+            return {}
+
+        windows = self.generate_windows(train_size, test_size, step, anchored)
+        if not windows:
+            logger.error(f"数据长度{self.pl_df.height}不足以切分训练窗口{train_size}")
+            return {}
+
+        param_sets = [params for params in iter_param_combinations(param_ranges)
+                      if self.strategy.is_valid_params(params)]
+        if not param_sets:
+            logger.error("参数范围内没有有效的参数组合")
+            return {}
+        close = self.pl_df['close'].cast(pl.Float64).to_numpy()
+        dates = self.pl_df['date']
+        signals = self._signal_matrix(param_sets)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            selections = list(executor.map(
+                lambda window: self._optimize_window(close, signals, param_sets, window, objective,
+                                                     initial_capital, batch_size),
+                windows))
+
+        # 测试窗口依次结转资金
+        capital = initial_capital
+        window_rows, equity_frames, trade_frames = [], [], []
+        param_index = {tuple(sorted(params.items())): k for k, params in enumerate(param_sets)}
+        previous_params: Dict[str, Any] = {}
+        for number, (window, (best_params, best_value)) in enumerate(zip(windows, selections)):
+            train_start, train_end, test_start, test_end = window
+            if not best_params:
+                # 训练窗口内没有可比较的目标值（如全部为NaN），沿用上一窗口的参数，首个窗口则跳过
+                if not previous_params:
+                    logger.warning(f"窗口{number}未选出最佳参数，跳过该窗口")
+                    continue
+                logger.warning(f"窗口{number}未选出最佳参数，沿用上一窗口的参数 {previous_params}")
+                best_params, best_value = previous_params, float('nan')
+            previous_params = best_params
+            test_signals = signals[test_start:test_end, [param_index[tuple(sorted(best_params.items()))]]].copy()
+            test_signals[-1] = SIGNAL_SELL
+            simulation = self._simulate_signal_matrix(close[test_start:test_end], test_signals, capital)
+
+            test_dates = dates[test_start:test_end]
+            entries = int(simulation['entry_counts'][0])
+            exits = int(simulation['exit_counts'][0])
+            trades = self._build_trades(
+                test_dates, simulation['entry_rows'][:entries, 0], simulation['exit_rows'][:exits, 0],
+                simulation['entry_prices'][:entries, 0], simulation['exit_prices'][:exits, 0],
+                simulation['shares'][:entries, 0], simulation['costs'][:exits, 0],
+                simulation['capital_after_exit'][:exits, 0])
+            trade_frames.append(trades.with_columns(pl.lit(number).alias('window')))
+
+            equity = simulation['equity'][:, 0]
+            equity_frames.append(pl.DataFrame({'date': test_dates, 'equity': equity,
+                                               'window': np.full(len(equity), number)}))
+            window_rows.append({
+                'window': number,
+                'train_start': dates[train_start],
+                'train_end': dates[train_end - 1],
+                'test_start': dates[test_start],
+                'test_end': dates[test_end - 1],
+                **best_params,
+                'train_value': best_value,
+                'test_return': (equity[-1] - capital) / capital * 100,
+            })
+            capital = float(equity[-1])
+
+        if not equity_frames:
+            logger.error("所有窗口均未选出最佳参数")
+            return {}
+
+        self.equity_curve = pl.concat(equity_frames)
+        self.trades = pl.concat(trade_frames)
+        total_return = (capital - initial_capital) / initial_capital * 100
+        performance = self.performance_analyzer.analyze(self.equity_curve, self.trades)
+
+        self.backtest_results = {
+            'initial_capital': initial_capital,
+            'final_equity': capital,
+            'total_return': total_return,
+            'trades': self.trades,
+            'equity_curve': self.equity_curve,
+            'performance': performance,
+            'windows': pl.DataFrame(window_rows),
+            'objective': objective,
+            'strategy_name': self.strategy.name
+        }
+
+        logger.info(f"滚动前向优化完成: {len(windows)}个窗口 × {len(param_sets)}组参数, "
+                    f"样本外总收益率 = {total_return:.2f}%")
+        return self.backtest_results
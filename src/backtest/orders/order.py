@@ -31,7 +31,7 @@ class Order(ABC):
         self.quantity = quantity
         self.side = side
         self.order_type = order_type
-        self.status = 'pending'  # pending, filled, cancelled
+        self.status = 'pending'  # pending, partially_filled, filled, cancelled
         self.created_at = datetime.now()
         self.filled_at = None
         self.filled_price = None
@@ -50,21 +50,46 @@ class Order(ABC):
         """
         pass
     
+    @property
+    def remaining_quantity(self) -> float:
+        """
+        未成交数量
+        
+        Returns:
+            float: 订单数量减去已成交数量
+        """
+        return self.quantity - self.filled_quantity
+    
+    @property
+    def is_active(self) -> bool:
+        """
+        订单是否仍可成交
+        
+        Returns:
+            bool: 状态为pending或partially_filled时为True
+        """
+        return self.status in ('pending', 'partially_filled')
+    
     def execute(self, execution_price: float, execution_quantity: Optional[float] = None):
         """
-        执行订单
+        执行订单，支持分批成交
+        
+        多次成交时filled_price为成交均价，全部成交后状态为filled，否则为partially_filled
         
         Args:
             execution_price: 执行价格
-            execution_quantity: 执行数量，默认全部执行
+            execution_quantity: 执行数量，默认全部剩余数量
         """
         if execution_quantity is None:
-            execution_quantity = self.quantity
+            execution_quantity = self.remaining_quantity
         
-        self.filled_price = execution_price
-        self.filled_quantity = execution_quantity
+        filled_quantity = self.filled_quantity + execution_quantity
+        if filled_quantity > 0:
+            previous_value = (self.filled_price or 0.0) * self.filled_quantity
+            self.filled_price = (previous_value + execution_price * execution_quantity) / filled_quantity
+        self.filled_quantity = filled_quantity
         self.filled_at = datetime.now()
-        self.status = 'filled'
+        self.status = 'filled' if self.remaining_quantity <= 0 else 'partially_filled'
     
     def cancel(self):
         """
@@ -190,6 +215,7 @@ class StopOrder(Order):
         """
         super().__init__(order_id, symbol, quantity, side, 'stop')
         self.stop_price = stop_price
+        self.triggered = False
     
     def should_execute(self, current_price: float) -> bool:
         """
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+订单簿，按价格索引管理未成交订单
+
+每只股票的挂单按类型和方向分别放入堆中，堆顶总是最容易被触发的订单：
+- 买入限价单：按限价从高到低（最高限价最先满足 最低价 <= 限价）
+- 卖出限价单：按限价从低到高（最低限价最先满足 最高价 >= 限价）
+- 买入止损单：按止损价从低到高（最低止损价最先满足 最高价 >= 止损价）
+- 卖出止损单：按止损价从高到低（最高止损价最先满足 最低价 <= 止损价）
+- 市价单及已触发的止损单：先进先出队列，在下一根K线开盘价成交
+
+每根K线只弹出触发价落在 [最低价, 最高价] 内的订单，未触发订单不会被逐一检查。
+同价订单按提交顺序（时间优先）排列；撤单只修改订单状态，在弹出时惰性丢弃。
+"""
+
+import heapq
+import itertools
+from collections import deque
+from typing import Dict, List, Tuple
+
+from src.backtest.orders.order import Order
+
+
+class SymbolOrderBook:
+    """
+    单只股票的订单簿类
+    """
+
+    def __init__(self, symbol: str):
+        """
+        初始化订单簿
+
+        Args:
+            symbol: 股票代码
+        """
+        self.symbol = symbol
+        self.buy_limits: List[Tuple[float, int, Order]] = []
+        self.sell_limits: List[Tuple[float, int, Order]] = []
+        self.buy_stops: List[Tuple[float, int, Order]] = []
+        self.sell_stops: List[Tuple[float, int, Order]] = []
+        self.market_orders: deque = deque()
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        """
+        挂单数量（含已撤销但尚未惰性丢弃的订单）
+        """
+        return (len(self.buy_limits) + len(self.sell_limits) + len(self.buy_stops)
+                + len(self.sell_stops) + len(self.market_orders))
+
+    def add(self, order: Order) -> None:
+        """
+        按订单类型与方向放入对应的堆或队列
+
+        已触发的止损单视为市价单，已触发的止损限价单视为限价单。
+
+        Args:
+            order: 订单对象
+        """
+        sequence = next(self._sequence)
+        buy = order.side == 'buy'
+        if order.order_type == 'market' or (order.order_type == 'stop' and order.triggered):
+            self.market_orders.append(order)
+        elif order.order_type == 'limit' or (order.order_type == 'stop_limit' and order.triggered):
+            if buy:
+                heapq.heappush(self.buy_limits, (-order.limit_price, sequence, order))
+            else:
+                heapq.heappush(self.sell_limits, (order.limit_price, sequence, order))
+        elif order.order_type in ('stop', 'stop_limit'):
+            if buy:
+                heapq.heappush(self.buy_stops, (order.stop_price, sequence, order))
+            else:
+                heapq.heappush(self.sell_stops, (-order.stop_price, sequence, order))
+        else:
+            raise ValueError(f"不支持的订单类型: {order.order_type}")
+
+    def match(self, open_price: float, high: float, low: float) -> List[Tuple[Order, float]]:
+        """
+        取出本根K线可以成交的订单及其成交价格
+
+        成交价格按K线内的可成交区间确定：跳空越过触发价时按开盘价成交，否则按触发价/限价成交。
+        止损单先于限价单处理。止损限价单只能在触发之后成交：本根K线内触发且限价可达时，
+        买单按 min(限价, max(开盘价, 止损价)) 成交，卖单按 max(限价, min(开盘价, 止损价)) 成交，
+        限价不可达时转入限价堆，从下一根K线起按普通限价单撮合。
+        返回的订单已从订单簿移除，调用方需把未完全成交的订单重新add回订单簿。
+
+        Args:
+            open_price: 开盘价
+            high: 最高价
+            low: 最低价
+
+        Returns:
+            List[Tuple[Order, float]]: (订单, 成交价格) 列表，市价单在前，其余按价格与时间优先
+        """
+        fills = []
+        while self.market_orders:
+            order = self.market_orders.popleft()
+            if order.is_active:
+                fills.append((order, open_price))
+
+        while self.buy_stops and self.buy_stops[0][0] <= high:
+            order = heapq.heappop(self.buy_stops)[2]
+            if not order.is_active:
+                continue
+            order.triggered = True
+            trigger_price = max(open_price, order.stop_price)
+            if order.order_type == 'stop':
+                fills.append((order, trigger_price))
+            elif low <= order.limit_price:
+                fills.append((order, min(order.limit_price, trigger_price)))
+            else:
+                self.add(order)
+
+        while self.sell_stops and -self.sell_stops[0][0] >= low:
+            order = heapq.heappop(self.sell_stops)[2]
+            if not order.is_active:
+                continue
+            order.triggered = True
+            trigger_price = min(open_price, order.stop_price)
+            if order.order_type == 'stop':
+                fills.append((order, trigger_price))
+            elif high >= order.limit_price:
+                fills.append((order, max(order.limit_price, trigger_price)))
+            else:
+                self.add(order)
+
+        while self.buy_limits and -self.buy_limits[0][0] >= low:
+            order = heapq.heappop(self.buy_limits)[2]
+            if order.is_active:
+                fills.append((order, min(open_price, order.limit_price)))
+
+        while self.sell_limits and self.sell_limits[0][0] <= high:
+            order = heapq.heappop(self.sell_limits)[2]
+            if order.is_active:
+                fills.append((order, max(open_price, order.limit_price)))
+
+        return fills
+
+
+class OrderBook:
+    """
+    多股票订单簿类，按股票代码维护SymbolOrderBook，并按订单ID索引全部订单
+    """
+
+    def __init__(self):
+        """
+        初始化订单簿
+        """
+        self.books: Dict[str, SymbolOrderBook] = {}
+        self.orders: Dict[str, Order] = {}
+
+    def submit(self, order: Order) -> None:
+        """
+        提交订单
+
+        Args:
+            order: 订单对象
+        """
+        if order.order_id in self.orders:
+            raise ValueError(f"订单ID重复: {order.order_id}")
+        self.orders[order.order_id] = order
+        self.add(order)
+
+    def add(self, order: Order) -> None:
+        """
+        把订单放入所属股票的订单簿（用于首次提交或部分成交后重新挂单）
+
+        Args:
+            order: 订单对象
+        """
+        book = self.books.get(order.symbol)
+        if book is None:
+            book = self.books[order.symbol] = SymbolOrderBook(order.symbol)
+        book.add(order)
+
+    def cancel(self, order_id: str) -> bool:
+        """
+        撤销订单，订单在下次被撮合弹出时从堆中丢弃
+
+        Args:
+            order_id: 订单ID
+
+        Returns:
+            bool: 订单存在且仍可成交时返回True
+        """
+        order = self.orders.get(order_id)
+        if order is None or not order.is_active:
+            return False
+        order.cancel()
+        return True
+
+    def match(self, symbol: str, open_price: float, high: float, low: float) -> List[Tuple[Order, float]]:
+        """
+        撮合指定股票在一根K线上的挂单
+
+        Args:
+            symbol: 股票代码
+            open_price: 开盘价
+            high: 最高价
+            low: 最低价
+
+        Returns:
+            List[Tuple[Order, float]]: (订单, 成交价格) 列表
+        """
+        book = self.books.get(symbol)
+        if book is None:
+            return []
+        return book.match(open_price, high, low)
+
+    def open_orders(self) -> List[Order]:
+        """
+        获取全部未完成订单
+
+        Returns:
+            List[Order]: 状态为pending或partially_filled的订单
+        """
+        return [order for order in self.orders.values() if order.is_active]
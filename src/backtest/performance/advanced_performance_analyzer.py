@@ -3,555 +3,427 @@
 
 """
 高级绩效分析器，用于计算回测的各种绩效指标和风险评估
+
+在PerformanceAnalyzer的批量分析之上补充风险调整收益、回撤区间、交易质量和基准相关指标，
+输入契约相同：权益曲线为 (K线数, 曲线数) 的矩阵，交易为trade_matrices给出的逐笔买入/卖出矩阵，
+参数扫描得到的成千上万条权益曲线可以一次分析完成。
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence, Union
 import numpy as np
-import pandas as pd
+import polars as pl
+
+from src.backtest.performance.performance_analyzer import (
+    PerformanceAnalyzer, TradesType, equity_array, trade_matrices
+)
+
+
+def _day_numbers(dates: Any) -> Optional[np.ndarray]:
+    """
+    把日期序列转换为天数，用于计算以自然日为单位的持续时间
+
+    Args:
+        dates: 日期序列
+
+    Returns:
+        Optional[np.ndarray]: 相对1970-01-01的天数，日期不是时间类型时为None
+    """
+    series = dates if isinstance(dates, pl.Series) else pl.Series(list(dates))
+    if series.dtype not in (pl.Date, pl.Datetime):
+        return None
+    return series.cast(pl.Date).to_physical().to_numpy().astype(np.int64)
+
 
+def _masked_std(values: np.ndarray, mask: np.ndarray) -> tuple:
+    """
+    按掩码沿axis 0计算总体标准差（两遍算法）
 
-class AdvancedPerformanceAnalyzer:
+    Returns:
+        tuple: (标准差, 参与计算的元素个数)
+    """
+    count = mask.sum(axis=0)
+    safe = np.maximum(count, 1)
+    mean = np.where(mask, values, 0.0).sum(axis=0) / safe
+    variance = np.where(mask, (values - mean) ** 2, 0.0).sum(axis=0) / safe
+    return np.sqrt(variance), count
+
+
+class AdvancedPerformanceAnalyzer(PerformanceAnalyzer):
     """
     高级绩效分析器类，提供更全面的回测绩效指标计算功能
     """
-    
+
     def __init__(self, risk_free_rate: float = 0.02):
         """
         初始化高级绩效分析器
-        
+
         Args:
             risk_free_rate: 无风险利率
         """
-        self.risk_free_rate = risk_free_rate
-    
-    def analyze(self, equity_curve: List[Dict[str, Any]], trades: List[Dict[str, Any]], benchmark_returns: Optional[List[float]] = None) -> Dict[str, Any]:
+        super().__init__(risk_free_rate)
+
+    def analyze(self, equity_curve: Union[pl.DataFrame, List[Dict[str, Any]]], trades: TradesType,
+                benchmark_returns: Optional[Sequence[float]] = None,
+                symbol_column: Optional[str] = None) -> Dict[str, Any]:
         """
         分析回测绩效
-        
+
         Args:
-            equity_curve: 权益曲线
-            trades: 交易记录
+            equity_curve: 权益曲线，Polars DataFrame或逐行字典列表，包含date和equity
+            trades: 交易记录，Polars DataFrame或逐行字典列表，按买入/卖出交替排列
             benchmark_returns: 基准收益率序列
-            
+            symbol_column: 股票代码列名，多股票成交记录按股票配对为往返交易，见round_trip_trades
+
         Returns:
             Dict[str, Any]: 详细的绩效分析结果
         """
-        if not equity_curve:
+        if not isinstance(equity_curve, pl.DataFrame):
+            equity_curve = pl.DataFrame(equity_curve, infer_schema_length=None)
+        if equity_curve.is_empty():
             return {}
-        
-        # 提取权益数据
-        equities = [item['equity'] for item in equity_curve]
-        dates = [item['date'] for item in equity_curve]
-        
-        # 计算基本指标
-        initial_equity = equities[0]
-        final_equity = equities[-1]
-        total_return = (final_equity - initial_equity) / initial_equity * 100
-        
-        # 计算年化收益率
-        days = len(equities)
-        annual_return = (pow((final_equity / initial_equity), 252 / days) - 1) * 100
-        
-        # 计算收益率序列
-        returns = []
-        for i in range(1, len(equities)):
-            daily_return = (equities[i] - equities[i-1]) / equities[i-1]
-            returns.append(daily_return)
-        
-        # 计算风险指标
-        if returns:
-            sharpe_ratio = self._calculate_sharpe_ratio(returns)
-            sortino_ratio = self._calculate_sortino_ratio(returns)
-            calmar_ratio = self._calculate_calmar_ratio(returns, equities)
-            max_drawdown = self._calculate_max_drawdown(equities)
-            drawdown_details = self._calculate_drawdown_details(equities, dates)
-            volatility = np.std(returns) * np.sqrt(252) * 100
-            downside_risk = self._calculate_downside_risk(returns)
-            winning_rate = self._calculate_winning_rate(trades)
-            average_profit_loss = self._calculate_average_profit_loss(trades)
-            profit_factor = self._calculate_profit_factor(trades)
-            expectancy = self._calculate_expectancy(trades)
-            sharpe_ratio_1y = self._calculate_sharpe_ratio(returns[-252:]) if len(returns) >= 252 else 0
-            sharpe_ratio_6m = self._calculate_sharpe_ratio(returns[-126:]) if len(returns) >= 126 else 0
-            
-            # 计算阿尔法和贝塔（如果提供了基准收益率）
-            alpha = 0
-            beta = 0
-            information_ratio = 0
-            if benchmark_returns and len(benchmark_returns) == len(returns):
-                alpha, beta = self._calculate_alpha_beta(returns, benchmark_returns)
-                information_ratio = self._calculate_information_ratio(returns, benchmark_returns)
+
+        dates = equity_curve['date']
+        batch = self.analyze_batch(equity_array(equity_curve)[:, None], **trade_matrices(trades, symbol_column=symbol_column),
+                                   dates=dates, benchmark_returns=benchmark_returns)
+        result = {name: values[0].item() for name, values in batch.items()}
+
+        if len(dates) > 1:
+            recovery_index = result.pop('drawdown_recovery_index')
+            result['drawdown_details'] = {
+                'max_drawdown': result['max_drawdown'],
+                'peak_date': dates[result.pop('drawdown_peak_index')],
+                'trough_date': dates[result.pop('drawdown_trough_index')],
+                'recovery_date': dates[recovery_index] if recovery_index >= 0 else None,
+                'drawdown_duration': result.pop('drawdown_duration'),
+                'recovery_duration': result.pop('recovery_duration'),
+                'max_drawdown_bars': result.pop('max_drawdown_bars'),
+                'drawdown_periods': result.pop('drawdown_periods')
+            }
         else:
-            sharpe_ratio = 0
-            sortino_ratio = 0
-            calmar_ratio = 0
-            max_drawdown = 0
-            drawdown_details = {}
-            volatility = 0
-            downside_risk = 0
-            winning_rate = 0
-            average_profit_loss = 0
-            profit_factor = 0
-            expectancy = 0
-            sharpe_ratio_1y = 0
-            sharpe_ratio_6m = 0
-            alpha = 0
-            beta = 0
-            information_ratio = 0
-        
-        # 计算交易相关指标
-        trade_count = len(trades) // 2  # 每笔完整交易包含买入和卖出
-        avg_holding_period = self._calculate_average_holding_period(trades, dates)
-        turnover_rate = self._calculate_turnover_rate(trades, initial_equity)
-        
-        # 构建详细的分析结果
-        analysis_result = {
-            # 基本指标
-            'total_return': total_return,
-            'annual_return': annual_return,
-            'trade_count': trade_count,
-            
-            # 风险调整收益指标
-            'sharpe_ratio': sharpe_ratio,
-            'sortino_ratio': sortino_ratio,
-            'calmar_ratio': calmar_ratio,
-            'information_ratio': information_ratio,
-            'sharpe_ratio_1y': sharpe_ratio_1y,
-            'sharpe_ratio_6m': sharpe_ratio_6m,
-            
-            # 风险指标
-            'volatility': volatility,
-            'downside_risk': downside_risk,
-            'max_drawdown': max_drawdown,
-            'drawdown_details': drawdown_details,
-            'alpha': alpha,
-            'beta': beta,
-            
-            # 交易指标
-            'winning_rate': winning_rate,
-            'average_profit_loss': average_profit_loss,
-            'profit_factor': profit_factor,
-            'expectancy': expectancy,
-            'avg_holding_period': avg_holding_period,
-            'turnover_rate': turnover_rate
-        }
-        
-        return analysis_result
-    
-    def _calculate_sharpe_ratio(self, returns: List[float]) -> float:
-        """
-        计算夏普比率
-        
-        Args:
-            returns: 收益率序列
-            
-        Returns:
-            float: 夏普比率
-        """
-        if not returns:
-            return 0
-        
-        avg_return = np.mean(returns)
-        std_return = np.std(returns)
-        
-        if std_return == 0:
-            return 0
-        
-        # 年化处理
-        sharpe_ratio = (avg_return - self.risk_free_rate / 252) / std_return * np.sqrt(252)
-        return sharpe_ratio
-    
-    def _calculate_sortino_ratio(self, returns: List[float]) -> float:
-        """
-        计算索提诺比率
-        
-        Args:
-            returns: 收益率序列
-            
-        Returns:
-            float: 索提诺比率
-        """
-        if not returns:
-            return 0
-        
-        avg_return = np.mean(returns)
-        
-        # 计算下行风险
-        downside_returns = [r for r in returns if r < 0]
-        if not downside_returns:
-            return 0
-        
-        downside_std = np.std(downside_returns)
-        
-        if downside_std == 0:
-            return 0
-        
-        # 年化处理
-        sortino_ratio = (avg_return - self.risk_free_rate / 252) / downside_std * np.sqrt(252)
-        return sortino_ratio
-    
-    def _calculate_calmar_ratio(self, returns: List[float], equities: List[float]) -> float:
-        """
-        计算卡马比率
-        
-        Args:
-            returns: 收益率序列
-            equities: 权益序列
-            
-        Returns:
-            float: 卡马比率
-        """
-        if not returns:
-            return 0
-        
-        # 计算年化收益率
-        annual_return = (pow(equities[-1] / equities[0], 252 / len(equities)) - 1) * 100
-        
-        # 计算最大回撤
-        max_drawdown = self._calculate_max_drawdown(equities)
-        
-        if max_drawdown == 0:
-            return 0
-        
-        # 卡马比率 = 年化收益率 / 最大回撤
-        calmar_ratio = annual_return / max_drawdown
-        return calmar_ratio
-    
-    def _calculate_max_drawdown(self, equities: List[float]) -> float:
-        """
-        计算最大回撤
-        
-        Args:
-            equities: 权益序列
-            
-        Returns:
-            float: 最大回撤（百分比）
-        """
-        if not equities:
-            return 0
-        
-        max_drawdown = 0
-        peak = equities[0]
-        
-        for equity in equities:
-            if equity > peak:
-                peak = equity
-            drawdown = (peak - equity) / peak * 100
-            if drawdown > max_drawdown:
-                max_drawdown = drawdown
-        
-        return max_drawdown
-    
-    def _calculate_drawdown_details(self, equities: List[float], dates: List[Any]) -> Dict[str, Any]:
+            for name in ('drawdown_peak_index', 'drawdown_trough_index', 'drawdown_recovery_index',
+                         'drawdown_duration', 'recovery_duration', 'max_drawdown_bars', 'drawdown_periods'):
+                result.pop(name)
+            result['drawdown_details'] = {}
+        return result
+
+    def analyze_batch(self, equities: np.ndarray, entry_prices: np.ndarray, exit_prices: np.ndarray,
+                      entry_shares: np.ndarray, entry_counts: np.ndarray, exit_counts: np.ndarray,
+                      exit_shares: Optional[np.ndarray] = None, entry_dates: Optional[np.ndarray] = None,
+                      exit_dates: Optional[np.ndarray] = None, dates: Any = None,
+                      benchmark_returns: Optional[Sequence[float]] = None) -> Dict[str, np.ndarray]:
         """
-        计算回撤详细信息
-        
+        批量分析多条权益曲线的绩效，基础指标由PerformanceAnalyzer.analyze_batch计算
+
         Args:
-            equities: 权益序列
-            dates: 日期序列
-            
+            equities: 权益矩阵，形状为 (K线数, 曲线数)
+            entry_prices: 各曲线第k笔买入价格，形状为 (最大交易笔数, 曲线数)，不足部分为NaN
+            exit_prices: 各曲线第k笔卖出价格，形状同entry_prices
+            entry_shares: 各曲线第k笔买入股数，形状同entry_prices
+            entry_counts: 各曲线买入次数
+            exit_counts: 各曲线卖出次数
+            exit_shares: 各曲线第k笔卖出股数，缺省时等于买入股数（全部卖出）
+            entry_dates: 第k笔买入日期（天数），用于平均持有周期，缺省时持有周期为0
+            exit_dates: 第k笔卖出日期（天数）
+            dates: 各曲线共用的日期序列，用于计算以自然日为单位的回撤持续时间，缺省时按K线数计
+            benchmark_returns: 基准收益率序列，长度需等于K线数-1
+
         Returns:
-            Dict[str, Any]: 回撤详细信息
+            Dict[str, np.ndarray]: 各绩效指标，每个值为长度等于曲线数的数组；
+                                   drawdown_peak_index/drawdown_trough_index/drawdown_recovery_index为K线下标（未恢复为-1）
         """
-        if not equities or not dates:
+        equities = np.asarray(equities, dtype=np.float64)
+        num_bars, num_curves = equities.shape
+        if num_bars == 0:
             return {}
-        
-        drawdowns = []
-        peak = equities[0]
-        peak_date = dates[0]
-        
-        for i, equity in enumerate(equities):
-            if equity > peak:
-                peak = equity
-                peak_date = dates[i]
+
+        result = super().analyze_batch(equities, entry_prices, exit_prices, entry_shares, entry_counts, exit_counts)
+        result['trade_count'] = result.pop('trades_count')
+        result.update(self._trade_activity(entry_prices, exit_prices, entry_shares, exit_shares, entry_dates,
+                                           exit_dates, exit_counts, equities[0]))
+        zeros = np.zeros(num_curves)
+
+        if num_bars > 1:
+            returns = np.diff(equities, axis=0) / equities[:-1]
+            drawdown = self._drawdown_statistics(equities, dates)
+            downside = _masked_std(returns, returns < 0)
+            annual_return = result['annual_return']
+
+            result.update({
+                'sortino_ratio': self._sortino_ratio(returns, downside),
+                'calmar_ratio': np.where(drawdown['max_drawdown'] == 0, 0.0,
+                                         annual_return / np.where(drawdown['max_drawdown'] == 0, 1.0,
+                                                                  drawdown['max_drawdown'])),
+                'sharpe_ratio_1y': self._sharpe_ratio(returns[-252:]) if len(returns) >= 252 else zeros,
+                'sharpe_ratio_6m': self._sharpe_ratio(returns[-126:]) if len(returns) >= 126 else zeros,
+                'downside_risk': self._downside_risk(downside),
+                **drawdown,
+                **self._trade_statistics(entry_prices, exit_prices, entry_shares, exit_counts)
+            })
+
+            if benchmark_returns is not None and len(benchmark_returns) == len(returns):
+                benchmark = np.asarray(benchmark_returns, dtype=np.float64)
+                result['alpha'], result['beta'] = self._alpha_beta(returns, benchmark)
+                result['information_ratio'] = self._information_ratio(returns, benchmark)
             else:
-                drawdown = (peak - equity) / peak * 100
-                drawdowns.append({
-                    'drawdown': drawdown,
-                    'peak_date': peak_date,
-                    'trough_date': dates[i]
-                })
-        
-        if not drawdowns:
-            return {
-                'max_drawdown': 0,
-                'peak_date': None,
-                'trough_date': None,
-                'recovery_date': None,
-                'drawdown_duration': 0,
-                'recovery_duration': 0
-            }
-        
-        # 找到最大回撤
-        max_drawdown_info = max(drawdowns, key=lambda x: x['drawdown'])
-        
-        # 计算回撤持续时间和恢复时间（简化处理）
-        drawdown_duration = 0
-        recovery_duration = 0
-        recovery_date = None
-        
-        # 尝试找到恢复日期
-        peak_value = equities[dates.index(max_drawdown_info['peak_date'])]
-        for i in range(dates.index(max_drawdown_info['trough_date']), len(equities)):
-            if equities[i] >= peak_value:
-                recovery_date = dates[i]
-                recovery_duration = (recovery_date - dates[i-1]).days
-                break
-        
-        if max_drawdown_info['peak_date'] and max_drawdown_info['trough_date']:
-            drawdown_duration = (max_drawdown_info['trough_date'] - max_drawdown_info['peak_date']).days
-        
-        return {
-            'max_drawdown': max_drawdown_info['drawdown'],
-            'peak_date': max_drawdown_info['peak_date'],
-            'trough_date': max_drawdown_info['trough_date'],
-            'recovery_date': recovery_date,
-            'drawdown_duration': drawdown_duration,
-            'recovery_duration': recovery_duration
-        }
-    
-    def _calculate_downside_risk(self, returns: List[float]) -> float:
+                result['alpha'] = result['beta'] = result['information_ratio'] = zeros
+        else:
+            for name in ('sortino_ratio', 'calmar_ratio', 'sharpe_ratio_1y', 'sharpe_ratio_6m',
+                         'downside_risk', 'drawdown_duration', 'recovery_duration',
+                         'max_drawdown_bars', 'drawdown_periods', 'profit_factor', 'expectancy',
+                         'alpha', 'beta', 'information_ratio'):
+                result[name] = zeros
+            result['drawdown_peak_index'] = result['drawdown_trough_index'] = np.zeros(num_curves, dtype=np.int64)
+            result['drawdown_recovery_index'] = np.full(num_curves, -1, dtype=np.int64)
+
+        return result
+
+    def rolling_metrics(self, equities: np.ndarray, window: int = 63) -> Dict[str, np.ndarray]:
         """
-        计算下行风险
-        
+        计算滚动夏普比率和滚动波动率
+
+        收益率按window行分块：每块结束位置的窗口只覆盖本块及之前window-1个收益率，
+        在这段数据上减去其均值后求局部累积和，窗口和与平方和由局部累积和相减得到。
+        累积和不跨块增长、方差由中心化后的平方和计算，避免E[x²]-mean²的相消误差；计算量与窗口长度无关。
+
         Args:
-            returns: 收益率序列
-            
+            equities: 权益序列或 (K线数, 曲线数) 的权益矩阵
+            window: 滚动窗口（收益率个数）
+
         Returns:
-            float: 下行风险（年化）
-        """
-        if not returns:
-            return 0
-        
-        # 计算下行偏差
-        downside_returns = [r for r in returns if r < 0]
-        if not downside_returns:
-            return 0
-        
-        downside_std = np.std(downside_returns)
-        
-        # 年化处理
-        annual_downside_risk = downside_std * np.sqrt(252) * 100
-        return annual_downside_risk
-    
-    def _calculate_winning_rate(self, trades: List[Dict[str, Any]]) -> float:
+            Dict[str, np.ndarray]: rolling_sharpe、rolling_volatility（年化，百分比），形状与equities相同，
+                                   第t行对应截至第t根K线的window个收益率，不足窗口为NaN
+        """
+        equities = np.asarray(equities, dtype=np.float64)
+        returns = np.diff(equities, axis=0) / equities[:-1]
+        shape = equities.shape
+        rolling_sharpe = np.full(shape, np.nan)
+        rolling_volatility = np.full(shape, np.nan)
+        if window <= 0 or len(returns) < window:
+            return {'rolling_sharpe': rolling_sharpe, 'rolling_volatility': rolling_volatility}
+
+        mean = np.empty((len(returns) - window + 1,) + returns.shape[1:])
+        variance = np.empty_like(mean)
+        zero = np.zeros((1,) + returns.shape[1:])
+        for block in range(0, len(mean), window):
+            # 本块窗口的终点为 block+window-1 .. block+2*window-2，覆盖的收益率为 segment
+            segment = returns[block:min(block + 2 * window - 1, len(returns))]
+            shift = segment.mean(axis=0)
+            centered = segment - shift
+            cumulative = np.concatenate([zero, np.cumsum(centered, axis=0)])
+            cumulative_sq = np.concatenate([zero, np.cumsum(centered * centered, axis=0)])
+            window_mean = (cumulative[window:] - cumulative[:-window]) / window
+            rows = slice(block, block + len(window_mean))
+            mean[rows] = window_mean + shift
+            variance[rows] = np.maximum((cumulative_sq[window:] - cumulative_sq[:-window]) / window
+                                        - window_mean ** 2, 0.0)
+
+        std = np.sqrt(variance)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe = np.where(std > 0, (mean - self.risk_free_rate / 252) / std * np.sqrt(252), 0.0)
+        rolling_sharpe[window:] = sharpe
+        rolling_volatility[window:] = std * np.sqrt(252) * 100
+        return {'rolling_sharpe': rolling_sharpe, 'rolling_volatility': rolling_volatility}
+
+    def _sharpe_ratio(self, returns: np.ndarray) -> np.ndarray:
         """
-        计算胜率
-        
+        计算夏普比率
+
         Args:
-            trades: 交易记录
-            
+            returns: 收益率矩阵，形状为 (收益率个数, 曲线数)
+
         Returns:
-            float: 胜率（百分比）
+            np.ndarray: 年化夏普比率
         """
-        if not trades:
-            return 0
-        
-        winning_trades = 0
-        for i in range(0, len(trades), 2):
-            if i + 1 < len(trades):
-                buy_trade = trades[i]
-                sell_trade = trades[i+1]
-                if sell_trade['price'] > buy_trade['price']:
-                    winning_trades += 1
-        
-        return (winning_trades / (len(trades) // 2)) * 100 if len(trades) >= 2 else 0
-    
-    def _calculate_average_profit_loss(self, trades: List[Dict[str, Any]]) -> float:
+        std_return = returns.std(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe = (returns.mean(axis=0) - self.risk_free_rate / 252) / std_return * np.sqrt(252)
+        return np.where(std_return == 0, 0.0, sharpe)
+
+    def _sortino_ratio(self, returns: np.ndarray, downside: tuple) -> np.ndarray:
         """
-        计算平均盈亏比
-        
+        计算索提诺比率，下行风险为负收益率的标准差
+
         Args:
-            trades: 交易记录
-            
+            returns: 收益率矩阵
+            downside: _masked_std(returns, returns < 0)的结果
+
         Returns:
-            float: 平均盈亏比
+            np.ndarray: 年化索提诺比率
         """
-        if not trades:
-            return 0
-        
-        profits = []
-        losses = []
-        
-        for i in range(0, len(trades), 2):
-            if i + 1 < len(trades):
-                buy_trade = trades[i]
-                sell_trade = trades[i+1]
-                profit = (sell_trade['price'] - buy_trade['price']) * buy_trade['shares']
-                if profit > 0:
-                    profits.append(profit)
-                else:
-                    losses.append(abs(profit))
-        
-        avg_profit = np.mean(profits) if profits else 0
-        avg_loss = np.mean(losses) if losses else 1
-        
-        return avg_profit / avg_loss if avg_loss > 0 else 0
-    
-    def _calculate_profit_factor(self, trades: List[Dict[str, Any]]) -> float:
+        downside_std, count = downside
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sortino = (returns.mean(axis=0) - self.risk_free_rate / 252) / downside_std * np.sqrt(252)
+        return np.where((count == 0) | (downside_std == 0), 0.0, sortino)
+
+    @staticmethod
+    def _downside_risk(downside: tuple) -> np.ndarray:
         """
-        计算盈利因子
-        
+        计算年化下行风险（百分比）
+
         Args:
-            trades: 交易记录
-            
+            downside: _masked_std(returns, returns < 0)的结果
+
         Returns:
-            float: 盈利因子
+            np.ndarray: 年化下行风险
         """
-        if not trades:
-            return 0
-        
-        total_profit = 0
-        total_loss = 0
-        
-        for i in range(0, len(trades), 2):
-            if i + 1 < len(trades):
-                buy_trade = trades[i]
-                sell_trade = trades[i+1]
-                profit = (sell_trade['price'] - buy_trade['price']) * buy_trade['shares']
-                if profit > 0:
-                    total_profit += profit
-                else:
-                    total_loss += abs(profit)
-        
-        return total_profit / total_loss if total_loss > 0 else 0
-    
-    def _calculate_expectancy(self, trades: List[Dict[str, Any]]) -> float:
+        downside_std, count = downside
+        return np.where(count == 0, 0.0, downside_std * np.sqrt(252) * 100)
+
+    def _drawdown_statistics(self, equities: np.ndarray, dates: Any) -> Dict[str, np.ndarray]:
         """
-        计算期望值
-        
+        计算最大回撤及其峰值、谷底、恢复位置，以及回撤区间的游程统计
+
+        峰值只在权益创新高（严格大于此前最高点）时更新；最大回撤取回撤最大的第一个谷底；
+        恢复位置为谷底之后权益首次回到峰值的K线。水下（低于此前最高点）区间按游程编码统计
+        最长持续K线数和回撤次数。
+
         Args:
-            trades: 交易记录
-            
+            equities: 权益矩阵
+            dates: 日期序列，可为None
+
         Returns:
-            float: 期望值
+            Dict[str, np.ndarray]: max_drawdown（百分比）、drawdown_peak_index、drawdown_trough_index、
+                                   drawdown_recovery_index、drawdown_duration、recovery_duration、
+                                   max_drawdown_bars、drawdown_periods
         """
-        if not trades:
-            return 0
-        
-        total_profit = 0
-        trade_count = len(trades) // 2
-        
-        for i in range(0, len(trades), 2):
-            if i + 1 < len(trades):
-                buy_trade = trades[i]
-                sell_trade = trades[i+1]
-                profit = (sell_trade['price'] - buy_trade['price']) * buy_trade['shares']
-                total_profit += profit
-        
-        return total_profit / trade_count if trade_count > 0 else 0
-    
-    def _calculate_alpha_beta(self, returns: List[float], benchmark_returns: List[float]) -> tuple:
+        num_bars, num_curves = equities.shape
+        columns = np.arange(num_curves)
+        index = np.arange(num_bars)[:, None]
+
+        peak = np.maximum.accumulate(equities, axis=0)
+        drawdown = (peak - equities) / peak * 100
+        trough_index = drawdown.argmax(axis=0)
+        max_drawdown = np.maximum(drawdown[trough_index, columns], 0.0)
+
+        # 峰值位置：最近一次严格创新高的K线
+        new_high = np.vstack([np.zeros((1, num_curves), dtype=bool), equities[1:] > peak[:-1]])
+        peak_position = np.maximum.accumulate(np.where(new_high, index, 0), axis=0)
+        peak_index = peak_position[trough_index, columns]
+
+        # 恢复位置：谷底及之后第一根不低于峰值的K线
+        recovered = (equities >= equities[peak_index, columns]) & (index >= trough_index)
+        recovery_index = np.where(recovered.any(axis=0), recovered.argmax(axis=0), -1)
+
+        # 水下区间游程：每个水下K线到其所在区间起点的长度
+        underwater = equities < peak
+        last_dry = np.maximum.accumulate(np.where(underwater, -1, index), axis=0)
+        run_length = np.where(underwater, index - last_dry, 0)
+        starts = underwater & ~np.vstack([np.zeros((1, num_curves), dtype=bool), underwater[:-1]])
+
+        days = _day_numbers(dates) if dates is not None else None
+        position = days if days is not None and len(days) == num_bars else np.arange(num_bars)
+        drawdown_duration = position[trough_index] - position[peak_index]
+        recovery_duration = np.where(recovery_index >= 0, position[np.maximum(recovery_index, 0)] - position[trough_index], 0)
+
+        return {
+            'max_drawdown': max_drawdown,
+            'drawdown_peak_index': peak_index,
+            'drawdown_trough_index': trough_index,
+            'drawdown_recovery_index': recovery_index,
+            'drawdown_duration': drawdown_duration,
+            'recovery_duration': recovery_duration,
+            'max_drawdown_bars': run_length.max(axis=0),
+            'drawdown_periods': starts.sum(axis=0)
+        }
+
+    def _alpha_beta(self, returns: np.ndarray, benchmark: np.ndarray) -> tuple:
         """
         计算阿尔法和贝塔
-        
+
         Args:
-            returns: 策略收益率序列
-            benchmark_returns: 基准收益率序列
-            
+            returns: 策略收益率矩阵
+            benchmark: 基准收益率序列
+
         Returns:
-            tuple: (alpha, beta)
+            tuple: (年化alpha数组, beta数组)
         """
-        if not returns or not benchmark_returns or len(returns) != len(benchmark_returns):
-            return 0, 0
-        
-        # 计算贝塔
-        covariance = np.cov(returns, benchmark_returns)[0, 1]
-        benchmark_variance = np.var(benchmark_returns)
-        
-        if benchmark_variance == 0:
-            return 0, 0
-        
+        benchmark_variance = benchmark.var()
+        if benchmark_variance == 0 or len(returns) < 2:
+            zeros = np.zeros(returns.shape[1])
+            return zeros, zeros
+
+        avg_return = returns.mean(axis=0)
+        avg_benchmark_return = benchmark.mean()
+        covariance = ((returns - avg_return) * (benchmark - avg_benchmark_return)[:, None]).sum(axis=0) / (len(returns) - 1)
         beta = covariance / benchmark_variance
-        
-        # 计算阿尔法
-        avg_return = np.mean(returns)
-        avg_benchmark_return = np.mean(benchmark_returns)
         alpha = (avg_return - self.risk_free_rate / 252) - beta * (avg_benchmark_return - self.risk_free_rate / 252)
-        
-        # 年化处理
-        annual_alpha = alpha * 252 * 100
-        
-        return annual_alpha, beta
-    
-    def _calculate_information_ratio(self, returns: List[float], benchmark_returns: List[float]) -> float:
+
+        return alpha * 252 * 100, beta
+
+    def _information_ratio(self, returns: np.ndarray, benchmark: np.ndarray) -> np.ndarray:
         """
         计算信息比率
-        
+
         Args:
-            returns: 策略收益率序列
-            benchmark_returns: 基准收益率序列
-            
+            returns: 策略收益率矩阵
+            benchmark: 基准收益率序列
+
         Returns:
-            float: 信息比率
+            np.ndarray: 年化信息比率
         """
-        if not returns or not benchmark_returns or len(returns) != len(benchmark_returns):
-            return 0
-        
-        # 计算超额收益
-        excess_returns = [r - b for r, b in zip(returns, benchmark_returns)]
-        
-        # 计算超额收益均值和标准差
-        avg_excess_return = np.mean(excess_returns)
-        std_excess_return = np.std(excess_returns)
-        
-        if std_excess_return == 0:
-            return 0
-        
-        # 年化处理
-        information_ratio = avg_excess_return / std_excess_return * np.sqrt(252)
-        return information_ratio
-    
-    def _calculate_average_holding_period(self, trades: List[Dict[str, Any]], dates: List[Any]) -> float:
+        excess_returns = returns - benchmark[:, None]
+        std_excess_return = excess_returns.std(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            information_ratio = excess_returns.mean(axis=0) / std_excess_return * np.sqrt(252)
+        return np.where(std_excess_return == 0, 0.0, information_ratio)
+
+    def _trade_activity(self, entry_prices: np.ndarray, exit_prices: np.ndarray, entry_shares: np.ndarray,
+                        exit_shares: Optional[np.ndarray], entry_dates: Optional[np.ndarray],
+                        exit_dates: Optional[np.ndarray], exit_counts: np.ndarray,
+                        initial_equity: np.ndarray) -> Dict[str, np.ndarray]:
         """
-        计算平均持有周期
-        
+        计算平均持有周期和换手率（只依赖逐笔交易矩阵，与权益曲线长度无关）
+
         Args:
-            trades: 交易记录
-            dates: 日期序列
-            
+            entry_prices: 逐笔买入价格矩阵
+            exit_prices: 逐笔卖出价格矩阵
+            entry_shares: 逐笔买入股数矩阵
+            exit_shares: 逐笔卖出股数矩阵，None表示等于买入股数
+            entry_dates: 逐笔买入日期矩阵（天数），None表示没有日期
+            exit_dates: 逐笔卖出日期矩阵（天数）
+            exit_counts: 各曲线卖出次数
+            initial_equity: 各曲线初始权益
+
         Returns:
-            float: 平均持有周期（天）
-        """
-        if not trades or len(trades) < 2:
-            return 0
-        
-        holding_periods = []
-        
-        for i in range(0, len(trades), 2):
-            if i + 1 < len(trades):
-                buy_date = trades[i]['date']
-                sell_date = trades[i+1]['date']
-                # 计算持有天数
-                try:
-                    holding_days = (sell_date - buy_date).days
-                    holding_periods.append(holding_days)
-                except:
-                    pass
-        
-        return np.mean(holding_periods) if holding_periods else 0
-    
-    def _calculate_turnover_rate(self, trades: List[Dict[str, Any]], initial_capital: float) -> float:
+            Dict[str, np.ndarray]: avg_holding_period（天）、turnover_rate（百分比）
+        """
+        if exit_shares is None:
+            exit_shares = entry_shares
+        trade_value = (np.nansum(entry_prices * entry_shares, axis=0)
+                       + np.nansum(exit_prices * exit_shares, axis=0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            turnover_rate = np.where(initial_equity == 0, 0.0, trade_value / (2 * initial_equity) * 100)
+
+        avg_holding_period = np.zeros(len(exit_counts))
+        if entry_dates is not None and exit_dates is not None:
+            completed = np.arange(len(exit_dates))[:, None] < exit_counts[None, :]
+            holding = np.where(completed, exit_dates - entry_dates, 0.0).sum(axis=0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                avg_holding_period = np.where(exit_counts > 0, holding / exit_counts, 0.0)
+
+        return {'avg_holding_period': avg_holding_period, 'turnover_rate': turnover_rate}
+
+    @staticmethod
+    def _trade_statistics(entry_prices: np.ndarray, exit_prices: np.ndarray, entry_shares: np.ndarray,
+                          exit_counts: np.ndarray) -> Dict[str, np.ndarray]:
         """
-        计算换手率
-        
+        由逐笔交易矩阵计算盈利因子和期望值（胜率与平均盈亏比由基类计算）
+
         Args:
-            trades: 交易记录
-            initial_capital: 初始资金
-            
+            entry_prices: 逐笔买入价格矩阵
+            exit_prices: 逐笔卖出价格矩阵
+            entry_shares: 逐笔买入股数矩阵
+            exit_counts: 各曲线卖出次数，即完整交易笔数
+
         Returns:
-            float: 换手率（百分比）
+            Dict[str, np.ndarray]: profit_factor、expectancy
         """
-        if not trades or initial_capital == 0:
-            return 0
-        
-        # 计算总交易量
-        total_trade_value = 0
-        for trade in trades:
-            if 'price' in trade and 'shares' in trade:
-                total_trade_value += trade['price'] * trade['shares']
-        
-        # 换手率 = 总交易量 / (2 * 初始资金) * 100
-        # 除以2是因为每笔交易包含买入和卖出
-        turnover_rate = (total_trade_value / (2 * initial_capital)) * 100
-        return turnover_rate
+        completed = np.arange(len(exit_prices))[:, None] < exit_counts[None, :]
+        profit = np.where(completed, (exit_prices - entry_prices) * entry_shares, 0.0)
+        gain_sum = np.where(profit > 0, profit, 0.0).sum(axis=0)
+        loss_sum = np.where(profit <= 0, -profit, 0.0).sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return {
+                'profit_factor': np.where(loss_sum > 0, gain_sum / loss_sum, 0.0),
+                'expectancy': np.where(exit_counts > 0, profit.sum(axis=0) / exit_counts, 0.0)
+            }
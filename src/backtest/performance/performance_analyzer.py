@@ -3,63 +3,267 @@
 
 """
 绩效分析器，用于计算回测的各种绩效指标
+
+所有指标都由analyze_batch在数组上计算：权益曲线为 (K线数, 曲线数) 的矩阵，交易为按笔排列的买入/卖出矩阵
+（第k笔买入与第k笔卖出组成第k笔完整交易）。单条曲线的analyze只是曲线数为1的analyze_batch，
+引擎的列式结果和逐行字典结果都先经trade_matrices转换为逐笔矩阵。
+多股票引擎的成交按日期混排、且可能部分成交，需指定symbol_column，先由round_trip_trades按股票配对为往返交易。
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Union
 import numpy as np
+import polars as pl
+
+
+TradesType = Union[pl.DataFrame, List[Dict[str, Any]], None]
+
+
+def _trades_frame(trades: TradesType) -> pl.DataFrame:
+    """把交易记录统一为Polars DataFrame"""
+    if isinstance(trades, pl.DataFrame):
+        return trades
+    if trades is None or len(trades) == 0:
+        return pl.DataFrame()
+    return pl.DataFrame(trades, infer_schema_length=None)
+
+
+def equity_array(equity_curve: Union[pl.DataFrame, List[Dict[str, Any]]]) -> np.ndarray:
+    """
+    取出权益曲线的权益序列
+
+    Args:
+        equity_curve: 权益曲线，Polars DataFrame或逐行字典列表，包含equity
+
+    Returns:
+        np.ndarray: float64权益序列
+    """
+    if isinstance(equity_curve, pl.DataFrame):
+        if equity_curve.is_empty():
+            return np.empty(0)
+        return equity_curve['equity'].cast(pl.Float64).to_numpy()
+    return np.fromiter((item['equity'] for item in equity_curve), dtype=np.float64, count=len(equity_curve))
+
+
+def round_trip_trades(trades: TradesType, symbol_column: str) -> pl.DataFrame:
+    """
+    按股票把逐笔成交配对为往返交易
+
+    每笔卖出按先进先出依次冲销同一股票（多条曲线时还需同一result_id）此前买入的股数，
+    冲销的每一段成为一笔往返交易：买入价为被冲销买单的成交价，卖出价为该卖单的成交价，股数为冲销股数。
+    部分成交、分批买卖都按股数配对；未平仓的买入不产生往返交易。
+
+    Args:
+        trades: 列式交易表或逐行字典列表，包含signal（'buy'/'sell'）、price、shares和symbol_column（及date、result_id）
+        symbol_column: 股票代码列名
+
+    Returns:
+        pl.DataFrame: 买入行与卖出行交替排列的往返交易，按卖出成交的先后排序，可直接交给trade_matrices
+    """
+    trades = _trades_frame(trades)
+    if trades.is_empty():
+        return trades
+    keys = [symbol_column] + (['result_id'] if 'result_id' in trades.columns else [])
+    signal = trades['signal']
+    is_buy = (signal == 'buy').to_numpy()
+    is_sell = (signal == 'sell').to_numpy()
+    shares = trades['shares'].cast(pl.Float64).to_numpy()
+    groups = trades.with_row_index('_row').group_by(keys, maintain_order=True).agg('_row')['_row']
+
+    entry_rows, exit_rows, sizes = [], [], []
+    for rows in groups.to_list():
+        rows = np.asarray(rows, dtype=np.int64)
+        buys, sells = rows[is_buy[rows]], rows[is_sell[rows]]
+        if not len(buys) or not len(sells):
+            continue
+        bought, sold = np.cumsum(shares[buys]), np.cumsum(shares[sells])
+        # 买入与卖出的累计股数共同把已平仓部分切分为若干段，每段落在唯一的买单和卖单内；
+        # 非整数股数的累计和有舍入误差，相差不超过tolerance的分界视为同一分界
+        tolerance = 1e-9 * max(bought[-1], sold[-1])
+        bounds = np.union1d(bought, sold)
+        bounds = bounds[bounds <= min(bought[-1], sold[-1]) + tolerance]
+        bounds = bounds[np.diff(bounds, prepend=0.0) > tolerance]
+        starts = np.concatenate(([0.0], bounds[:-1]))
+        middle = (starts + bounds) / 2
+        entry_rows.append(buys[np.minimum(np.searchsorted(bought, middle), len(buys) - 1)])
+        exit_rows.append(sells[np.minimum(np.searchsorted(sold, middle), len(sells) - 1)])
+        sizes.append(bounds - starts)
+
+    if not sizes:
+        return trades.clear()
+    entries, exits, sizes = np.concatenate(entry_rows), np.concatenate(exit_rows), np.concatenate(sizes)
+    order = np.argsort(exits, kind='stable')
+    rows = np.empty(2 * len(order), dtype=np.int64)
+    rows[0::2], rows[1::2] = entries[order], exits[order]
+    return trades[rows].with_columns(pl.Series('shares', np.repeat(sizes[order], 2)))
+
+
+def trade_matrices(trades: TradesType, num_curves: int = 1, symbol_column: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """
+    把按买入/卖出交替排列的交易记录转换为analyze_batch使用的逐笔矩阵
+
+    同一曲线内的第2k条交易为第k笔买入、第2k+1条为第k笔卖出（与交易记录的排列顺序一致，不检查signal列）。
+    指定symbol_column时先经round_trip_trades按股票配对，适用于多股票混排或部分成交的交易记录。
+
+    Args:
+        trades: 列式交易表或逐行字典列表，包含price、shares（及date）；
+                多条曲线时result_id列为所属曲线的列下标
+        num_curves: 曲线数
+        symbol_column: 股票代码列名，None表示交易记录已按买入/卖出交替排列
+
+    Returns:
+        Dict[str, np.ndarray]: entry_prices、exit_prices、entry_shares、exit_shares为 (最大笔数, 曲线数) 的矩阵，
+                               不足部分为NaN；entry_counts、exit_counts为各曲线买入、卖出次数；
+                               交易表含日期列时另有entry_dates、exit_dates（相对1970-01-01的天数）
+    """
+    trades = _trades_frame(trades)
+    if symbol_column is not None:
+        trades = round_trip_trades(trades, symbol_column)
+    if trades.is_empty():
+        ids = np.empty(0, dtype=np.int64)
+    elif 'result_id' in trades.columns:
+        ids = trades['result_id'].cast(pl.Int64).to_numpy()
+    else:
+        ids = np.zeros(trades.height, dtype=np.int64)
+
+    # 每条交易在所属曲线内的序号
+    order = np.argsort(ids, kind='stable')
+    counts = np.bincount(ids, minlength=num_curves)
+    ordinal = np.empty(len(ids), dtype=np.int64)
+    ordinal[order] = np.arange(len(ids)) - np.repeat(np.cumsum(counts) - counts, counts)
+    is_entry = ordinal % 2 == 0
+    entry_counts = np.bincount(ids[is_entry], minlength=num_curves)
+    exit_counts = counts - entry_counts
+    max_trades = int(entry_counts.max()) if num_curves else 0
+
+    def scatter(values: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        matrix = np.full((max_trades, num_curves), np.nan)
+        matrix[ordinal[rows] // 2, ids[rows]] = values[rows]
+        return matrix
+
+    result = {'entry_counts': entry_counts, 'exit_counts': exit_counts}
+    columns = {'price': ('entry_prices', 'exit_prices'), 'shares': ('entry_shares', 'exit_shares')}
+    for column, (entry_name, exit_name) in columns.items():
+        values = (trades[column].cast(pl.Float64).to_numpy() if column in trades.columns
+                  else np.full(len(ids), np.nan))
+        result[entry_name] = scatter(values, is_entry)
+        result[exit_name] = scatter(values, ~is_entry)
+    if 'date' in trades.columns and trades.schema['date'] in (pl.Date, pl.Datetime):
+        days = trades['date'].cast(pl.Date).to_physical().cast(pl.Float64).to_numpy()
+        result['entry_dates'] = scatter(days, is_entry)
+        result['exit_dates'] = scatter(days, ~is_entry)
+    return result
 
 
 class PerformanceAnalyzer:
     """
     绩效分析器类，提供回测绩效指标计算功能
     """
-    
-    def analyze(self, equity_curve: List[Dict[str, Any]], trades: List[Dict[str, Any]]) -> Dict[str, Any]:
+
+    def __init__(self, risk_free_rate: float = 0.0):
+        """
+        初始化绩效分析器
+
+        Args:
+            risk_free_rate: 年化无风险利率，用于夏普比率
+        """
+        self.risk_free_rate = risk_free_rate
+
+    def analyze(self, equity_curve: Union[pl.DataFrame, List[Dict[str, Any]]], trades: TradesType,
+                symbol_column: Optional[str] = None) -> Dict[str, Any]:
         """
         分析回测绩效
         
         Args:
-            equity_curve: 权益曲线
-            trades: 交易记录
+            equity_curve: 权益曲线，Polars DataFrame或逐行字典列表
+            trades: 交易记录，Polars DataFrame或逐行字典列表，按买入/卖出交替排列
+            symbol_column: 股票代码列名，多股票成交记录按股票配对为往返交易，见round_trip_trades
             
         Returns:
             Dict[str, Any]: 绩效分析结果
         """
-        if not equity_curve:
+        equities = equity_array(equity_curve)
+        if not len(equities):
+            return {}
+        matrices = trade_matrices(trades, symbol_column=symbol_column)
+        batch = self.analyze_batch(equities[:, None], matrices['entry_prices'], matrices['exit_prices'],
+                                   matrices['entry_shares'], matrices['entry_counts'], matrices['exit_counts'])
+        return {name: values[0].item() for name, values in batch.items()}
+
+    def analyze_arrays(self, equity: np.ndarray, entry_prices: np.ndarray, exit_prices: np.ndarray,
+                       entry_shares: np.ndarray) -> Dict[str, Any]:
+        """
+        分析单条权益曲线的绩效，交易直接以逐笔数组给出
+
+        Args:
+            equity: 权益序列
+            entry_prices: 各笔买入价格
+            exit_prices: 各笔卖出价格，长度不超过买入笔数（最后一笔可能未卖出）
+            entry_shares: 各笔买入股数
+
+        Returns:
+            Dict[str, Any]: 与analyze相同的绩效分析结果
+        """
+        equity = np.asarray(equity, dtype=np.float64)
+        if not len(equity):
             return {}
+        num_entries, num_exits = len(entry_prices), len(exit_prices)
+        padded_exits = np.full(num_entries, np.nan)
+        padded_exits[:num_exits] = exit_prices
+        batch = self.analyze_batch(equity[:, None], np.asarray(entry_prices, dtype=np.float64)[:, None],
+                                   padded_exits[:, None], np.asarray(entry_shares, dtype=np.float64)[:, None],
+                                   np.array([num_entries]), np.array([num_exits]))
+        return {name: values[0].item() for name, values in batch.items()}
+    
+    def analyze_batch(self, equities: np.ndarray, entry_prices: np.ndarray, exit_prices: np.ndarray,
+                      entry_shares: np.ndarray, entry_counts: np.ndarray, exit_counts: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        批量分析多条权益曲线的绩效，指标定义与analyze一致
         
-        # 提取权益数据
-        equities = [item['equity'] for item in equity_curve]
-        dates = [item['date'] for item in equity_curve]
+        Args:
+            equities: 权益矩阵，形状为 (K线数, 组合数)
+            entry_prices: 各组合第k笔买入价格，形状为 (最大交易笔数, 组合数)，不足部分为NaN
+            exit_prices: 各组合第k笔卖出价格，形状同entry_prices
+            entry_shares: 各组合第k笔买入股数，形状同entry_prices
+            entry_counts: 各组合买入次数
+            exit_counts: 各组合卖出次数
+            
+        Returns:
+            Dict[str, np.ndarray]: 各绩效指标，每个值为长度等于组合数的数组
+        """
+        num_bars, num_combos = equities.shape
+        if num_bars == 0:
+            return {}
         
-        # 计算基本指标
         initial_equity = equities[0]
         final_equity = equities[-1]
         total_return = (final_equity - initial_equity) / initial_equity * 100
+        annual_return = (np.power(final_equity / initial_equity, 252 / num_bars) - 1) * 100
         
-        # 计算年化收益率
-        days = len(equities)
-        annual_return = (pow((final_equity / initial_equity), 252 / days) - 1) * 100
-        
-        # 计算收益率序列
-        returns = []
-        for i in range(1, len(equities)):
-            daily_return = (equities[i] - equities[i-1]) / equities[i-1]
-            returns.append(daily_return)
-        
-        # 计算风险指标
-        if returns:
-            sharpe_ratio = self._calculate_sharpe_ratio(returns)
-            max_drawdown = self._calculate_max_drawdown(equities)
-            volatility = np.std(returns) * np.sqrt(252) * 100
-            winning_rate = self._calculate_winning_rate(trades)
-            average_profit_loss = self._calculate_average_profit_loss(trades)
+        if num_bars > 1:
+            returns = np.diff(equities, axis=0) / equities[:-1]
+            avg_return = returns.mean(axis=0)
+            std_return = returns.std(axis=0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                sharpe_ratio = np.where(std_return == 0, 0.0,
+                                        (avg_return - self.risk_free_rate / 252) / std_return * np.sqrt(252))
+            peak = np.maximum.accumulate(equities, axis=0)
+            max_drawdown = np.maximum(((peak - equities) / peak * 100).max(axis=0), 0.0)
+            volatility = std_return * np.sqrt(252) * 100
+            
+            # 第k笔完整交易由第k笔买入和第k笔卖出组成
+            completed = np.arange(len(exit_prices))[:, None] < exit_counts[None, :]
+            profit = np.where(completed, (exit_prices - entry_prices) * entry_shares, np.nan)
+            wins = (completed & (exit_prices > entry_prices)).sum(axis=0)
+            pairs = (entry_counts + exit_counts) // 2
+            with np.errstate(divide='ignore', invalid='ignore'):
+                winning_rate = np.where(pairs >= 1, wins / pairs * 100, 0.0)
+                gain = profit > 0
+                loss = completed & ~gain
+                avg_profit = np.where(gain.any(axis=0), np.where(gain, profit, 0.0).sum(axis=0) / gain.sum(axis=0), 0.0)
+                avg_loss = np.where(loss.any(axis=0), np.where(loss, np.abs(profit), 0.0).sum(axis=0) / loss.sum(axis=0), 1.0)
+                average_profit_loss = np.where(avg_loss > 0, avg_profit / avg_loss, 0.0)
         else:
-            sharpe_ratio = 0
-            max_drawdown = 0
-            volatility = 0
-            winning_rate = 0
-            average_profit_loss = 0
+            sharpe_ratio = max_drawdown = volatility = winning_rate = average_profit_loss = np.zeros(num_combos)
         
         return {
             'total_return': total_return,
@@ -69,108 +273,5 @@ class PerformanceAnalyzer:
             'volatility': volatility,
             'winning_rate': winning_rate,
             'average_profit_loss': average_profit_loss,
-            'trades_count': len(trades) // 2  # 每笔完整交易包含买入和卖出
+            'trades_count': (entry_counts + exit_counts) // 2
         }
-    
-    def _calculate_sharpe_ratio(self, returns: List[float], risk_free_rate: float = 0) -> float:
-        """
-        计算夏普比率
-        
-        Args:
-            returns: 收益率序列
-            risk_free_rate: 无风险利率
-            
-        Returns:
-            float: 夏普比率
-        """
-        if not returns:
-            return 0
-        
-        avg_return = np.mean(returns)
-        std_return = np.std(returns)
-        
-        if std_return == 0:
-            return 0
-        
-        # 年化处理
-        sharpe_ratio = (avg_return - risk_free_rate / 252) / std_return * np.sqrt(252)
-        return sharpe_ratio
-    
-    def _calculate_max_drawdown(self, equities: List[float]) -> float:
-        """
-        计算最大回撤
-        
-        Args:
-            equities: 权益序列
-            
-        Returns:
-            float: 最大回撤（百分比）
-        """
-        if not equities:
-            return 0
-        
-        max_drawdown = 0
-        peak = equities[0]
-        
-        for equity in equities:
-            if equity > peak:
-                peak = equity
-            drawdown = (peak - equity) / peak * 100
-            if drawdown > max_drawdown:
-                max_drawdown = drawdown
-        
-        return max_drawdown
-    
-    def _calculate_winning_rate(self, trades: List[Dict[str, Any]]) -> float:
-        """
-        计算胜率
-        
-        Args:
-            trades: 交易记录
-            
-        Returns:
-            float: 胜率（百分比）
-        """
-        if not trades:
-            return 0
-        
-        winning_trades = 0
-        for i in range(0, len(trades), 2):
-            if i + 1 < len(trades):
-                buy_trade = trades[i]
-                sell_trade = trades[i+1]
-                if sell_trade['price'] > buy_trade['price']:
-                    winning_trades += 1
-        
-        return (winning_trades / (len(trades) // 2)) * 100 if len(trades) >= 2 else 0
-    
-    def _calculate_average_profit_loss(self, trades: List[Dict[str, Any]]) -> float:
-        """
-        计算平均盈亏比
-        
-        Args:
-            trades: 交易记录
-            
-        Returns:
-            float: 平均盈亏比
-        """
-        if not trades:
-            return 0
-        
-        profits = []
-        losses = []
-        
-        for i in range(0, len(trades), 2):
-            if i + 1 < len(trades):
-                buy_trade = trades[i]
-                sell_trade = trades[i+1]
-                profit = (sell_trade['price'] - buy_trade['price']) * buy_trade['shares']
-                if profit > 0:
-                    profits.append(profit)
-                else:
-                    losses.append(abs(profit))
-        
-        avg_profit = np.mean(profits) if profits else 0
-        avg_loss = np.mean(losses) if losses else 1
-        
-        return avg_profit / avg_loss if avg_loss > 0 else 0
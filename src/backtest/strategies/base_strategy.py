@@ -6,7 +6,20 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Union
+
+import numpy as np
+import polars as pl
+
+from src.backtest.strategies.rolling_state import RollingWindow, WindowedEMA
+
+
+# 向量化信号编码：1买入，-1卖出，0持有
+SIGNAL_BUY = 1
+SIGNAL_SELL = -1
+SIGNAL_HOLD = 0
+
+SIGNAL_CODES = {'buy': SIGNAL_BUY, 'sell': SIGNAL_SELL, 'hold': SIGNAL_HOLD}
 
 
 class BaseStrategy(ABC):
@@ -23,6 +36,7 @@ class BaseStrategy(ABC):
         """
         self.name = name
         self.params = {}
+        self._rolling_state = {}
     
     def set_params(self, params: Dict[str, Any]):
         """
@@ -33,6 +47,58 @@ class BaseStrategy(ABC):
         """
         self.params.update(params)
     
+    def reset_state(self):
+        """
+        清空逐K线累积的指标状态，使同一策略实例可以重新开始一段回测
+
+        逐K线回测的引擎在每次回测开始时调用；实时行情回调在切换标的或重新订阅时也应调用
+        """
+        self._rolling_state.clear()
+    
+    def _state(self, name: str, factory, *args):
+        """
+        按名称获取增量指标状态，首次使用或参数（窗口等）变化时重新创建
+        
+        Args:
+            name: 状态名称
+            factory: 状态类
+            *args: 构造参数
+            
+        Returns:
+            状态对象
+        """
+        entry = self._rolling_state.get(name)
+        if entry is None or entry[0] != args:
+            entry = (args, factory(*args))
+            self._rolling_state[name] = entry
+        return entry[1]
+    
+    def rolling_window(self, name: str, window: int) -> RollingWindow:
+        """
+        获取名为name的滚动窗口（O(1)更新的滚动和/均值/标准差）
+        
+        Args:
+            name: 状态名称
+            window: 窗口大小
+            
+        Returns:
+            RollingWindow: 滚动窗口
+        """
+        return self._state(name, RollingWindow, int(window))
+    
+    def windowed_ema(self, name: str, period: int) -> WindowedEMA:
+        """
+        获取名为name的窗口内EMA（与signal_kernels.windowed_ema定义一致）
+        
+        Args:
+            name: 状态名称
+            period: 周期
+            
+        Returns:
+            WindowedEMA: 窗口内EMA
+        """
+        return self._state(name, WindowedEMA, int(period))
+    
     @abstractmethod
     def generate_signal(self, data: Dict[str, Any], index: int) -> str:
         """
@@ -46,3 +112,47 @@ class BaseStrategy(ABC):
             str: 交易信号，'buy'、'sell'或'hold'
         """
         pass
+    
+    def generate_signals(self, data: pl.DataFrame) -> Optional[Union[np.ndarray, pl.Expr]]:
+        """
+        一次性生成整段数据的交易信号（向量化回测使用）
+        
+        子类可返回与data等长的信号数组（SIGNAL_BUY/SIGNAL_SELL/SIGNAL_HOLD），
+        或在data上求值得到信号列的Polars表达式。返回None表示不支持，
+        向量化引擎会回退为逐K线调用generate_signal。
+        
+        Args:
+            data: 按时间升序排列的完整行情数据
+            
+        Returns:
+            Optional[Union[np.ndarray, pl.Expr]]: 信号数组或表达式
+        """
+        return None
+    
+    def generate_signals_batch(self, data: pl.DataFrame, param_sets: List[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        一次性生成多组参数在整段数据上的交易信号（批量参数评估使用）
+        
+        子类应对网格中每个不同的指标列只计算一次，再沿参数轴广播信号逻辑。
+        返回None表示不支持，调用方会回退为逐组参数回测。
+        
+        Args:
+            data: 按时间升序排列的完整行情数据
+            param_sets: 参数组合列表，未给出的参数使用当前策略参数
+            
+        Returns:
+            Optional[np.ndarray]: 形状为 (K线数, 参数组合数) 的信号矩阵
+        """
+        return None
+    
+    def is_valid_params(self, params: Dict[str, Any]) -> bool:
+        """
+        检查参数组合是否有意义，参数扫描跳过无效组合
+        
+        Args:
+            params: 参数组合，未给出的参数使用当前策略参数
+            
+        Returns:
+            bool: 参数组合是否有效
+        """
+        return True
@@ -5,8 +5,12 @@
 移动平均线策略
 """
 
-from src.backtest.strategies.base_strategy import BaseStrategy
-from typing import Dict, Any
+import numpy as np
+import polars as pl
+
+from src.backtest.strategies.base_strategy import BaseStrategy, SIGNAL_BUY, SIGNAL_SELL
+from src.backtest.strategies.signal_kernels import rolling_mean, align_full
+from typing import Dict, Any, List
 
 
 class MAStrategy(BaseStrategy):
@@ -26,8 +30,6 @@ class MAStrategy(BaseStrategy):
         super().__init__(name="移动平均线策略")
         self.params['short_window'] = short_window
         self.params['long_window'] = long_window
-        self.short_ma = []
-        self.long_ma = []
     
     def generate_signal(self, data: Dict[str, Any], index: int) -> str:
         """
@@ -40,26 +42,20 @@ class MAStrategy(BaseStrategy):
         Returns:
             str: 交易信号，'buy'、'sell'或'hold'
         """
-        # 计算移动平均线
         close_price = data.get('close', 0)
         
-        # 更新短期均线
-        self.short_ma.append(close_price)
-        if len(self.short_ma) > self.params['short_window']:
-            self.short_ma.pop(0)
-        
-        # 更新长期均线
-        self.long_ma.append(close_price)
-        if len(self.long_ma) > self.params['long_window']:
-            self.long_ma.pop(0)
+        # 更新短期、长期均线窗口（环形缓冲区，O(1)）
+        short_ma = self.rolling_window('short_ma', self.params['short_window'])
+        long_ma = self.rolling_window('long_ma', self.params['long_window'])
+        short_ma.push(close_price)
+        long_ma.push(close_price)
         
         # 检查是否有足够的数据计算均线
-        if len(self.short_ma) < self.params['short_window'] or len(self.long_ma) < self.params['long_window']:
+        if not (short_ma.full and long_ma.full):
             return 'hold'
         
-        # 计算均线值
-        short_ma_value = sum(self.short_ma) / len(self.short_ma)
-        long_ma_value = sum(self.long_ma) / len(self.long_ma)
+        short_ma_value = short_ma.mean
+        long_ma_value = long_ma.mean
         
         # 生成信号
         if short_ma_value > long_ma_value:
@@ -68,3 +64,67 @@ class MAStrategy(BaseStrategy):
             return 'sell'
         else:
             return 'hold'
+    
+    def generate_signals(self, data: pl.DataFrame) -> np.ndarray:
+        """
+        向量化生成整段交易信号，与逐K线generate_signal逐点一致
+        
+        Args:
+            data: 按时间升序排列的完整行情数据
+            
+        Returns:
+            np.ndarray: 信号数组（1买入，-1卖出，0持有）
+        """
+        close = data['close'].cast(pl.Float64).to_numpy()
+        short_window = int(self.params['short_window'])
+        long_window = int(self.params['long_window'])
+        signals = np.zeros(len(close), dtype=np.int8)
+        
+        # 两条均线窗口都填满后才产生信号
+        warmup = max(short_window, long_window)
+        if len(close) < warmup:
+            return signals
+        
+        short_ma = rolling_mean(close, short_window)[warmup - short_window:]
+        long_ma = rolling_mean(close, long_window)[warmup - long_window:]
+        signals[warmup - 1:] = np.where(short_ma > long_ma, SIGNAL_BUY, np.where(short_ma < long_ma, SIGNAL_SELL, 0))
+        return signals
+    
+    def generate_signals_batch(self, data: pl.DataFrame, param_sets: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        批量生成多组均线参数的交易信号
+        
+        网格中每个不同的窗口只计算一次均线，再按参数组合取列比较
+        
+        Args:
+            data: 按时间升序排列的完整行情数据
+            param_sets: 参数组合列表
+            
+        Returns:
+            np.ndarray: 形状为 (K线数, 参数组合数) 的信号矩阵
+        """
+        close = data['close'].cast(pl.Float64).to_numpy()
+        params = [{**self.params, **param_set} for param_set in param_sets]
+        short_windows = np.array([int(p['short_window']) for p in params])
+        long_windows = np.array([int(p['long_window']) for p in params])
+        
+        # 每个不同窗口的均线只计算一次，未填满窗口的K线为NaN，比较结果为持有
+        windows = np.union1d(short_windows, long_windows)
+        ma = np.column_stack([align_full(rolling_mean(close, w), len(close)) for w in windows])
+        short_ma = ma[:, np.searchsorted(windows, short_windows)]
+        long_ma = ma[:, np.searchsorted(windows, long_windows)]
+        
+        return np.where(short_ma > long_ma, SIGNAL_BUY, np.where(short_ma < long_ma, SIGNAL_SELL, 0)).astype(np.int8)
+    
+    def is_valid_params(self, params: Dict[str, Any]) -> bool:
+        """
+        短期均线窗口需小于长期窗口，窗口相等时两条均线重合、不产生任何交易
+        
+        Args:
+            params: 参数组合
+            
+        Returns:
+            bool: 参数组合是否有效
+        """
+        merged = {**self.params, **params}
+        return 0 < int(merged['short_window']) < int(merged['long_window'])
@@ -5,8 +5,12 @@
 MACD策略
 """
 
-from src.backtest.strategies.base_strategy import BaseStrategy
-from typing import Dict, Any
+import numpy as np
+import polars as pl
+
+from src.backtest.strategies.base_strategy import BaseStrategy, SIGNAL_BUY, SIGNAL_SELL
+from src.backtest.strategies.signal_kernels import windowed_ema, align_full
+from typing import Dict, Any, List
 
 
 class MACDStrategy(BaseStrategy):
@@ -28,31 +32,6 @@ class MACDStrategy(BaseStrategy):
         self.params['fast_period'] = fast_period
         self.params['slow_period'] = slow_period
         self.params['signal_period'] = signal_period
-        self.close_prices = []
-        self.fast_ema = []
-        self.slow_ema = []
-        self.macd = []
-        self.signal = []
-    
-    def _calculate_ema(self, prices, period):
-        """
-        计算指数移动平均线
-        
-        Args:
-            prices: 价格序列
-            period: 周期
-            
-        Returns:
-            float: EMA值
-        """
-        if len(prices) < period:
-            return sum(prices) / len(prices)
-        
-        alpha = 2 / (period + 1)
-        ema = prices[0]
-        for price in prices[1:]:
-            ema = alpha * price + (1 - alpha) * ema
-        return ema
     
     def generate_signal(self, data: Dict[str, Any], index: int) -> str:
         """
@@ -65,37 +44,30 @@ class MACDStrategy(BaseStrategy):
         Returns:
             str: 交易信号，'buy'、'sell'或'hold'
         """
-        # 获取收盘价
         close_price = data.get('close', 0)
         
-        # 更新价格序列
-        self.close_prices.append(close_price)
+        # 快速、慢速EMA都是最近N个价格上的窗口内EMA，逐K线O(1)更新
+        fast_ema = self.windowed_ema('fast_ema', self.params['fast_period']).update(close_price)
+        slow_ema = self.windowed_ema('slow_ema', self.params['slow_period'])
+        slow_ema.update(close_price)
         
-        # 计算EMA
-        if len(self.close_prices) >= self.params['slow_period']:
-            # 计算快速EMA
-            fast_ema = self._calculate_ema(self.close_prices[-self.params['fast_period']:], self.params['fast_period'])
-            self.fast_ema.append(fast_ema)
-            
-            # 计算慢速EMA
-            slow_ema = self._calculate_ema(self.close_prices[-self.params['slow_period']:], self.params['slow_period'])
-            self.slow_ema.append(slow_ema)
+        # 价格数量达到慢速周期后开始计算MACD
+        if slow_ema.full:
+            macd = fast_ema - slow_ema.value
+            signal_ema = self.windowed_ema('signal_ema', self.params['signal_period'])
+            signal_ema.update(macd)
             
-            # 计算MACD
-            macd = fast_ema - slow_ema
-            self.macd.append(macd)
-            
-            # 计算信号线
-            if len(self.macd) >= self.params['signal_period']:
-                signal = self._calculate_ema(self.macd[-self.params['signal_period']:], self.params['signal_period'])
-                self.signal.append(signal)
+            # 信号线需要signal_period个MACD值
+            if signal_ema.full:
+                # 只保留最近两根K线的MACD与信号线用于判断交叉
+                macd_history = self.rolling_window('macd', 2)
+                signal_history = self.rolling_window('signal', 2)
+                macd_history.push(macd)
+                signal_history.push(signal_ema.value)
                 
-                # 生成信号
-                if len(self.signal) > 1:
-                    prev_macd = self.macd[-2]
-                    prev_signal = self.signal[-2]
-                    current_macd = self.macd[-1]
-                    current_signal = self.signal[-1]
+                if signal_history.full:
+                    prev_macd, current_macd = macd_history.oldest, macd_history.last
+                    prev_signal, current_signal = signal_history.oldest, signal_history.last
                     
                     # 金叉买入
                     if prev_macd < prev_signal and current_macd > current_signal:
@@ -105,3 +77,118 @@ class MACDStrategy(BaseStrategy):
                         return 'sell'
         
         return 'hold'
+    
+    def generate_signals(self, data: pl.DataFrame) -> np.ndarray:
+        """
+        向量化生成整段交易信号，与逐K线generate_signal逐点一致
+        
+        逐K线实现在每根K线上增量更新最近N个值的窗口内EMA，这里以windowed_ema一次算出全部窗口
+        
+        Args:
+            data: 按时间升序排列的完整行情数据
+            
+        Returns:
+            np.ndarray: 信号数组（1买入，-1卖出，0持有）
+        """
+        close = data['close'].cast(pl.Float64).to_numpy()
+        fast_period = int(self.params['fast_period'])
+        slow_period = int(self.params['slow_period'])
+        signal_period = int(self.params['signal_period'])
+        signals = np.zeros(len(close), dtype=np.int8)
+        
+        # MACD从第slow_period根K线开始计算
+        start = slow_period - 1
+        if len(close) <= start:
+            return signals
+        
+        fast_ema = self._fast_ema_series(close, fast_period, start)
+        slow_ema = windowed_ema(close, slow_period)
+        macd = fast_ema - slow_ema
+        
+        # 信号线需要signal_period个MACD值，金叉死叉还需要前一根的信号线
+        signal_line = windowed_ema(macd, signal_period)
+        if len(signal_line) < 2:
+            return signals
+        
+        macd_tail = macd[signal_period - 1:]
+        prev_macd, curr_macd = macd_tail[:-1], macd_tail[1:]
+        prev_signal, curr_signal = signal_line[:-1], signal_line[1:]
+        cross = np.where((prev_macd < prev_signal) & (curr_macd > curr_signal), SIGNAL_BUY,
+                         np.where((prev_macd > prev_signal) & (curr_macd < curr_signal), SIGNAL_SELL, 0))
+        signals[start + signal_period:] = cross
+        return signals
+    
+    def _fast_ema_series(self, close: np.ndarray, fast_period: int, start: int) -> np.ndarray:
+        """
+        计算从第start根K线起的快速EMA序列
+        
+        快速周期大于慢速周期时，数据不足fast_period的K线上退化为已有价格的均值，与WindowedEMA一致
+        """
+        if fast_period <= start + 1:
+            return windowed_ema(close, fast_period)[start - fast_period + 1:]
+        
+        prefix = np.cumsum(close)[start:fast_period - 1]
+        prefix_mean = prefix / np.arange(start + 1, start + 1 + len(prefix))
+        return np.concatenate([prefix_mean, windowed_ema(close, fast_period)])
+    
+    def generate_signals_batch(self, data: pl.DataFrame, param_sets: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        批量生成多组MACD参数的交易信号
+        
+        每个不同周期的EMA、每个不同(快速, 慢速)组合的MACD线只计算一次，
+        信号线按信号周期分组，对同组的所有MACD列一次性计算
+        
+        Args:
+            data: 按时间升序排列的完整行情数据
+            param_sets: 参数组合列表
+            
+        Returns:
+            np.ndarray: 形状为 (K线数, 参数组合数) 的信号矩阵
+        """
+        close = data['close'].cast(pl.Float64).to_numpy()
+        n = len(close)
+        params = [{**self.params, **param_set} for param_set in param_sets]
+        fast_periods = [int(p['fast_period']) for p in params]
+        slow_periods = [int(p['slow_period']) for p in params]
+        signal_periods = np.array([int(p['signal_period']) for p in params])
+        
+        # 数据不足一个周期时退化为已有价格的均值，与WindowedEMA一致
+        cumulative_mean = np.cumsum(close) / np.arange(1, n + 1)
+        ema = {}
+        for period in set(fast_periods) | set(slow_periods):
+            values = align_full(windowed_ema(close, period), n)
+            values[:min(period - 1, n)] = cumulative_mean[:period - 1]
+            ema[period] = values
+        
+        # MACD从第slow_period根K线开始计算，之前为NaN
+        macd_lines = {}
+        for fast_period, slow_period in set(zip(fast_periods, slow_periods)):
+            line = ema[fast_period] - ema[slow_period]
+            line[:slow_period - 1] = np.nan
+            macd_lines[(fast_period, slow_period)] = line
+        macd = np.column_stack([macd_lines[key] for key in zip(fast_periods, slow_periods)])
+        
+        signal_line = np.empty_like(macd)
+        for signal_period in np.unique(signal_periods):
+            columns = np.flatnonzero(signal_periods == signal_period)
+            signal_line[:, columns] = align_full(windowed_ema(macd[:, columns], signal_period), n)
+        
+        signals = np.zeros(macd.shape, dtype=np.int8)
+        prev_macd, curr_macd = macd[:-1], macd[1:]
+        prev_signal, curr_signal = signal_line[:-1], signal_line[1:]
+        signals[1:] = np.where((prev_macd < prev_signal) & (curr_macd > curr_signal), SIGNAL_BUY,
+                               np.where((prev_macd > prev_signal) & (curr_macd < curr_signal), SIGNAL_SELL, 0))
+        return signals
+    
+    def is_valid_params(self, params: Dict[str, Any]) -> bool:
+        """
+        快速周期需小于慢速周期，周期相等时MACD线恒为0
+        
+        Args:
+            params: 参数组合
+            
+        Returns:
+            bool: 参数组合是否有效
+        """
+        merged = {**self.params, **params}
+        return 0 < int(merged['fast_period']) < int(merged['slow_period']) and int(merged['signal_period']) > 0
@@ -6,7 +6,12 @@
 """
 
 from typing import Dict, Any
-from src.backtest.strategies.base_strategy import BaseStrategy
+
+import numpy as np
+import polars as pl
+
+from src.backtest.strategies.base_strategy import BaseStrategy, SIGNAL_BUY, SIGNAL_SELL
+from src.backtest.strategies.signal_kernels import rolling_sum
 
 
 class MeanReversionStrategy(BaseStrategy):
@@ -41,6 +46,16 @@ class MeanReversionStrategy(BaseStrategy):
         overbought = self.params.get('overbought', 70)
         oversold = self.params.get('oversold', 30)
         
+        # 增量记录最近rsi_period个涨跌幅度，供RSI计算使用
+        closes = self.rolling_window('close', 2)
+        closes.push(data.get('close', 0))
+        gains = self.rolling_window('gains', rsi_period)
+        losses = self.rolling_window('losses', rsi_period)
+        if closes.full:
+            delta = closes.last - closes.oldest
+            gains.push(delta if delta > 0 else 0)
+            losses.push(0 if delta > 0 else abs(delta))
+        
         # 检查是否有足够的数据
         if index < rsi_period:
             return 'hold'
@@ -68,30 +83,17 @@ class MeanReversionStrategy(BaseStrategy):
         Returns:
             float: RSI值
         """
-        # 获取收盘价数据
-        closes = []
-        for i in range(max(0, index - period), index + 1):
-            closes.append(data.get(f'close_{i}', data.get('close', 0)))
-        
-        # 计算价格变化
-        deltas = []
-        for i in range(1, len(closes)):
-            deltas.append(closes[i] - closes[i-1])
-        
-        # 计算上涨和下跌
-        gains = []
-        losses = []
-        for delta in deltas:
-            if delta > 0:
-                gains.append(delta)
-                losses.append(0)
-            else:
-                gains.append(0)
-                losses.append(abs(delta))
-        
-        # 计算平均上涨和下跌
-        avg_gain = sum(gains) / len(gains) if gains else 0
-        avg_loss = sum(losses) / len(losses) if losses else 0
+        # 数据中带close_{i}历史列时优先使用最近period+1个收盘价
+        if f'close_{index}' in data:
+            closes = [data[f'close_{i}'] for i in range(max(0, index - period), index + 1)]
+            deltas = [closes[i] - closes[i-1] for i in range(1, len(closes))]
+            gains = [delta if delta > 0 else 0 for delta in deltas]
+            losses = [0 if delta > 0 else abs(delta) for delta in deltas]
+            avg_gain = sum(gains) / len(gains) if gains else 0
+            avg_loss = sum(losses) / len(losses) if losses else 0
+        else:
+            avg_gain = self.rolling_window('gains', period).mean
+            avg_loss = self.rolling_window('losses', period).mean
         
         # 计算RSI
         if avg_loss == 0:
@@ -101,3 +103,33 @@ class MeanReversionStrategy(BaseStrategy):
         rsi = 100 - (100 / (1 + rs))
         
         return rsi
+    
+    def generate_signals(self, data: pl.DataFrame) -> np.ndarray:
+        """
+        向量化生成整段交易信号，与逐K线generate_signal逐点一致
+        
+        Args:
+            data: 按时间升序排列的完整行情数据
+            
+        Returns:
+            np.ndarray: 信号数组（1买入，-1卖出，0持有）
+        """
+        rsi_period = int(self.params.get('rsi_period', 14))
+        overbought = self.params.get('overbought', 70)
+        oversold = self.params.get('oversold', 30)
+        
+        close = data['close'].cast(pl.Float64).to_numpy()
+        signals = np.zeros(len(close), dtype=np.int8)
+        if len(close) <= rsi_period:
+            return signals
+        
+        deltas = np.diff(close)
+        gains = np.where(deltas > 0, deltas, 0.0)
+        losses = np.where(deltas > 0, 0.0, -deltas)
+        avg_gain = rolling_sum(gains, rsi_period) / rsi_period
+        avg_loss = rolling_sum(losses, rsi_period) / rsi_period
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = np.where(avg_loss == 0, 100.0, 100 - (100 / (1 + avg_gain / avg_loss)))
+        signals[rsi_period:] = np.where(rsi < oversold, SIGNAL_BUY, np.where(rsi > overbought, SIGNAL_SELL, 0))
+        return signals
@@ -26,24 +26,6 @@ class MultiFactorStrategy(BaseStrategy):
         super().__init__(name="多因子策略")
         self.params['factors'] = factors or ['ma', 'macd', 'rsi']
         self.params['weights'] = weights or {'ma': 0.3, 'macd': 0.4, 'rsi': 0.3}
-        
-        # 初始化因子数据
-        self.ma_data = {
-            'short_ma': [],
-            'long_ma': []
-        }
-        self.macd_data = {
-            'close_prices': [],
-            'fast_ema': [],
-            'slow_ema': [],
-            'macd': [],
-            'signal': []
-        }
-        self.rsi_data = {
-            'close_prices': [],
-            'gains': [],
-            'losses': []
-        }
     
     def _calculate_ma(self, data: Dict[str, Any]):
         """
@@ -57,23 +39,18 @@ class MultiFactorStrategy(BaseStrategy):
         """
         close_price = data.get('close', 0)
         
-        # 更新短期均线
-        self.ma_data['short_ma'].append(close_price)
-        if len(self.ma_data['short_ma']) > 5:
-            self.ma_data['short_ma'].pop(0)
-        
-        # 更新长期均线
-        self.ma_data['long_ma'].append(close_price)
-        if len(self.ma_data['long_ma']) > 20:
-            self.ma_data['long_ma'].pop(0)
+        # 更新短期、长期均线窗口
+        short_ma = self.rolling_window('ma_short', 5)
+        long_ma = self.rolling_window('ma_long', 20)
+        short_ma.push(close_price)
+        long_ma.push(close_price)
         
         # 检查是否有足够的数据计算均线
-        if len(self.ma_data['short_ma']) < 5 or len(self.ma_data['long_ma']) < 20:
+        if not (short_ma.full and long_ma.full):
             return 0
         
-        # 计算均线值
-        short_ma_value = sum(self.ma_data['short_ma']) / len(self.ma_data['short_ma'])
-        long_ma_value = sum(self.ma_data['long_ma']) / len(self.ma_data['long_ma'])
+        short_ma_value = short_ma.mean
+        long_ma_value = long_ma.mean
         
         # 生成因子值
         if short_ma_value > long_ma_value:
@@ -83,26 +60,6 @@ class MultiFactorStrategy(BaseStrategy):
         else:
             return 0
     
-    def _calculate_ema(self, prices, period):
-        """
-        计算指数移动平均线
-        
-        Args:
-            prices: 价格序列
-            period: 周期
-            
-        Returns:
-            float: EMA值
-        """
-        if len(prices) < period:
-            return sum(prices) / len(prices)
-        
-        alpha = 2 / (period + 1)
-        ema = prices[0]
-        for price in prices[1:]:
-            ema = alpha * price + (1 - alpha) * ema
-        return ema
-    
     def _calculate_macd(self, data: Dict[str, Any]):
         """
         计算MACD因子
@@ -115,34 +72,27 @@ class MultiFactorStrategy(BaseStrategy):
         """
         close_price = data.get('close', 0)
         
-        # 更新价格序列
-        self.macd_data['close_prices'].append(close_price)
+        # 更新快速、慢速窗口内EMA
+        fast_ema = self.windowed_ema('macd_fast_ema', 12).update(close_price)
+        slow_ema = self.windowed_ema('macd_slow_ema', 26)
+        slow_ema.update(close_price)
         
-        # 计算EMA
-        if len(self.macd_data['close_prices']) >= 26:
-            # 计算快速EMA
-            fast_ema = self._calculate_ema(self.macd_data['close_prices'][-12:], 12)
-            self.macd_data['fast_ema'].append(fast_ema)
+        if slow_ema.full:
+            # 计算MACD和信号线
+            macd = fast_ema - slow_ema.value
+            signal_ema = self.windowed_ema('macd_signal_ema', 9)
+            signal_ema.update(macd)
             
-            # 计算慢速EMA
-            slow_ema = self._calculate_ema(self.macd_data['close_prices'][-26:], 26)
-            self.macd_data['slow_ema'].append(slow_ema)
-            
-            # 计算MACD
-            macd = fast_ema - slow_ema
-            self.macd_data['macd'].append(macd)
-            
-            # 计算信号线
-            if len(self.macd_data['macd']) >= 9:
-                signal = self._calculate_ema(self.macd_data['macd'][-9:], 9)
-                self.macd_data['signal'].append(signal)
+            if signal_ema.full:
+                macd_history = self.rolling_window('macd_line', 2)
+                signal_history = self.rolling_window('macd_signal', 2)
+                macd_history.push(macd)
+                signal_history.push(signal_ema.value)
                 
                 # 生成因子值
-                if len(self.macd_data['signal']) > 1:
-                    prev_macd = self.macd_data['macd'][-2]
-                    prev_signal = self.macd_data['signal'][-2]
-                    current_macd = self.macd_data['macd'][-1]
-                    current_signal = self.macd_data['signal'][-1]
+                if signal_history.full:
+                    prev_macd, current_macd = macd_history.oldest, macd_history.last
+                    prev_signal, current_signal = signal_history.oldest, signal_history.last
                     
                     # 金叉买入
                     if prev_macd < prev_signal and current_macd > current_signal:
@@ -165,32 +115,27 @@ class MultiFactorStrategy(BaseStrategy):
         """
         close_price = data.get('close', 0)
         
-        # 更新价格序列
-        self.rsi_data['close_prices'].append(close_price)
+        # 只保留最近两个收盘价用于计算涨跌
+        closes = self.rolling_window('rsi_close', 2)
+        closes.push(close_price)
         
-        # 计算收益率
-        if len(self.rsi_data['close_prices']) > 1:
-            previous_price = self.rsi_data['close_prices'][-2]
-            current_price = close_price
-            change = current_price - previous_price
+        if closes.full:
+            change = closes.last - closes.oldest
             
+            # 最近14个涨跌幅度的滚动窗口
+            gains = self.rolling_window('rsi_gains', 14)
+            losses = self.rolling_window('rsi_losses', 14)
             if change > 0:
-                self.rsi_data['gains'].append(change)
-                self.rsi_data['losses'].append(0)
+                gains.push(change)
+                losses.push(0)
             else:
-                self.rsi_data['gains'].append(0)
-                self.rsi_data['losses'].append(abs(change))
-            
-            # 限制窗口大小为14
-            if len(self.rsi_data['gains']) > 14:
-                self.rsi_data['gains'].pop(0)
-            if len(self.rsi_data['losses']) > 14:
-                self.rsi_data['losses'].pop(0)
+                gains.push(0)
+                losses.push(abs(change))
             
             # 计算RSI
-            if len(self.rsi_data['gains']) == 14:
-                avg_gain = sum(self.rsi_data['gains']) / 14
-                avg_loss = sum(self.rsi_data['losses']) / 14
+            if gains.full:
+                avg_gain = gains.mean
+                avg_loss = losses.mean
                 
                 if avg_loss == 0:
                     rsi = 100
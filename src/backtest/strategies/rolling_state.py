@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+逐K线增量指标状态
+
+与signal_kernels中的整段向量化内核相对应，这里的原语供逐K线的generate_signal和实时行情回调使用，
+每根K线的更新开销与窗口长度无关：
+- RollingWindow：环形缓冲区上的滚动和/均值/标准差
+- WindowedEMA：以窗口首个值为初值的窗口内EMA（与windowed_ema定义一致）
+
+增量加减会累积浮点误差，RollingWindow和WindowedEMA在环形缓冲区每绕一圈时按窗口顺序重新求和一次，
+均摊开销仍为O(1)，且与signal_kernels的结果只在最后几位有效数字上有差别。
+"""
+
+import math
+from typing import List, Optional
+
+
+class RollingWindow:
+    """
+    固定长度的滚动窗口，维护窗口内的和与平方和
+    """
+
+    __slots__ = ('window', '_buffer', '_position', '_count', '_sum', '_sum_sq')
+
+    def __init__(self, window: int):
+        """
+        初始化滚动窗口
+
+        Args:
+            window: 窗口大小
+        """
+        if window <= 0:
+            raise ValueError(f"窗口大小必须为正数: {window}")
+        self.window = window
+        self._buffer = [0.0] * window
+        self._position = 0
+        self._count = 0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+
+    def push(self, value: float) -> Optional[float]:
+        """
+        加入一个新值
+
+        Args:
+            value: 新值
+
+        Returns:
+            Optional[float]: 被挤出窗口的旧值，窗口未满时为None
+        """
+        position = self._position
+        evicted = None
+        if self._count == self.window:
+            evicted = self._buffer[position]
+            self._sum += value - evicted
+            self._sum_sq += value * value - evicted * evicted
+        else:
+            self._count += 1
+            self._sum += value
+            self._sum_sq += value * value
+        self._buffer[position] = value
+
+        position += 1
+        if position == self.window:
+            position = 0
+            # 每绕一圈按时间顺序重新求和，消除增量加减累积的误差
+            self._sum = sum(self._buffer)
+            self._sum_sq = sum(x * x for x in self._buffer)
+        self._position = position
+        return evicted
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def full(self) -> bool:
+        """窗口是否已填满"""
+        return self._count == self.window
+
+    @property
+    def sum(self) -> float:
+        """窗口内的和"""
+        return self._sum
+
+    @property
+    def mean(self) -> float:
+        """窗口内的均值，窗口为空时为0"""
+        return self._sum / self._count if self._count else 0.0
+
+    @property
+    def std(self) -> float:
+        """窗口内的总体标准差"""
+        if not self._count:
+            return 0.0
+        mean = self._sum / self._count
+        return math.sqrt(max(self._sum_sq / self._count - mean * mean, 0.0))
+
+    @property
+    def resummed(self) -> bool:
+        """最近一次push是否恰好绕满一圈并按窗口顺序重新求和"""
+        return self._count == self.window and self._position == 0
+
+    @property
+    def last(self) -> float:
+        """最近加入的值"""
+        return self._buffer[self._position - 1]
+
+    @property
+    def oldest(self) -> float:
+        """窗口内最早的值"""
+        return self._buffer[self._position] if self._count == self.window else self._buffer[0]
+
+    def values(self) -> List[float]:
+        """按时间顺序返回窗口内的值"""
+        if self._count < self.window:
+            return self._buffer[:self._count]
+        return self._buffer[self._position:] + self._buffer[:self._position]
+
+
+class WindowedEMA:
+    """
+    窗口内EMA：只用最近period个值，以其中最早的值为初值做 alpha = 2/(period+1) 的递推；
+    值不足period个时退化为已有值的均值
+
+    记 S_t 为窗口内除初值外各项的加权和，则 S_t = alpha*x_t + (1-alpha)*S_{t-1} - alpha*(1-alpha)^(period-1)*x_{t-period+1}，
+    EMA_t = (1-alpha)^(period-1)*x_{t-period+1} + S_t，每根K线O(1)更新。
+    """
+
+    __slots__ = ('period', 'alpha', '_decay', '_tail_weight', '_window', '_weighted', '_value',
+                 '_run_value', '_run_length')
+
+    def __init__(self, period: int):
+        """
+        初始化窗口内EMA
+
+        Args:
+            period: 周期，同时也是窗口大小
+        """
+        self.period = period
+        self.alpha = 2 / (period + 1)
+        self._decay = 1 - self.alpha
+        self._tail_weight = self._decay ** (period - 1)
+        self._window = RollingWindow(period)
+        self._weighted = 0.0
+        self._value = 0.0
+        self._run_value = None
+        self._run_length = 0
+
+    def update(self, value: float) -> float:
+        """
+        加入一个新值并返回当前EMA
+
+        窗口内全部为同一个值时（停牌、一字板等价格不变的区间），直接沿用按定义递推出的结果，
+        不让增量更新的残差在本应相等的均线之间制造虚假的交叉。
+
+        Args:
+            value: 新值
+
+        Returns:
+            float: 当前EMA
+        """
+        if value == self._run_value:
+            self._run_length += 1
+        else:
+            self._run_value = value
+            self._run_length = 1
+
+        window = self._window
+        was_full = window.full
+        window.push(value)
+        if not window.full:
+            self._value = window.mean
+            return self._value
+        if self._run_length > self.period:
+            return self._value
+
+        if was_full and not window.resummed and self._run_length < self.period:
+            oldest = window.oldest
+            self._weighted = (self.alpha * value + self._decay * self._weighted
+                              - self.alpha * self._tail_weight * oldest)
+            self._value = self._tail_weight * oldest + self._weighted
+        else:
+            # 窗口刚填满、缓冲区绕满一圈或窗口内全为同一值时按定义重新递推
+            values = window.values()
+            ema = values[0]
+            for price in values[1:]:
+                ema = self.alpha * price + self._decay * ema
+            self._value = ema
+            self._weighted = ema - self._tail_weight * values[0]
+        return self._value
+
+    def __len__(self) -> int:
+        return len(self._window)
+
+    @property
+    def full(self) -> bool:
+        """窗口是否已填满"""
+        return self._window.full
+
+    @property
+    def value(self) -> float:
+        """当前EMA"""
+        return self._value
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+向量化信号计算内核
+
+滚动和在sliding_window_view的只读视图上逐窗口归约，不复制数据，也没有Python层的循环。
+每个窗口的和只取决于窗口内的值（不像前缀和差分那样依赖窗口之前的累计值），
+相同内容的窗口得到相同的和，全为0的窗口得到精确的0，均线相等或零损失的判断不受舍入影响。
+逐K线策略使用rolling_state中的增量状态，两者的求和顺序不同，结果只在最后几位有效数字上有差别。
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    计算完整窗口的滚动和
+
+    Args:
+        values: 输入序列
+        window: 窗口大小
+
+    Returns:
+        np.ndarray: 长度为 len(values) - window + 1 的数组，第k个元素对应 values[k:k+window]；
+                    二维输入时沿axis 0对每列分别计算
+    """
+    x = np.asarray(values, dtype=np.float64)
+    if window <= 0 or len(x) < window:
+        return np.empty((0,) + x.shape[1:], dtype=np.float64)
+    return sliding_window_view(x, window, axis=0).sum(axis=-1)
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    计算完整窗口的滚动均值
+
+    Args:
+        values: 输入序列
+        window: 窗口大小
+
+    Returns:
+        np.ndarray: 长度为 len(values) - window + 1 的数组
+    """
+    return rolling_sum(values, window) / window
+
+
+def windowed_ema(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    计算窗口内EMA：以窗口首个值为初值，在窗口内做 alpha = 2/(period+1) 的递推
+
+    Args:
+        values: 输入序列
+        period: 周期，同时也是窗口大小
+
+    Returns:
+        np.ndarray: 长度为 len(values) - period + 1 的数组；二维输入时沿axis 0对每列分别计算
+    """
+    x = np.asarray(values, dtype=np.float64)
+    count = len(x) - period + 1
+    if period <= 0 or count <= 0:
+        return np.empty((0,) + x.shape[1:], dtype=np.float64)
+    alpha = 2 / (period + 1)
+    ema = x[:count].copy()
+    for offset in range(1, period):
+        ema = alpha * x[offset:offset + count] + (1 - alpha) * ema
+    return ema
+
+
+def align_full(values: np.ndarray, length: int) -> np.ndarray:
+    """
+    将完整窗口结果按末端对齐回原序列长度，前端补NaN
+
+    Args:
+        values: rolling_sum/rolling_mean/windowed_ema 的结果
+        length: 原序列长度
+
+    Returns:
+        np.ndarray: 长度为length的数组，第t个元素对应以t结尾的窗口
+    """
+    full = np.full((length,) + values.shape[1:], np.nan)
+    if len(values):
+        full[length - len(values):] = values
+    return full
+
+
+def forward_fill_signals(signals: np.ndarray) -> np.ndarray:
+    """
+    将买卖信号前向填充为状态：最近一次非持有信号
+
+    Args:
+        signals: 信号数组（1买入，-1卖出，0持有），二维时每列为一只股票、沿时间轴（axis 0）填充
+
+    Returns:
+        np.ndarray: 每根K线处最近一次非零信号，之前没有信号时为0
+    """
+    signals = np.asarray(signals)
+    rows = np.arange(len(signals)).reshape((-1,) + (1,) * (signals.ndim - 1))
+    index = np.where(signals != 0, rows, 0)
+    np.maximum.accumulate(index, axis=0, out=index)
+    # 首个非零信号之前的位置索引为0：signals[0]若非零即为首个信号，否则取到0
+    return np.take_along_axis(signals, index, axis=0)
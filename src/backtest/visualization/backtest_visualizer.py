@@ -6,6 +6,7 @@
 """
 
 from typing import Dict, Any
+import polars as pl
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
@@ -30,33 +31,27 @@ class BacktestVisualizer:
                           subplot_titles=('权益曲线', '交易信号'),
                           row_heights=[0.7, 0.3])
         
-        # 提取数据
+        # 提取数据，equity_curve和trades可以是Polars DataFrame（列式结果）或逐行字典列表
         equity_curve = backtest_results.get('equity_curve', [])
         trades = backtest_results.get('trades', [])
         strategy_name = backtest_results.get('strategy_name', 'Strategy')
+        if not isinstance(equity_curve, pl.DataFrame):
+            equity_curve = pl.DataFrame(equity_curve, infer_schema_length=None)
+        if not isinstance(trades, pl.DataFrame):
+            trades = pl.DataFrame(trades, infer_schema_length=None)
         
-        if equity_curve:
+        if not equity_curve.is_empty():
             # 绘制权益曲线
-            dates = [item['date'] for item in equity_curve]
-            equities = [item['equity'] for item in equity_curve]
-            
-            fig.add_trace(go.Scatter(x=dates, y=equities, name='权益', line=dict(color='blue')),
+            fig.add_trace(go.Scatter(x=equity_curve['date'], y=equity_curve['equity'], name='权益',
+                                     line=dict(color='blue')),
                          row=1, col=1)
         
-        if trades:
+        if not trades.is_empty():
             # 绘制交易信号
-            buy_dates = []
-            buy_prices = []
-            sell_dates = []
-            sell_prices = []
-            
-            for trade in trades:
-                if trade['signal'] == 'buy':
-                    buy_dates.append(trade['date'])
-                    buy_prices.append(trade['price'])
-                elif trade['signal'] == 'sell':
-                    sell_dates.append(trade['date'])
-                    sell_prices.append(trade['price'])
+            buys = trades.filter(pl.col('signal') == 'buy')
+            sells = trades.filter(pl.col('signal') == 'sell')
+            buy_dates, buy_prices = buys['date'], buys['price']
+            sell_dates, sell_prices = sells['date'], sells['price']
             
             fig.add_trace(go.Scatter(x=buy_dates, y=buy_prices, name='买入信号', 
                                    mode='markers', marker=dict(color='green', size=10, symbol='triangle-up')),
@@ -351,6 +351,17 @@ class PluginBase(ABC):
         """
         return False
 
+    def supports_lazy(self) -> bool:
+        """
+        检查插件的calculate_polars是否接受LazyFrame并返回LazyFrame
+
+        支持时，调用方在投影后的LazyFrame上构建插件的查询计划，与其他插件的计划通过一次collect_all执行
+
+        Returns:
+            bool: 是否支持Lazy查询计划
+        """
+        return False
+
     # -----------------------------
     # 插件间通信方法
     # -----------------------------
@@ -725,12 +736,14 @@ class IndicatorPlugin(PluginBase):
         """
         使用polars计算技术指标
         
+        supports_lazy()返回True的插件需同时接受LazyFrame，并返回与输入类型一致的结果
+        
         Args:
-            data: 股票数据，polars DataFrame
+            data: 股票数据，polars DataFrame或LazyFrame
             **kwargs: 指标参数
             
         Returns:
-            Any: 包含指标的polars DataFrame
+            Any: 包含指标的polars DataFrame或LazyFrame
         """
         df_pd = data.to_pandas()
         result_pd = self.calculate(df_pd, **kwargs)
@@ -14,6 +14,7 @@ from PySide6.QtGui import QFont
 
 from src.utils.logger import logger
 from src.quant.analysis.factor_analyzer import FactorAnalyzer
+from src.ui.task_manager import global_task_manager
 
 
 class FactorAnalysisDialog(QDialog):
@@ -27,6 +28,12 @@ class FactorAnalysisDialog(QDialog):
         self.setGeometry(100, 100, 800, 600)
         self.setModal(True)
         
+        # 分析器在多次分析之间复用，缓存已计算的因子
+        self.analyzer = FactorAnalyzer()
+        self.last_result = None
+        self._task_id = None
+        self._cancel_requested = False
+        
         self.init_ui()
         
     def init_ui(self):
@@ -171,6 +178,11 @@ class FactorAnalysisDialog(QDialog):
         self.run_button.clicked.connect(self.run_analysis)
         button_layout.addWidget(self.run_button)
         
+        self.cancel_button = QPushButton("取消分析")
+        self.cancel_button.clicked.connect(self.cancel_analysis)
+        self.cancel_button.setEnabled(False)
+        button_layout.addWidget(self.cancel_button)
+        
         self.export_button = QPushButton("导出报告")
         self.export_button.clicked.connect(self.export_report)
         self.export_button.setEnabled(False)
@@ -184,8 +196,10 @@ class FactorAnalysisDialog(QDialog):
         
     def run_analysis(self):
         """
-        运行因子分析
+        运行因子分析（在后台任务中执行）
         """
+        if self._task_id is not None:
+            return
         try:
             # 获取参数
             stock_code = self.stock_code_edit.text()
@@ -193,52 +207,125 @@ class FactorAnalysisDialog(QDialog):
             end_date = self.end_date_edit.date().toString("yyyy-MM-dd")
             analysis_type = self.analysis_combo.currentText()
             window = int(self.window_edit.text())
-            
-            # 获取选中的因子
-            selected_factors = []
-            for name, checkbox in self.tech_factors.items():
-                if checkbox.isChecked():
-                    selected_factors.append(name)
-            for name, checkbox in self.fundamental_factors.items():
-                if checkbox.isChecked():
-                    selected_factors.append(name)
-            for name, checkbox in self.momentum_factors.items():
-                if checkbox.isChecked():
-                    selected_factors.append(name)
-            
-            if not selected_factors:
-                self.result_text.setText("请至少选择一个因子")
-                return
-            
-            # 显示进度条
-            self.progress_bar.setVisible(True)
-            self.progress_bar.setValue(0)
-            
-            # 创建因子分析器
-            analyzer = FactorAnalyzer()
-            
-            # 运行分析
-            result = analyzer.run_analysis(
-                stock_code=stock_code,
-                start_date=start_date,
-                end_date=end_date,
-                factors=selected_factors,
-                analysis_type=analysis_type,
-                window=window
-            )
-            
-            # 显示结果
-            self.display_result(result)
-            
-            # 启用导出按钮
-            self.export_button.setEnabled(True)
-            
-        except Exception as e:
-            logger.error(f"分析失败: {e}")
-            self.result_text.setText(f"分析失败: {str(e)}")
-        finally:
-            self.progress_bar.setVisible(False)
-            self.progress_bar.setValue(0)
+        except ValueError:
+            self.result_text.setText("滚动窗口必须是整数")
+            return
+        
+        # 获取选中的因子
+        selected_factors = []
+        for name, checkbox in self.tech_factors.items():
+            if checkbox.isChecked():
+                selected_factors.append(name)
+        for name, checkbox in self.fundamental_factors.items():
+            if checkbox.isChecked():
+                selected_factors.append(name)
+        for name, checkbox in self.momentum_factors.items():
+            if checkbox.isChecked():
+                selected_factors.append(name)
+        
+        if not selected_factors:
+            self.result_text.setText("请至少选择一个因子")
+            return
+        
+        # 显示进度条
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setValue(0)
+        self.run_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self._cancel_requested = False
+        
+        global_task_manager.task_progress.connect(self._on_task_progress)
+        global_task_manager.task_completed.connect(self._on_task_completed)
+        global_task_manager.task_error.connect(self._on_task_error)
+        self._task_id = global_task_manager.create_task(
+            f"因子分析 {stock_code}",
+            self._analysis_task,
+            kwargs={
+                'analyzer': self.analyzer,
+                'stock_code': stock_code,
+                'start_date': start_date,
+                'end_date': end_date,
+                'factors': selected_factors,
+                'analysis_type': analysis_type,
+                'window': window
+            }
+        )
+    
+    @staticmethod
+    def _analysis_task(analyzer, stock_code, start_date, end_date, factors, analysis_type, window,
+                       task_id=None, signals=None):
+        """
+        后台任务：运行因子分析，通过任务信号汇报进度，任务被取消时在下一个检查点结束
+        """
+        runner = global_task_manager.tasks.get(task_id)
+        return analyzer.run_analysis(
+            stock_code=stock_code,
+            start_date=start_date,
+            end_date=end_date,
+            factors=factors,
+            analysis_type=analysis_type,
+            window=window,
+            progress=lambda current, total: signals.progress.emit(task_id, current, total),
+            is_cancelled=lambda: runner is not None and runner.is_cancelled
+        )
+    
+    def cancel_analysis(self):
+        """
+        取消正在运行的因子分析
+        """
+        if self._task_id is not None:
+            self._cancel_requested = True
+            self.cancel_button.setEnabled(False)
+            global_task_manager.cancel_task(self._task_id)
+    
+    def _on_task_progress(self, task_id, current, total):
+        if task_id == self._task_id:
+            self.progress_bar.setValue(int(current * 100 / total) if total else 0)
+    
+    def _on_task_completed(self, task_id, result):
+        if task_id != self._task_id:
+            return
+        self._finish_task()
+        self.last_result = result
+        # 显示结果
+        self.display_result(result)
+        # 启用导出按钮
+        self.export_button.setEnabled(True)
+    
+    def _on_task_error(self, task_id, error_message):
+        if task_id != self._task_id:
+            return
+        cancelled = self._cancel_requested
+        self._finish_task()
+        if cancelled:
+            self.result_text.setText("分析已取消")
+        else:
+            logger.error(f"分析失败: {error_message}")
+            self.result_text.setText(f"分析失败: {error_message}")
+    
+    def _finish_task(self):
+        """
+        断开任务信号并恢复界面状态
+        """
+        try:
+            global_task_manager.task_progress.disconnect(self._on_task_progress)
+            global_task_manager.task_completed.disconnect(self._on_task_completed)
+            global_task_manager.task_error.disconnect(self._on_task_error)
+        except RuntimeError:
+            pass
+        self._task_id = None
+        self._cancel_requested = False
+        self.run_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        self.progress_bar.setVisible(False)
+        self.progress_bar.setValue(0)
+    
+    def closeEvent(self, event):
+        """
+        关闭对话框时取消正在运行的分析
+        """
+        self.cancel_analysis()
+        super().closeEvent(event)
     
     def display_result(self, result):
         """
@@ -270,6 +357,15 @@ class FactorAnalysisDialog(QDialog):
                     else:
                         text += f"{key}: {value}\n"
         
+        if 'factor_combination' in result:
+            text += "\n等权组合因子分析:\n"
+            text += "-" * 30 + "\n"
+            for key, value in result['factor_combination'].items():
+                if isinstance(value, float):
+                    text += f"{key}: {value:.4f}\n"
+                else:
+                    text += f"{key}: {value}\n"
+        
         if 'correlation_matrix' in result:
             text += "\n因子相关性矩阵:\n"
             text += "-" * 30 + "\n"
@@ -278,6 +374,9 @@ class FactorAnalysisDialog(QDialog):
             for row in matrix:
                 text += "\t".join([f"{v:.2f}" for v in row]) + "\n"
         
+        if result.get('missing_factors'):
+            text += f"\n数据中缺少、未参与分析的因子: {', '.join(result['missing_factors'])}\n"
+        
         text += "-" * 50 + "\n"
         
         self.result_text.setText(text)
@@ -290,9 +389,8 @@ class FactorAnalysisDialog(QDialog):
             # 这里可以实现报告导出逻辑
             from src.quant.reports.report_generator import ReportGenerator
             
-            # 获取分析结果（这里需要从result_text中解析，实际应该从分析器获取）
             report_generator = ReportGenerator()
-            report_generator.generate_factor_analysis_report({})
+            report_generator.generate_factor_analysis_report(self.last_result or {})
             
             self.result_text.append("\n报告导出成功！")
         except Exception as e:
@@ -3,402 +3,380 @@
 
 """
 因子分析器
+
+通过DataManager加载股票日线数据，所选因子在一个Polars惰性查询中一次算出；
+计算好的因子按 (股票代码, 日期范围, 因子, 窗口) 缓存，切换分析类型时直接复用。
+run_analysis可以通过progress回调汇报进度、通过is_cancelled回调响应取消，便于放到TaskManager的后台任务中执行。
 """
 
-import polars as pl
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
 import numpy as np
-from datetime import datetime, timedelta
+import polars as pl
 
+from src.alpha.risk.covariance_engine import pairwise_correlation
+from src.data.data_manager import DataManager
+from src.database.db_manager import DatabaseManager
+from src.utils.config import get_config
+from src.utils.exceptions import DataNotFoundError
 from src.utils.logger import logger
 
+# 各因子输出的列，第一列作为该因子参与检验、相关性和组合分析的因子值
+FACTOR_COLUMNS: Dict[str, List[str]] = {
+    'MACD': ['macd', 'macd_signal', 'macd_hist'],
+    'RSI': ['rsi'],
+    'BOLL': ['boll_mid', 'boll_upper', 'boll_lower'],
+    'KDJ': ['kdj_k', 'kdj_d', 'kdj_j'],
+    'MA': ['ma5', 'ma10', 'ma20', 'ma60'],
+    'ATR': ['atr'],
+    'WR': ['wr'],
+    'CCI': ['cci'],
+    'PE': ['pe'],
+    'PB': ['pb'],
+    'ROE': ['roe'],
+    'EPS': ['eps'],
+    'MOM1M': ['mom1m'],
+    'MOM3M': ['mom3m'],
+    'MOM6M': ['mom6m'],
+    'MOM12M': ['mom12m'],
+}
+
+# 基本面因子直接取数据中的同名列（数据源不提供时无法分析）
+FUNDAMENTAL_FACTORS = ('PE', 'PB', 'ROE', 'EPS')
+
+ANALYSIS_TYPES = ("因子有效性检验", "因子相关性分析", "因子组合分析")
+
+# 分层测试的层数
+QUANTILES = 5
+
+
+class AnalysisCancelled(Exception):
+    """因子分析被取消"""
+
+
+def _factor_expressions(factor: str) -> List[pl.Expr]:
+    """
+    技术指标和动量因子的表达式
+
+    Args:
+        factor: 因子名称
+
+    Returns:
+        List[pl.Expr]: 按FACTOR_COLUMNS中的列顺序命名的表达式
+    """
+    close, high, low = pl.col('close'), pl.col('high'), pl.col('low')
+    if factor == 'MACD':
+        macd = close.ewm_mean(span=12) - close.ewm_mean(span=26)
+        signal = macd.ewm_mean(span=9)
+        return [macd.alias('macd'), signal.alias('macd_signal'), (macd - signal).alias('macd_hist')]
+    if factor == 'RSI':
+        delta = close.diff()
+        average_gain = delta.clip(lower_bound=0).rolling_mean(window_size=14)
+        average_loss = (-delta).clip(lower_bound=0).rolling_mean(window_size=14)
+        return [(100 - 100 / (1 + average_gain / (average_loss + 1e-10))).alias('rsi')]
+    if factor == 'BOLL':
+        middle = close.rolling_mean(window_size=20)
+        std = close.rolling_std(window_size=20)
+        return [middle.alias('boll_mid'), (middle + 2 * std).alias('boll_upper'), (middle - 2 * std).alias('boll_lower')]
+    if factor == 'KDJ':
+        lowest = low.rolling_min(window_size=9)
+        rsv = (close - lowest) / (high.rolling_max(window_size=9) - lowest + 1e-10) * 100
+        k = rsv.ewm_mean(span=3)
+        d = k.ewm_mean(span=3)
+        return [k.alias('kdj_k'), d.alias('kdj_d'), (3 * k - 2 * d).alias('kdj_j')]
+    if factor == 'MA':
+        return [close.rolling_mean(window_size=n).alias(f'ma{n}') for n in (5, 10, 20, 60)]
+    if factor == 'ATR':
+        previous = close.shift(1)
+        true_range = pl.max_horizontal(high - low, (high - previous).abs(), (low - previous).abs())
+        return [true_range.rolling_mean(window_size=14).alias('atr')]
+    if factor == 'WR':
+        lowest = low.rolling_min(window_size=14)
+        highest = high.rolling_max(window_size=14)
+        return [((highest - close) / (highest - lowest + 1e-10) * 100).alias('wr')]
+    if factor == 'CCI':
+        typical = (high + low + close) / 3
+        average = typical.rolling_mean(window_size=14)
+        deviation = (typical - average).abs().rolling_mean(window_size=14)
+        return [((typical - average) / (0.015 * deviation)).alias('cci')]
+    momentum = {'MOM1M': 20, 'MOM3M': 60, 'MOM6M': 120, 'MOM12M': 240}
+    if factor in momentum:
+        return [close.pct_change(momentum[factor]).alias(factor.lower())]
+    raise ValueError(f"不支持的因子: {factor}")
+
+
+def _factor_statistics(sample: pl.DataFrame, column: str, window: int) -> Dict[str, Optional[float]]:
+    """
+    因子值与下一日收益率的IC和分层测试
+
+    IC为两者的相关系数，滚动IC按window日窗口计算（ic_ir = 滚动IC均值 / 标准差）；
+    分层测试按因子值等频分为QUANTILES层，比较最高层与最低层的平均下一日收益率。
+
+    Args:
+        sample: 已去掉缺失值、包含因子列和forward_return的数据
+        column: 因子列
+        window: 滚动窗口
+    """
+    statistics = sample.select(
+        pl.corr(column, 'forward_return').alias('ic'),
+        pl.rolling_corr(column, 'forward_return', window_size=window).alias('rolling_ic'),
+    )
+    rolling_ic = statistics['rolling_ic'].fill_nan(None).drop_nulls()
+    ic_mean = rolling_ic.mean() if len(rolling_ic) else None
+    ic_std = rolling_ic.std() if len(rolling_ic) > 1 else None
+
+    layers = (sample
+              .with_columns(((pl.col(column).rank('ordinal') - 1) * QUANTILES // pl.len()).alias('quantile'))
+              .group_by('quantile')
+              .agg(pl.col('forward_return').mean().alias('avg_return'))
+              .sort('quantile'))
+    long_return, short_return = layers['avg_return'][-1], layers['avg_return'][0]
+    return {
+        'ic': statistics['ic'][0],
+        'ic_mean': ic_mean,
+        'ic_ir': ic_mean / ic_std if ic_std else None,
+        'long_return': long_return,
+        'short_return': short_return,
+        'long_short_return': long_return - short_return
+    }
+
 
 class FactorAnalyzer:
     """
     因子分析器
     """
-    
-    def __init__(self):
+
+    def __init__(self, data_manager: Optional[DataManager] = None, cache_size: int = 8):
         """
         初始化因子分析器
+
+        Args:
+            data_manager: 数据管理器，None表示首次分析时按配置创建
+            cache_size: 缓存的因子数据个数
         """
-        pass
-    
-    def run_analysis(self, stock_code, start_date, end_date, factors, analysis_type, window):
+        self.data_manager = data_manager
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[Tuple, Tuple[pl.DataFrame, List[str]]]' = OrderedDict()
+
+    def clear_cache(self):
+        """
+        清除缓存的因子数据
+        """
+        self._cache.clear()
+
+    def run_analysis(self, stock_code, start_date, end_date, factors, analysis_type, window,
+                     progress: Optional[Callable[[int, int], None]] = None,
+                     is_cancelled: Optional[Callable[[], bool]] = None):
         """
         运行因子分析
-        
+
         Args:
             stock_code: 股票代码
             start_date: 开始日期
             end_date: 结束日期
             factors: 因子列表
-            analysis_type: 分析类型
-            window: 滚动窗口
-            
+            analysis_type: 分析类型，见ANALYSIS_TYPES
+            window: 滚动窗口（滚动IC的窗口长度）
+            progress: 进度回调 (当前, 总数)，总数为100
+            is_cancelled: 返回True时在下一个检查点抛出AnalysisCancelled
+
         Returns:
-            dict: 分析结果
+            dict: 分析结果，missing_factors为数据中缺少、未参与分析的因子
         """
+        if analysis_type not in ANALYSIS_TYPES:
+            raise ValueError(f"不支持的分析类型: {analysis_type}")
+
+        def report(current: int):
+            if is_cancelled is not None and is_cancelled():
+                raise AnalysisCancelled("因子分析已取消")
+            if progress is not None:
+                progress(current, 100)
+
         try:
-            # 生成模拟数据
-            data = self._generate_sample_data(stock_code, start_date, end_date)
-            
-            # 计算因子
-            data = self._calculate_factors(data, factors)
-            
-            # 根据分析类型运行分析
+            report(0)
+            data, missing = self._factor_data(stock_code, start_date, end_date, factors, window, report)
+            report(70)
+            available = [factor for factor in factors if factor not in missing]
+
             if analysis_type == "因子有效性检验":
-                result = self._factor_validity_test(data, factors, window)
+                result = self._factor_validity_test(data, available, window, report)
             elif analysis_type == "因子相关性分析":
-                result = self._factor_correlation_analysis(data, factors)
-            elif analysis_type == "因子组合分析":
-                result = self._factor_combination_analysis(data, factors, window)
+                result = self._factor_correlation_analysis(data, available)
             else:
-                raise ValueError(f"不支持的分析类型: {analysis_type}")
-            
+                result = self._factor_combination_analysis(data, available, window)
+            report(100)
+
             # 添加基本信息
             result.update({
                 'analysis_type': analysis_type,
                 'stock_code': stock_code,
                 'start_date': start_date,
                 'end_date': end_date,
-                'factors': factors
+                'factors': factors,
+                'missing_factors': missing,
             })
-            
             return result
-            
+
+        except AnalysisCancelled:
+            logger.info(f"因子分析已取消: {stock_code}")
+            raise
         except Exception as e:
             logger.error(f"分析失败: {e}")
             raise
-    
-    def _generate_sample_data(self, stock_code, start_date, end_date):
+
+    def _get_data_manager(self) -> DataManager:
+        """按配置创建数据管理器（只创建一次）"""
+        if self.data_manager is None:
+            config = get_config()
+            self.data_manager = DataManager(config, DatabaseManager(config))
+        return self.data_manager
+
+    def _factor_data(self, stock_code, start_date, end_date, factors, window,
+                     report: Callable[[int], None]) -> Tuple[pl.DataFrame, List[str]]:
         """
-        生成模拟数据
-        
-        Args:
-            stock_code: 股票代码
-            start_date: 开始日期
-            end_date: 结束日期
-            
+        加载数据并计算因子（带缓存）
+
         Returns:
-            pl.DataFrame: 模拟数据
+            Tuple[pl.DataFrame, List[str]]: (包含因子列和下一日收益率forward_return的数据, 数据中缺少的因子)
         """
-        # 解析日期
-        start = datetime.strptime(start_date, "%Y-%m-%d")
-        end = datetime.strptime(end_date, "%Y-%m-%d")
-        
-        # 生成日期序列
-        dates = []
-        current = start
-        while current <= end:
-            dates.append(current)
-            current += timedelta(days=1)
-        
-        # 过滤掉非交易日（简单模拟，只保留周一到周五）
-        trading_dates = [d for d in dates if d.weekday() < 5]
-        
-        # 生成价格数据
-        np.random.seed(42)  # 固定种子以确保结果可复现
-        base_price = 100.0
-        prices = []
-        price = base_price
-        
-        for _ in trading_dates:
-            # 添加一些随机波动
-            change = np.random.normal(0, 1)
-            price = max(1, price + change)
-            prices.append(price)
-        
-        # 生成成交量数据
-        volumes = np.random.randint(100000, 1000000, size=len(trading_dates))
-        
-        # 创建DataFrame
-        data = pl.DataFrame({
-            'date': trading_dates,
-            'open': [p * (1 + np.random.normal(0, 0.01)) for p in prices],
-            'high': [p * (1 + np.random.normal(0, 0.02)) for p in prices],
-            'low': [p * (1 - np.random.normal(0, 0.02)) for p in prices],
-            'close': prices,
-            'volume': volumes
-        })
-        
-        return data
-    
-    def _calculate_factors(self, data, factors):
+        key = (stock_code, start_date, end_date, tuple(sorted(set(factors))), window)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            logger.debug(f"复用缓存的因子数据: {stock_code} {start_date}~{end_date}")
+            return self._cache[key]
+
+        data = self._get_data_manager().get_stock_data(stock_code, start_date, end_date)
+        if data is None or data.is_empty():
+            raise DataNotFoundError("股票数据", f"{stock_code} {start_date}~{end_date}")
+        report(40)
+        entry = self._calculate_factors(data, factors)
+        self._cache[key] = entry
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return entry
+
+    def _calculate_factors(self, data: pl.DataFrame, factors) -> Tuple[pl.DataFrame, List[str]]:
         """
-        计算因子
-        
+        在一个惰性查询中计算全部所选因子
+
+        有前复权价格（qfq_*列）时用前复权价格计算。
+
         Args:
             data: 股票数据
             factors: 因子列表
-            
+
         Returns:
-            pl.DataFrame: 包含因子的数据
+            Tuple[pl.DataFrame, List[str]]: (包含因子列和forward_return的数据, 数据中缺少的因子)
         """
-        # 计算各种因子
-        if 'MACD' in factors:
-            # 计算MACD
-            ema12 = data['close'].ewm_mean(span=12)
-            ema26 = data['close'].ewm_mean(span=26)
-            macd = ema12 - ema26
-            signal = macd.ewm_mean(span=9)
-            histogram = macd - signal
-            data = data.with_columns([
-                macd.alias('macd'),
-                signal.alias('macd_signal'),
-                histogram.alias('macd_hist')
-            ])
-        
-        if 'RSI' in factors:
-            # 计算RSI
-            delta = data['close'].diff()
-            gain = delta.apply(lambda x: x if x > 0 else 0)
-            loss = delta.apply(lambda x: -x if x < 0 else 0)
-            avg_gain = gain.rolling_mean(window_size=14)
-            avg_loss = loss.rolling_mean(window_size=14)
-            rs = avg_gain / (avg_loss + 1e-10)
-            rsi = 100 - (100 / (1 + rs))
-            data = data.with_columns([rsi.alias('rsi')])
-        
-        if 'BOLL' in factors:
-            # 计算布林带
-            ma20 = data['close'].rolling_mean(window_size=20)
-            std20 = data['close'].rolling_std(window_size=20)
-            upper = ma20 + 2 * std20
-            lower = ma20 - 2 * std20
-            data = data.with_columns([
-                ma20.alias('boll_mid'),
-                upper.alias('boll_upper'),
-                lower.alias('boll_lower')
-            ])
-        
-        if 'KDJ' in factors:
-            # 计算KDJ
-            low = data['low'].rolling_min(window_size=9)
-            high = data['high'].rolling_max(window_size=9)
-            rsv = (data['close'] - low) / (high - low + 1e-10) * 100
-            k = rsv.ewm_mean(span=3)
-            d = k.ewm_mean(span=3)
-            j = 3 * k - 2 * d
-            data = data.with_columns([
-                k.alias('kdj_k'),
-                d.alias('kdj_d'),
-                j.alias('kdj_j')
-            ])
-        
-        if 'MA' in factors:
-            # 计算移动平均线
-            data = data.with_columns([
-                data['close'].rolling_mean(window_size=5).alias('ma5'),
-                data['close'].rolling_mean(window_size=10).alias('ma10'),
-                data['close'].rolling_mean(window_size=20).alias('ma20'),
-                data['close'].rolling_mean(window_size=60).alias('ma60')
-            ])
-        
-        if 'ATR' in factors:
-            # 计算ATR
-            tr1 = data['high'] - data['low']
-            tr2 = abs(data['high'] - data['close'].shift(1))
-            tr3 = abs(data['low'] - data['close'].shift(1))
-            # 使用Polars的max方法计算最大值
-            tr = pl.max_horizontal([tr1, tr2, tr3])
-            atr = tr.rolling_mean(window_size=14)
-            data = data.with_columns([atr.alias('atr')])
-        
-        if 'WR' in factors:
-            # 计算威廉指标
-            low = data['low'].rolling_min(window_size=14)
-            high = data['high'].rolling_max(window_size=14)
-            wr = (high - data['close']) / (high - low + 1e-10) * 100
-            data = data.with_columns([wr.alias('wr')])
-        
-        if 'CCI' in factors:
-            # 计算CCI
-            typical_price = (data['high'] + data['low'] + data['close']) / 3
-            ma = typical_price.rolling_mean(window_size=14)
-            mean_dev = abs(typical_price - ma).rolling_mean(window_size=14)
-            cci = (typical_price - ma) / (0.015 * mean_dev)
-            data = data.with_columns([cci.alias('cci')])
-        
-        if 'PE' in factors:
-            # 模拟市盈率
-            pe = np.random.normal(15, 5, size=len(data))
-            data = data.with_columns([pl.Series('pe', pe)])
-        
-        if 'PB' in factors:
-            # 模拟市净率
-            pb = np.random.normal(2, 0.5, size=len(data))
-            data = data.with_columns([pl.Series('pb', pb)])
-        
-        if 'ROE' in factors:
-            # 模拟净资产收益率
-            roe = np.random.normal(10, 3, size=len(data))
-            data = data.with_columns([pl.Series('roe', roe)])
-        
-        if 'EPS' in factors:
-            # 模拟每股收益
-            eps = np.random.normal(1, 0.3, size=len(data))
-            data = data.with_columns([pl.Series('eps', eps)])
-        
-        if 'MOM1M' in factors:
-            # 1个月动量
-            mom1m = data['close'].pct_change(20)
-            data = data.with_columns([mom1m.alias('mom1m')])
-        
-        if 'MOM3M' in factors:
-            # 3个月动量
-            mom3m = data['close'].pct_change(60)
-            data = data.with_columns([mom3m.alias('mom3m')])
-        
-        if 'MOM6M' in factors:
-            # 6个月动量
-            mom6m = data['close'].pct_change(120)
-            data = data.with_columns([mom6m.alias('mom6m')])
-        
-        if 'MOM12M' in factors:
-            # 12个月动量
-            mom12m = data['close'].pct_change(240)
-            data = data.with_columns([mom12m.alias('mom12m')])
-        
-        return data
-    
-    def _factor_validity_test(self, data, factors, window):
+        prices = [pl.col(f'qfq_{name}' if f'qfq_{name}' in data.columns else name).cast(pl.Float64).alias(name)
+                  for name in ('open', 'high', 'low', 'close')]
+        base = [pl.col('date')] + prices
+        if 'volume' in data.columns:
+            base.append(pl.col('volume').cast(pl.Float64))
+
+        expressions, missing = [], []
+        for factor in dict.fromkeys(factors):
+            if factor in FUNDAMENTAL_FACTORS:
+                column = FACTOR_COLUMNS[factor][0]
+                if column in data.columns:
+                    expressions.append(pl.col(column).cast(pl.Float64))
+                else:
+                    missing.append(factor)
+            else:
+                expressions.extend(_factor_expressions(factor))
+        if missing:
+            logger.warning(f"数据中没有以下基本面因子，不参与分析: {missing}")
+
+        frame = (data.lazy()
+                 .with_columns(base)
+                 .sort('date')
+                 .with_columns(expressions)
+                 .with_columns((pl.col('close').shift(-1) / pl.col('close') - 1).alias('forward_return'))
+                 # 除零得到的NaN、无穷大按缺失处理
+                 .with_columns(pl.col(pl.Float64).replace([np.inf, -np.inf], None).fill_nan(None))
+                 .collect())
+        return frame, missing
+
+    def _factor_validity_test(self, data, factors, window, report: Callable[[int], None]):
         """
         因子有效性检验
-        
+
+        逐个因子计算与下一日收益率的IC、滚动IC和分层测试（见_factor_statistics）。
+
         Args:
-            data: 股票数据
+            data: 因子数据
             factors: 因子列表
             window: 滚动窗口
-            
+            report: 进度回调
+
         Returns:
             dict: 分析结果
         """
         factor_results = {}
-        
-        # 计算收益率
-        data = data.with_columns([data['close'].pct_change(1).alias('return')])
-        
-        for factor in factors:
-            # 获取因子列名
-            factor_col = factor.lower()
-            if factor_col not in data.columns:
+        for i, factor in enumerate(factors):
+            column = FACTOR_COLUMNS[factor][0]
+            sample = data.select(column, 'forward_return').drop_nulls()
+            if sample.height < 2:
                 continue
-            
-            # 计算因子与收益率的相关性（IC值）
-            corr_matrix = data[[factor_col, 'return']].corr()
-            ic = corr_matrix.get_column(factor_col)[1]
-            
-            # 计算分层测试
-            # 将因子值分为5层
-            data = data.with_columns([
-                pl.col(factor_col).qcut(5).alias(f'{factor_col}_quantile')
-            ])
-            
-            # 计算每层的平均收益率
-            quantile_returns = data.groupby(f'{factor_col}_quantile').agg([
-                pl.col('return').mean().alias('avg_return')
-            ]).sort(f'{factor_col}_quantile')
-            
-            # 计算多空收益
-            long_return = quantile_returns[-1]['avg_return'].item()
-            short_return = quantile_returns[0]['avg_return'].item()
-            long_short_return = long_return - short_return
-            
-            factor_results[factor] = {
-                'ic': ic,
-                'long_return': long_return,
-                'short_return': short_return,
-                'long_short_return': long_short_return
-            }
-        
+
+            factor_results[factor] = _factor_statistics(sample, column, window)
+            report(70 + 30 * (i + 1) // max(len(factors), 1))
+
         return {
             'factor_results': factor_results
         }
-    
+
     def _factor_correlation_analysis(self, data, factors):
         """
         因子相关性分析
-        
+
         Args:
-            data: 股票数据
+            data: 因子数据
             factors: 因子列表
-            
+
         Returns:
             dict: 分析结果
         """
-        # 获取因子列
-        factor_cols = []
-        for factor in factors:
-            factor_col = factor.lower()
-            if factor_col in data.columns:
-                factor_cols.append(factor_col)
-        
-        # 计算相关性矩阵
+        factor_cols = [FACTOR_COLUMNS[factor][0] for factor in factors]
+
+        # 计算相关性矩阵（逐对使用共同的有效样本）
         if factor_cols:
-            correlation_matrix = data[factor_cols].corr().to_numpy().tolist()
+            values = data.select(factor_cols).to_numpy().astype(np.float64)
+            correlation_matrix = pairwise_correlation(values).tolist()
         else:
             correlation_matrix = []
-        
+
         return {
             'correlation_matrix': correlation_matrix,
             'factor_columns': factor_cols
         }
-    
+
     def _factor_combination_analysis(self, data, factors, window):
         """
         因子组合分析
-        
+
+        各因子标准化后等权相加得到组合因子，再做与有效性检验相同的IC和分层测试。
+
         Args:
-            data: 股票数据
+            data: 因子数据
             factors: 因子列表
             window: 滚动窗口
-            
+
         Returns:
             dict: 分析结果
         """
-        # 计算收益率
-        data = data.with_columns([data['close'].pct_change(1).alias('return')])
-        
-        # 构建因子组合
-        factor_cols = []
-        for factor in factors:
-            factor_col = factor.lower()
-            if factor_col in data.columns:
-                factor_cols.append(factor_col)
-        
-        # 简单等权组合
+        factor_cols = [FACTOR_COLUMNS[factor][0] for factor in factors]
+        combination = {'ic': 0, 'long_return': 0, 'short_return': 0, 'long_short_return': 0}
         if factor_cols:
-            data = data.with_columns([
-                pl.sum_horizontal(factor_cols).alias('factor_combination')
-            ])
-            
-            # 计算组合因子与收益率的相关性
-            corr_matrix = data[['factor_combination', 'return']].corr()
-            ic = corr_matrix.get_column('factor_combination')[1]
-            
-            # 计算分层测试
-            data = data.with_columns([
-                pl.col('factor_combination').qcut(5).alias('factor_quantile')
-            ])
-            
-            quantile_returns = data.groupby('factor_quantile').agg([
-                pl.col('return').mean().alias('avg_return')
-            ]).sort('factor_quantile')
-            
-            long_return = quantile_returns[-1]['avg_return'].item()
-            short_return = quantile_returns[0]['avg_return'].item()
-            long_short_return = long_return - short_return
-        else:
-            ic = 0
-            long_return = 0
-            short_return = 0
-            long_short_return = 0
-        
+            standardized = [((pl.col(c) - pl.col(c).mean()) / pl.col(c).std()).alias(c) for c in factor_cols]
+            sample = (data
+                      .select(standardized + [pl.col('forward_return')])
+                      .drop_nulls()
+                      .select(pl.sum_horizontal(factor_cols).alias('factor_combination'), 'forward_return'))
+            if sample.height >= 2:
+                combination = _factor_statistics(sample, 'factor_combination', window)
+
         return {
-            'factor_combination': {
-                'ic': ic,
-                'long_return': long_return,
-                'short_return': short_return,
-                'long_short_return': long_short_return
-            }
+            'factor_combination': combination
         }
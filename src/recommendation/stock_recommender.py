@@ -4,9 +4,12 @@
 """
 股票推荐器，用于基于多因子模型推荐股票
 支持多种推荐算法：多因子选股、行业轮动、动量策略
+
+评分在一个Polars惰性查询中完成：按股票分组聚合出全部股票的因子和评分，
+再用top_k取出排名靠前的股票，可选按行业内标准化评分排名。
 """
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import polars as pl
 import numpy as np
 from loguru import logger
@@ -24,7 +27,8 @@ class StockRecommender:
         self.recommendations = []
     
     def recommend_stocks(self, stocks_data: pl.DataFrame, top_n: int = 10, algorithm: str = "多因子选股", 
-                        industry: str = "全部行业", weights: Dict[str, float] = None, **params) -> List[Dict[str, Any]]:
+                        industry: str = "全部行业", weights: Dict[str, float] = None,
+                        industry_neutral: bool = False, **params) -> List[Dict[str, Any]]:
         """
         推荐股票
         
@@ -34,14 +38,67 @@ class StockRecommender:
             algorithm: 推荐算法，可选值：多因子选股、行业轮动、动量策略
             industry: 行业过滤，"全部行业"表示不过滤
             weights: 因子权重字典
+            industry_neutral: 是否按行业内标准化后的评分排名，避免推荐集中在少数行业
             **params: 其他推荐参数
             
         Returns:
             List[Dict[str, Any]]: 推荐结果
         """
+        query = self._score_query(stocks_data, algorithm, industry, weights, industry_neutral, params)
+        if query is None:
+            return []
+        
+        ranking = ['industry_score', 'risk_adjusted_score'] if self._is_neutral(stocks_data, industry_neutral) \
+            else ['risk_adjusted_score']
+        top = query.top_k(top_n, by=ranking).sort(ranking, descending=True).collect()
+        self.recommendations = top.to_dicts()
+        
+        logger.info(f"推荐完成，共推荐 {len(self.recommendations)} 只股票")
+        return self.recommendations
+    
+    def score_stocks(self, stocks_data: pl.DataFrame, algorithm: str = "多因子选股", industry: str = "全部行业",
+                     weights: Dict[str, float] = None, industry_neutral: bool = False, **params) -> pl.DataFrame:
+        """
+        对全部股票评分，不排序、不截取
+        
+        Args:
+            stocks_data: 股票数据
+            algorithm: 推荐算法，可选值：多因子选股、行业轮动、动量策略
+            industry: 行业过滤，"全部行业"表示不过滤
+            weights: 因子权重字典
+            industry_neutral: 是否增加行业内标准化评分列industry_score
+            **params: 其他推荐参数
+            
+        Returns:
+            pl.DataFrame: 每只股票一行的评分结果，字段与recommend_stocks返回的字典相同
+        """
+        query = self._score_query(stocks_data, algorithm, industry, weights, industry_neutral, params)
+        return pl.DataFrame() if query is None else query.collect()
+    
+    @staticmethod
+    def _is_neutral(stocks_data: pl.DataFrame, industry_neutral: bool) -> bool:
+        return industry_neutral and 'industry' in stocks_data.columns
+    
+    def _score_query(self, stocks_data: pl.DataFrame, algorithm: str, industry: str,
+                     weights: Dict[str, float], industry_neutral: bool,
+                     params: Dict[str, Any]) -> Optional[pl.LazyFrame]:
+        """
+        构建评分的惰性查询：按股票分组一次聚合出全部股票的因子，再逐列计算评分、信号和风险等级
+        
+        Args:
+            stocks_data: 股票数据
+            algorithm: 推荐算法
+            industry: 行业过滤
+            weights: 因子权重
+            industry_neutral: 是否计算行业内标准化评分
+            params: 其他推荐参数
+            
+        Returns:
+            Optional[pl.LazyFrame]: 评分查询，没有可评分的数据时为None
+        """
         if stocks_data.is_empty():
             logger.warning("没有股票数据")
-            return []
+            return None
         
         if weights is None:
             weights = {
@@ -56,164 +113,154 @@ class StockRecommender:
             stocks_data = stocks_data.filter(pl.col('industry') == industry)
             if stocks_data.is_empty():
                 logger.warning(f"没有{industry}行业的股票数据")
-                return []
+                return None
         
-        stock_groups = stocks_data.group_by('stock_code')
-        
-        scored_stocks = []
-        
-        for stock_code, group in stock_groups:
-            latest_data = group.sort('date').tail(1)
-            if latest_data.is_empty():
-                continue
-            
-            latest_data_dict = latest_data.to_dict(as_series=False)
-            latest_data = {}
-            for col, values in latest_data_dict.items():
-                if values:
-                    latest_data[col] = values[0]
-            
-            prices = group.sort('date')['close'].to_numpy()
-            if len(prices) < 20:
-                continue
-            
-            if algorithm == "动量策略":
-                score, risk_score = self._calculate_momentum_score(prices, group, params)
-            elif algorithm == "行业轮动":
-                score, risk_score = self._calculate_industry_rotation_score(prices, group, params)
+        if algorithm == "动量策略":
+            score, risk_score = self._momentum_score_exprs(params)
+        elif algorithm == "行业轮动":
+            score, risk_score = self._industry_rotation_score_exprs(params)
+        else:
+            score, risk_score = self._multi_factor_score_exprs(weights, params)
+        
+        columns = stocks_data.columns
+        stock_name = pl.col('stock_name').last() if 'stock_name' in columns \
+            else pl.format('股票{}', pl.col('stock_code').first())
+        industry_name = pl.col('industry').last() if 'industry' in columns else pl.lit('未知')
+        
+        # group_by保持组内的行顺序，只按日期稳定排序即可使每只股票组内日期升序，
+        # first/last/tail即为最早、最新和最近N条记录；按字符串代码排序的开销是按日期排序的数倍
+        query = (stocks_data.lazy()
+                 .sort('date', maintain_order=True)
+                 .group_by('stock_code')
+                 .agg(pl.len().alias('__bars'),
+                      stock_name.alias('stock_name'),
+                      score.alias('score'),
+                      risk_score.alias('risk_score'),
+                      pl.col('close').last().alias('current_price'),
+                      industry_name.alias('industry'))
+                 .filter(pl.col('__bars') >= 20)
+                 .drop('__bars'))
+        
+        risk_adjusted = pl.col('score') * (1 - pl.col('risk_score') / 100)
+        query = query.with_columns(
+            risk_adjusted.alias('risk_adjusted_score'),
+            self._signal_expr(risk_adjusted).alias('signal'),
+            pl.when(pl.col('risk_score') < 30).then(pl.lit('低'))
+            .when(pl.col('risk_score') < 60).then(pl.lit('中'))
+            .otherwise(pl.lit('高')).alias('risk_level'),
+            (pl.col('score') * 100).alias('expected_return'))
+        
+        if industry_neutral:
+            if self._is_neutral(stocks_data, industry_neutral):
+                # 行业内z-score，行业内只有一只股票或评分相同时为0
+                mean = pl.col('risk_adjusted_score').mean().over('industry')
+                std = pl.col('risk_adjusted_score').std().over('industry')
+                query = query.with_columns(
+                    pl.when(std > 0).then((pl.col('risk_adjusted_score') - mean) / std)
+                    .otherwise(0.0).alias('industry_score'))
             else:
-                score, risk_score = self._calculate_multi_factor_score(prices, group, weights, params)
-            
-            risk_adjusted_score = score * (1 - risk_score / 100)
-            signal = self._generate_signal(risk_adjusted_score, score, risk_score)
-            risk_level = '低' if risk_score < 30 else '中' if risk_score < 60 else '高'
-            
-            scored_stocks.append({
-                'stock_code': stock_code,
-                'stock_name': latest_data.get('stock_name', f'股票{stock_code}'),
-                'score': score,
-                'risk_score': risk_score,
-                'risk_adjusted_score': risk_adjusted_score,
-                'signal': signal,
-                'risk_level': risk_level,
-                'current_price': latest_data.get('close', 0),
-                'industry': latest_data.get('industry', '未知'),
-                'expected_return': score * 100
-            })
-        
-        scored_stocks.sort(key=lambda x: x['risk_adjusted_score'], reverse=True)
-        self.recommendations = scored_stocks[:top_n]
+                logger.warning("股票数据没有industry列，按全市场评分排名")
         
-        logger.info(f"推荐完成，共推荐 {len(self.recommendations)} 只股票")
-        return self.recommendations
+        return query.select('stock_code', 'stock_name', 'score', 'risk_score', 'risk_adjusted_score', 'signal',
+                            'risk_level', 'current_price', 'industry', 'expected_return',
+                            *(['industry_score'] if self._is_neutral(stocks_data, industry_neutral) else []))
+    
+    @staticmethod
+    def _lag(expr: pl.Expr, n: int) -> pl.Expr:
+        """组内倒数第n个值（n=1为最新值），记录不足n条时为null"""
+        return pl.when(pl.len() >= n).then(expr.tail(n).first())
+    
+    @staticmethod
+    def _relative_volatility(prices: pl.Expr) -> pl.Expr:
+        """价格的总体标准差除以均值"""
+        return prices.std(ddof=0) / prices.mean()
     
-    def _calculate_multi_factor_score(self, prices: np.ndarray, group: pl.DataFrame, 
-                                     weights: Dict[str, float], params: Dict[str, Any]) -> tuple:
+    def _multi_factor_score_exprs(self, weights: Dict[str, float], params: Dict[str, Any]) -> tuple:
         """
-        多因子评分
+        多因子评分的分组聚合表达式
         
         Args:
-            prices: 价格数组
-            group: 股票数据分组
             weights: 因子权重
             params: 参数
             
         Returns:
             tuple: (score, risk_score)
         """
-        momentum_10 = (prices[-1] - prices[-10]) / prices[-10] if len(prices) >= 10 else 0
-        momentum_20 = (prices[-1] - prices[-20]) / prices[-20] if len(prices) >= 20 else 0
-        volatility = np.std(prices[-20:]) / np.mean(prices[-20:]) if len(prices) >= 20 else 0
+        close, volume = pl.col('close'), pl.col('volume')
+        momentum_10 = (close.last() - self._lag(close, 10)) / self._lag(close, 10)
+        momentum_20 = (close.last() - self._lag(close, 20)) / self._lag(close, 20)
+        volatility = self._relative_volatility(close.tail(20))
         
-        volumes = group.sort('date')['volume'].to_numpy()
-        volume_change = (volumes[-1] - volumes[-10]) / volumes[-10] if len(volumes) >= 10 else 0
+        volume_change = (volume.last() - self._lag(volume, 10)) / self._lag(volume, 10)
         
-        returns = np.diff(prices) / prices[:-1]
-        sharpe_ratio = np.mean(returns) / (np.std(returns) + 1e-10) if len(returns) > 1 else 0
+        returns = close.pct_change()
+        sharpe_ratio = returns.mean() / (returns.std(ddof=0) + 1e-10)
         
         score = (
             (momentum_10 + momentum_20) * weights.get('momentum', 0.2) +
             (1 - volatility) * weights.get('volatility', 0.2) +
             volume_change * weights.get('value', 0.2) +
             sharpe_ratio * weights.get('quality', 0.2) +
-            np.mean(returns) * weights.get('growth', 0.2)
+            returns.mean() * weights.get('growth', 0.2)
         )
-        score = max(0, min(1, score))
-        
-        risk_score = min(100, volatility * 200)
-        return score, risk_score
+        return score.clip(0, 1), (volatility * 200).clip(upper_bound=100)
     
-    def _calculate_momentum_score(self, prices: np.ndarray, group: pl.DataFrame, 
-                                  params: Dict[str, Any]) -> tuple:
+    def _momentum_score_exprs(self, params: Dict[str, Any]) -> tuple:
         """
-        动量策略评分
+        动量策略评分的分组聚合表达式
         
         Args:
-            prices: 价格数组
-            group: 股票数据分组
-            params: 参数
+            params: 参数，period为动量周期（默认20，超过记录数时取全部记录）
             
         Returns:
             tuple: (score, risk_score)
         """
         period = params.get('period', 20)
-        if len(prices) < period:
-            period = len(prices)
-        
-        momentum = (prices[-1] - prices[-period]) / prices[-period] if period > 0 else 0
+        if period <= 1:
+            return pl.lit(0.0), pl.lit(0.0)
         
-        volatility = np.std(prices[-period:]) / np.mean(prices[-period:]) if period > 1 else 0
+        window = pl.col('close').tail(period)
+        momentum = (window.last() - window.first()) / window.first()
+        volatility = self._relative_volatility(window)
         
-        score = max(0, min(1, momentum * 2))
-        
-        risk_score = min(100, volatility * 200)
-        return score, risk_score
+        return (momentum * 2).clip(0, 1), (volatility * 200).clip(upper_bound=100)
     
-    def _calculate_industry_rotation_score(self, prices: np.ndarray, group: pl.DataFrame, 
-                                          params: Dict[str, Any]) -> tuple:
+    def _industry_rotation_score_exprs(self, params: Dict[str, Any]) -> tuple:
         """
-        行业轮动策略评分
+        行业轮动策略评分的分组聚合表达式
         
         Args:
-            prices: 价格数组
-            group: 股票数据分组
             params: 参数
             
         Returns:
             tuple: (score, risk_score)
         """
-        momentum_20 = (prices[-1] - prices[-20]) / prices[-20] if len(prices) >= 20 else 0
-        momentum_60 = (prices[-1] - prices[-60]) / prices[-60] if len(prices) >= 60 else 0
+        close, volume = pl.col('close'), pl.col('volume')
+        momentum_20 = (close.last() - self._lag(close, 20)) / self._lag(close, 20)
+        momentum_60 = ((close.last() - self._lag(close, 60)) / self._lag(close, 60)).fill_null(0.0)
         
-        volatility = np.std(prices[-20:]) / np.mean(prices[-20:]) if len(prices) >= 20 else 0
+        volatility = self._relative_volatility(close.tail(20))
         
-        volumes = group.sort('date')['volume'].to_numpy()
-        volume_momentum = (volumes[-5:] - volumes[-10:-5]).mean() / (volumes[-10:-5].mean() + 1e-10) if len(volumes) >= 10 else 0
+        previous = volume.tail(10).head(5).mean()
+        volume_momentum = (volume.tail(5).mean() - previous) / (previous + 1e-10)
         
         score = momentum_20 * 0.4 + momentum_60 * 0.3 + volume_momentum * 0.3
-        score = max(0, min(1, score + 0.5))
-        
-        risk_score = min(100, volatility * 200)
-        return score, risk_score
+        return (score + 0.5).clip(0, 1), (volatility * 200).clip(upper_bound=100)
     
-    def _generate_signal(self, risk_adjusted_score: float, score: float, risk_score: float) -> str:
+    @staticmethod
+    def _signal_expr(risk_adjusted_score: pl.Expr) -> pl.Expr:
         """
         生成推荐信号
         
         Args:
             risk_adjusted_score: 风险调整后的评分
-            score: 原始评分
-            risk_score: 风险评分
             
         Returns:
-            str: 推荐信号
+            pl.Expr: 推荐信号，buy/hold/sell
         """
-        if risk_adjusted_score > 0.7:
-            return 'buy'
-        elif risk_adjusted_score > 0.3:
-            return 'hold'
-        else:
-            return 'sell'
+        return (pl.when(risk_adjusted_score > 0.7).then(pl.lit('buy'))
+                .when(risk_adjusted_score > 0.3).then(pl.lit('hold'))
+                .otherwise(pl.lit('sell')))
     
     def get_recommendations(self) -> List[Dict[str, Any]]:
         """
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+通达信风格条件公式编译器
+
+把通达信选股公式（如 "KDJ.J < 0 AND VOL > 2 * MA(VOL, 5)"）解析为面板因子表达式
+（src.alpha.factors.panel_factors），由PanelFactorEngine编译为Polars惰性查询在全市场面板上求值，
+required_lookback给出得到最新一根K线的结果需要的历史K线数。
+
+语法：
+- 语句以分号分隔；"名称:=表达式" 定义中间变量，"名称:表达式" 定义输出线，最后一条语句为选股条件
+- 行情变量 OPEN/O、HIGH/H、LOW/L、CLOSE/C、VOL/V、AMOUNT/AMO
+- 运算符 + - * /、> < >= <= = <>、AND OR NOT（也可写作 && || !=），{...} 为注释
+- 函数 REF MA EMA SMA SUM HHV LLV STD STDP COUNT EVERY EXIST CROSS IF ABS MAX MIN SQRT LN NOT
+- "指标.输出线" 引用内置指标公式，指标名与IndicatorRegistry中的注册名一致（如 KDJ.J、MACD.MACD_HIST）
+
+与通达信一致，MA、SUM、HHV、LLV、STD在K线不足N根时按已有K线计算；条件为数值时非0即为真。
+"""
+
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+import polars as pl
+
+from src.alpha.factors.panel_factors import (PanelExpr, _as_expr, _map, _ts, col, log, sqrt, ts_cumsum, ts_delay,
+                                             ts_ewm, where)
+
+
+class FormulaError(ValueError):
+    """公式语法或语义错误"""
+
+
+# 行情变量 -> 面板列
+PRICE_VARIABLES = {
+    'OPEN': 'open', 'O': 'open',
+    'HIGH': 'high', 'H': 'high',
+    'LOW': 'low', 'L': 'low',
+    'CLOSE': 'close', 'C': 'close',
+    'VOL': 'volume', 'V': 'volume', 'VOLUME': 'volume',
+    'AMOUNT': 'amount', 'AMO': 'amount',
+}
+
+# 内置指标公式，键与IndicatorRegistry的注册名一致，输出线与calculate_multiple_indicators_polars的默认列对应
+INDICATOR_FORMULAS: Dict[str, str] = {
+    'ma': "MA5:MA(CLOSE,5); MA10:MA(CLOSE,10); MA20:MA(CLOSE,20); MA60:MA(CLOSE,60);",
+    'vol_ma': "VOL_MA5:MA(VOL,5); VOL_MA10:MA(VOL,10);",
+    'macd': "MACD:EMA(CLOSE,12)-EMA(CLOSE,26); MACD_SIGNAL:EMA(MACD,9); MACD_HIST:MACD-MACD_SIGNAL;",
+    'rsi': ("LC:=REF(CLOSE,1); GAIN:=SMA(MAX(CLOSE-LC,0),14,1); LOSS:=SMA(MAX(LC-CLOSE,0),14,1);"
+            "RSI14:IF(LOSS=0,100,100-100/(1+GAIN/LOSS));"),
+    'kdj': ("RSV:=(CLOSE-LLV(LOW,14))/(HHV(HIGH,14)-LLV(LOW,14))*100;"
+            "K:SMA(RSV,3,1); D:SMA(K,3,1); J:3*K-2*D;"),
+    'boll': "MB:MA(CLOSE,20); UP:MB+2*STD(CLOSE,20); DN:MB-2*STD(CLOSE,20);",
+}
+
+_TOKEN = re.compile(r"""
+    (?P<space>\s+|\{[^}]*\})
+  | (?P<number>\d+\.?\d*|\.\d+)
+  | (?P<name>[A-Za-z_一-鿿][A-Za-z0-9_一-鿿]*)
+  | (?P<op>:=|>=|<=|<>|!=|==|&&|\|\||[-+*/(),;:<>=.])
+""", re.VERBOSE)
+
+_COMPARISONS = {
+    '>': lambda a, b: a > b, '<': lambda a, b: a < b,
+    '>=': lambda a, b: a >= b, '<=': lambda a, b: a <= b,
+    '=': lambda a, b: a == b, '==': lambda a, b: a == b,
+    '<>': lambda a, b: a != b, '!=': lambda a, b: a != b,
+}
+
+# 语法树节点：('num', 值) ('name', 名称) ('ref', 指标, 输出线) ('call', 函数, 参数)
+# ('binary', 运算符, 左, 右) ('neg', 子节点) ('not', 子节点)
+Node = Tuple
+
+
+def tokenize(text: str) -> List[Tuple[str, str, int]]:
+    """
+    把公式切分为 (类型, 文本, 位置) 序列，名称统一为大写
+
+    Raises:
+        FormulaError: 存在无法识别的字符
+    """
+    tokens, position = [], 0
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None:
+            raise FormulaError(f"公式第{position + 1}个字符无法识别: {text[position:position + 10]!r}")
+        kind = match.lastgroup
+        if kind != 'space':
+            value = match.group()
+            if kind == 'name':
+                value = value.upper()
+                if value in ('AND', 'OR', 'NOT'):
+                    kind = 'op'
+            tokens.append((kind, value, position))
+        position = match.end()
+    tokens.append(('end', '', len(text)))
+    return tokens
+
+
+class _Parser:
+    """递归下降解析器，优先级从低到高为 OR、AND、NOT、比较、加减、乘除、正负号"""
+
+    def __init__(self, text: str):
+        self.tokens = tokenize(text)
+        self.index = 0
+
+    def peek(self, offset: int = 0) -> Tuple[str, str, int]:
+        return self.tokens[min(self.index + offset, len(self.tokens) - 1)]
+
+    def take(self) -> Tuple[str, str, int]:
+        token = self.peek()
+        self.index += 1
+        return token
+
+    def expect(self, value: str):
+        kind, text, position = self.take()
+        if text != value or kind != 'op':
+            raise FormulaError(f"公式第{position + 1}个字符处应为 {value!r}，实际为 {text or '结尾'!r}")
+
+    def statements(self) -> List[Tuple[Optional[str], bool, Node]]:
+        """解析全部语句，返回 (名称, 是否为输出线, 语法树) 列表"""
+        result = []
+        while self.peek()[0] != 'end':
+            if self.peek()[1] == ';':
+                self.take()
+                continue
+            name, output = None, False
+            if self.peek()[0] == 'name' and self.peek(1)[1] in (':=', ':'):
+                name = self.take()[1]
+                output = self.take()[1] == ':'
+            result.append((name, output, self.expression()))
+            if self.peek()[0] != 'end':
+                self.expect(';')
+        if not result:
+            raise FormulaError("公式为空")
+        return result
+
+    def expression(self) -> Node:
+        node = self.conjunction()
+        while self.peek()[1] in ('OR', '||'):
+            self.take()
+            node = ('binary', 'OR', node, self.conjunction())
+        return node
+
+    def conjunction(self) -> Node:
+        node = self.negation()
+        while self.peek()[1] in ('AND', '&&'):
+            self.take()
+            node = ('binary', 'AND', node, self.negation())
+        return node
+
+    def negation(self) -> Node:
+        if self.peek()[1] == 'NOT' and self.peek(1)[1] != '(':
+            self.take()
+            return ('not', self.negation())
+        return self.comparison()
+
+    def comparison(self) -> Node:
+        node = self.additive()
+        while self.peek()[0] == 'op' and self.peek()[1] in _COMPARISONS:
+            op = self.take()[1]
+            node = ('binary', op, node, self.additive())
+        return node
+
+    def additive(self) -> Node:
+        node = self.term()
+        while self.peek()[1] in ('+', '-'):
+            op = self.take()[1]
+            node = ('binary', op, node, self.term())
+        return node
+
+    def term(self) -> Node:
+        node = self.unary()
+        while self.peek()[1] in ('*', '/'):
+            op = self.take()[1]
+            node = ('binary', op, node, self.unary())
+        return node
+
+    def unary(self) -> Node:
+        if self.peek()[1] == '-':
+            self.take()
+            return ('neg', self.unary())
+        if self.peek()[1] == '+':
+            self.take()
+            return self.unary()
+        return self.primary()
+
+    def primary(self) -> Node:
+        kind, text, position = self.take()
+        if kind == 'number':
+            return ('num', float(text))
+        if text == '(':
+            node = self.expression()
+            self.expect(')')
+            return node
+        if kind == 'name' or text == 'NOT':
+            if self.peek()[1] == '(':
+                self.take()
+                args = []
+                if self.peek()[1] != ')':
+                    args.append(self.expression())
+                    while self.peek()[1] == ',':
+                        self.take()
+                        args.append(self.expression())
+                self.expect(')')
+                return ('call', text, args)
+            if self.peek()[1] == '.':
+                self.take()
+                line_kind, line, line_position = self.take()
+                if line_kind != 'name':
+                    raise FormulaError(f"公式第{line_position + 1}个字符处应为指标输出线名称")
+                return ('ref', text, line)
+            return ('name', text)
+        raise FormulaError(f"公式第{position + 1}个字符处不应出现 {text or '结尾'!r}")
+
+
+# ---------------------------------------------------------------------------
+# 通达信函数（窗口不足N根K线时按已有K线计算）
+# ---------------------------------------------------------------------------
+
+def _rolling(op: str, method: str, x: PanelExpr, n: int, **kwargs) -> PanelExpr:
+    return _ts(op, lambda a: getattr(a, method)(n, min_periods=1, **kwargs), x, params=(n,), lookback=n - 1)
+
+
+def _extreme(op: str, method: Callable[..., pl.Expr], a: PanelExpr, b: PanelExpr) -> PanelExpr:
+    """逐元素最大/最小值，任一参数无值时结果无值"""
+    return _map(op, lambda x, y: pl.when(x.is_not_null() & y.is_not_null()).then(method(x, y)), a, b)
+
+
+def _count(condition: PanelExpr, n: int) -> PanelExpr:
+    hits = where(condition, 1.0, 0.0)
+    return ts_cumsum(hits) if n == 0 else _rolling('tdx_sum', 'rolling_sum', hits, n)
+
+
+def _cross(a: PanelExpr, b: PanelExpr) -> PanelExpr:
+    return (a > b) & (ts_delay(a, 1) <= ts_delay(b, 1))
+
+
+# 函数名 -> (需要为常数的参数位置, 参数个数, 构建函数, 结果是否为条件)
+_FUNCTIONS: Dict[str, Tuple[Tuple[int, ...], int, Callable[..., PanelExpr], bool]] = {
+    'REF': ((1,), 2, lambda x, n: ts_delay(x, int(n)), False),
+    'MA': ((1,), 2, lambda x, n: _rolling('tdx_ma', 'rolling_mean', x, int(n)), False),
+    'EMA': ((1,), 2, lambda x, n: ts_ewm(x, 2 / (n + 1)), False),
+    'SMA': ((1, 2), 3, lambda x, n, m: ts_ewm(x, m / n), False),
+    'SUM': ((1,), 2, lambda x, n: ts_cumsum(x) if n == 0 else _rolling('tdx_sum', 'rolling_sum', x, int(n)), False),
+    'HHV': ((1,), 2, lambda x, n: _rolling('tdx_hhv', 'rolling_max', x, int(n)), False),
+    'LLV': ((1,), 2, lambda x, n: _rolling('tdx_llv', 'rolling_min', x, int(n)), False),
+    'STD': ((1,), 2, lambda x, n: _rolling('tdx_std', 'rolling_std', x, int(n)), False),
+    'STDP': ((1,), 2, lambda x, n: _rolling('tdx_stdp', 'rolling_std', x, int(n), ddof=0), False),
+    'COUNT': ((1,), 2, lambda x, n: _count(x, int(n)), False),
+    'EVERY': ((1,), 2, lambda x, n: _count(x, int(n)) == int(n), True),
+    'EXIST': ((1,), 2, lambda x, n: _count(x, int(n)) > 0, True),
+    'CROSS': ((), 2, _cross, True),
+    'IF': ((), 3, lambda c, a, b: where(c, a, b), False),
+    'IFF': ((), 3, lambda c, a, b: where(c, a, b), False),
+    'ABS': ((), 1, abs, False),
+    'MAX': ((), 2, lambda a, b: _extreme('tdx_max', pl.max_horizontal, a, b), False),
+    'MIN': ((), 2, lambda a, b: _extreme('tdx_min', pl.min_horizontal, a, b), False),
+    'SQRT': ((), 1, sqrt, False),
+    'LN': ((), 1, log, False),
+    'NOT': ((), 1, lambda x: x == 0, True),
+}
+
+# 参数需要按条件（布尔）解释的函数及位置
+_CONDITION_ARGS = {'COUNT': (0,), 'EVERY': (0,), 'EXIST': (0,), 'IF': (0,), 'IFF': (0,)}
+
+
+class CompiledFormula:
+    """
+    编译后的公式
+
+    Attributes:
+        text: 公式原文
+        condition: 选股条件（最后一条语句，布尔表达式）
+        outputs: 输出线名称 -> 表达式，按定义顺序
+    """
+
+    def __init__(self, text: str, condition: PanelExpr, outputs: Dict[str, PanelExpr]):
+        self.text = text
+        self.condition = condition
+        self.outputs = outputs
+
+
+class FormulaCompiler:
+    """
+    公式编译器，把通达信风格公式编译为面板因子表达式
+
+    "指标.输出线" 引用的指标公式只编译一次并缓存。
+    """
+
+    def __init__(self, indicators: Optional[Dict[str, str]] = None):
+        """
+        初始化公式编译器
+
+        Args:
+            indicators: 指标名 -> 公式，默认使用INDICATOR_FORMULAS
+        """
+        self.indicators = dict(INDICATOR_FORMULAS if indicators is None else indicators)
+        self._indicator_cache: Dict[str, Dict[str, PanelExpr]] = {}
+
+    def register_indicator(self, name: str, formula: str):
+        """
+        注册（或覆盖）一个可在公式中以 "名称.输出线" 引用的指标
+
+        Args:
+            name: 指标名（不区分大小写）
+            formula: 指标公式，输出线以 "名称:表达式" 定义
+        """
+        self.indicators[name.lower()] = formula
+        self._indicator_cache.pop(name.lower(), None)
+
+    def compile(self, text: str) -> CompiledFormula:
+        """
+        编译公式
+
+        Args:
+            text: 公式文本
+
+        Returns:
+            CompiledFormula: 选股条件和输出线
+
+        Raises:
+            FormulaError: 语法错误、未知的变量/函数/指标或参数不合法
+        """
+        variables: Dict[str, Tuple[PanelExpr, bool]] = {}
+        outputs: Dict[str, PanelExpr] = {}
+        result = None
+        for name, output, node in _Parser(text).statements():
+            result = self._compile(node, variables)
+            if name is not None:
+                variables[name] = result
+                if output:
+                    outputs[name] = result[0]
+        expr, is_condition = result
+        return CompiledFormula(text, expr if is_condition else expr != 0, outputs)
+
+    def _indicator(self, name: str) -> Dict[str, PanelExpr]:
+        """编译内置指标公式，返回其输出线"""
+        key = name.lower()
+        if key not in self._indicator_cache:
+            if key not in self.indicators:
+                raise FormulaError(f"未知的指标: {name}，可用指标: {', '.join(sorted(self.indicators))}")
+            self._indicator_cache[key] = self.compile(self.indicators[key]).outputs
+        return self._indicator_cache[key]
+
+    def _compile(self, node: Node, variables: Dict[str, Tuple[PanelExpr, bool]]) -> Tuple[PanelExpr, bool]:
+        """把语法树编译为 (表达式, 是否为条件)"""
+        kind = node[0]
+        if kind == 'num':
+            return _as_expr(node[1]), False
+        if kind == 'name':
+            if node[1] in variables:
+                return variables[node[1]]
+            if node[1] in PRICE_VARIABLES:
+                return col(PRICE_VARIABLES[node[1]]), False
+            raise FormulaError(f"未知的变量: {node[1]}")
+        if kind == 'ref':
+            lines = self._indicator(node[1])
+            if node[2] not in lines:
+                raise FormulaError(f"指标{node[1]}没有输出线{node[2]}，可用输出线: {', '.join(lines)}")
+            return lines[node[2]], False
+        if kind == 'neg':
+            return -self._number(node[1], variables), False
+        if kind == 'not':
+            return self._number(node[1], variables) == 0, True
+        if kind == 'binary':
+            op, left, right = node[1], node[2], node[3]
+            if op in ('AND', 'OR'):
+                a, b = self._condition(left, variables), self._condition(right, variables)
+                return (a & b if op == 'AND' else a | b), True
+            a, b = self._number(left, variables), self._number(right, variables)
+            if op in _COMPARISONS:
+                return _COMPARISONS[op](a, b), True
+            return {'+': a + b, '-': a - b, '*': a * b, '/': a / b}[op], False
+        return self._call(node[1], node[2], variables)
+
+    def _call(self, name: str, args: List[Node], variables) -> Tuple[PanelExpr, bool]:
+        """编译函数调用，常数参数（周期等）要求为数字"""
+        if name not in _FUNCTIONS:
+            raise FormulaError(f"未知的函数: {name}")
+        constant_positions, arity, build, is_condition = _FUNCTIONS[name]
+        if len(args) != arity:
+            raise FormulaError(f"函数{name}需要{arity}个参数，实际为{len(args)}个")
+        values = []
+        for position, arg in enumerate(args):
+            if position in constant_positions:
+                if arg[0] != 'num' or arg[1] < 0:
+                    raise FormulaError(f"函数{name}的第{position + 1}个参数应为非负常数")
+                values.append(arg[1])
+            elif position in _CONDITION_ARGS.get(name, ()):
+                values.append(self._condition(arg, variables))
+            else:
+                values.append(self._number(arg, variables))
+        if name == 'SMA' and not 0 < values[2] <= values[1]:
+            raise FormulaError(f"SMA参数无效: N={values[1]}, M={values[2]}")
+        if name in ('MA', 'HHV', 'LLV', 'STD', 'STDP', 'EMA', 'EVERY') and values[1] < 1:
+            raise FormulaError(f"函数{name}的周期应不小于1")
+        return build(*values), is_condition
+
+    def _number(self, node: Node, variables) -> PanelExpr:
+        """按数值编译，条件转换为1/0"""
+        expr, is_condition = self._compile(node, variables)
+        return where(expr, 1.0, 0.0) if is_condition else expr
+
+    def _condition(self, node: Node, variables) -> PanelExpr:
+        """按条件编译，数值非0为真"""
+        expr, is_condition = self._compile(node, variables)
+        return expr if is_condition else expr != 0
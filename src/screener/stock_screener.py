@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+全市场选股器
+
+选股规则是一条通达信风格条件公式（src.screener.formula），编译为面板因子表达式后由
+PanelFactorEngine生成一个Polars惰性查询。多条规则共用的子表达式（如同一条均线）只计算一次；
+每只股票只需加载公式lookback所需的最近若干根K线，在全市场面板上一次求出最新交易日满足条件的股票，
+不再需要逐只股票经过TechnicalAnalyzer计算全部指标。
+"""
+
+import time
+from typing import Dict, Iterable, List, Optional, Union
+
+import polars as pl
+from loguru import logger
+
+from src.alpha.calculator.panel_factor_engine import PanelFactorEngine
+from src.alpha.factors.panel_factors import PanelExpr, required_lookback
+from src.business.rules_engine import BusinessRule
+from src.screener.formula import CompiledFormula, FormulaCompiler
+
+
+class ScreenRule(BusinessRule):
+    """
+    选股规则，由一条通达信风格条件公式定义
+    """
+
+    def __init__(self, name: str, formula: str, description: str = "",
+                 compiler: Optional[FormulaCompiler] = None):
+        """
+        初始化选股规则
+
+        Args:
+            name: 规则名称，也是结果中条件列的列名
+            formula: 条件公式，如 "KDJ.J < 0 AND VOL > 2 * MA(VOL, 5)"
+            description: 规则描述
+            compiler: 公式编译器，默认使用内置指标公式
+
+        Raises:
+            FormulaError: 公式无法编译
+        """
+        super().__init__(name, description)
+        self.formula: CompiledFormula = (compiler or FormulaCompiler()).compile(formula)
+
+    def expressions(self) -> Dict[str, PanelExpr]:
+        """
+        规则在结果中的列：条件列（规则名）和各输出线（规则名.输出线名）
+
+        Returns:
+            Dict[str, PanelExpr]: 列名 -> 表达式
+        """
+        columns = {self.name: self.formula.condition}
+        for line, expr in self.formula.outputs.items():
+            columns[f'{self.name}.{line}'] = expr
+        return columns
+
+    @property
+    def lookback(self) -> Optional[int]:
+        """得到最新一根K线的结果需要此前多少根K线，None表示依赖全部历史"""
+        lookbacks = [required_lookback(expr) for expr in self.expressions().values()]
+        return None if None in lookbacks else max(lookbacks)
+
+    def evaluate(self, data, **kwargs) -> pl.DataFrame:
+        """
+        在面板上执行本规则选股
+
+        Args:
+            data: 多股票长表面板
+            **kwargs: 传给StockScreener.screen的参数（symbol_col、date_col、as_of）
+
+        Returns:
+            pl.DataFrame: 满足条件的股票
+        """
+        screener = StockScreener(kwargs.pop('symbol_col', 'ts_code'), kwargs.pop('date_col', 'date'))
+        screener.add_rule(self)
+        return screener.screen(data, **kwargs)
+
+
+class StockScreener:
+    """
+    全市场选股器，管理一组选股规则并在面板上批量求值
+    """
+
+    def __init__(self, symbol_col: str = 'ts_code', date_col: str = 'date',
+                 compiler: Optional[FormulaCompiler] = None):
+        """
+        初始化选股器
+
+        Args:
+            symbol_col: 股票代码列名
+            date_col: 日期列名
+            compiler: 公式编译器，默认使用内置指标公式
+        """
+        self.symbol_col = symbol_col
+        self.date_col = date_col
+        self.compiler = compiler or FormulaCompiler()
+        self.rules: Dict[str, ScreenRule] = {}
+
+    def add_rule(self, rule: Union[ScreenRule, str], formula: Optional[str] = None,
+                 description: str = "") -> ScreenRule:
+        """
+        添加（或覆盖）选股规则
+
+        Args:
+            rule: ScreenRule对象，或规则名称（此时需提供formula）
+            formula: 条件公式
+            description: 规则描述
+
+        Returns:
+            ScreenRule: 添加的规则
+        """
+        if not isinstance(rule, ScreenRule):
+            if formula is None:
+                raise ValueError(f"规则{rule}缺少条件公式")
+            rule = ScreenRule(rule, formula, description, self.compiler)
+        self.rules[rule.name] = rule
+        return rule
+
+    def remove_rule(self, name: str):
+        """
+        移除选股规则
+
+        Args:
+            name: 规则名称
+        """
+        self.rules.pop(name, None)
+
+    def _selected(self, names: Optional[List[str]]) -> List[ScreenRule]:
+        names = list(self.rules) if names is None else names
+        missing = [name for name in names if name not in self.rules]
+        if missing:
+            raise KeyError(f"未添加的选股规则: {missing}")
+        if not names:
+            raise ValueError("没有可执行的选股规则")
+        return [self.rules[name] for name in names]
+
+    def lookback(self, names: Optional[List[str]] = None) -> Optional[int]:
+        """
+        计算一组规则需要的历史K线数
+
+        Args:
+            names: 规则名称列表，None表示全部规则
+
+        Returns:
+            Optional[int]: 各规则lookback的最大值，任一规则依赖全部历史时为None
+        """
+        lookbacks = [rule.lookback for rule in self._selected(names)]
+        return None if None in lookbacks else max(lookbacks)
+
+    def evaluate(self, panel, names: Optional[List[str]] = None, as_of=None) -> pl.DataFrame:
+        """
+        在面板上求出每只股票最新交易日的规则结果
+
+        Args:
+            panel: 多股票长表面板（Polars DataFrame或LazyFrame），包含公式用到的OHLCV列
+            names: 规则名称列表，None表示全部规则
+            as_of: 选股日期，只使用该日及之前的K线；None表示面板的最新日期
+
+        Returns:
+            pl.DataFrame: 在选股日期有K线的每只股票一行：股票代码、日期、close、
+                          各规则的条件列（Boolean，无值为False）和输出线列
+        """
+        rules = self._selected(names)
+        symbol, date = pl.col(self.symbol_col), pl.col(self.date_col)
+        query = panel.lazy()
+        if as_of is not None:
+            query = query.filter(date <= as_of)
+        screen_date = query.select(date.max()).collect().item()
+
+        lookback = self.lookback(names)
+        if lookback is not None:
+            # 只保留每只股票最近lookback+1根K线；按日期稳定排序后over内的行顺序即为日期顺序
+            query = (query.sort(self.date_col, maintain_order=True)
+                     .filter(pl.int_range(pl.len()).reverse().over(symbol) <= lookback))
+
+        columns: Dict[str, PanelExpr] = {}
+        for rule in rules:
+            columns.update(rule.expressions())
+        engine = PanelFactorEngine(query, self.symbol_col, self.date_col, factors=columns)
+        layers, outputs = engine.compile()
+        query = engine.panel
+        for layer in layers:
+            query = query.with_columns(layer)
+
+        conditions = {rule.name for rule in rules}
+        selected = []
+        for name, output in zip(columns, outputs):
+            if name in conditions:
+                selected.append(output.fill_null(False))
+            else:
+                selected.append(output.cast(pl.Float64).fill_nan(None))
+        return (query
+                .filter(date == screen_date)
+                .select(self.symbol_col, self.date_col, 'close', *selected)
+                .collect())
+
+    def screen(self, panel, names: Optional[List[str]] = None, as_of=None, match: str = 'all') -> pl.DataFrame:
+        """
+        在面板上选出最新交易日满足条件的股票
+
+        Args:
+            panel: 多股票长表面板
+            names: 规则名称列表，None表示全部规则
+            as_of: 选股日期，None表示面板的最新日期
+            match: 'all'要求满足全部规则，'any'满足任一规则即可
+
+        Returns:
+            pl.DataFrame: 满足条件的股票，列同evaluate()，按股票代码排序
+        """
+        if match not in ('all', 'any'):
+            raise ValueError(f"不支持的匹配方式: {match}")
+        start = time.perf_counter()
+        names = [rule.name for rule in self._selected(names)]
+        result = self.evaluate(panel, names, as_of)
+        combine = pl.all_horizontal if match == 'all' else pl.any_horizontal
+        matches = result.filter(combine(names)).sort(self.symbol_col)
+        logger.info(f"选股完成: {result.height}只股票中{matches.height}只满足条件，"
+                    f"耗时{time.perf_counter() - start:.2f}秒")
+        return matches
+
+    def screen_universe(self, codes: Iterable[str], tdx_data_path: Optional[str] = None,
+                        store_path: Optional[str] = None, names: Optional[List[str]] = None,
+                        match: str = 'all') -> pl.DataFrame:
+        """
+        从列式存储或通达信日线文件加载全市场，选出最新交易日满足条件的股票
+
+        每只股票只读取规则lookback所需的最近K线。
+
+        Args:
+            codes: 股票代码列表
+            tdx_data_path: 通达信数据根目录，与store_path均为None时使用配置中的路径
+            store_path: 列式存储目录，存在对应Parquet文件时优先使用
+            names: 规则名称列表，None表示全部规则
+            match: 'all'要求满足全部规则，'any'满足任一规则即可
+
+        Returns:
+            pl.DataFrame: 满足条件的股票
+        """
+        from src.tech_analysis.universe_calculator import load_universe_panel
+
+        if tdx_data_path is None and store_path is None:
+            from src.utils.config import get_config
+            tdx_data_path = get_config().data.tdx_data_path
+
+        lookback = self.lookback(names)
+        panel = load_universe_panel(codes, tdx_data_path, store_path,
+                                    None if lookback is None else lookback + 1, symbol_col=self.symbol_col)
+        return self.screen(panel, names, match=match)
@@ -63,17 +63,26 @@ class StrategyAnalyzer:
         
         return self.tech_analyzer.get_data()
     
-    def generate_signals(self, strategy_type: str, **params) -> Dict[str, Any]:
+    def generate_signals(self, strategy_type: str, panel=None, symbol_col: str = 'ts_code',
+                         **params) -> Dict[str, Any]:
         """
         生成交易信号
         
         Args:
             strategy_type: 策略类型
+            panel: 多股票长表面板，提供时在全市场上一次扫描面板最新日期出现的信号，
+                   而不是对分析器自身的数据生成信号
+            symbol_col: 面板的股票代码列名
             **params: 策略参数
             
         Returns:
-            Dict[str, Any]: 包含信号的字典
+            Dict[str, Any]: 包含信号的字典；扫描面板时signals为当日出现信号的股票
         """
+        if panel is not None:
+            signals = self.signal_generator.generate_panel_signals(
+                panel, strategy_type, symbol_col=symbol_col, latest_only=True, **params)
+            return {'signals': signals, 'params': params}
+        
         data = self.tech_analyzer.get_data()
         
         if strategy_type == 'trend_following':
@@ -3,11 +3,15 @@
 
 """
 信号生成器，用于根据技术指标生成交易信号
+
+每种策略的买卖条件写成Polars表达式（交叉用shift比较前后两根K线），持仓由买入/卖出信号
+置1/0后向前填充得到，整段序列在一个惰性查询中求值。同样的表达式加上 .over(股票代码列)
+即可在多股票面板上一次求出全市场的信号，例如扫描当日出现均线金叉的全部股票。
 """
 
-from typing import Dict, Any, List
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
 import polars as pl
-import numpy as np
 from loguru import logger
 
 
@@ -15,198 +19,243 @@ class SignalGenerator:
     """
     信号生成器类，提供各种策略的信号生成方法
     """
-    
-    def generate_trend_following_signals(self, data: pl.DataFrame, **params) -> Dict[str, Any]:
+
+    def _rules(self, columns: List[str], strategy_type: str, over: Callable[[pl.Expr], pl.Expr],
+               row: pl.Expr, panel: bool, params: Dict[str, Any]) -> Optional[Tuple[List[List[pl.Expr]], pl.Expr,
+                                                                                   pl.Expr, str, str, int]]:
         """
-        生成趋势跟踪策略信号
-        
+        构建策略的买卖条件
+
         Args:
-            data: 包含技术指标的数据
+            columns: 数据的列名
+            strategy_type: 策略类型
+            over: 把时间序列表达式限定在单只股票内（单股票数据时原样返回）
+            row: 股票内的K线序号
+            panel: 是否为多股票面板
+            params: 策略参数
+
+        Returns:
+            Optional[Tuple]: (依次物化的中间列, 买入条件, 卖出条件, 买入原因, 卖出原因, 首个判断信号的K线序号)，
+                             缺少所需指标时为None
+        """
+        close = pl.col('close')
+
+        if strategy_type == 'trend_following':
+            ma_short = params.get('ma_short', 10)
+            ma_long = params.get('ma_long', 20)
+            layer = []
+            for window in (ma_short, ma_long):
+                if f'ma{window}' not in columns:
+                    if not panel:
+                        logger.error(f"缺少MA指标数据，需要ma{ma_short}和ma{ma_long}")
+                        return None
+                    # 多股票面板在查询中按股票计算缺少的均线
+                    layer.append(over(close.rolling_mean(window)).alias(f'ma{window}'))
+            short_ma, long_ma = self._value(f'ma{ma_short}'), self._value(f'ma{ma_long}')
+            prev_short, prev_long = over(short_ma.shift(1)), over(long_ma.shift(1))
+            buy = (short_ma > long_ma) & (prev_short <= prev_long)
+            sell = (short_ma < long_ma) & (prev_short >= prev_long)
+            return [layer], buy, sell, 'MA金叉', 'MA死叉', 1
+
+        if strategy_type == 'mean_reversion':
+            rsi_period = params.get('rsi_period', 14)
+            if f'rsi{rsi_period}' not in columns:
+                logger.error(f"缺少RSI指标数据，需要rsi{rsi_period}")
+                return None
+            rsi = self._value(f'rsi{rsi_period}')
+            buy = rsi < params.get('oversold', 30)
+            sell = rsi > params.get('overbought', 70)
+            return [], buy, sell, 'RSI超卖', 'RSI超买', 0
+
+        if strategy_type == 'momentum':
+            period = params.get('momentum_period', 12)
+            # 前period根K线的动量记为0
+            previous = over(close.shift(period))
+            momentum = pl.when(row >= period).then((close - previous) / previous * 100).otherwise(0.0)
+            layer = [momentum.alias('__momentum')]
+            momentum, prev_momentum = pl.col('__momentum'), over(pl.col('__momentum').shift(1))
+            buy = (momentum > 0) & (momentum > prev_momentum)
+            sell = (momentum < 0) & (momentum < prev_momentum)
+            return [layer], buy, sell, '动量上升', '动量下降', period
+
+        if strategy_type == 'volatility_breakout':
+            window = params.get('window', 20)
+            multiplier = params.get('multiplier', 2.0)
+            # 真实波幅（首根K线为0），ATR为此前window根K线真实波幅的均值，前window根K线为0
+            prev_close = over(close.shift(1))
+            high, low = pl.col('high'), pl.col('low')
+            true_range = pl.max_horizontal(high - low, (high - prev_close).abs(), (low - prev_close).abs())
+            tr_layer = [pl.when(row >= 1).then(true_range).otherwise(0.0).alias('__tr')]
+            atr_layer = [over(pl.col('__tr').rolling_mean(window).shift(1)).fill_null(0.0).alias('__atr')]
+            prev_atr = over(pl.col('__atr').shift(1))
+            buy = close > prev_close + multiplier * prev_atr
+            sell = close < prev_close - multiplier * prev_atr
+            return [tr_layer, atr_layer], buy, sell, '突破上轨', '突破下轨', window
+
+        logger.error(f"不支持的策略类型: {strategy_type}")
+        return None
+
+    @staticmethod
+    def _value(name: str) -> pl.Expr:
+        """指标列，NaN视为缺失，与NumPy中NaN参与的比较均为False一致"""
+        return pl.col(name).cast(pl.Float64).fill_nan(None)
+
+    def _signal_query(self, data, strategy_type: str, symbol_col: Optional[str], date_col: str,
+                      params: Dict[str, Any]) -> Optional[pl.LazyFrame]:
+        """
+        构建逐K线信号的惰性查询
+
+        Args:
+            data: 行情数据（可含指标列），Polars DataFrame或LazyFrame
+            strategy_type: 策略类型
+            symbol_col: 股票代码列名，None表示单只股票
+            date_col: 日期列名
+            params: 策略参数
+
+        Returns:
+            Optional[pl.LazyFrame]: 从首个判断信号的K线开始，每根K线一行：
+                                    (股票代码,) 日期, price, signal（buy/sell/null）, reason, position
+        """
+        query = data.lazy()
+        if symbol_col is None:
+            over = lambda expr: expr
+        else:
+            over = lambda expr: expr.over('__group')
+            # group内保持行顺序，按日期稳定排序即可使每只股票内日期升序；
+            # 窗口按整数编码的股票代码分组，比逐个窗口对字符串代码求哈希快
+            query = (query.sort(date_col, maintain_order=True)
+                     .with_columns(pl.col(symbol_col).cast(pl.String).cast(pl.Categorical)
+                                   .to_physical().alias('__group')))
+        row = over(pl.int_range(pl.len()))
+
+        rules = self._rules(query.collect_schema().names(), strategy_type, over, row,
+                            symbol_col is not None, params)
+        if rules is None:
+            return None
+        layers, buy, sell, buy_reason, sell_reason, start = rules
+        for layer in layers:
+            if layer:
+                query = query.with_columns(layer)
+
+        # 买卖条件先物化为列，避免signal和reason各自重复求值窗口表达式
+        query = query.with_columns(row.alias('__row'), buy.fill_null(False).alias('__buy'),
+                                   sell.fill_null(False).alias('__sell'))
+        buy, sell = pl.col('__buy'), pl.col('__sell')
+        # 同一根K线同时满足时买入优先，与逐K线判断的if/elif顺序一致
+        query = query.with_columns(
+            pl.when(buy).then(pl.lit('buy')).when(sell).then(pl.lit('sell')).alias('signal'),
+            pl.when(buy).then(pl.lit(buy_reason)).when(sell).then(pl.lit(sell_reason)).alias('reason'))
+        # 持仓：买入置1、卖出置0，其余K线沿用之前的持仓，首个信号之前为0
+        position = (pl.when(pl.col('signal') == 'buy').then(pl.lit(1, pl.Int8))
+                    .when(pl.col('signal') == 'sell').then(pl.lit(0, pl.Int8)))
+        query = (query
+                 .filter(pl.col('__row') >= start)
+                 .with_columns(over(position.forward_fill()).fill_null(0).alias('position')))
+        keys = [date_col] if symbol_col is None else [symbol_col, date_col]
+        return query.select(*keys, pl.col('close').alias('price'), 'signal', 'reason', 'position')
+
+    def signal_frame(self, data: pl.DataFrame, strategy_type: str, date_col: str = 'date',
+                     **params) -> Optional[pl.DataFrame]:
+        """
+        计算单只股票的逐K线信号
+
+        Args:
+            data: 按日期升序的行情数据，包含策略所需的指标列
+            strategy_type: 策略类型，trend_following、mean_reversion、momentum或volatility_breakout
+            date_col: 日期列名
             **params: 策略参数
-            
+
         Returns:
-            Dict[str, Any]: 信号字典
-        """
-        # 默认参数
-        ma_short = params.get('ma_short', 10)
-        ma_long = params.get('ma_long', 20)
-        
-        # 确保MA指标已计算
-        if f'ma{ma_short}' not in data.columns or f'ma{ma_long}' not in data.columns:
-            logger.error(f"缺少MA指标数据，需要ma{ma_short}和ma{ma_long}")
+            Optional[pl.DataFrame]: 从首个判断信号的K线开始每根K线一行，包含日期、price、signal、reason、position；
+                                    缺少所需指标时为None
+        """
+        query = self._signal_query(data, strategy_type, None, date_col, params)
+        return None if query is None else query.collect()
+
+    def _generate(self, data: pl.DataFrame, strategy_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """把逐K线信号整理为信号字典"""
+        frame = self.signal_frame(data, strategy_type, **params)
+        if frame is None:
             return {}
-        
-        # 计算信号
-        short_ma = data[f'ma{ma_short}'].to_numpy()
-        long_ma = data[f'ma{ma_long}'].to_numpy()
-        close = data['close'].to_numpy()
-        dates = data['date'].to_numpy()
-        
-        signals = []
-        positions = []
-        
-        for i in range(1, len(short_ma)):
-            # 金叉信号
-            if short_ma[i] > long_ma[i] and short_ma[i-1] <= long_ma[i-1]:
-                signals.append({'date': dates[i], 'signal': 'buy', 'price': close[i], 'reason': 'MA金叉'})
-                positions.append(1)
-            # 死叉信号
-            elif short_ma[i] < long_ma[i] and short_ma[i-1] >= long_ma[i-1]:
-                signals.append({'date': dates[i], 'signal': 'sell', 'price': close[i], 'reason': 'MA死叉'})
-                positions.append(0)
-            else:
-                # 保持之前的仓位
-                positions.append(positions[-1] if positions else 0)
-        
         return {
-            'signals': signals,
-            'positions': positions,
+            'signals': frame.filter(pl.col('signal').is_not_null()).select('date', 'signal', 'price', 'reason'),
+            'positions': frame['position'],
             'params': params
         }
-    
+
+    def generate_trend_following_signals(self, data: pl.DataFrame, **params) -> Dict[str, Any]:
+        """
+        生成趋势跟踪策略信号
+
+        Args:
+            data: 包含技术指标的数据
+            **params: 策略参数
+
+        Returns:
+            Dict[str, Any]: 信号字典，signals为信号DataFrame（date、signal、price、reason），
+                            positions为从第2根K线开始的持仓序列
+        """
+        return self._generate(data, 'trend_following', params)
+
     def generate_mean_reversion_signals(self, data: pl.DataFrame, **params) -> Dict[str, Any]:
         """
         生成均值回归策略信号
-        
+
         Args:
             data: 包含技术指标的数据
             **params: 策略参数
-            
+
         Returns:
-            Dict[str, Any]: 信号字典
-        """
-        # 默认参数
-        rsi_period = params.get('rsi_period', 14)
-        overbought = params.get('overbought', 70)
-        oversold = params.get('oversold', 30)
-        
-        # 确保RSI指标已计算
-        if f'rsi{rsi_period}' not in data.columns:
-            logger.error(f"缺少RSI指标数据，需要rsi{rsi_period}")
-            return {}
-        
-        # 计算信号
-        rsi = data[f'rsi{rsi_period}'].to_numpy()
-        close = data['close'].to_numpy()
-        dates = data['date'].to_numpy()
-        
-        signals = []
-        positions = []
-        
-        for i in range(len(rsi)):
-            # 超卖信号
-            if rsi[i] < oversold:
-                signals.append({'date': dates[i], 'signal': 'buy', 'price': close[i], 'reason': 'RSI超卖'})
-                positions.append(1)
-            # 超买信号
-            elif rsi[i] > overbought:
-                signals.append({'date': dates[i], 'signal': 'sell', 'price': close[i], 'reason': 'RSI超买'})
-                positions.append(0)
-            else:
-                # 保持之前的仓位
-                positions.append(positions[-1] if positions else 0)
-        
-        return {
-            'signals': signals,
-            'positions': positions,
-            'params': params
-        }
-    
+            Dict[str, Any]: 信号字典，signals为信号DataFrame，positions为每根K线的持仓序列
+        """
+        return self._generate(data, 'mean_reversion', params)
+
     def generate_momentum_signals(self, data: pl.DataFrame, **params) -> Dict[str, Any]:
         """
         生成动量策略信号
-        
+
         Args:
             data: 包含技术指标的数据
             **params: 策略参数
-            
+
         Returns:
-            Dict[str, Any]: 信号字典
-        """
-        # 默认参数
-        momentum_period = params.get('momentum_period', 12)
-        
-        # 计算动量
-        close = data['close'].to_numpy()
-        dates = data['date'].to_numpy()
-        
-        momentum = np.zeros_like(close)
-        for i in range(momentum_period, len(close)):
-            momentum[i] = (close[i] - close[i - momentum_period]) / close[i - momentum_period] * 100
-        
-        signals = []
-        positions = []
-        
-        for i in range(momentum_period, len(momentum)):
-            # 动量为正且增加
-            if momentum[i] > 0 and momentum[i] > momentum[i-1]:
-                signals.append({'date': dates[i], 'signal': 'buy', 'price': close[i], 'reason': '动量上升'})
-                positions.append(1)
-            # 动量为负且减少
-            elif momentum[i] < 0 and momentum[i] < momentum[i-1]:
-                signals.append({'date': dates[i], 'signal': 'sell', 'price': close[i], 'reason': '动量下降'})
-                positions.append(0)
-            else:
-                # 保持之前的仓位
-                positions.append(positions[-1] if positions else 0)
-        
-        return {
-            'signals': signals,
-            'positions': positions,
-            'params': params
-        }
-    
+            Dict[str, Any]: 信号字典，signals为信号DataFrame，positions为从第momentum_period根K线开始的持仓序列
+        """
+        return self._generate(data, 'momentum', params)
+
     def generate_volatility_breakout_signals(self, data: pl.DataFrame, **params) -> Dict[str, Any]:
         """
         生成波动率突破策略信号
-        
+
         Args:
             data: 包含技术指标的数据
             **params: 策略参数
-            
+
         Returns:
-            Dict[str, Any]: 信号字典
-        """
-        # 默认参数
-        window = params.get('window', 20)
-        multiplier = params.get('multiplier', 2.0)
-        
-        # 计算ATR
-        high = data['high'].to_numpy()
-        low = data['low'].to_numpy()
-        close = data['close'].to_numpy()
-        dates = data['date'].to_numpy()
-        
-        tr = np.zeros_like(close)
-        for i in range(1, len(close)):
-            tr[i] = max(high[i] - low[i], abs(high[i] - close[i-1]), abs(low[i] - close[i-1]))
-        
-        atr = np.zeros_like(close)
-        for i in range(window, len(tr)):
-            atr[i] = np.mean(tr[i-window:i])
-        
-        # 计算突破水平
-        upper_band = close + multiplier * atr
-        lower_band = close - multiplier * atr
-        
-        signals = []
-        positions = []
-        
-        for i in range(window, len(close)):
-            # 突破上轨
-            if close[i] > upper_band[i-1]:
-                signals.append({'date': dates[i], 'signal': 'buy', 'price': close[i], 'reason': '突破上轨'})
-                positions.append(1)
-            # 突破下轨
-            elif close[i] < lower_band[i-1]:
-                signals.append({'date': dates[i], 'signal': 'sell', 'price': close[i], 'reason': '突破下轨'})
-                positions.append(0)
-            else:
-                # 保持之前的仓位
-                positions.append(positions[-1] if positions else 0)
-        
-        return {
-            'signals': signals,
-            'positions': positions,
-            'params': params
-        }
+            Dict[str, Any]: 信号字典，signals为信号DataFrame，positions为从第window根K线开始的持仓序列
+        """
+        return self._generate(data, 'volatility_breakout', params)
+
+    def generate_panel_signals(self, panel, strategy_type: str, symbol_col: str = 'ts_code',
+                               date_col: str = 'date', latest_only: bool = False, **params) -> pl.DataFrame:
+        """
+        在多股票面板上一次计算全部股票的信号
+
+        Args:
+            panel: 长表面板（每行一只股票一个交易日），Polars DataFrame或LazyFrame；
+                   趋势跟踪策略缺少的ma{N}列按股票在查询中计算
+            strategy_type: 策略类型
+            symbol_col: 股票代码列名
+            date_col: 日期列名
+            latest_only: 只返回面板最新日期上出现买卖信号的股票，如当日金叉
+            **params: 策略参数
+
+        Returns:
+            pl.DataFrame: 股票代码、日期、price、signal、reason、position；缺少所需指标时为空表
+        """
+        query = self._signal_query(panel, strategy_type, symbol_col, date_col, params)
+        if query is None:
+            return pl.DataFrame()
+        if latest_only:
+            query = query.filter((pl.col(date_col) == pl.col(date_col).max()) & pl.col('signal').is_not_null())
+        return query.sort(symbol_col, date_col).collect()
@@ -42,11 +42,13 @@ class StrategyVisualizer:
                      row=1, col=1)
         
         # 绘制信号点
-        signal_data = signals.get('signals', [])
-        buy_dates = [s['date'] for s in signal_data if s['signal'] == 'buy']
-        buy_prices = [s['price'] for s in signal_data if s['signal'] == 'buy']
-        sell_dates = [s['date'] for s in signal_data if s['signal'] == 'sell']
-        sell_prices = [s['price'] for s in signal_data if s['signal'] == 'sell']
+        signal_data = signals.get('signals')
+        buy_dates, buy_prices, sell_dates, sell_prices = [], [], [], []
+        if signal_data is not None:
+            buys = signal_data.filter(pl.col('signal') == 'buy')
+            sells = signal_data.filter(pl.col('signal') == 'sell')
+            buy_dates, buy_prices = buys['date'].to_list(), buys['price'].to_list()
+            sell_dates, sell_prices = sells['date'].to_list(), sells['price'].to_list()
         
         fig.add_trace(go.Scatter(x=buy_dates, y=buy_prices, name='买入信号', 
                                mode='markers', marker=dict(color='green', size=10, symbol='triangle-up')),
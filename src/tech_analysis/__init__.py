@@ -9,6 +9,7 @@ from src.tech_analysis.technical_analyzer import TechnicalAnalyzer
 from src.tech_analysis.indicator_manager import IndicatorManager, global_indicator_manager
 from src.tech_analysis.indicator_registry import IndicatorRegistry, global_indicator_registry, register_indicator
 from src.tech_analysis.indicator_cache import IndicatorCache, global_indicator_cache, cached_calculation
+from src.tech_analysis.universe_calculator import calculate_indicators_for_universe, iter_indicators_for_universe
 
 __all__ = [
     "TechnicalAnalyzer",
@@ -19,5 +20,7 @@ __all__ = [
     "global_indicator_registry",
     "global_indicator_cache",
     "register_indicator",
-    "cached_calculation"
+    "cached_calculation",
+    "calculate_indicators_for_universe",
+    "iter_indicators_for_universe"
 ]
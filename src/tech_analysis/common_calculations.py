@@ -169,9 +169,10 @@ def calculate_gain_loss(lazy_df: pl.LazyFrame) -> pl.LazyFrame:
     Returns:
         pl.LazyFrame: 包含上涨和下跌变化的LazyFrame
     """
+    # 保留首行的空值，使后续SMA递推从首个有效涨跌幅开始
     return lazy_df.with_columns(
-        pl.when(pl.col('price_change') > 0).then(pl.col('price_change')).otherwise(0).alias('gain'),
-        pl.when(pl.col('price_change') < 0).then(-pl.col('price_change')).otherwise(0).alias('loss')
+        pl.col('price_change').clip(lower_bound=0).alias('gain'),
+        (-pl.col('price_change')).clip(lower_bound=0).alias('loss')
     )
 
 
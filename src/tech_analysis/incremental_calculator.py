@@ -9,6 +9,8 @@ import polars as pl
 from typing import List, Dict, Any, Optional
 from loguru import logger
 
+from .window_kernels import tdx_ema, tdx_sma
+
 
 class IncrementalCalculator:
     """
@@ -186,20 +188,15 @@ class IncrementalCalculator:
         # 合并数据用于计算
         combined_data = existing_data.vstack(new_data).select(['date', 'close'])
         
-        # 计算EMA12、EMA26
-        ema12 = combined_data.with_columns(
-            pl.col('close').ewm_mean(span=fast_period).alias('ema12')
-        )['ema12']
-        
-        ema26 = combined_data.with_columns(
-            pl.col('close').ewm_mean(span=slow_period).alias('ema26')
-        )['ema26']
+        # 计算EMA12、EMA26（通达信EMA递推，与批量计算一致）
+        ema12 = tdx_ema(combined_data['close'], fast_period)
+        ema26 = tdx_ema(combined_data['close'], slow_period)
         
         # 计算MACD线
         macd_line = ema12 - ema26
         
         # 计算信号线
-        macd_signal = macd_line.ewm_mean(span=signal_period)
+        macd_signal = tdx_ema(macd_line, signal_period)
         
         # 计算柱状图
         macd_hist = macd_line - macd_signal
@@ -240,8 +237,8 @@ class IncrementalCalculator:
         for window in windows:
             price_change = combined_data['close'].diff()
 
-            avg_gain_expr = pl.when(price_change > 0).then(price_change).otherwise(0.0).ewm_mean(span=window)
-            avg_loss_expr = pl.when(price_change < 0).then(-price_change).otherwise(0.0).ewm_mean(span=window)
+            avg_gain_expr = tdx_sma(price_change.clip(lower_bound=0), window, 1)
+            avg_loss_expr = tdx_sma((-price_change).clip(lower_bound=0), window, 1)
 
             rsi_col = f'rsi{window}'
             rsi_expr = pl.when(avg_loss_expr == 0).then(100.0).otherwise(
@@ -287,8 +284,8 @@ class IncrementalCalculator:
             d_col = f'd{window}'
             j_col = f'j{window}'
 
-            k_expr = rsv_expr.rolling_mean(window_size=3, min_periods=1)
-            d_expr = k_expr.rolling_mean(window_size=3, min_periods=1)
+            k_expr = tdx_sma(rsv_expr, 3, 1)
+            d_expr = tdx_sma(k_expr, 3, 1)
             j_expr = 3 * k_expr - 2 * d_expr
 
             result = result.with_columns(
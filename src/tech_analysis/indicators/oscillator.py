@@ -8,6 +8,7 @@
 
 import polars as pl
 from ..utils import to_float32, calculate_mad
+from ..window_kernels import tdx_sma
 from ..common_calculations import (
     calculate_price_change,
     calculate_gain_loss,
@@ -33,9 +34,9 @@ def calculate_rsi(lazy_df: pl.LazyFrame, windows: list) -> pl.LazyFrame:
     
     # 计算RSI，使用表达式别名避免创建中间列
     for window in windows:
-        # 直接计算RSI值，不创建中间列
-        avg_gain = pl.col('gain').ewm_mean(span=window)
-        avg_loss = pl.col('loss').ewm_mean(span=window)
+        # 通达信RSI：SMA(MAX(C-LC,0),N,1) / SMA(ABS(C-LC),N,1) * 100
+        avg_gain = tdx_sma(pl.col('gain'), window, 1)
+        avg_loss = tdx_sma(pl.col('loss'), window, 1)
         
         rsi = to_float32(pl.when(avg_loss == 0).then(100.0).otherwise(100.0 - (100.0 / (1.0 + (avg_gain / avg_loss))))).alias(f'rsi{window}')
         
@@ -65,9 +66,9 @@ def calculate_kdj(lazy_df: pl.LazyFrame, windows: list) -> pl.LazyFrame:
         ).alias(f'rsv_{window}')
         lazy_df = lazy_df.with_columns(rsv_expr)
         
-        # 计算k、d、j值
-        k_expr = to_float32(pl.col(f'rsv_{window}').rolling_mean(window_size=3, min_periods=1)).alias(f'k{window}')
-        d_expr = to_float32(k_expr.rolling_mean(window_size=3, min_periods=1)).alias(f'd{window}')
+        # 计算k、d、j值，通达信K=SMA(RSV,3,1)，D=SMA(K,3,1)
+        k_expr = to_float32(tdx_sma(pl.col(f'rsv_{window}'), 3, 1)).alias(f'k{window}')
+        d_expr = to_float32(tdx_sma(k_expr, 3, 1)).alias(f'd{window}')
         j_expr = to_float32(3 * k_expr - 2 * d_expr).alias(f'j{window}')
         
         lazy_df = lazy_df.with_columns([k_expr, d_expr, j_expr])
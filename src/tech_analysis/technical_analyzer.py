@@ -28,6 +28,7 @@ from .indicator_calculator import (
     calculate_multiple_indicators_polars,
     generate_cache_key
 )
+from .windowed_evaluator import calculate_indicators_windowed
 from .indicator_manager import global_indicator_manager
 from .indicator_cache import global_indicator_cache
 from .incremental_calculator import global_incremental_calculator
@@ -39,6 +40,31 @@ from src.utils.exceptions import (
 )
 from src.utils.exception_handler import handle_exception_with_retry, handle_error_gracefully
 
+# 插件指标计算中按插件隔离处理的异常类型
+_PLUGIN_ERRORS = (pl.exceptions.PolarsError, ValueError, TypeError, RuntimeError, KeyError)
+
+
+def _plugin_params_key(params: Dict[str, Any]) -> tuple:
+    """
+    生成插件参数键，列表、字典、集合转换为可哈希类型，用于记录插件指标的计算状态
+
+    Args:
+        params: 传递给插件的参数
+
+    Returns:
+        tuple: 按参数名排序的可哈希参数键
+    """
+    def make_hashable(obj):
+        if isinstance(obj, (list, tuple)):
+            return tuple(make_hashable(item) for item in obj)
+        elif isinstance(obj, dict):
+            return tuple(sorted((k, make_hashable(v)) for k, v in obj.items()))
+        elif isinstance(obj, set):
+            return frozenset(obj)
+        return obj
+
+    return tuple(sorted((k, make_hashable(v)) for k, v in params.items()))
+
 
 class TechnicalAnalyzer(ITechnicalAnalyzer):
     """
@@ -808,20 +834,25 @@ class TechnicalAnalyzer(ITechnicalAnalyzer):
         
         plugin = indicator_plugins[plugin_name]
         
+        # 支持Lazy查询计划的插件走快速路径
+        if kwargs.get('incremental_data') is None and hasattr(plugin, 'supports_lazy') and plugin.supports_lazy():
+            return self.calculate_plugin_indicators_lazy([plugin_name], **kwargs)
+        return self._calculate_plugin_indicator_eager(plugin_name, plugin, **kwargs)
+
+    def _calculate_plugin_indicator_eager(self, plugin_name, plugin, **kwargs):
+        """
+        在DataFrame上逐个计算插件指标（含缓存与增量计算）
+
+        Args:
+            plugin_name: 插件名称
+            plugin: 指标插件实例
+            **kwargs: 传递给插件calculate方法的参数
+
+        Returns:
+            pl.DataFrame: 包含插件指标的DataFrame
+        """
         # 检查插件指标是否已经计算
-        # 生成参数哈希，处理不可哈希类型
-        def make_hashable(obj):
-            if isinstance(obj, list):
-                return tuple(obj)
-            elif isinstance(obj, dict):
-                return tuple(sorted((k, make_hashable(v)) for k, v in obj.items()))
-            elif isinstance(obj, set):
-                return frozenset(obj)
-            return obj
-        
-        # 生成参数哈希
-        hashable_kwargs = {k: make_hashable(v) for k, v in kwargs.items()}
-        params_hash = hash(tuple(sorted(hashable_kwargs.items())))
+        params_hash = _plugin_params_key(kwargs)
         
         if plugin_name in self.calculated_indicators['plugin'] and params_hash in self.calculated_indicators['plugin'][plugin_name]:
             # 返回Polars DataFrame
@@ -970,6 +1001,127 @@ class TechnicalAnalyzer(ITechnicalAnalyzer):
             self.is_lazy = False
         return self.pl_df
     
+    def calculate_plugin_indicators_lazy(self, plugin_names, **kwargs):
+        """
+        以Lazy查询计划批量计算插件指标
+
+        对supports_lazy()的插件：只投影get_required_columns声明的列，在LazyFrame上调用calculate_polars，
+        各插件的查询计划相互独立，通过一次pl.collect_all并行执行；结果按数据指纹+参数缓存。
+        不支持Lazy的插件、以及查询计划构建或执行失败的插件逐个在DataFrame上计算，
+        单个插件失败不影响其他插件的结果。
+
+        Args:
+            plugin_names: 插件名称列表
+            **kwargs: 传递给插件calculate_polars方法的参数
+
+        Returns:
+            pl.DataFrame: 包含插件指标的DataFrame
+
+        Raises:
+            RuntimeError: 有插件计算失败时，在合并完其余插件结果后抛出
+        """
+        if not self.plugin_manager:
+            raise ValueError("插件管理器未初始化")
+
+        indicator_plugins = self.plugin_manager.get_available_indicator_plugins()
+        if self.is_lazy:
+            self.pl_df = self.pl_df.collect()
+            self.is_lazy = False
+
+        params_key = _plugin_params_key(kwargs)
+        source = self.pl_df.lazy()
+        pending = []
+        failures = {}
+        for plugin_name in plugin_names:
+            if plugin_name not in indicator_plugins:
+                failures[plugin_name] = "不存在或未启用"
+                continue
+            plugin = indicator_plugins[plugin_name]
+
+            if not (hasattr(plugin, 'supports_lazy') and plugin.supports_lazy()):
+                self._calculate_plugin_fallback(plugin_name, plugin, failures, **kwargs)
+                continue
+
+            if (params_key in self.calculated_indicators['plugin'].get(plugin_name, set())
+                    and all(col in self.pl_df.columns for col in plugin.get_output_columns())):
+                continue
+
+            cache_type = f"plugin_{plugin_name}"
+            cached_result = global_indicator_cache.get(self.pl_df, cache_type, **kwargs)
+            if cached_result is not None:
+                logger.debug(f"插件指标{plugin_name}缓存命中")
+                self._merge_plugin_result(plugin_name, cached_result, params_key)
+                continue
+
+            required_columns = [col for col in plugin.get_required_columns() if col in self.pl_df.columns]
+            try:
+                plan = plugin.calculate_polars(source.select(required_columns), **kwargs)
+            except _PLUGIN_ERRORS as e:
+                logger.warning(f"插件指标{plugin_name}构建查询计划失败，改为逐个计算: {e}")
+                self._calculate_plugin_fallback(plugin_name, plugin, failures, **kwargs)
+                continue
+            pending.append((plugin_name, plugin, required_columns, plan))
+
+        if pending:
+            try:
+                results = pl.collect_all([plan for _, _, _, plan in pending])
+            except _PLUGIN_ERRORS as e:
+                # 批量执行失败时逐个执行，定位失败的插件
+                logger.warning(f"批量执行插件查询计划失败，改为逐个执行: {e}")
+                results = [None] * len(pending)
+
+            for (plugin_name, plugin, required_columns, plan), result in zip(pending, results):
+                try:
+                    if result is None:
+                        result = plan.collect()
+                    output = result.select([col for col in result.columns if col not in required_columns])
+                    self._merge_plugin_result(plugin_name, output, params_key)
+                except _PLUGIN_ERRORS as e:
+                    logger.warning(f"插件指标{plugin_name}查询计划执行失败，改为逐个计算: {e}")
+                    self._calculate_plugin_fallback(plugin_name, plugin, failures, **kwargs)
+                    continue
+                global_indicator_cache.set(self.pl_df, output, f"plugin_{plugin_name}", **kwargs)
+
+        self._pandas_cache = None
+        self._pandas_cache_hash = None
+        if failures:
+            raise RuntimeError(f"插件指标计算失败: {failures}")
+        return self.pl_df
+
+    def _calculate_plugin_fallback(self, plugin_name, plugin, failures, **kwargs):
+        """
+        逐个计算单个插件指标，失败时记录到failures而不中断其他插件
+
+        Args:
+            plugin_name: 插件名称
+            plugin: 指标插件实例
+            failures: 失败记录，键为插件名称，值为错误信息
+            **kwargs: 传递给插件的参数
+        """
+        try:
+            self._calculate_plugin_indicator_eager(plugin_name, plugin, **kwargs)
+        except _PLUGIN_ERRORS as e:
+            logger.error(str(e))
+            failures[plugin_name] = str(e)
+
+    def _merge_plugin_result(self, plugin_name, output, params_key):
+        """
+        将插件指标输出列按行合并到主DataFrame，只添加新列
+
+        Args:
+            plugin_name: 插件名称
+            output: 只包含插件输出列的DataFrame
+            params_key: 参数键，用于记录计算状态
+        """
+        if output.height != self.pl_df.height:
+            raise RuntimeError(f"插件指标{plugin_name}输出行数{output.height}与数据行数{self.pl_df.height}不一致")
+
+        new_columns = [col for col in output.columns if col not in self.pl_df.columns]
+        if new_columns:
+            self.pl_df = self.pl_df.with_columns([output[col] for col in new_columns])
+
+        self.calculated_indicators['plugin'].setdefault(plugin_name, set()).add(params_key)
+
     def calculate_indicator_parallel(self, indicator_type, *args, **kwargs):
         """
         计算特定类型的指标，利用Polars内置并行计算能力
@@ -1313,7 +1465,7 @@ class TechnicalAnalyzer(ITechnicalAnalyzer):
             plugins_to_calculate = []
             for plugin_name in plugin_indicators:
                 # 生成参数哈希
-                params_hash = hash(tuple(sorted(kwargs.items())))
+                params_hash = _plugin_params_key(kwargs)
                 if plugin_name not in self.calculated_indicators['plugin'] or params_hash not in self.calculated_indicators['plugin'][plugin_name]:
                     plugins_to_calculate.append(plugin_name)
             
@@ -1388,7 +1540,7 @@ class TechnicalAnalyzer(ITechnicalAnalyzer):
         plugins_to_calculate = []
         for plugin_name in plugin_names:
             # 生成参数哈希
-            params_hash = hash(tuple(sorted(kwargs.items())))
+            params_hash = _plugin_params_key(kwargs)
             if plugin_name not in self.calculated_indicators['plugin'] or params_hash not in self.calculated_indicators['plugin'][plugin_name]:
                 plugins_to_calculate.append(plugin_name)
         
@@ -1435,7 +1587,8 @@ class TechnicalAnalyzer(ITechnicalAnalyzer):
         Args:
             data: 股票数据，None表示使用现有数据
             indicator_types: 指标类型列表，默认计算所有指标
-            **params: 指标计算参数
+            **params: 指标计算参数；传入visible_rows时只为最后visible_rows行计算指标
+                （自动附加预热回看），更早的行指标为空值
 
         Returns:
             pl.DataFrame或pd.DataFrame: 包含所有计算结果的数据
@@ -1484,7 +1637,9 @@ class TechnicalAnalyzer(ITechnicalAnalyzer):
             indicator_types = ['ma', 'rsi', 'kdj', 'vol_ma', 'wr', 'macd', 'dmi', 'cci', 'roc', 'mtm', 'obv', 'vr', 'psy', 'trix', 'brar', 'asi', 'emv', 'mcst']
         
         # 2. 准备需要计算的内置指标类型
-        builtin_indicators = [ind for ind in indicator_types if ind in ['ma', 'rsi', 'kdj', 'vol_ma', 'wr', 'macd', 'dmi', 'cci', 'roc', 'mtm', 'obv', 'vr', 'psy', 'trix', 'brar', 'asi', 'emv', 'mcst', 'abi', 'adl', 'adr', 'obos']]
+        builtin_indicators = [ind for ind in indicator_types if ind in ['ma', 'rsi', 'kdj', 'vol_ma', 'wr', 'boll', 'macd', 'dmi', 'cci', 'roc', 'mtm', 'obv', 'vr', 'psy', 'trix', 'brar', 'asi', 'emv', 'mcst', 'abi', 'adl', 'adr', 'obos',
+                                                                       'sar', 'dma', 'fsl', 'expma', 'bbi', 'cr', 'hsl', 'lb', 'cyc', 'cys']]
+        visible_rows = params.get('visible_rows')
         
         # 3. 使用新的批量计算函数进行内置指标计算
         indicators_updated = False
@@ -1493,12 +1648,17 @@ class TechnicalAnalyzer(ITechnicalAnalyzer):
         
         if builtin_indicators:
             try:
-                # 使用新的批量计算函数，将所有指标计算合并到单个查询计划
-                lazy_df = self.pl_df.lazy()
-                lazy_df = calculate_multiple_indicators_polars(lazy_df, builtin_indicators, **params)
-                
-                # 执行计算并更新主DataFrame
-                self.pl_df = lazy_df.collect()
+                if visible_rows:
+                    # 窗口化计算：只对可见窗口加预热回看的行、只投影基础列执行查询计划
+                    indicator_params = {k: v for k, v in params.items() if k not in ('visible_rows', 'return_polars')}
+                    self.pl_df = calculate_indicators_windowed(self.pl_df, builtin_indicators, visible_rows, **indicator_params)
+                else:
+                    # 使用新的批量计算函数，将所有指标计算合并到单个查询计划
+                    lazy_df = self.pl_df.lazy()
+                    lazy_df = calculate_multiple_indicators_polars(lazy_df, builtin_indicators, **params)
+
+                    # 执行计算并更新主DataFrame
+                    self.pl_df = lazy_df.collect()
                 
                 # 4. 更新计算状态
                 # 使用字典映射替代长if-elif链，减少重复代码
@@ -1548,15 +1708,15 @@ class TechnicalAnalyzer(ITechnicalAnalyzer):
                     error=error_message
                 )
         
-        # 6. 计算插件指标
-        plugin_indicators = self.get_available_plugin_indicators()
-        for plugin_name in plugin_indicators:
-            if indicator_types is None or plugin_name in indicator_types:
-                try:
-                    # 直接调用插件计算
-                    self.calculate_plugin_indicator(plugin_name, **params)
-                except (ValueError, TypeError, RuntimeError) as e:
-                    logger.error(f"计算插件指标{plugin_name}时发生错误: {str(e)}")
+        # 6. 计算插件指标，支持Lazy的插件的查询计划通过一次collect_all执行，失败的插件逐个回退
+        plugin_indicators = [plugin_name for plugin_name in self.get_available_plugin_indicators()
+                             if indicator_types is None or plugin_name in indicator_types]
+        if plugin_indicators:
+            plugin_params = {k: v for k, v in params.items() if k not in ('visible_rows', 'return_polars')}
+            try:
+                self.calculate_plugin_indicators_lazy(plugin_indicators, **plugin_params)
+            except (ValueError, TypeError, RuntimeError) as e:
+                logger.error(f"计算插件指标{plugin_indicators}时发生错误: {str(e)}")
         
         # 7. 恢复复权列到结果中
         if adj_data:
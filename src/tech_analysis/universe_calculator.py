@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+全市场多股票指标计算模块
+
+按股票维度把指标计算分发到进程池：
+- 子进程直接读取通达信日线文件（或列式存储中的Parquet文件），不经过主进程传递原始数据
+- 每只股票在子进程内用单个Lazy查询计划完成所有指标计算
+- 结果以Arrow IPC字节流返回主进程，按完成顺序流式写入sink
+"""
+
+import io
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import polars as pl
+from loguru import logger
+
+
+# 单股票可计算的内置指标（大势型指标依赖全市场涨跌家数，不在此列）
+DEFAULT_UNIVERSE_INDICATORS = [
+    'ma', 'macd', 'rsi', 'kdj', 'vol_ma', 'wr', 'boll', 'dmi', 'cci', 'roc',
+    'mtm', 'obv', 'vr', 'psy', 'trix', 'brar', 'asi', 'emv', 'mcst'
+]
+
+# 北交所股票代码前缀
+BJ_CODE_PREFIXES = ('4', '8', '92')
+
+# 通达信日线记录格式：每条32字节，字段顺序与TdxHandler.parse_day_file保持一致
+TDX_DAY_RECORD_DTYPE = np.dtype([
+    ('date', '<u4'),
+    ('open', '<u4'),
+    ('high', '<u4'),
+    ('low', '<u4'),
+    ('close', '<u4'),
+    ('volume', '<u4'),
+    ('amount', '<u4'),
+    ('reserved', '<u4'),
+])
+
+
+def parse_stock_code(stock_code: str) -> Tuple[str, str]:
+    """
+    解析股票代码，返回(市场, 代码)
+
+    支持 600000、sh.600000、sh600000、600000.SH 等格式。
+    以4、8、92开头的6位代码识别为北交所股票（与event_driven_engine.price_limit_ratio的判定一致），
+    即使带有.SZ等后缀或前缀也是如此
+
+    Args:
+        stock_code: 股票代码
+
+    Returns:
+        Tuple[str, str]: 市场(sh/sz/bj)和6位代码
+    """
+    code = stock_code.strip()
+    lower = code.lower()
+    if '.' in code:
+        left, right = code.split('.', 1)
+        if left.lower() in ('sh', 'sz', 'bj'):
+            market, code = left.lower(), right
+        elif right.upper() in ('SH', 'SZ', 'BJ'):
+            market, code = right.lower(), left
+        else:
+            raise ValueError(f"无效的股票代码格式: {stock_code}")
+    elif lower[:2] in ('sh', 'sz', 'bj') and len(lower) == 8:
+        market, code = lower[:2], code[2:]
+    else:
+        market = 'sh' if code.startswith('6') else 'sz'
+    if len(code) == 6 and code.startswith(BJ_CODE_PREFIXES):
+        market = 'bj'
+    return market, code
+
+
+def resolve_tdx_day_file(tdx_data_path: str, stock_code: str) -> Path:
+    """
+    获取股票对应的通达信日线文件路径
+
+    Args:
+        tdx_data_path: 通达信数据根目录
+        stock_code: 股票代码
+
+    Returns:
+        Path: 日线文件路径，如 {tdx_data_path}/sh/lday/sh600000.day
+    """
+    market, code = parse_stock_code(stock_code)
+    return Path(tdx_data_path) / market / 'lday' / f'{market}{code}.day'
+
+
+def read_tdx_day_records(file_path: Path, max_days: Optional[int] = None) -> np.ndarray:
+    """
+    把通达信日线文件读为NumPy结构化数组
+
+    Args:
+        file_path: 日线文件路径
+        max_days: 只读取最近max_days条记录，None表示读取全部
+
+    Returns:
+        np.ndarray: TDX_DAY_RECORD_DTYPE记录数组
+    """
+    file_path = Path(file_path)
+    record_count = file_path.stat().st_size // TDX_DAY_RECORD_DTYPE.itemsize
+    start_record = 0
+    if max_days is not None and max_days > 0:
+        start_record = max(0, record_count - max_days)
+
+    return np.fromfile(
+        file_path,
+        dtype=TDX_DAY_RECORD_DTYPE,
+        count=record_count - start_record,
+        offset=start_record * TDX_DAY_RECORD_DTYPE.itemsize
+    )
+
+
+def tdx_records_to_frame(records: np.ndarray) -> pl.DataFrame:
+    """
+    把通达信日线记录数组按列转换为DataFrame（价格单位为分，转换为元）
+
+    Args:
+        records: TDX_DAY_RECORD_DTYPE记录数组
+
+    Returns:
+        pl.DataFrame: 包含date, open, high, low, close, volume, amount的DataFrame
+    """
+    return pl.DataFrame({
+        'date': records['date'].astype(np.int64),
+        'open': records['open'] / 100.0,
+        'high': records['high'] / 100.0,
+        'low': records['low'] / 100.0,
+        'close': records['close'] / 100.0,
+        'volume': records['volume'].astype(np.float64),
+        'amount': records['amount'].astype(np.float64),
+    }).with_columns(
+        pl.col('date').cast(pl.Utf8).str.strptime(pl.Date, format='%Y%m%d', strict=False)
+    )
+
+
+def read_tdx_day_frame(file_path: Path, max_days: Optional[int] = None) -> pl.DataFrame:
+    """
+    使用NumPy结构化数组一次性解析通达信日线文件
+
+    相比逐条struct.unpack，直接把整个文件映射为记录数组后按列转换，
+    不产生逐行的Python对象
+
+    Args:
+        file_path: 日线文件路径
+        max_days: 只读取最近max_days条记录，None表示读取全部
+
+    Returns:
+        pl.DataFrame: 包含date, open, high, low, close, volume, amount的DataFrame
+    """
+    return tdx_records_to_frame(read_tdx_day_records(file_path, max_days))
+
+
+def _scan_symbol_parquet(parquet_file: Path, max_days: Optional[int] = None) -> pl.LazyFrame:
+    """惰性扫描列式存储中单只股票的文件，只投影OHLCV列，按日期排序后取最近max_days条"""
+    lazy_df = pl.scan_parquet(parquet_file)
+    available = lazy_df.collect_schema().names()
+    columns = [col for col in ['date', 'open', 'high', 'low', 'close', 'volume', 'amount'] if col in available]
+    lazy_df = lazy_df.select(columns).sort('date')
+    if max_days is not None and max_days > 0:
+        lazy_df = lazy_df.tail(max_days)
+    return lazy_df
+
+
+def load_symbol_frame(stock_code: str, tdx_data_path: Optional[str] = None,
+                      store_path: Optional[str] = None,
+                      max_days: Optional[int] = None) -> pl.DataFrame:
+    """
+    加载单只股票的日线数据，优先读取列式存储，其次读取通达信日线文件
+
+    列式存储约定为 {store_path}/{stock_code}.parquet，读取时只投影OHLCV列
+
+    Args:
+        stock_code: 股票代码
+        tdx_data_path: 通达信数据根目录
+        store_path: 列式存储目录
+        max_days: 只读取最近max_days条记录
+
+    Returns:
+        pl.DataFrame: 日线数据
+    """
+    if store_path:
+        parquet_file = Path(store_path) / f'{stock_code}.parquet'
+        if parquet_file.exists():
+            return _scan_symbol_parquet(parquet_file, max_days).collect()
+
+    if not tdx_data_path:
+        raise FileNotFoundError(f"股票{stock_code}没有可用的数据源")
+
+    file_path = resolve_tdx_day_file(tdx_data_path, stock_code)
+    if not file_path.exists():
+        raise FileNotFoundError(f"股票{stock_code}的通达信数据文件不存在: {file_path}")
+    return read_tdx_day_frame(file_path, max_days)
+
+
+def load_universe_panel(codes: Iterable[str], tdx_data_path: Optional[str] = None,
+                        store_path: Optional[str] = None, max_days: Optional[int] = None,
+                        symbol_col: str = 'ts_code') -> pl.DataFrame:
+    """
+    把多只股票的日线加载为一个长表面板
+
+    与逐只调用load_symbol_frame再拼接不同，通达信文件只读出记录数组，全部拼接后
+    一次完成列转换和日期解析；列式存储中的文件以惰性扫描一起收集。
+    加载失败的股票记录警告后跳过。
+
+    Args:
+        codes: 股票代码列表
+        tdx_data_path: 通达信数据根目录
+        store_path: 列式存储目录，存在对应Parquet文件时优先使用
+        max_days: 每只股票只读取最近max_days条记录
+        symbol_col: 股票代码列名（Categorical类型）
+
+    Returns:
+        pl.DataFrame: 按股票、日期排列的面板，包含股票代码列和OHLCV列
+
+    Raises:
+        ValueError: 没有任何可用的股票数据
+    """
+    records, record_codes, scans = [], [], []
+    for code in codes:
+        try:
+            parquet_file = Path(store_path) / f'{code}.parquet' if store_path else None
+            if parquet_file is not None and parquet_file.exists():
+                scan = _scan_symbol_parquet(parquet_file, max_days)
+                scans.append(scan.with_columns(pl.lit(code).alias(symbol_col)))
+                continue
+            if not tdx_data_path:
+                raise FileNotFoundError(f"股票{code}没有可用的数据源")
+            file_path = resolve_tdx_day_file(tdx_data_path, code)
+            if not file_path.exists():
+                raise FileNotFoundError(f"股票{code}的通达信数据文件不存在: {file_path}")
+            records.append(read_tdx_day_records(file_path, max_days))
+            record_codes.append(code)
+        except Exception as e:
+            # 单只股票的任何异常都只跳过该股票，不中断整个面板的加载
+            logger.warning(f"加载股票 {code} 失败: {e}")
+
+    frames = []
+    if records:
+        lengths = np.array([len(chunk) for chunk in records])
+        symbols = pl.Series(symbol_col, record_codes).gather(np.repeat(np.arange(len(record_codes)), lengths))
+        frames.append(tdx_records_to_frame(np.concatenate(records)).with_columns(symbols))
+    if scans:
+        frames.extend(pl.collect_all(scans))
+    frames = [frame for frame in frames if frame.height]
+    if not frames:
+        raise ValueError("没有可用的股票数据")
+    panel = pl.concat(frames, how='diagonal_relaxed')
+    return panel.with_columns(pl.col(symbol_col).cast(pl.Categorical))
+
+
+@contextmanager
+def _spawn_polars_threads(polars_threads: int) -> Iterator[None]:
+    """
+    在创建子进程期间设置POLARS_MAX_THREADS
+
+    每个子进程只处理一只股票的小数据量，限制Polars内部线程数，
+    避免进程数 × 线程数超出CPU核心数导致的过度订阅。
+    Polars在导入时确定线程池大小，而spawn启动的子进程在运行初始化函数之前就会随模块导入加载Polars，
+    所以只能通过父进程的环境变量传给子进程；退出时恢复父进程原来的设置
+    """
+    previous = os.environ.get('POLARS_MAX_THREADS')
+    os.environ['POLARS_MAX_THREADS'] = str(polars_threads)
+    try:
+        yield
+    finally:
+        if previous is None:
+            os.environ.pop('POLARS_MAX_THREADS', None)
+        else:
+            os.environ['POLARS_MAX_THREADS'] = previous
+
+
+def _calculate_symbol_task(stock_code: str, indicator_types: List[str], params: Dict[str, Any],
+                           tdx_data_path: Optional[str], store_path: Optional[str],
+                           max_days: Optional[int]) -> Tuple[str, Optional[bytes], Optional[str]]:
+    """
+    子进程任务：加载单只股票数据并计算指标
+
+    Returns:
+        Tuple[str, Optional[bytes], Optional[str]]: (股票代码, Arrow IPC字节流, 错误信息)
+    """
+    from .indicator_calculator import calculate_multiple_indicators_polars
+
+    try:
+        df = load_symbol_frame(stock_code, tdx_data_path, store_path, max_days)
+        if df.is_empty():
+            return stock_code, None, "数据为空"
+
+        result = calculate_multiple_indicators_polars(df.lazy(), indicator_types, **params).collect()
+
+        buffer = io.BytesIO()
+        result.write_ipc(buffer, compression='uncompressed')
+        return stock_code, buffer.getvalue(), None
+    except Exception as e:
+        # 任何异常都按该股票失败返回；异常若逃出子进程，future.result()会在主进程抛出并中断整个迭代
+        return stock_code, None, f"{type(e).__name__}: {e}"
+
+
+class MemorySink:
+    """
+    内存结果收集器，按股票代码保存计算结果
+    """
+
+    def __init__(self):
+        self.results: Dict[str, pl.DataFrame] = {}
+
+    def __call__(self, stock_code: str, df: pl.DataFrame):
+        self.results[stock_code] = df
+
+
+class ParquetSink:
+    """
+    Parquet结果写入器，每只股票写入 {output_dir}/{stock_code}.parquet
+    """
+
+    def __init__(self, output_dir: str, compression: str = 'zstd'):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.compression = compression
+
+    def __call__(self, stock_code: str, df: pl.DataFrame):
+        df.write_parquet(self.output_dir / f'{stock_code}.parquet', compression=self.compression)
+
+
+def iter_indicators_for_universe(codes: Iterable[str], indicator_types: Optional[List[str]] = None,
+                                 tdx_data_path: Optional[str] = None, store_path: Optional[str] = None,
+                                 max_workers: Optional[int] = None, max_days: Optional[int] = None,
+                                 polars_threads: int = 1,
+                                 **params) -> Iterator[Tuple[str, Optional[pl.DataFrame], Optional[str]]]:
+    """
+    按完成顺序逐只产出股票的指标计算结果
+
+    Args:
+        codes: 股票代码列表
+        indicator_types: 指标类型列表，默认DEFAULT_UNIVERSE_INDICATORS
+        tdx_data_path: 通达信数据根目录，None表示使用配置中的路径
+        store_path: 列式存储目录，存在对应Parquet文件时优先使用
+        max_workers: 进程数，None表示使用CPU核心数；1表示在当前进程内顺序计算
+        max_days: 每只股票只读取最近max_days条记录
+        polars_threads: 每个子进程的Polars线程数
+        **params: 指标计算参数，与calculate_multiple_indicators_polars一致
+
+    Yields:
+        Tuple[str, Optional[pl.DataFrame], Optional[str]]: (股票代码, 结果DataFrame, 错误信息)
+    """
+    codes = list(codes)
+    if indicator_types is None:
+        indicator_types = DEFAULT_UNIVERSE_INDICATORS
+
+    if tdx_data_path is None and store_path is None:
+        from src.utils.config import get_config
+        tdx_data_path = get_config().data.tdx_data_path
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 4
+    max_workers = max(1, min(max_workers, len(codes) or 1))
+
+    if max_workers == 1:
+        for stock_code in codes:
+            code, payload, error = _calculate_symbol_task(
+                stock_code, indicator_types, params, tdx_data_path, store_path, max_days
+            )
+            yield code, pl.read_ipc(io.BytesIO(payload)) if payload is not None else None, error
+        return
+
+    # Polars的线程池与fork不兼容，使用spawn启动子进程
+    mp_context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as executor:
+        # 子进程在submit时按需启动，环境变量只需在提交任务期间生效
+        with _spawn_polars_threads(polars_threads):
+            futures = [
+                executor.submit(_calculate_symbol_task, stock_code, indicator_types, params,
+                                tdx_data_path, store_path, max_days)
+                for stock_code in codes
+            ]
+        for future in as_completed(futures):
+            code, payload, error = future.result()
+            yield code, pl.read_ipc(io.BytesIO(payload)) if payload is not None else None, error
+
+
+def calculate_indicators_for_universe(codes: Iterable[str], indicator_types: Optional[List[str]] = None,
+                                      sink: Optional[Callable[[str, pl.DataFrame], None]] = None,
+                                      tdx_data_path: Optional[str] = None, store_path: Optional[str] = None,
+                                      max_workers: Optional[int] = None, max_days: Optional[int] = None,
+                                      polars_threads: int = 1, **params) -> Dict[str, Any]:
+    """
+    多股票指标计算：按股票分发到进程池，结果流式写入sink
+
+    与calculate_indicators_parallel按指标分组多线程计算单只股票不同，
+    这里的并行粒度是股票，子进程之间没有共享数据，也不需要按日期重新join
+
+    Args:
+        codes: 股票代码列表
+        indicator_types: 指标类型列表，默认DEFAULT_UNIVERSE_INDICATORS
+        sink: 结果接收函数sink(stock_code, df)，None表示收集到内存中返回
+        tdx_data_path: 通达信数据根目录，None表示使用配置中的路径
+        store_path: 列式存储目录，存在对应Parquet文件时优先使用
+        max_workers: 进程数，None表示使用CPU核心数
+        max_days: 每只股票只读取最近max_days条记录
+        polars_threads: 每个子进程的Polars线程数
+        **params: 指标计算参数
+
+    Returns:
+        Dict[str, Any]: 计算统计信息，包含succeeded、failed、elapsed、symbols_per_second；
+                        未指定sink时还包含results（股票代码到结果DataFrame的映射）
+    """
+    memory_sink = None
+    if sink is None:
+        memory_sink = MemorySink()
+        sink = memory_sink
+
+    start_time = time.perf_counter()
+    succeeded = 0
+    failed = {}
+
+    for stock_code, df, error in iter_indicators_for_universe(
+        codes, indicator_types, tdx_data_path=tdx_data_path, store_path=store_path,
+        max_workers=max_workers, max_days=max_days, polars_threads=polars_threads, **params
+    ):
+        if error is not None:
+            failed[stock_code] = error
+            logger.warning(f"计算股票{stock_code}指标失败: {error}")
+            continue
+        sink(stock_code, df)
+        succeeded += 1
+
+    elapsed = time.perf_counter() - start_time
+    total = succeeded + len(failed)
+    symbols_per_second = total / elapsed if elapsed > 0 else 0.0
+    logger.info(f"全市场指标计算完成: 成功{succeeded}只，失败{len(failed)}只，"
+                f"耗时{elapsed:.2f}秒，{symbols_per_second:.1f}只/秒")
+
+    stats = {
+        'succeeded': succeeded,
+        'failed': failed,
+        'elapsed': elapsed,
+        'symbols_per_second': symbols_per_second
+    }
+    if memory_sink is not None:
+        stats['results'] = memory_sink.results
+    return stats
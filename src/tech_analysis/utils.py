@@ -8,6 +8,8 @@
 import polars as pl
 from typing import List, Set, Dict, Any
 
+from .window_kernels import rolling_mad
+
 
 def collect_used_windows(indicator_types: List[str], indicator_params: Dict[str, Dict[str, Any]]) -> Set[int]:
     """
@@ -231,7 +233,9 @@ def to_float32(expr: pl.Expr) -> pl.Expr:
 
 def calculate_mad(tp_series: pl.Expr, window: int) -> pl.Expr:
     """
-    计算平均绝对偏差（MAD）
+    计算平均绝对偏差（MAD），与通达信AVEDEV一致
+    
+    每个窗口内的偏差都相对该窗口自身的均值计算，而不是当前行的移动平均
     
     Args:
         tp_series: 典型价格序列
@@ -240,9 +244,4 @@ def calculate_mad(tp_series: pl.Expr, window: int) -> pl.Expr:
     Returns:
         pl.Expr: MAD计算表达式
     """
-    # 计算滚动平均值
-    ma_tp_rolling = tp_series.rolling_mean(window_size=window, min_periods=1)
-    # 计算绝对偏差
-    abs_dev = (tp_series - ma_tp_rolling).abs()
-    # 计算滚动平均绝对偏差
-    return abs_dev.rolling_mean(window_size=window, min_periods=1).cast(pl.Float32)
+    return rolling_mad(tp_series, window, min_periods=1).cast(pl.Float32)
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+精确滚动窗口计算内核
+
+提供与通达信公式一致的窗口函数：
+- AVEDEV：真实的滚动平均绝对偏差（每个窗口相对该窗口自身均值）
+- SMA(X,N,M)：Y = (M*X + (N-M)*Y') / N
+- EMA(X,N)：Y = (2*X + (N-1)*Y') / (N+1)
+- WMA(X,N)：线性加权移动平均，权重1..N
+- DMA(X,A)：Y = A*X + (1-A)*Y'，A可以是常数或序列
+
+SMA/EMA/常数DMA的递推直接映射为ewm_mean(adjust=False)，WMA由两个rolling_sum组合而成；
+AVEDEV和序列权重的DMA以NumPy实现并通过map_batches接入Lazy查询计划，多股票面板的AVEDEV需通过by参数按股票分组计算。
+内核同时接受pl.Expr和pl.Series，便于在批量计算与增量计算中复用。
+"""
+
+from typing import Optional, Union
+
+import numpy as np
+import polars as pl
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+ExprOrSeries = Union[pl.Expr, pl.Series]
+
+# 滑动窗口视图按块计算，限制 行数 × 窗口 的临时内存
+_MAD_CHUNK_ROWS = 65536
+
+
+def rolling_mad_numpy(values: np.ndarray, window: int, min_periods: int = 1) -> np.ndarray:
+    """
+    计算精确的滚动平均绝对偏差（通达信AVEDEV）
+
+    对每个窗口先求窗口均值，再求窗口内各点到该均值的平均绝对偏差。
+    使用sliding_window_view构造 (n, window) 的只读视图，按块向量化计算。
+    NaN视为缺失值，不参与均值和偏差计算。
+
+    Args:
+        values: 输入序列
+        window: 窗口大小
+        min_periods: 窗口内最少有效值个数，不足时返回NaN
+
+    Returns:
+        np.ndarray: 与输入等长的MAD序列
+    """
+    x = np.asarray(values, dtype=np.float64)
+    n = len(x)
+    result = np.full(n, np.nan)
+    if n == 0 or window < 1:
+        return result
+
+    # 前端补NaN，使前window-1行也得到（不完整的）窗口
+    padded = np.concatenate([np.full(window - 1, np.nan), x])
+    windows = sliding_window_view(padded, window)
+
+    for start in range(0, n, _MAD_CHUNK_ROWS):
+        block = windows[start:start + _MAD_CHUNK_ROWS]
+        valid = ~np.isnan(block)
+        counts = valid.sum(axis=1)
+        filled = np.where(valid, block, 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = filled.sum(axis=1) / counts
+            deviations = np.where(valid, np.abs(block - means[:, None]), 0.0)
+            mad = deviations.sum(axis=1) / counts
+        mad[counts < max(min_periods, 1)] = np.nan
+        result[start:start + len(block)] = mad
+
+    return result
+
+
+def rolling_mad(x: ExprOrSeries, window: int, min_periods: int = 1, by: Optional[str] = None) -> ExprOrSeries:
+    """
+    精确滚动平均绝对偏差（通达信AVEDEV(X,N)）
+
+    内核通过map_batches作用于整列；多股票面板不要依赖.over()（map_batches在窗口上下文中是否按组调用
+    随Polars版本而不同），应传入by，由内核按分组列逐组计算（组内保持原有行序）。
+
+    Args:
+        x: 输入表达式或序列
+        window: 窗口大小
+        min_periods: 窗口内最少有效值个数
+        by: 分组列名（如股票代码），None表示整列为同一序列；只支持表达式输入
+
+    Returns:
+        pl.Expr或pl.Series: MAD结果，类型与输入一致
+    """
+    def _kernel(s: pl.Series) -> pl.Series:
+        values = s.cast(pl.Float64).fill_null(np.nan).to_numpy()
+        return pl.Series(s.name, rolling_mad_numpy(values, window, min_periods)).fill_nan(None)
+
+    def _grouped_kernel(s: pl.Series) -> pl.Series:
+        values = s.struct.field('x').cast(pl.Float64).fill_null(np.nan).to_numpy()
+        codes = s.struct.field('by').rank('dense').fill_null(0).to_numpy()
+        order = np.argsort(codes, kind='stable')
+        bounds = np.flatnonzero(np.diff(codes[order])) + 1
+        result = np.empty(len(values))
+        for rows in np.split(order, bounds):
+            result[rows] = rolling_mad_numpy(values[rows], window, min_periods)
+        return pl.Series(result).fill_nan(None)
+
+    if isinstance(x, pl.Series):
+        if by is not None:
+            raise ValueError("by只支持表达式输入")
+        return _kernel(x)
+    if by is not None:
+        return pl.struct(x.alias('x'), pl.col(by).alias('by')).map_batches(_grouped_kernel, return_dtype=pl.Float64)
+    return x.map_batches(_kernel, return_dtype=pl.Float64)
+
+
+def tdx_sma(x: ExprOrSeries, n: int, m: int = 1) -> ExprOrSeries:
+    """
+    通达信SMA(X,N,M)：Y = (M*X + (N-M)*Y') / N
+
+    等价于alpha=M/N、adjust=False的指数加权平均，首个有效值作为初始值
+
+    Args:
+        x: 输入表达式或序列
+        n: 周期N
+        m: 权重M，需满足 0 < M <= N
+
+    Returns:
+        pl.Expr或pl.Series: SMA结果
+    """
+    if n <= 0 or m <= 0 or m > n:
+        raise ValueError(f"SMA参数无效: N={n}, M={m}")
+    return x.ewm_mean(alpha=m / n, adjust=False, ignore_nulls=True)
+
+
+def tdx_ema(x: ExprOrSeries, n: int) -> ExprOrSeries:
+    """
+    通达信EMA(X,N)：Y = (2*X + (N-1)*Y') / (N+1)
+
+    Args:
+        x: 输入表达式或序列
+        n: 周期N
+
+    Returns:
+        pl.Expr或pl.Series: EMA结果
+    """
+    if n <= 0:
+        raise ValueError(f"EMA参数无效: N={n}")
+    return x.ewm_mean(alpha=2.0 / (n + 1), adjust=False, ignore_nulls=True)
+
+
+def tdx_wma(x: pl.Expr, n: int) -> pl.Expr:
+    """
+    通达信WMA(X,N)：线性加权移动平均，最近一期权重为N，最早一期权重为1
+
+    利用滚动和恒等式 Σw·x = Σk·x - (t-N)·Σx（k为行号）转化为两个rolling_sum，避免逐窗口加权
+
+    Args:
+        x: 输入表达式
+        n: 周期N
+
+    Returns:
+        pl.Expr: WMA结果，前N-1行为空
+    """
+    if n <= 0:
+        raise ValueError(f"WMA参数无效: N={n}")
+    x = x.cast(pl.Float64)
+    index = pl.int_range(0, pl.len(), dtype=pl.Int64).cast(pl.Float64)
+    weighted_sum = (index * x).rolling_sum(window_size=n) - (index - n) * x.rolling_sum(window_size=n)
+    return weighted_sum / (n * (n + 1) / 2.0)
+
+
+def dma_numpy(values: np.ndarray, alphas: np.ndarray) -> np.ndarray:
+    """
+    动态移动平均递推 Y = A*X + (1-A)*Y'
+
+    序列按约sqrt(n)行分块：各块先以0为初值同时递推（每步是跨块的向量运算），
+    再逐块传递块首的初值，最后按块内(1-A)的累乘把初值叠加回去。
+    只有乘法没有除法，A接近0或等于1时不会溢出，结果与逐行递推只差舍入误差。
+    NaN输入或NaN权重的行沿用上一期结果，首个有效值之前为NaN。
+
+    Args:
+        values: 输入序列
+        alphas: 平滑因子序列，取值(0, 1]
+
+    Returns:
+        np.ndarray: DMA结果
+    """
+    x = np.asarray(values, dtype=np.float64)
+    a = np.clip(np.asarray(alphas, dtype=np.float64), 0.0, 1.0)
+    n = len(x)
+    valid = ~(np.isnan(x) | np.isnan(a))
+    if not valid.any():
+        return np.full(n, np.nan)
+    # 无效行取 A=0（沿用上一期），首个有效行取 A=1（以该值为初值）
+    first = int(np.argmax(valid))
+    a = np.where(valid, a, 0.0)
+    a[first] = 1.0
+    x = np.where(valid, x, 0.0)
+
+    block = max(1, int(np.sqrt(n)))
+    blocks = -(-n // block)
+    padded_a = np.zeros(blocks * block)
+    padded_x = np.zeros(blocks * block)
+    padded_a[:n], padded_x[:n] = a, x
+    weights = padded_a.reshape(blocks, block).T
+    inputs = padded_x.reshape(blocks, block).T * weights
+    decay = 1.0 - weights
+
+    partial = np.empty_like(weights)
+    prev = np.zeros(blocks)
+    for row in range(block):
+        prev = inputs[row] + decay[row] * prev
+        partial[row] = prev
+    carry_decay = np.cumprod(decay, axis=0)
+
+    starts = np.empty(blocks)
+    carry = 0.0
+    for j, (block_decay, block_end) in enumerate(zip(carry_decay[-1].tolist(), partial[-1].tolist())):
+        starts[j] = carry
+        carry = block_decay * carry + block_end
+
+    result = (carry_decay * starts + partial).T.reshape(-1)[:n]
+    result[:first] = np.nan
+    return result
+
+
+def tdx_dma(x: ExprOrSeries, alpha: Union[float, pl.Expr, pl.Series]) -> ExprOrSeries:
+    """
+    通达信DMA(X,A)：Y = A*X + (1-A)*Y'
+
+    Args:
+        x: 输入表达式或序列
+        alpha: 平滑因子，常数或与x等长的表达式/序列
+
+    Returns:
+        pl.Expr或pl.Series: DMA结果
+    """
+    if isinstance(alpha, (int, float)):
+        if not 0 < alpha <= 1:
+            raise ValueError(f"DMA参数无效: A={alpha}")
+        return x.ewm_mean(alpha=float(alpha), adjust=False, ignore_nulls=True)
+
+    if isinstance(x, pl.Series):
+        values = x.cast(pl.Float64).fill_null(np.nan).to_numpy()
+        alphas = alpha.cast(pl.Float64).fill_null(np.nan).to_numpy()
+        return pl.Series(x.name, dma_numpy(values, alphas)).fill_nan(None)
+
+    def _kernel(s: pl.Series) -> pl.Series:
+        values = s.struct.field('x').cast(pl.Float64).fill_null(np.nan).to_numpy()
+        alphas = s.struct.field('a').cast(pl.Float64).fill_null(np.nan).to_numpy()
+        return pl.Series(dma_numpy(values, alphas)).fill_nan(None)
+
+    return pl.struct(x.alias('x'), alpha.alias('a')).map_batches(_kernel, return_dtype=pl.Float64)
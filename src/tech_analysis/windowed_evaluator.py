@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+按需窗口化指标计算
+
+调用方声明指标集合与可见行数，引擎根据各指标参数自动推导预热回看长度，
+只对 可见行数 + 回看长度 的数据、只投影计算所需的基础列，执行一次Lazy查询计划。
+
+回看长度的推导规则：
+- 滚动窗口类指标：回看 = 最大窗口（多级滚动时逐级相加）
+- 递推类指标（通达信SMA/EMA）：初值残留权重为 (1-alpha)^k，
+  取使残留权重低于容差的最小k作为回看长度
+- 累积类或路径依赖指标（OBV、ASI、MCST、SAR、ADL、CYC∞等）：无有限回看，使用全部历史
+"""
+
+import math
+from typing import Iterable, List, Optional
+
+import polars as pl
+from loguru import logger
+
+from .indicator_calculator import calculate_multiple_indicators_polars
+from .utils import get_indicator_params
+
+
+# 递推类指标初值残留权重的默认容差
+DEFAULT_WARMUP_TOLERANCE = 1e-5
+
+# 指标计算可能用到的基础输入列，其余列（已有指标列、复权列等）不参与计算
+INDICATOR_INPUT_COLUMNS = (
+    'date', 'open', 'high', 'low', 'close', 'volume', 'amount',
+    'up_count', 'down_count'
+)
+
+# 依赖全部历史的指标，回看长度无上限
+UNBOUNDED_INDICATORS = frozenset({'obv', 'asi', 'mcst', 'sar', 'adl', 'cyc', 'fsl'})
+
+
+def ema_warmup_bars(alpha: float, tolerance: float = DEFAULT_WARMUP_TOLERANCE) -> int:
+    """
+    计算递推 Y = alpha*X + (1-alpha)*Y' 收敛到容差所需的K线数
+
+    Args:
+        alpha: 平滑因子，取值(0, 1]
+        tolerance: 初值残留权重容差
+
+    Returns:
+        int: 预热K线数
+    """
+    if alpha >= 1.0:
+        return 0
+    return int(math.ceil(math.log(tolerance) / math.log(1.0 - alpha)))
+
+
+def estimate_warmup_bars(indicator_type: str, tolerance: float = DEFAULT_WARMUP_TOLERANCE,
+                         **params) -> Optional[int]:
+    """
+    根据指标参数推导单个指标的预热回看长度
+
+    Args:
+        indicator_type: 指标类型
+        tolerance: 递推类指标的初值残留权重容差
+        **params: 指标计算参数，与calculate_multiple_indicators_polars一致
+
+    Returns:
+        Optional[int]: 回看K线数，None表示需要全部历史
+    """
+    if indicator_type in UNBOUNDED_INDICATORS:
+        return None
+
+    indicator_params = get_indicator_params(**params).get(indicator_type, {})
+    windows = indicator_params.get('windows', [])
+    max_window = max(windows) if windows else 0
+
+    if indicator_type in ('ma', 'vol_ma', 'wr', 'boll', 'cci', 'psy', 'brar', 'emv'):
+        return max_window
+    if indicator_type in ('roc', 'mtm', 'vr'):
+        return max_window + 1
+    if indicator_type == 'cr':
+        return max(params.get('cr_windows', [26])) + 1
+    if indicator_type == 'rsi':
+        return max(ema_warmup_bars(1.0 / w, tolerance) for w in windows) + 1
+    if indicator_type == 'kdj':
+        return max_window + 2 * ema_warmup_bars(1.0 / 3, tolerance)
+    if indicator_type == 'macd':
+        return (ema_warmup_bars(2.0 / (indicator_params['slow_period'] + 1), tolerance)
+                + ema_warmup_bars(2.0 / (indicator_params['signal_period'] + 1), tolerance))
+    if indicator_type == 'dmi':
+        # DX依赖N日和，ADX再取N日均值，ADXR再回看N日
+        return 3 * max_window + 1
+    if indicator_type == 'trix':
+        signal_period = indicator_params['signal_period']
+        return max(3 * ema_warmup_bars(2.0 / (w + 1), tolerance) for w in windows) \
+            + ema_warmup_bars(2.0 / (signal_period + 1), tolerance) + 1
+    if indicator_type == 'expma':
+        return max(ema_warmup_bars(2.0 / (w + 1), tolerance) for w in params.get('expma_windows', [12, 50]))
+    if indicator_type == 'dma':
+        return params.get('dma_long_period', 50) + params.get('dma_signal_period', 10)
+    if indicator_type == 'bbi':
+        return 24
+    if indicator_type == 'hsl':
+        return 60 + 10
+    if indicator_type == 'lb':
+        return params.get('lb_period', 5) + 1
+    if indicator_type == 'cys':
+        return params.get('cys_cyc_window', 13) + 5
+    if indicator_type in ('abi', 'adr', 'obos'):
+        return params.get('period', 10)
+
+    # 未登记的指标保守处理，使用全部历史
+    return None
+
+
+def estimate_lookback(indicator_types: Iterable[str], tolerance: float = DEFAULT_WARMUP_TOLERANCE,
+                      **params) -> Optional[int]:
+    """
+    计算一组指标共同所需的预热回看长度
+
+    Args:
+        indicator_types: 指标类型列表
+        tolerance: 递推类指标的初值残留权重容差
+        **params: 指标计算参数
+
+    Returns:
+        Optional[int]: 回看K线数，任一指标需要全部历史时返回None
+    """
+    lookback = 0
+    for indicator_type in indicator_types:
+        bars = estimate_warmup_bars(indicator_type, tolerance, **params)
+        if bars is None:
+            return None
+        lookback = max(lookback, bars)
+    return lookback
+
+
+def calculate_indicators_windowed(df: pl.DataFrame, indicator_types: List[str], visible_rows: int,
+                                  tolerance: float = DEFAULT_WARMUP_TOLERANCE,
+                                  **params) -> pl.DataFrame:
+    """
+    只对可见窗口计算指定指标
+
+    仅投影基础输入列，对最后 visible_rows + 回看长度 行构建一次Lazy查询计划，
+    再把可见窗口内的指标值按行对齐回原数据；可见窗口之前的行指标为空值。
+    原数据中已有的同名指标列会被替换。
+
+    Args:
+        df: 按时间升序排列的K线数据
+        indicator_types: 需要计算的指标类型列表
+        visible_rows: 可见（需要有效指标值）的行数
+        tolerance: 递推类指标的初值残留权重容差
+        **params: 指标计算参数，与calculate_multiple_indicators_polars一致
+
+    Returns:
+        pl.DataFrame: 与df等高、包含指标列的数据
+    """
+    total_rows = df.height
+    if total_rows == 0 or not indicator_types:
+        return df
+
+    visible_rows = max(1, min(int(visible_rows), total_rows))
+    lookback = estimate_lookback(indicator_types, tolerance, **params)
+    if lookback is None:
+        start = 0
+    else:
+        start = max(0, total_rows - visible_rows - lookback)
+
+    input_columns = [col for col in INDICATOR_INPUT_COLUMNS if col in df.columns]
+    lazy_df = df.lazy().select(input_columns).slice(start)
+    result = calculate_multiple_indicators_polars(lazy_df, indicator_types, **params).collect()
+
+    indicator_columns = [col for col in result.columns if col not in input_columns]
+    values = result.select(indicator_columns).tail(visible_rows)
+    padding = values.clear(n=total_rows - visible_rows)
+    values = pl.concat([padding, values], how='vertical')
+
+    logger.debug(f"窗口化指标计算: 指标{indicator_types}, 可见{visible_rows}行, "
+                 f"回看{'全部' if lookback is None else lookback}行, 实际计算{total_rows - start}/{total_rows}行")
+
+    existing = [col for col in indicator_columns if col in df.columns]
+    return df.drop(existing).hstack(values)
+
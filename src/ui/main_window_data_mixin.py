@@ -11,6 +11,15 @@ from src.ui.task_manager import global_task_manager
 from src.utils.logger import logger
 from src.utils.exceptions import DataException
 
+# 界面指标名称到内置指标类型的映射，未登记的指标（VOL-TDX、大势型指标等）由渲染器按需计算
+PANE_INDICATOR_TYPES = {
+    'MA': 'ma', 'VOL': 'vol_ma', 'KDJ': 'kdj', 'MACD': 'macd', 'RSI': 'rsi', 'WR': 'wr',
+    'BOLL': 'boll', 'VR': 'vr', 'BRAR': 'brar', 'DMI': 'dmi', 'TRIX': 'trix', 'OBV': 'obv',
+    'ASI': 'asi', 'EMV': 'emv', 'CCI': 'cci', 'ROC': 'roc', 'MTM': 'mtm', 'PSY': 'psy',
+    'MCST': 'mcst', 'DMA': 'dma', 'FSL': 'fsl', 'SAR': 'sar', 'CR': 'cr', 'EXPMA': 'expma',
+    'BBI': 'bbi', 'HSL': 'hsl', 'LB': 'lb', 'CYC': 'cyc', 'CYS': 'cys',
+}
+
 
 class MainWindowDataMixin:
     """
@@ -1012,33 +1021,144 @@ class MainWindowDataMixin:
         global_task_manager.task_completed.connect(on_task_completed)
         global_task_manager.task_error.connect(on_task_error)
 
+    def _visible_indicator_types(self) -> list:
+        """
+        获取当前图表可见的内置指标类型（主图MA、成交量及各副图指标）
+
+        Returns:
+            list: 指标类型列表
+        """
+        pane_names = ['MA', 'VOL'] + list(getattr(self, 'window_indicators', {}).values())
+        indicator_types = []
+        for name in pane_names:
+            indicator_type = PANE_INDICATOR_TYPES.get(name)
+            if indicator_type and indicator_type not in indicator_types:
+                indicator_types.append(indicator_type)
+        return indicator_types
+
     def _recalculate_indicators_for_period(self, df: pl.DataFrame) -> pl.DataFrame:
         """
-        为周线或月线数据重新计算技术指标
+        为当前可见窗口重新计算技术指标
+
+        只计算主图和副图实际显示的指标，且只覆盖最后displayed_bar_count根K线
+        （自动附加各指标所需的预热回看），更早的行指标为空值。
 
         Args:
-            df: 周线或月线数据（只有基础OHLCV数据）
+            df: 日线、周线或月线数据
 
         Returns:
             pl.DataFrame: 包含技术指标的数据
         """
         try:
-            from src.tech_analysis.technical_analyzer import TechnicalAnalyzer
-
-            # TechnicalAnalyzer 已支持 Polars DataFrame，直接传递
-            analyzer = TechnicalAnalyzer(df)
-
-            # 计算所有技术指标，直接返回 Polars DataFrame
-            # 传入数据以确保复权列被保留
-            result_pl = analyzer.calculate_all_indicators(data=df, return_polars=True)
-
-            logger.info(f"为{df.height}条数据重新计算了技术指标")
+            indicator_types = self._visible_indicator_types()
+            visible_rows = getattr(self, 'displayed_bar_count', 100)
+            result_pl = self._calculate_visible_indicators(df, indicator_types, visible_rows)
+            self._indicator_window = (frozenset(indicator_types), visible_rows)
             return result_pl
 
         except (OSError, RuntimeError, ValueError) as e:
             logger.exception(f"重新计算技术指标失败: {e}")
             return df
 
+    @staticmethod
+    def _calculate_visible_indicators(df: pl.DataFrame, indicator_types: list, visible_rows: int) -> pl.DataFrame:
+        """
+        计算最后visible_rows根K线的指定指标，不读写窗口状态，可在后台线程中调用
+
+        Args:
+            df: 日线、周线或月线数据
+            indicator_types: 指标类型列表
+            visible_rows: 可见K线数量
+
+        Returns:
+            pl.DataFrame: 包含技术指标的数据
+        """
+        from src.tech_analysis.technical_analyzer import TechnicalAnalyzer
+
+        # TechnicalAnalyzer 已支持 Polars DataFrame，直接传递
+        analyzer = TechnicalAnalyzer(df)
+
+        # 只计算可见指标，直接返回 Polars DataFrame
+        # 传入数据以确保复权列被保留
+        result_pl = analyzer.calculate_all_indicators(data=df, indicator_types=indicator_types,
+                                                      visible_rows=visible_rows, return_polars=True)
+        logger.info(f"为{df.height}条数据中最后{min(visible_rows, df.height)}条计算了指标: {indicator_types}")
+        return result_pl
+
+    def _ensure_visible_indicators(self, df: pl.DataFrame, stock_name: str = None, stock_code: str = None) -> pl.DataFrame:
+        """
+        柱体数增加或切换副图指标后，按需在后台补算当前股票数据的指标
+
+        缺少指标时立即返回原数据（已有指标照常绘制），补算通过global_task_manager在后台线程执行，
+        完成后若当前股票未切换，则更新current_stock_data并重绘K线图。
+
+        Args:
+            df: 待绘制的数据
+            stock_name: 股票名称，用于补算完成后重绘
+            stock_code: 股票代码，用于补算完成后重绘
+
+        Returns:
+            pl.DataFrame: 本次用于绘制的数据
+        """
+        if df is None or df is not getattr(self, 'current_stock_data', None):
+            return df
+
+        computed = getattr(self, '_indicator_window', None)
+        indicator_types = self._visible_indicator_types()
+        visible_rows = getattr(self, 'displayed_bar_count', 100)
+        request = (frozenset(indicator_types), visible_rows)
+        if computed is not None and request[0] <= computed[0] and visible_rows <= computed[1]:
+            return df
+
+        # 同一份数据的相同补算请求已在后台执行时不重复提交
+        pending = getattr(self, '_indicator_task', None)
+        if pending is not None and pending[0] is df and pending[1] == request:
+            return df
+
+        def _calculate_indicators_task(source, task_id=None, signals=None):
+            """后台任务函数"""
+            return self._calculate_visible_indicators(source, indicator_types, visible_rows)
+
+        task_id = global_task_manager.create_task(
+            f"补算可见指标: {stock_name or ''}({stock_code or ''})",
+            _calculate_indicators_task,
+            (df,)
+        )
+        self._indicator_task = (df, request, task_id)
+
+        def _finish():
+            try:
+                global_task_manager.task_completed.disconnect(on_task_completed)
+                global_task_manager.task_error.disconnect(on_task_error)
+            except RuntimeError:
+                pass
+            pending = getattr(self, '_indicator_task', None)
+            if pending is not None and pending[2] == task_id:
+                self._indicator_task = None
+
+        def on_task_completed(completed_task_id, result):
+            if completed_task_id != task_id:
+                return
+            _finish()
+
+            # 计算期间已切换股票或重新加载数据时丢弃结果
+            if result is None or getattr(self, 'current_stock_data', None) is not df:
+                return
+            self.current_stock_data = result
+            self._indicator_window = request
+            if stock_name is not None and stock_code is not None:
+                self.plot_k_line(result, stock_name, stock_code)
+
+        def on_task_error(error_task_id, error_message):
+            if error_task_id != task_id:
+                return
+            _finish()
+            logger.warning(f"补算可见指标失败: {error_message}")
+
+        global_task_manager.task_completed.connect(on_task_completed)
+        global_task_manager.task_error.connect(on_task_error)
+        return df
+
     def _format_color_item(self, item, value):
         try:
             val = float(value)
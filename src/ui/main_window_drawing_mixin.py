@@ -101,6 +101,8 @@ class MainWindowDrawingMixin:
             stock_name: 股票名称
             stock_code: 股票代码
         """
+        if hasattr(self, '_ensure_visible_indicators'):
+            df = self._ensure_visible_indicators(df, stock_name, stock_code)
         return self.chart_manager.plot_k_line(df, stock_name, stock_code)
     
     def _plot_k_line_impl(self, df, stock_name, stock_code):
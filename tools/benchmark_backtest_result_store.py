@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+列式回测结果内存占用与Parquet持久化基准。
+
+功能：
+1. 用BacktestEngine（逐行字典结果）对一组参数组合逐个回测，
+   比较保留原始结果字典（tracemalloc统计）与转换为BacktestResult后（按列估算）的内存占用
+2. 把全部结果写入Parquet目录再读回，检查权益曲线、交易记录与汇总指标和原始结果一致，并统计读写耗时
+3. 检查signal列含hold、自定义标签或空值的交易记录可以原样保存和读回
+
+退出码：读回结果一致返回0，否则返回1。
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import polars as pl
+from loguru import logger
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.backtest.engine.backtest_engine import BacktestEngine
+from src.backtest.engine.backtest_result import (BacktestResult, load_backtest_results, load_backtest_summary,
+                                                 save_backtest_results)
+from src.backtest.strategies.ma_strategy import MAStrategy
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from benchmark_vectorized_backtest import make_synthetic_daily
+
+
+def traced_size(build) -> tuple:
+    """返回 (build()的结果, 构建期间新增并保留的内存字节数)"""
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def check_signal_labels() -> bool:
+    """signal为buy/sell/hold时按int8保存，含自定义标签时整列按Categorical保存，两种情况都应原样读回"""
+    equity_curve = pl.DataFrame({"date": pl.date_range(pl.date(2024, 1, 1), pl.date(2024, 1, 4), eager=True),
+                                 "equity": [1.0, 1.1, 1.2, 1.3]})
+    cases = [["buy", "hold", "sell", "hold"], ["buy", "rebalance", None, "sell"]]
+    results = []
+    for signals in cases:
+        trades = equity_curve.select("date", pl.Series("signal", signals, dtype=pl.Utf8), price=pl.col("equity"))
+        results.append({"equity_curve": equity_curve, "trades": trades})
+    with tempfile.TemporaryDirectory() as directory:
+        save_backtest_results(results, directory)
+        loaded = load_backtest_results(directory)
+    return all(result["trades"].equals(original["trades"]) for result, original in zip(loaded, results))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="列式回测结果内存占用与Parquet持久化基准")
+    parser.add_argument("--bars", type=int, default=2520, help="K线数量")
+    parser.add_argument("--results", type=int, default=200, help="保留的回测结果数量")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    data = make_synthetic_daily(args.bars)
+    param_sets = [{"short_window": short, "long_window": long}
+                  for short in range(2, 42) for long in range(50, 250, 10)][:args.results]
+
+    def run(params):
+        engine = BacktestEngine(data)
+        engine.set_strategy(MAStrategy(**params))
+        result = engine.run_backtest()
+        result["params"] = params
+        return result
+
+    raw = [run(params) for params in param_sets]
+    _, raw_bytes = traced_size(lambda: [run(params) for params in param_sets])
+    # Polars的内存不经过Python分配器，列式结果按BacktestResult.nbytes统计
+    columnar = [BacktestResult.from_results(result) for result in raw]
+    columnar_bytes = sum(result.nbytes() for result in columnar)
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        save_backtest_results(columnar, directory)
+        write_s = time.perf_counter() - start
+        disk_bytes = sum(path.stat().st_size for path in Path(directory).iterdir())
+
+        start = time.perf_counter()
+        loaded = load_backtest_results(directory)
+        read_s = time.perf_counter() - start
+        summary = load_backtest_summary(directory)
+
+    consistent = len(loaded) == len(raw) and all(
+        result["equity_curve"].equals(pl.DataFrame(original["equity_curve"]))
+        and result["trades"].equals(pl.DataFrame(original["trades"], infer_schema_length=None))
+        and result["total_return"] == original["total_return"]
+        and result["params"] == original["params"]
+        for result, original in zip(loaded, raw))
+
+    print(pl.DataFrame([{
+        "results": len(raw),
+        "bars": args.bars,
+        "dict_mb": round(raw_bytes / 2 ** 20, 2),
+        "columnar_mb": round(columnar_bytes / 2 ** 20, 2),
+        "reduction": round(raw_bytes / columnar_bytes, 1),
+        "parquet_mb": round(disk_bytes / 2 ** 20, 2),
+        "write_s": round(write_s, 3),
+        "read_s": round(read_s, 3),
+    }]))
+    print(summary.sort("total_return", descending=True).select("result_id", "short_window", "long_window",
+                                                                "total_return").head(5))
+    labels_ok = check_signal_labels()
+    print(f"读回结果与原始结果一致: {consistent}")
+    print(f"hold与自定义signal标签读回一致: {labels_ok}")
+    if not (consistent and labels_ok):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+批量参数评估基准。
+
+功能：
+1. 在合成日线上对MAStrategy和MACDStrategy做网格优化
+2. 比较批量评估（VectorizedBacktestEngine.run_backtest_batch）与逐组合回测的耗时
+3. 抽样检查批量结果与BacktestEngine逐K线回测的一致性
+
+退出码：抽样结果全部一致返回0，否则返回1。
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+from loguru import logger
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.backtest.engine.backtest_engine import BacktestEngine
+from src.backtest.engine.parameter_sweep import iter_param_combinations
+from src.backtest.engine.vectorized_backtest_engine import VectorizedBacktestEngine
+from src.backtest.strategies.ma_strategy import MAStrategy
+from src.backtest.strategies.macd_strategy import MACDStrategy
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from benchmark_vectorized_backtest import make_synthetic_daily
+
+GRIDS = {
+    "ma": (MAStrategy, {"short_window": list(range(2, 42)), "long_window": list(range(20, 120, 2))}),
+    "macd": (MACDStrategy, {"fast_period": list(range(4, 20)), "slow_period": list(range(20, 40, 2)),
+                            "signal_period": list(range(3, 15))}),
+}
+
+METRICS = ("sharpe_ratio", "max_drawdown", "winning_rate", "average_profit_loss", "annual_return", "trades_count")
+
+
+def check_sample(df: pl.DataFrame, strategy_class, batch_results, samples: int, tolerance: float) -> float:
+    """抽样与逐K线回测比较，返回最大相对误差"""
+    rng = np.random.default_rng(0)
+    worst = 0.0
+    for index in rng.choice(len(batch_results), size=min(samples, len(batch_results)), replace=False):
+        result = batch_results[index]
+        strategy = strategy_class()
+        strategy.set_params(result["params"])
+        engine = BacktestEngine(df)
+        engine.set_strategy(strategy)
+        expected = engine.run_backtest(result["initial_capital"])
+        worst = max(worst, abs(expected["final_equity"] - result["final_equity"]) / expected["final_equity"])
+        for name in METRICS:
+            a, b = expected["performance"][name], result["performance"][name]
+            worst = max(worst, abs(a - b) / max(abs(a), 1.0))
+    return worst
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="批量参数评估基准")
+    parser.add_argument("--bars", type=int, default=2520, help="K线数量")
+    parser.add_argument("--loop-samples", type=int, default=50, help="逐组合回测计时使用的组合数，用于估算全网格耗时")
+    parser.add_argument("--check-samples", type=int, default=20, help="一致性抽样检查的组合数")
+    parser.add_argument("--tolerance", type=float, default=1e-9, help="一致性检查的最大相对误差")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    df = make_synthetic_daily(args.bars)
+
+    rows = []
+    failed = False
+    for name, (strategy_class, param_ranges) in GRIDS.items():
+        param_sets = list(iter_param_combinations(param_ranges))
+        engine = VectorizedBacktestEngine(df)
+        engine.set_strategy(strategy_class())
+
+        start = time.perf_counter()
+        batch_results = engine.run_backtest_batch(param_sets)
+        batch_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for params in param_sets[:args.loop_samples]:
+            strategy = strategy_class()
+            strategy.set_params(params)
+            loop_engine = BacktestEngine(df)
+            loop_engine.set_strategy(strategy)
+            loop_engine.run_backtest()
+        loop_s = (time.perf_counter() - start) / min(args.loop_samples, len(param_sets)) * len(param_sets)
+
+        error = check_sample(df, strategy_class, batch_results, args.check_samples, args.tolerance)
+        failed |= error > args.tolerance
+        rows.append({
+            "strategy": name,
+            "combinations": len(param_sets),
+            "batch_s": round(batch_s, 2),
+            "loop_s_estimated": round(loop_s, 1),
+            "speedup": round(loop_s / batch_s, 1),
+            "max_rel_error": error,
+        })
+
+    print(pl.DataFrame(rows))
+    if failed:
+        print("批量结果与逐K线回测不一致")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
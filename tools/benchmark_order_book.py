@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+订单簿撮合一致性检查与事件驱动引擎吞吐量基准。
+
+功能：
+1. 一致性：在随机K线上，比较SymbolOrderBook的堆撮合与逐单扫描全部挂单的暴力撮合，
+   要求每根K线成交的订单集合与成交价格完全一致（不考虑资金、成交量等账户约束，命中即全部成交）；
+   并用手工构造的K线检查止损限价单不会以触发前的价格成交；
+   在两只股票的手工行情上检查EventDrivenBacktestEngine的交易统计按股票和股数配对成交
+2. 性能：向EventDrivenBacktestEngine预先提交大量（默认100万）随机限价/止损/止损限价单，
+   并在回调中每日追加市价单，统计撮合耗时与每秒处理订单数
+
+退出码：一致性检查通过返回0，否则返回1。
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import polars as pl
+from loguru import logger
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.backtest.engine.event_driven_engine import EventDrivenBacktestEngine
+from src.backtest.orders.order import LimitOrder, MarketOrder, Order, StopLimitOrder, StopOrder
+from src.backtest.orders.order_book import SymbolOrderBook
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from benchmark_vectorized_backtest import make_synthetic_daily
+
+
+def make_random_orders(count: int, symbols: List[str], reference: Dict[str, float], seed: int) -> List[Order]:
+    """生成以参考价为中心、价格上下浮动30%的随机挂单"""
+    rng = np.random.default_rng(seed)
+    kinds = rng.integers(0, 3, count).tolist()
+    sides = np.where(rng.random(count) < 0.5, 'buy', 'sell').tolist()
+    symbol_idx = rng.integers(0, len(symbols), count)
+    base = np.array([reference[symbol] for symbol in symbols])[symbol_idx]
+    prices = np.round(base * rng.uniform(0.7, 1.3, count), 2)
+    limits = np.round(prices * rng.uniform(0.98, 1.02, count), 2).tolist()
+    prices = prices.tolist()
+    quantities = (rng.integers(1, 20, count) * 100).tolist()
+    orders = []
+    for i in range(count):
+        symbol = symbols[symbol_idx[i]]
+        if kinds[i] == 0:
+            orders.append(LimitOrder(f"o{i}", symbol, quantities[i], sides[i], prices[i]))
+        elif kinds[i] == 1:
+            orders.append(StopOrder(f"o{i}", symbol, quantities[i], sides[i], prices[i]))
+        else:
+            orders.append(StopLimitOrder(f"o{i}", symbol, quantities[i], sides[i], prices[i], limits[i]))
+    return orders
+
+
+def brute_force_match(orders: List[Order], open_price: float, high: float, low: float) -> Dict[str, float]:
+    """逐单扫描全部挂单，返回本根K线成交的 {订单ID: 成交价格}"""
+    fills = {}
+    for order in orders:
+        if not order.is_active:
+            continue
+        buy = order.side == 'buy'
+        if order.order_type in ('stop', 'stop_limit') and not order.triggered:
+            if (high >= order.stop_price) if buy else (low <= order.stop_price):
+                order.triggered = True
+                trigger_price = max(open_price, order.stop_price) if buy else min(open_price, order.stop_price)
+                if order.order_type == 'stop':
+                    fills[order.order_id] = trigger_price
+                elif (low <= order.limit_price) if buy else (high >= order.limit_price):
+                    fills[order.order_id] = (min(order.limit_price, trigger_price) if buy
+                                             else max(order.limit_price, trigger_price))
+            continue
+        if order.order_type == 'stop':
+            fills[order.order_id] = open_price
+        elif (low <= order.limit_price) if buy else (high >= order.limit_price):
+            fills[order.order_id] = min(open_price, order.limit_price) if buy else max(open_price, order.limit_price)
+    return fills
+
+
+def check_matching_parity(order_count: int, bars: int) -> bool:
+    """比较堆撮合与暴力撮合的逐K线成交结果"""
+    data = make_synthetic_daily(bars, seed=11)
+    heap_orders = make_random_orders(order_count, ["000001"], {"000001": float(data['close'][0])}, seed=5)
+    scan_orders = make_random_orders(order_count, ["000001"], {"000001": float(data['close'][0])}, seed=5)
+    book = SymbolOrderBook("000001")
+    for order in heap_orders:
+        book.add(order)
+
+    for open_price, high, low in data.select('open', 'high', 'low').iter_rows():
+        high, low = max(high, open_price), min(low, open_price)
+        heap_fills = {order.order_id: price for order, price in book.match(open_price, high, low)}
+        scan_fills = brute_force_match(scan_orders, open_price, high, low)
+        if heap_fills != scan_fills:
+            return False
+        for orders in (heap_orders, scan_orders):
+            for order in orders:
+                if order.order_id in heap_fills:
+                    order.execute(heap_fills[order.order_id])
+    return True
+
+
+def check_stop_limit_fills() -> bool:
+    """止损限价单在触发K线内的成交价不得优于触发价，限价不可达时留到后续K线"""
+    # (方向, 止损价, 限价, 开盘价, 最高价, 最低价, 期望成交价；None表示本根K线不成交)
+    cases = [
+        ('buy', 10.5, 11.0, 10.0, 12.0, 9.5, 10.5),    # 盘中上穿止损价，不能按更低的开盘价成交
+        ('buy', 10.5, 11.0, 10.8, 12.0, 9.5, 10.8),    # 开盘已越过止损价，按开盘价成交
+        ('buy', 10.5, 11.0, 11.5, 12.0, 10.9, 11.0),   # 跳空高于限价，盘中回落到限价成交
+        ('buy', 10.5, 11.0, 11.5, 12.0, 11.2, None),   # 触发后限价不可达
+        ('sell', 9.5, 9.0, 10.0, 10.5, 8.5, 9.5),      # 盘中下穿止损价，不能按更高的开盘价成交
+        ('sell', 9.5, 9.0, 9.2, 10.5, 8.5, 9.2),       # 开盘已越过止损价，按开盘价成交
+        ('sell', 9.5, 9.0, 8.5, 9.1, 8.0, 9.0),        # 跳空低于限价，盘中反弹到限价成交
+        ('sell', 9.5, 9.0, 8.5, 8.8, 8.0, None),       # 触发后限价不可达
+    ]
+    for k, (side, stop, limit, open_price, high, low, expected) in enumerate(cases):
+        book = SymbolOrderBook("000001")
+        book.add(StopLimitOrder(f"s{k}", "000001", 100, side, stop, limit))
+        fills = book.match(open_price, high, low)
+        actual = fills[0][1] if fills else None
+        if actual != expected:
+            print(f"止损限价单用例{k}: 期望成交价{expected}, 实际{actual}")
+            return False
+    return True
+
+
+def check_round_trip_stats() -> bool:
+    """两只股票交错成交、分批买入和部分卖出时，交易统计应按股票先进先出配对"""
+    dates = pl.date_range(pl.date(2024, 1, 1), pl.date(2024, 1, 5), eager=True)
+
+    def bars(prices: List[float]) -> pl.DataFrame:
+        return pl.DataFrame({"date": dates, "open": prices, "high": prices, "low": prices, "close": prices,
+                             "volume": [1e7] * len(prices)})
+
+    # 市价单在下一根K线开盘成交（涨跌幅均未触及涨跌停）
+    # 000001: 10买1000、10.5买1000、11卖1500 → 往返交易 1000×(11-10)=1000 与 500×(11-10.5)=250
+    # 000002: 50买1000、54卖1000 → 往返交易 4000
+    orders = {
+        dates[0]: [MarketOrder("a1", "000001", 1000, "buy"), MarketOrder("b1", "000002", 1000, "buy")],
+        dates[1]: [MarketOrder("a2", "000001", 1000, "buy")],
+        dates[2]: [MarketOrder("a3", "000001", 1500, "sell"), MarketOrder("b2", "000002", 1000, "sell")],
+    }
+    engine = EventDrivenBacktestEngine({"000001": bars([10.0, 10.0, 10.5, 11.0, 11.0]),
+                                        "000002": bars([50.0, 50.0, 52.0, 54.0, 54.0])})
+    engine.set_bar_callback(lambda engine, date, _: [engine.submit_order(order) for order in orders.get(date, [])])
+    performance = engine.run_backtest(1e6)["performance"]
+    expected = {"trades_count": 3, "winning_rate": 100.0, "average_profit_loss": (1000 + 250 + 4000) / 3}
+    for name, value in expected.items():
+        if abs(performance[name] - value) > 1e-9:
+            print(f"事件驱动引擎交易统计 {name}: 期望{value}, 实际{performance[name]}")
+            return False
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="订单簿撮合一致性检查与吞吐量基准")
+    parser.add_argument("--orders", type=int, default=1_000_000, help="预先提交的挂单数量")
+    parser.add_argument("--symbols", type=int, default=50, help="股票数量")
+    parser.add_argument("--bars", type=int, default=2520, help="每只股票的K线数量")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    parity = check_matching_parity(20_000, 500)
+    print(f"堆撮合与暴力撮合一致: {parity}")
+    stop_limit_ok = check_stop_limit_fills()
+    print(f"止损限价单触发后成交: {stop_limit_ok}")
+    round_trip_ok = check_round_trip_stats()
+    print(f"事件驱动引擎交易统计按股票配对: {round_trip_ok}")
+
+    data = {f"{600000 + i:06d}": make_synthetic_daily(args.bars, seed=i) for i in range(args.symbols)}
+    engine = EventDrivenBacktestEngine(data)
+    reference = {symbol: float(df['close'][0]) for symbol, df in data.items()}
+
+    start = time.perf_counter()
+    orders = make_random_orders(args.orders, list(data), reference, seed=1)
+    create_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for order in orders:
+        engine.submit_order(order)
+    submit_s = time.perf_counter() - start
+
+    counter = iter(range(10 ** 12))
+
+    def on_bar(engine: EventDrivenBacktestEngine, date, bars: Dict[str, Dict[str, float]]) -> None:
+        # 每日对第一只股票按持仓状态交替提交市价买单/卖单
+        symbol = next(iter(bars))
+        side = 'sell' if engine.positions.get(symbol) else 'buy'
+        engine.submit_order(MarketOrder(f"m{next(counter)}", symbol, 1000, side))
+
+    engine.set_bar_callback(on_bar)
+    start = time.perf_counter()
+    result = engine.run_backtest(1e8)
+    run_s = time.perf_counter() - start
+
+    submitted = len(engine.order_book.orders)
+    status = pl.Series("status", [order.status for order in engine.order_book.orders.values()]).value_counts()
+    print(pl.DataFrame([{
+        "orders": submitted,
+        "bars": engine.bars.height,
+        "fills": result["trades"].height,
+        "create_s": round(create_s, 2),
+        "submit_s": round(submit_s, 2),
+        "backtest_s": round(run_s, 2),
+        "orders_per_s": round(submitted / run_s),
+    }]))
+    print(status.sort("status"))
+
+    if not parity:
+        print("堆撮合与暴力撮合不一致")
+        sys.exit(1)
+    if not stop_limit_ok:
+        print("止损限价单成交价早于触发")
+        sys.exit(1)
+    if not round_trip_ok:
+        print("事件驱动引擎交易统计配对错误")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多进程参数扫描吞吐量基准。
+
+功能：
+1. 在合成日线上对MAStrategy做 short_window × long_window 网格扫描
+2. 以不同进程数运行 ParameterSweepEngine，输出吞吐量（组合/秒）与加速比
+3. 可选开启提前终止，比较剪枝比例与耗时
+4. 检查不同进程数下未剪枝组合的结果与单进程一致
+5. 检查批量评估结果与逐组合回测一致，且无效组合（short_window >= long_window）已被跳过
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import sys
+import time
+from pathlib import Path
+
+import polars as pl
+from loguru import logger
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.backtest.costs.cost_model import CostModel
+from src.backtest.engine.parameter_sweep import ParameterSweepEngine, _evaluate_params
+from src.backtest.strategies.ma_strategy import MAStrategy
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from benchmark_vectorized_backtest import make_synthetic_daily
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="多进程参数扫描吞吐量基准")
+    parser.add_argument("--bars", type=int, default=2520, help="K线数量")
+    parser.add_argument("--short-max", type=int, default=101, help="短期均线窗口上限（不含）")
+    parser.add_argument("--long-max", type=int, default=201, help="长期均线窗口上限（不含）")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="要测试的进程数")
+    parser.add_argument("--early-stop-fraction", type=float, default=None, help="提前终止使用的前段数据比例")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    param_ranges = {"short_window": list(range(2, args.short_max)),
+                    "long_window": list(range(20, args.long_max))}
+    df = make_synthetic_daily(args.bars)
+    sweep = ParameterSweepEngine(df, MAStrategy)
+
+    rows = []
+    baseline = None
+    reference = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        results = sweep.run(param_ranges, max_workers=workers, early_stop_fraction=args.early_stop_fraction)
+        elapsed = time.perf_counter() - start
+        total = results.height
+        baseline = baseline or elapsed
+        rows.append({
+            "workers": workers,
+            "combinations": total,
+            "pruned": int(results["pruned"].sum()),
+            "elapsed_s": round(elapsed, 2),
+            "combos_per_s": round(total / elapsed, 1),
+            "speedup": round(baseline / elapsed, 2),
+        })
+        kept = results.filter(~pl.col("pruned")).sort(list(param_ranges)).select(*param_ranges, "total_return")
+        if args.early_stop_fraction is None:
+            if reference is not None and not kept.equals(reference):
+                print(f"{workers}进程结果与单进程不一致")
+                sys.exit(1)
+            reference = kept
+
+    invalid = results.filter(pl.col("short_window") >= pl.col("long_window")).height
+    if invalid:
+        print(f"结果中包含{invalid}个无效组合")
+        sys.exit(1)
+
+    sample = results.filter(~pl.col("pruned")).gather_every(max(1, results.height // 20))
+    for row in sample.iter_rows(named=True):
+        params = {name: row[name] for name in param_ranges}
+        expected = _evaluate_params(df, MAStrategy, params, CostModel(), 1000000.0)
+        for name in ("total_return", "sharpe_ratio", "max_drawdown"):
+            if not math.isclose(row[name], expected[name], rel_tol=1e-9, abs_tol=1e-9):
+                print(f"{params} {name} 批量={row[name]} 逐组合={expected[name]}")
+                sys.exit(1)
+
+    print(pl.DataFrame(rows))
+    print("最佳参数:", sweep.best_params(results, list(param_ranges)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+向量化绩效分析一致性检查与性能基准。
+
+功能：
+1. 一致性：以逐条循环的参照实现（原AdvancedPerformanceAnalyzer的公式）为基准，
+   在BacktestEngine的真实回测结果上检查analyze的各项指标与最大回撤峰值/谷底/恢复日期，
+   并以无风险利率为0的同一参照检查引擎使用的PerformanceAnalyzer.analyze；
+   再检查analyze_batch对多条曲线一次计算的结果与逐条analyze一致，rolling_metrics与逐窗口计算一致
+   （含均值远大于波动的低波动曲线）
+2. 性能：比较逐条参照实现与analyze_batch分析大量（默认1万条）参数扫描权益曲线的耗时
+
+退出码：全部一致返回0，否则返回1。
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import polars as pl
+from loguru import logger
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.backtest.engine.backtest_engine import BacktestEngine
+from src.backtest.performance.advanced_performance_analyzer import AdvancedPerformanceAnalyzer
+from src.backtest.performance.performance_analyzer import PerformanceAnalyzer, trade_matrices
+from src.backtest.strategies.ma_strategy import MAStrategy
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from benchmark_vectorized_backtest import make_synthetic_daily
+
+RISK_FREE_RATE = 0.02
+
+# PerformanceAnalyzer的输出键及对应的参照指标
+BASIC_METRICS = {'total_return': 'total_return', 'annual_return': 'annual_return', 'sharpe_ratio': 'sharpe_ratio',
+                 'max_drawdown': 'max_drawdown', 'volatility': 'volatility', 'winning_rate': 'winning_rate',
+                 'average_profit_loss': 'average_profit_loss', 'trades_count': 'trade_count'}
+
+
+def reference_metrics(equities: List[float], dates: List[Any], trades: List[Dict[str, Any]],
+                      benchmark: List[float], risk_free_rate: float = RISK_FREE_RATE) -> Dict[str, Any]:
+    """逐条参照实现，与原AdvancedPerformanceAnalyzer.analyze的循环公式一致"""
+    rf = risk_free_rate / 252
+    returns = [(equities[i] - equities[i - 1]) / equities[i - 1] for i in range(1, len(equities))]
+
+    def sharpe(values):
+        std = np.std(values)
+        return 0 if std == 0 else (np.mean(values) - rf) / std * np.sqrt(252)
+
+    downside = [r for r in returns if r < 0]
+    downside_std = np.std(downside) if downside else 0
+    annual_return = (pow(equities[-1] / equities[0], 252 / len(equities)) - 1) * 100
+
+    peak, peak_date, max_info = equities[0], dates[0], None
+    for equity, date in zip(equities, dates):
+        if equity > peak:
+            peak, peak_date = equity, date
+        else:
+            drawdown = (peak - equity) / peak * 100
+            if max_info is None or drawdown > max_info[0]:
+                max_info = (drawdown, peak_date, date)
+    max_drawdown, peak_date, trough_date = max_info
+    peak_value = equities[dates.index(peak_date)]
+    recovery_date = next((dates[i] for i in range(dates.index(trough_date), len(equities))
+                          if equities[i] >= peak_value), None)
+
+    profits = [(trades[i + 1]['price'] - trades[i]['price']) * trades[i]['shares']
+               for i in range(0, len(trades) - 1, 2)]
+    gains = [p for p in profits if p > 0]
+    losses = [abs(p) for p in profits if p <= 0]
+    completed = len(trades) // 2
+    avg_loss = np.mean(losses) if losses else 1
+
+    excess = [r - b for r, b in zip(returns, benchmark)]
+    beta = np.cov(returns, benchmark)[0, 1] / np.var(benchmark)
+    alpha = (np.mean(returns) - rf) - beta * (np.mean(benchmark) - rf)
+
+    return {
+        'total_return': (equities[-1] - equities[0]) / equities[0] * 100,
+        'annual_return': annual_return,
+        'sharpe_ratio': sharpe(returns),
+        'sortino_ratio': 0 if downside_std == 0 else (np.mean(returns) - rf) / downside_std * np.sqrt(252),
+        'calmar_ratio': 0 if max_drawdown == 0 else annual_return / max_drawdown,
+        'sharpe_ratio_1y': sharpe(returns[-252:]) if len(returns) >= 252 else 0,
+        'sharpe_ratio_6m': sharpe(returns[-126:]) if len(returns) >= 126 else 0,
+        'volatility': np.std(returns) * np.sqrt(252) * 100,
+        'downside_risk': downside_std * np.sqrt(252) * 100,
+        'max_drawdown': max_drawdown,
+        'peak_date': peak_date,
+        'trough_date': trough_date,
+        'recovery_date': recovery_date,
+        'alpha': alpha * 252 * 100,
+        'beta': beta,
+        'information_ratio': np.mean(excess) / np.std(excess) * np.sqrt(252),
+        'winning_rate': sum(1 for i in range(0, len(trades) - 1, 2)
+                            if trades[i + 1]['price'] > trades[i]['price']) / completed * 100 if completed else 0,
+        'average_profit_loss': (np.mean(gains) if gains else 0) / avg_loss,
+        'profit_factor': sum(gains) / sum(losses) if sum(losses) > 0 else 0,
+        'expectancy': sum(profits) / completed if completed else 0,
+        'trade_count': completed,
+        'avg_holding_period': np.mean([(trades[i + 1]['date'] - trades[i]['date']).days
+                                       for i in range(0, len(trades) - 1, 2)]) if completed else 0,
+        'turnover_rate': sum(t['price'] * t['shares'] for t in trades) / (2 * equities[0]) * 100,
+    }
+
+
+def close(expected: float, actual: float) -> bool:
+    return math.isclose(expected, actual, rel_tol=1e-9, abs_tol=1e-12)
+
+
+def check_reference(runs: int, bars: int) -> bool:
+    """在真实回测结果上比较analyze与逐条参照实现"""
+    analyzer = AdvancedPerformanceAnalyzer(RISK_FREE_RATE)
+    basic_analyzer = PerformanceAnalyzer()
+    for seed in range(runs):
+        engine = BacktestEngine(make_synthetic_daily(bars, seed=seed))
+        engine.set_strategy(MAStrategy(short_window=5 + seed, long_window=30))
+        result = engine.run_backtest()
+        equity_curve = pl.DataFrame(result['equity_curve'])
+        trades = pl.DataFrame(result['trades'], infer_schema_length=None)
+        benchmark = np.random.default_rng(seed).normal(0, 0.01, equity_curve.height - 1).tolist()
+
+        expected = reference_metrics(equity_curve['equity'].to_list(), equity_curve['date'].to_list(),
+                                     trades.to_dicts(), benchmark)
+        actual = analyzer.analyze(equity_curve, trades, benchmark)
+        details = actual['drawdown_details']
+        for name, value in expected.items():
+            got = details[name] if name.endswith('_date') else actual[name]
+            if not (got == value if name.endswith('_date') else close(value, got)):
+                print(f"第{seed}次回测 {name} 不一致: 参照{value} 实际{got}")
+                return False
+
+        # 引擎使用的基础分析器：逐行字典与列式输入结果一致，且与无风险利率为0的参照一致
+        expected = reference_metrics(equity_curve['equity'].to_list(), equity_curve['date'].to_list(),
+                                     trades.to_dicts(), benchmark, risk_free_rate=0.0)
+        for basic in (basic_analyzer.analyze(result['equity_curve'], result['trades']),
+                      basic_analyzer.analyze(equity_curve, trades)):
+            for name, reference_name in BASIC_METRICS.items():
+                if not close(expected[reference_name], basic[name]):
+                    print(f"第{seed}次回测 基础指标{name} 不一致: 参照{expected[reference_name]} 实际{basic[name]}")
+                    return False
+    return True
+
+
+def make_sweep(curves: int, bars: int, seed: int) -> tuple:
+    """生成模拟参数扫描的权益矩阵和交易表（每条曲线若干买卖对）"""
+    rng = np.random.default_rng(seed)
+    drift = rng.normal(0.0003, 0.0003, curves)
+    returns = rng.normal(drift, 0.015, (bars - 1, curves))
+    equities = 1e6 * np.vstack([np.ones(curves), np.cumprod(1 + returns, axis=0)])
+    dates = pl.date_range(pl.date(2015, 1, 1), pl.date(2015, 1, 1) + pl.duration(days=bars - 1), eager=True)
+
+    rows = rng.integers(0, 40, curves) * 2
+    result_id = np.repeat(np.arange(curves), rows)
+    day = np.sort(rng.integers(0, bars, len(result_id)))
+    trades = pl.DataFrame({
+        'result_id': result_id,
+        'date': dates.gather(day),
+        'price': np.round(rng.uniform(5, 50, len(result_id)), 2),
+        'shares': rng.integers(1, 50, len(result_id)) * 100,
+    }).sort('result_id', maintain_order=True)
+    return equities, dates, trades
+
+
+def check_batch(equities: np.ndarray, dates: pl.Series, trades: pl.DataFrame) -> bool:
+    """比较analyze_batch与逐条analyze，以及rolling_metrics与逐窗口计算"""
+    analyzer = AdvancedPerformanceAnalyzer(RISK_FREE_RATE)
+    benchmark = np.random.default_rng(0).normal(0, 0.01, len(equities) - 1)
+    batch = analyzer.analyze_batch(equities, **trade_matrices(trades, equities.shape[1]),
+                                   dates=dates, benchmark_returns=benchmark)
+    for column in range(equities.shape[1]):
+        single = analyzer.analyze(pl.DataFrame({'date': dates, 'equity': equities[:, column]}),
+                                  trades.filter(pl.col('result_id') == column).drop('result_id'), benchmark)
+        for name, value in single.items():
+            if name == 'drawdown_details':
+                continue
+            if not close(value, batch[name][column].item()):
+                print(f"第{column}条曲线 {name} 不一致: 逐条{value} 批量{batch[name][column]}")
+                return False
+
+    # 追加一条日收益约1%、波动约1e-6的曲线，检查滚动方差没有相消误差
+    steady = np.cumprod(1 + 0.01 + np.random.default_rng(3).normal(0, 1e-6, len(equities)))
+    equities = np.column_stack([equities, steady])
+    window = 63
+    rolling = analyzer.rolling_metrics(equities, window)
+    returns = np.diff(equities, axis=0) / equities[:-1]
+    for t in range(window, len(equities), 17):
+        sample = returns[t - window:t]
+        std = sample.std(axis=0)
+        sharpe = (sample.mean(axis=0) - RISK_FREE_RATE / 252) / std * np.sqrt(252)
+        if not (np.allclose(rolling['rolling_sharpe'][t], sharpe, rtol=1e-7)
+                and np.allclose(rolling['rolling_volatility'][t], std * np.sqrt(252) * 100, rtol=1e-7)):
+            print(f"第{t}根K线滚动指标不一致")
+            return False
+    return bool(np.isnan(rolling['rolling_sharpe'][:window]).all())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="向量化绩效分析一致性检查与性能基准")
+    parser.add_argument("--curves", type=int, default=10_000, help="性能基准的权益曲线数量")
+    parser.add_argument("--bars", type=int, default=1260, help="每条权益曲线的K线数量")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    reference_ok = check_reference(runs=6, bars=600)
+    print(f"analyze与逐条参照实现一致: {reference_ok}")
+    batch_ok = check_batch(*make_sweep(50, args.bars, seed=1))
+    print(f"analyze_batch/rolling_metrics与逐条计算一致: {batch_ok}")
+
+    equities, dates, trades = make_sweep(args.curves, args.bars, seed=2)
+    analyzer = AdvancedPerformanceAnalyzer(RISK_FREE_RATE)
+    start = time.perf_counter()
+    analyzer.analyze_batch(equities, **trade_matrices(trades, args.curves), dates=dates)
+    batch_s = time.perf_counter() - start
+
+    sample = min(args.curves, 200)
+    date_list = dates.to_list()
+    trade_lists = trades.partition_by('result_id', as_dict=True, include_key=False)
+    benchmark = np.random.default_rng(0).normal(0, 0.01, args.bars - 1).tolist()
+    start = time.perf_counter()
+    for column in range(sample):
+        frame = trade_lists.get((column,))
+        column_trades = frame.to_dicts() if frame is not None else []
+        reference_metrics(equities[:, column].tolist(), date_list, column_trades, benchmark)
+    loop_s = (time.perf_counter() - start) * args.curves / sample
+    print(f"{args.curves}条×{args.bars}根K线: 批量 {batch_s:.2f}s, 逐条（按{sample}条外推） {loop_s:.1f}s, "
+          f"加速 {loop_s / batch_s:.0f}x")
+
+    if not (reference_ok and batch_ok):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+组合回测引擎一致性检查与性能基准。
+
+功能：
+1. 一致性：分仓模式下组合权益应等于各股票以 初始资金/股票数 单独回测（VectorizedBacktestEngine）的权益之和
+   （检查在无停牌数据上进行，单股回测无法表达停牌日的估值）；
+   两种模式下交易统计（trades_count、winning_rate、average_profit_loss）应与逐股先进先出配对的参照实现一致
+2. 性能：在带随机停牌和不同上市日期的多股票面板（默认500只 × 10年日线）上，
+   分别运行分仓模式和每20个交易日横截面再平衡的调仓模式并计时
+
+退出码：一致性检查通过返回0，否则返回1。
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import sys
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import polars as pl
+from loguru import logger
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.backtest.engine.portfolio_backtest_engine import PortfolioBacktestEngine
+from src.backtest.engine.vectorized_backtest_engine import VectorizedBacktestEngine
+from src.backtest.strategies.ma_strategy import MAStrategy
+
+
+def make_panel(symbols: int, bars: int, suspension_rate: float, seed: int = 3) -> Dict[str, pl.DataFrame]:
+    """生成多股票日线数据，可选随机停牌与错开的上市日期"""
+    rng = np.random.default_rng(seed)
+    dates = pl.date_range(pl.date(2010, 1, 1), pl.date(2010, 1, 1) + pl.duration(days=bars - 1), eager=True)
+    data = {}
+    for i in range(symbols):
+        close = 10.0 * np.exp(np.cumsum(rng.normal(0.0, 0.02, bars)))
+        df = pl.DataFrame({"date": dates, "close": close, "volume": rng.integers(1_000, 100_000, bars)})
+        if suspension_rate > 0:
+            listed = int(rng.integers(0, bars // 10))
+            keep = rng.random(bars) >= suspension_rate
+            keep[:listed] = False
+            df = df.filter(pl.Series(keep))
+        data[f"{i:06d}"] = df
+    return data
+
+
+def make_engine(data: Dict[str, pl.DataFrame]) -> PortfolioBacktestEngine:
+    engine = PortfolioBacktestEngine(data)
+    for stock_code in data:
+        engine.set_strategy(stock_code, MAStrategy(short_window=5, long_window=20))
+    return engine
+
+
+def check_sleeve_parity(symbols: int, bars: int, tolerance: float) -> float:
+    """返回组合权益与单股权益之和的最大相对误差"""
+    data = make_panel(symbols, bars, suspension_rate=0.0)
+    initial_capital = 1000000.0
+    portfolio = make_engine(data).run_backtest(initial_capital)
+
+    expected = np.zeros(bars)
+    for stock_code, df in data.items():
+        engine = VectorizedBacktestEngine(df)
+        engine.set_strategy(MAStrategy(short_window=5, long_window=20))
+        expected += engine.run_backtest(initial_capital / symbols)["equity_curve"]["equity"].to_numpy()
+
+    actual = portfolio["equity_curve"]["equity"].to_numpy()
+    return float((np.abs(actual - expected) / expected).max())
+
+
+def reference_trade_stats(trades: pl.DataFrame) -> Dict[str, float]:
+    """逐笔成交按股票先进先出冲销买入，每段冲销为一笔往返交易，返回与PerformanceAnalyzer定义相同的交易统计"""
+    lots = defaultdict(deque)
+    profits = []
+    for row in trades.iter_rows(named=True):
+        if row["signal"] == "buy":
+            lots[row["stock_code"]].append([row["price"], row["shares"]])
+            continue
+        remaining = row["shares"]
+        queue = lots[row["stock_code"]]
+        # 股数可以是非整数，低于1e-6股的余量视为舍入误差
+        while remaining > 1e-6 and queue:
+            lot = queue[0]
+            size = min(lot[1], remaining)
+            profits.append((row["price"] - lot[0]) * size)
+            lot[1] -= size
+            remaining -= size
+            if lot[1] <= 1e-6:
+                queue.popleft()
+    gains = [p for p in profits if p > 0]
+    losses = [abs(p) for p in profits if p <= 0]
+    avg_profit = sum(gains) / len(gains) if gains else 0.0
+    avg_loss = sum(losses) / len(losses) if losses else 1.0
+    return {
+        "trades_count": len(profits),
+        "winning_rate": len(gains) / len(profits) * 100 if profits else 0.0,
+        "average_profit_loss": avg_profit / avg_loss if avg_loss > 0 else 0.0,
+    }
+
+
+def check_trade_stats(symbols: int, bars: int, rebalance_frequency: int) -> bool:
+    """检查分仓与调仓模式的交易统计与逐股参照实现一致"""
+    data = make_panel(symbols, bars, suspension_rate=0.02)
+    engine = make_engine(data)
+    for frequency in (0, rebalance_frequency):
+        result = engine.run_backtest(1000000.0, rebalance_frequency=frequency)
+        expected = reference_trade_stats(result["trades"])
+        for name, value in expected.items():
+            if not math.isclose(result["performance"][name], value, rel_tol=1e-9, abs_tol=1e-9):
+                print(f"调仓间隔{frequency}: {name} 引擎={result['performance'][name]} 参照={value}")
+                return False
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="组合回测引擎一致性检查与性能基准")
+    parser.add_argument("--symbols", type=int, default=500, help="基准股票数量")
+    parser.add_argument("--bars", type=int, default=10 * 252, help="每只股票的K线数量，默认约10年日线")
+    parser.add_argument("--suspension-rate", type=float, default=0.02, help="随机停牌比例")
+    parser.add_argument("--rebalance-frequency", type=int, default=20, help="调仓模式的调仓间隔")
+    parser.add_argument("--tolerance", type=float, default=1e-9, help="分仓一致性检查的最大相对误差")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    parity_error = check_sleeve_parity(20, 1000, args.tolerance)
+    print(f"分仓模式与单股回测之和的最大相对误差: {parity_error:.3e}")
+    stats_ok = check_trade_stats(20, 1000, args.rebalance_frequency)
+    print(f"交易统计与逐股先进先出配对一致: {stats_ok}")
+
+    data = make_panel(args.symbols, args.bars, args.suspension_rate)
+    rows = []
+    start = time.perf_counter()
+    engine = make_engine(data)
+    build_s = time.perf_counter() - start
+    for label, frequency in (("sleeves", 0), ("rebalance", args.rebalance_frequency)):
+        start = time.perf_counter()
+        result = engine.run_backtest(1000000.0, rebalance_frequency=frequency)
+        rows.append({
+            "mode": label,
+            "symbols": args.symbols,
+            "dates": len(engine.dates),
+            "panel_build_s": round(build_s, 3),
+            "backtest_s": round(time.perf_counter() - start, 3),
+            "trades": result["trades"].height,
+            "total_return": round(result["total_return"], 2),
+        })
+    print(pl.DataFrame(rows))
+
+    if parity_error > args.tolerance:
+        print("分仓模式一致性检查失败")
+        sys.exit(1)
+    if not stats_ok:
+        print("交易统计检查失败")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
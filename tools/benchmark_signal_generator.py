@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+信号生成器一致性检查与性能基准。
+
+功能：
+1. 一致性：以逐K线循环的参照实现（原SignalGenerator逐K线判断、追加信号字典的逻辑）为基准，
+   检查表达式实现在四种策略、不同参数、含NaN预热期的指标下的信号日期、方向、价格、原因和持仓序列
+2. 面板：检查多股票面板上按股票计算的信号与逐只股票计算的结果一致，当日信号扫描只返回最新日期的信号
+3. 性能：比较逐只股票循环与一次面板查询扫描全市场（默认5000只股票×250个交易日）当日均线金叉的耗时
+
+退出码：全部一致返回0，否则返回1。
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import polars as pl
+from loguru import logger
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.strategy.signals.signal_generator import SignalGenerator
+
+CASES = [
+    ('trend_following', {}),
+    ('trend_following', {'ma_short': 5, 'ma_long': 10}),
+    ('mean_reversion', {}),
+    ('mean_reversion', {'rsi_period': 6, 'oversold': 20, 'overbought': 80}),
+    ('momentum', {}),
+    ('momentum', {'momentum_period': 3}),
+    ('volatility_breakout', {}),
+    ('volatility_breakout', {'window': 5, 'multiplier': 0.5}),
+]
+
+
+def make_bars(n: int, seed: int = 0) -> pl.DataFrame:
+    """生成单只股票的日线及ma/rsi指标列（指标前若干根K线为NaN）"""
+    rng = np.random.default_rng(seed)
+    close = 10.0 * np.exp(np.cumsum(rng.normal(0.0, 0.02, n)))
+    high = close * (1 + rng.uniform(0, 0.03, n))
+    low = close * (1 - rng.uniform(0, 0.03, n))
+    frame = pl.DataFrame({
+        'date': pl.date_range(pl.date(2020, 1, 1), pl.date(2020, 1, 1) + pl.duration(days=n - 1), eager=True),
+        'open': close, 'high': high, 'low': low, 'close': close,
+    })
+    columns = []
+    for window in (5, 10, 20):
+        columns.append(pl.col('close').rolling_mean(window).fill_null(float('nan')).alias(f'ma{window}'))
+    change = pl.col('close').diff()
+    for period in (6, 14):
+        gain = change.clip(lower_bound=0).rolling_mean(period)
+        loss = (-change).clip(lower_bound=0).rolling_mean(period)
+        columns.append((100 - 100 / (1 + gain / loss)).fill_null(float('nan')).alias(f'rsi{period}'))
+    return frame.with_columns(columns)
+
+
+def reference_signals(data: pl.DataFrame, strategy_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """逐K线循环的参照实现，与原SignalGenerator一致"""
+    close = data['close'].to_numpy()
+    dates = data['date'].to_list()
+    if strategy_type == 'trend_following':
+        short_ma = data[f"ma{params.get('ma_short', 10)}"].to_numpy()
+        long_ma = data[f"ma{params.get('ma_long', 20)}"].to_numpy()
+        start = 1
+        rule = lambda i: ('buy', 'MA金叉') if short_ma[i] > long_ma[i] and short_ma[i-1] <= long_ma[i-1] \
+            else ('sell', 'MA死叉') if short_ma[i] < long_ma[i] and short_ma[i-1] >= long_ma[i-1] else None
+    elif strategy_type == 'mean_reversion':
+        rsi = data[f"rsi{params.get('rsi_period', 14)}"].to_numpy()
+        oversold, overbought = params.get('oversold', 30), params.get('overbought', 70)
+        start = 0
+        rule = lambda i: ('buy', 'RSI超卖') if rsi[i] < oversold \
+            else ('sell', 'RSI超买') if rsi[i] > overbought else None
+    elif strategy_type == 'momentum':
+        start = params.get('momentum_period', 12)
+        momentum = np.zeros_like(close)
+        for i in range(start, len(close)):
+            momentum[i] = (close[i] - close[i - start]) / close[i - start] * 100
+        rule = lambda i: ('buy', '动量上升') if momentum[i] > 0 and momentum[i] > momentum[i-1] \
+            else ('sell', '动量下降') if momentum[i] < 0 and momentum[i] < momentum[i-1] else None
+    else:
+        start = params.get('window', 20)
+        multiplier = params.get('multiplier', 2.0)
+        high, low = data['high'].to_numpy(), data['low'].to_numpy()
+        tr = np.zeros_like(close)
+        for i in range(1, len(close)):
+            tr[i] = max(high[i] - low[i], abs(high[i] - close[i-1]), abs(low[i] - close[i-1]))
+        atr = np.zeros_like(close)
+        for i in range(start, len(tr)):
+            atr[i] = np.mean(tr[i-start:i])
+        upper, lower = close + multiplier * atr, close - multiplier * atr
+        rule = lambda i: ('buy', '突破上轨') if close[i] > upper[i-1] \
+            else ('sell', '突破下轨') if close[i] < lower[i-1] else None
+
+    signals: List[Dict[str, Any]] = []
+    positions: List[int] = []
+    for i in range(start, len(close)):
+        fired = rule(i)
+        if fired is None:
+            positions.append(positions[-1] if positions else 0)
+            continue
+        signals.append({'date': dates[i], 'signal': fired[0], 'price': close[i], 'reason': fired[1]})
+        positions.append(1 if fired[0] == 'buy' else 0)
+    return {'signals': signals, 'positions': positions}
+
+
+def same_signals(expected: Dict[str, Any], actual: Dict[str, Any]) -> bool:
+    """比较信号列表与持仓序列"""
+    rows = actual['signals'].to_dicts()
+    if len(rows) != len(expected['signals']) or actual['positions'].to_list() != expected['positions']:
+        return False
+    for want, got in zip(expected['signals'], rows):
+        if (want['date'], want['signal'], want['reason']) != (got['date'], got['signal'], got['reason']) \
+                or not math.isclose(want['price'], got['price'], rel_tol=1e-12):
+            return False
+    return True
+
+
+def make_panel(stocks: int, bars: int, seed: int = 0) -> pl.DataFrame:
+    """多股票长表面板，K线数量不等，行顺序打乱"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(stocks):
+        n = int(rng.integers(5, bars + 1)) if i % 4 == 0 else bars
+        # 以相同的最后日期对齐，模拟上市时间不同
+        frame = make_bars(n, seed=seed * 100_000 + i).with_columns(
+            pl.col('date') + pl.duration(days=bars - n), pl.lit(f"{600000 + i:06d}.SH").alias('ts_code'))
+        frames.append(frame)
+    return pl.concat(frames).sample(fraction=1.0, shuffle=True, seed=seed)
+
+
+def check_parity() -> bool:
+    """比较表达式实现与逐K线参照实现，以及面板与逐只股票计算"""
+    generator = SignalGenerator()
+    ok = True
+    for seed, n in ((1, 300), (2, 25), (3, 8), (4, 1)):
+        data = make_bars(n, seed=seed)
+        for strategy_type, params in CASES:
+            expected = reference_signals(data, strategy_type, params)
+            actual = getattr(generator, f'generate_{strategy_type}_signals')(data, **params)
+            if not same_signals(expected, actual):
+                print(f"{strategy_type}{params} {n}根K线 与参照实现不一致")
+                ok = False
+
+    panel = make_panel(40, 120, seed=5)
+    for strategy_type, params in CASES:
+        actual = generator.generate_panel_signals(panel, strategy_type, **params)
+        for (code,), bars in panel.sort('date').group_by('ts_code', maintain_order=True):
+            expected = reference_signals(bars, strategy_type, params)
+            rows = actual.filter(pl.col('ts_code') == code)
+            got = {'signals': rows.filter(pl.col('signal').is_not_null()).select('date', 'signal', 'price', 'reason'),
+                   'positions': rows['position']}
+            if not same_signals(expected, got):
+                print(f"面板 {strategy_type}{params} {code} 与逐只股票计算不一致")
+                ok = False
+
+    # 面板缺少ma列时在查询中按股票计算
+    latest = generator.generate_panel_signals(panel.drop('ma5', 'ma10', 'ma20'), 'trend_following',
+                                              latest_only=True, ma_short=5, ma_long=10)
+    expected = generator.generate_panel_signals(panel, 'trend_following', latest_only=True, ma_short=5, ma_long=10)
+    if not latest.equals(expected) or (latest.height and latest['date'].n_unique() != 1):
+        print("当日信号扫描不一致")
+        ok = False
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="信号生成器一致性检查与性能基准")
+    parser.add_argument("--stocks", type=int, default=5000, help="股票数量")
+    parser.add_argument("--bars", type=int, default=250, help="每只股票的K线数量")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    parity = check_parity()
+    print(f"与逐K线参照实现一致: {parity}")
+
+    panel = make_panel(args.stocks, args.bars, seed=7).drop('ma5', 'ma10', 'ma20', 'rsi6', 'rsi14')
+    generator = SignalGenerator()
+    start = time.perf_counter()
+    crosses = 0
+    last_date = panel['date'].max()
+    for _, bars in panel.sort('date').group_by('ts_code', maintain_order=True):
+        bars = bars.with_columns(pl.col('close').rolling_mean(w).alias(f'ma{w}') for w in (10, 20))
+        signals = reference_signals(bars, 'trend_following', {})['signals']
+        crosses += bool(signals) and signals[-1]['date'] == last_date and signals[-1]['signal'] == 'buy'
+    loop_s = time.perf_counter() - start
+    start = time.perf_counter()
+    today = generator.generate_panel_signals(panel, 'trend_following', latest_only=True)
+    panel_s = time.perf_counter() - start
+    golden = today.filter(pl.col('signal') == 'buy').height
+    print(f"{args.stocks}只股票×{args.bars}个交易日（{panel.height}行）扫描当日均线金叉: "
+          f"逐只股票循环 {loop_s:.2f}s（{crosses}只）, 面板查询 {panel_s * 1000:.0f}ms（{golden}只）, "
+          f"加速 {loop_s / panel_s:.0f}x")
+
+    if not parity or crosses != golden:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+股票推荐器一致性检查与性能基准。
+
+功能：
+1. 一致性：以逐股票循环的参照实现（原StockRecommender按股票分组、逐只转换为NumPy数组评分的公式）为基准，
+   检查分组聚合实现在三种算法、不同动量周期、不同K线数量（含不足20条、不足60条的股票）下的评分、
+   风险评分、信号、风险等级和排名
+2. 行业中性：检查按行业内标准化评分排名时，industry_score在每个行业内均值为0
+3. 性能：比较两者对全市场（默认5000只股票×250个交易日）评分的耗时
+
+退出码：全部一致返回0，否则返回1。
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import polars as pl
+from loguru import logger
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.recommendation.stock_recommender import StockRecommender
+
+INDUSTRIES = ['银行', '医药', '电子', '化工', '食品饮料', '汽车']
+DEFAULT_WEIGHTS = {'momentum': 0.2, 'value': 0.2, 'growth': 0.2, 'quality': 0.2, 'volatility': 0.2}
+
+
+def make_stocks(stocks: int, bars: int, seed: int = 0) -> pl.DataFrame:
+    """生成多只股票的日线长表，K线数量在10 ~ bars之间随机，行顺序打乱"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(stocks):
+        n = int(rng.integers(10, bars + 1)) if i % 3 == 0 else bars
+        close = 10.0 * np.exp(np.cumsum(rng.normal(0.001, 0.02, n)))
+        frames.append(pl.DataFrame({
+            'stock_code': f"{600000 + i:06d}.SH",
+            'stock_name': f"股票{i}",
+            'industry': INDUSTRIES[i % len(INDUSTRIES)],
+            'date': pl.date_range(pl.date(2024, 1, 1), pl.date(2024, 1, 1) + pl.duration(days=n - 1), eager=True),
+            'close': close,
+            'volume': rng.integers(10_000, 5_000_000, n).astype(np.float64),
+        }))
+    data = pl.concat(frames)
+    return data.sample(fraction=1.0, shuffle=True, seed=seed)
+
+
+def reference_scores(stocks_data: pl.DataFrame, algorithm: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """逐股票循环的参照实现，与原StockRecommender的公式一致"""
+    scored = []
+    for (stock_code,), group in stocks_data.group_by('stock_code'):
+        group = group.sort('date')
+        prices = group['close'].to_numpy()
+        volumes = group['volume'].to_numpy()
+        if len(prices) < 20:
+            continue
+        if algorithm == "动量策略":
+            period = params.get('period', 20)
+            if len(prices) < period:
+                period = len(prices)
+            momentum = (prices[-1] - prices[-period]) / prices[-period] if period > 0 else 0
+            volatility = np.std(prices[-period:]) / np.mean(prices[-period:]) if period > 1 else 0
+            score = max(0, min(1, momentum * 2))
+        elif algorithm == "行业轮动":
+            momentum_20 = (prices[-1] - prices[-20]) / prices[-20]
+            momentum_60 = (prices[-1] - prices[-60]) / prices[-60] if len(prices) >= 60 else 0
+            volatility = np.std(prices[-20:]) / np.mean(prices[-20:])
+            volume_momentum = (volumes[-5:] - volumes[-10:-5]).mean() / (volumes[-10:-5].mean() + 1e-10)
+            score = max(0, min(1, momentum_20 * 0.4 + momentum_60 * 0.3 + volume_momentum * 0.3 + 0.5))
+        else:
+            w = DEFAULT_WEIGHTS
+            momentum_10 = (prices[-1] - prices[-10]) / prices[-10]
+            momentum_20 = (prices[-1] - prices[-20]) / prices[-20]
+            volatility = np.std(prices[-20:]) / np.mean(prices[-20:])
+            volume_change = (volumes[-1] - volumes[-10]) / volumes[-10]
+            returns = np.diff(prices) / prices[:-1]
+            sharpe_ratio = np.mean(returns) / (np.std(returns) + 1e-10)
+            score = ((momentum_10 + momentum_20) * w['momentum'] + (1 - volatility) * w['volatility']
+                     + volume_change * w['value'] + sharpe_ratio * w['quality'] + np.mean(returns) * w['growth'])
+            score = max(0, min(1, score))
+        risk_score = min(100, volatility * 200)
+        risk_adjusted = score * (1 - risk_score / 100)
+        scored.append({
+            'stock_code': stock_code, 'score': score, 'risk_score': risk_score,
+            'risk_adjusted_score': risk_adjusted,
+            'signal': 'buy' if risk_adjusted > 0.7 else 'hold' if risk_adjusted > 0.3 else 'sell',
+            'risk_level': '低' if risk_score < 30 else '中' if risk_score < 60 else '高',
+            'current_price': prices[-1],
+        })
+    scored.sort(key=lambda x: x['risk_adjusted_score'], reverse=True)
+    return scored
+
+
+def check_parity() -> bool:
+    """比较分组聚合实现与逐股票参照实现"""
+    data = make_stocks(300, 120, seed=1)
+    recommender = StockRecommender()
+    ok = True
+    cases = [("多因子选股", {}), ("行业轮动", {}), ("动量策略", {}), ("动量策略", {'period': 5}),
+             ("动量策略", {'period': 90}), ("动量策略", {'period': 1})]
+    for algorithm, params in cases:
+        expected = {row['stock_code']: row for row in reference_scores(data, algorithm, params)}
+        actual = recommender.score_stocks(data, algorithm=algorithm, **params)
+        if actual.height != len(expected):
+            print(f"{algorithm}{params} 股票数不一致: 参照{len(expected)} 实际{actual.height}")
+            ok = False
+        for row in actual.iter_rows(named=True):
+            reference = expected[row['stock_code']]
+            for key, value in reference.items():
+                same = math.isclose(value, row[key], rel_tol=1e-9, abs_tol=1e-12) \
+                    if isinstance(value, float) else value == row[key]
+                if not same:
+                    print(f"{algorithm}{params} {row['stock_code']} {key} 不一致: 参照{value} 实际{row[key]}")
+                    ok = False
+        top = recommender.recommend_stocks(data, top_n=10, algorithm=algorithm, **params)
+        expected_top = [row['risk_adjusted_score'] for row in expected.values()]
+        expected_top = sorted(expected_top, reverse=True)[:10]
+        if not np.allclose([row['risk_adjusted_score'] for row in top], expected_top, rtol=1e-9):
+            print(f"{algorithm}{params} 前10名不一致")
+            ok = False
+
+    neutral = recommender.score_stocks(data, industry_neutral=True)
+    means = neutral.group_by('industry').agg(pl.col('industry_score').mean().abs())['industry_score']
+    if means.max() > 1e-9:
+        print(f"行业内标准化评分的行业均值不为0: {means.max()}")
+        ok = False
+    top = recommender.recommend_stocks(data, top_n=len(INDUSTRIES), industry_neutral=True)
+    if [row['industry_score'] for row in top] != sorted((row['industry_score'] for row in top), reverse=True):
+        print("行业中性排名未按industry_score降序")
+        ok = False
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="股票推荐器一致性检查与性能基准")
+    parser.add_argument("--stocks", type=int, default=5000, help="股票数量")
+    parser.add_argument("--bars", type=int, default=250, help="每只股票的K线数量")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    parity = check_parity()
+    print(f"与逐股票参照实现一致: {parity}")
+
+    data = make_stocks(args.stocks, args.bars, seed=2)
+    recommender = StockRecommender()
+    start = time.perf_counter()
+    reference_scores(data, "多因子选股", {})
+    loop_s = time.perf_counter() - start
+    timings = {}
+    for label, kwargs in (('全市场', {}), ('行业中性', {'industry_neutral': True})):
+        start = time.perf_counter()
+        recommender.recommend_stocks(data, top_n=50, **kwargs)
+        timings[label] = time.perf_counter() - start
+    print(f"{args.stocks}只股票×{args.bars}个交易日（{data.height}行）多因子评分: 逐股票循环 {loop_s:.2f}s, "
+          + ", ".join(f"{label} {seconds * 1000:.0f}ms" for label, seconds in timings.items())
+          + f", 加速 {loop_s / timings['全市场']:.0f}x")
+
+    if not parity:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
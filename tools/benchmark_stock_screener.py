@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+全市场选股器一致性检查与性能基准。
+
+功能：
+1. 在临时目录生成合成的通达信日线文件（默认5000只股票×1000个交易日，部分股票停牌或上市较晚）
+2. 一致性：以逐只股票调用calculate_multiple_indicators_polars计算全历史指标（TechnicalAnalyzer的计算路径）
+   为基准，检查选股器只加载lookback根K线得到的KDJ.J、VOL_MA.VOL_MA5、MACD、RSI和选股结果；
+   另以逐K线的Python实现检查CROSS、COUNT、EVERY、EXIST、HHV、REF、IF等函数
+3. 性能：比较逐只股票计算指标后判断与screen_universe的耗时
+
+退出码：全部一致返回0，否则返回1。
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import polars as pl
+from loguru import logger
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.screener.stock_screener import StockScreener
+from src.tech_analysis.indicator_calculator import calculate_multiple_indicators_polars
+from src.tech_analysis.universe_calculator import TDX_DAY_RECORD_DTYPE, load_symbol_frame, resolve_tdx_day_file
+
+SCREEN = "KDJ.J < 0 AND VOL > 2 * MA(VOL, 5)"
+# 指标库以Float32输出，比较时的相对误差上限
+TOLERANCE = 1e-4
+
+
+def write_tdx_files(root: Path, stocks: int, bars: int, seed: int = 0) -> List[str]:
+    """生成合成的通达信日线文件，返回股票代码"""
+    rng = np.random.default_rng(seed)
+    dates = pl.date_range(pl.date(2020, 1, 1), pl.date(2020, 1, 1) + pl.duration(days=bars * 2), eager=True)
+    dates = dates.filter(dates.dt.weekday() <= 5)[:bars]
+    day_numbers = dates.dt.strftime('%Y%m%d').cast(pl.UInt32).to_numpy()
+    codes = []
+    for i in range(stocks):
+        code = f"{600000 + i:06d}" if i % 2 == 0 else f"{i:06d}"
+        n = int(rng.integers(20, bars)) if i % 10 == 0 else bars
+        close = 10.0 * np.exp(np.cumsum(rng.normal(0.0, 0.02, n)))
+        high = close * (1 + rng.uniform(0, 0.03, n))
+        low = close * (1 - rng.uniform(0, 0.03, n))
+        # 偶有放量
+        volume = rng.lognormal(12, 0.3, n) * np.where(rng.random(n) < 0.1, 3.0, 1.0)
+        # 少数股票最新一日停牌
+        keep = slice(0, n - 1) if i % 25 == 0 else slice(0, n)
+        records = np.zeros(n, dtype=TDX_DAY_RECORD_DTYPE)
+        records['date'] = day_numbers[bars - n:]
+        records['open'] = np.round(np.r_[close[0], close[:-1]] * 100)
+        records['high'] = np.round(np.maximum(high, close) * 100)
+        records['low'] = np.round(np.minimum(low, close) * 100)
+        records['close'] = np.round(close * 100)
+        records['volume'] = volume.astype(np.uint32)
+        records['amount'] = (volume * close).astype(np.uint32)
+        path = resolve_tdx_day_file(str(root), code)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        records[keep].tofile(path)
+        codes.append(code)
+    return codes
+
+
+def close_enough(want, got) -> bool:
+    if want is None or got is None or math.isnan(want):
+        return (want is None or math.isnan(want)) == (got is None)
+    return math.isclose(want, got, rel_tol=TOLERANCE, abs_tol=TOLERANCE)
+
+
+def reference_screen(root: Path, codes: List[str]) -> Dict[str, Dict[str, float]]:
+    """逐只股票计算全历史指标，取最新交易日的指标值"""
+    latest = {}
+    for code in codes:
+        frame = load_symbol_frame(code, str(root))
+        indicators = calculate_multiple_indicators_polars(frame.lazy(), ['kdj', 'vol_ma', 'macd', 'rsi']).collect()
+        latest[code] = indicators.tail(1).to_dicts()[0]
+    return latest
+
+
+def check_indicator_parity(root: Path, codes: List[str]) -> bool:
+    """选股器结果与逐只股票全历史计算的指标一致"""
+    screener = StockScreener()
+    screener.add_rule('kdj_volume', f"J: KDJ.J; VM5: VOL_MA.VOL_MA5; {SCREEN}")
+    screener.add_rule('macd_rsi', "M: MACD.MACD_HIST; R: RSI.RSI14; M > 0 AND R > 50")
+    panel = screener.evaluate(_load(root, codes, screener.lookback()))
+    expected = reference_screen(root, codes)
+    screen_date = max(row['date'] for row in expected.values())
+    ok = True
+    if set(panel['ts_code'].cast(pl.String)) != {code for code, row in expected.items() if row['date'] == screen_date}:
+        print("选股日期有K线的股票集合不一致")
+        ok = False
+    near_threshold, matched = 0, 0
+    for row in panel.iter_rows(named=True):
+        reference = expected[row['ts_code']]
+        for column, key in (('kdj_volume.J', 'j'), ('kdj_volume.VM5', 'vol_ma5'),
+                            ('macd_rsi.M', 'macd_hist'), ('macd_rsi.R', 'rsi14')):
+            if not close_enough(reference[key], row[column]):
+                print(f"{row['ts_code']} {column} 不一致: 参照{reference[key]} 实际{row[column]}")
+                ok = False
+        want = bool(reference['j'] < 0 and reference['volume'] > 2 * reference['vol_ma5'])
+        # Float32指标恰在阈值附近时不比较
+        if abs(reference['j']) < 1e-3 or abs(reference['volume'] / reference['vol_ma5'] - 2) < 1e-5:
+            near_threshold += 1
+        elif want != row['kdj_volume']:
+            print(f"{row['ts_code']} 选股结果不一致: 参照{want} 实际{row['kdj_volume']}")
+            ok = False
+        matched += want
+    print(f"指标一致性: {panel.height}只股票，{matched}只满足 \"{SCREEN}\"，{near_threshold}只在阈值附近未比较")
+    return ok
+
+
+def _load(root: Path, codes: List[str], lookback) -> pl.DataFrame:
+    from src.tech_analysis.universe_calculator import load_universe_panel
+    return load_universe_panel(codes, str(root), max_days=None if lookback is None else lookback + 1)
+
+
+def reference_functions(close: np.ndarray, open_: np.ndarray, high: np.ndarray) -> Dict[str, float]:
+    """逐K线计算函数检查公式在最新K线上的值"""
+    n = len(close)
+    # 价格为整数分，均线比较用整数运算，避免均线恰好相等时的浮点误差
+    cents = np.round(close * 100).astype(np.int64)
+    above = lambda i: cents[max(0, i - 2):i + 1].sum() * min(i + 1, 8) > cents[max(0, i - 7):i + 1].sum() * min(i + 1, 3)
+    cross = [i >= 1 and above(i) and not above(i - 1) for i in range(n)]
+    up = close > open_
+    last = n - 1
+    hhv = np.max(high[max(0, last - 9):last + 1])
+    return {
+        'CR': float(cross[last]),
+        'CNT': float(np.sum(up[max(0, last - 9):last + 1])),
+        'EV': float(n >= 3 and bool(np.all(up[last - 2:last + 1]))),
+        'EX': float(any(cross[max(0, last - 4):last + 1])),
+        'H': hhv,
+        'P': close[last - 2] if n > 2 else float('nan'),
+        'S': float(np.sum(close[max(0, last - 4):last + 1])),
+        'Z': close[last] - open_[last] if close[last] > open_[last] else open_[last] - close[last],
+    }
+
+
+def check_function_parity(root: Path, codes: List[str]) -> bool:
+    """TDX函数与逐K线实现一致"""
+    formula = ("CR: CROSS(MA(C,3), MA(C,8)); CNT: COUNT(C>O, 10); EV: EVERY(C>O, 3); EX: EXIST(CROSS(MA(C,3),MA(C,8)), 5);"
+               "H: HHV(HIGH, 10); P: REF(C, 2); S: SUM(C, 5); Z: IF(C>O, C-O, O-C); CNT >= 5 AND NOT C < O")
+    screener = StockScreener()
+    screener.add_rule('functions', formula)
+    panel = screener.evaluate(_load(root, codes, screener.lookback()))
+    ok = True
+    for row in panel.iter_rows(named=True):
+        frame = load_symbol_frame(row['ts_code'], str(root))
+        expected = reference_functions(frame['close'].to_numpy(), frame['open'].to_numpy(), frame['high'].to_numpy())
+        for name, value in expected.items():
+            if not close_enough(value, row[f'functions.{name}']):
+                print(f"{row['ts_code']} {name} 不一致: 参照{value} 实际{row[f'functions.{name}']}")
+                ok = False
+        want = expected['CNT'] >= 5 and frame['close'][-1] >= frame['open'][-1]
+        if want != row['functions']:
+            print(f"{row['ts_code']} 条件不一致: 参照{want} 实际{row['functions']}")
+            ok = False
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="全市场选股器一致性检查与性能基准")
+    parser.add_argument("--stocks", type=int, default=5000, help="股票数量")
+    parser.add_argument("--bars", type=int, default=1000, help="每只股票的K线数量")
+    parser.add_argument("--loop-sample", type=int, default=500, help="逐只股票计时的抽样股票数，按比例折算到全市场")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        codes = write_tdx_files(root, args.stocks, args.bars, seed=3)
+
+        parity = check_indicator_parity(root, codes[:300]) and check_function_parity(root, codes[:300])
+        print(f"与逐只股票全历史计算一致: {parity}")
+
+        sample = codes[:args.loop_sample]
+        start = time.perf_counter()
+        reference = reference_screen(root, sample)
+        loop_s = (time.perf_counter() - start) * len(codes) / len(sample)
+        screener = StockScreener()
+        screener.add_rule('kdj_volume', SCREEN)
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            matches = screener.screen_universe(codes, str(root))
+            timings.append(time.perf_counter() - start)
+        screen_s = min(timings)
+        print(f"{args.stocks}只股票×{args.bars}个交易日 选股 \"{SCREEN}\"（每只股票加载{screener.lookback() + 1}根K线）: "
+              f"逐只股票计算指标 约{loop_s:.1f}s（按{len(sample)}只折算）, screen_universe {screen_s:.2f}s, "
+              f"加速 {loop_s / screen_s:.0f}x, 选出{matches.height}只")
+        del reference
+
+    if not parity:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+全市场多股票指标计算吞吐量基准。
+
+功能：
+1. 使用真实通达信数据目录，或在临时目录生成合成日线文件
+2. 以不同进程数调用 calculate_indicators_for_universe
+3. 输出每个进程数下的吞吐量（只/秒）与加速比
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import polars as pl
+from loguru import logger
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.tech_analysis.universe_calculator import (TDX_DAY_RECORD_DTYPE,
+                                                   calculate_indicators_for_universe)
+
+
+def write_synthetic_tdx_files(root: Path, count: int, bars: int, seed: int = 0) -> List[str]:
+    """在root下生成count只股票的合成通达信日线文件，返回股票代码列表"""
+    rng = np.random.default_rng(seed)
+    lday = root / "sz" / "lday"
+    lday.mkdir(parents=True, exist_ok=True)
+
+    dates = pl.date_range(pl.date(1990, 1, 1), pl.date(2100, 1, 1), interval="1d", eager=True)
+    dates = dates.filter(dates.dt.weekday() <= 5).head(bars)
+    date_ints = dates.dt.strftime("%Y%m%d").cast(pl.UInt32).to_numpy()
+
+    codes = []
+    for i in range(count):
+        code = f"{i:06d}"
+        close = 10.0 * np.exp(np.cumsum(rng.normal(0.0, 0.02, bars)))
+        spread = np.abs(rng.normal(0.0, 0.01, bars)) * close
+        records = np.zeros(bars, dtype=TDX_DAY_RECORD_DTYPE)
+        records["date"] = date_ints
+        records["open"] = np.round(close * 100)
+        records["high"] = np.round((close + spread) * 100)
+        records["low"] = np.round((close - spread) * 100)
+        records["close"] = np.round(close * 100)
+        records["volume"] = rng.integers(10_000, 1_000_000, bars)
+        records["amount"] = records["volume"] * records["close"] // 100
+        records.tofile(lday / f"sz{code}.day")
+        codes.append(code)
+    return codes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="全市场多股票指标计算吞吐量基准")
+    parser.add_argument("--tdx-path", default="", help="通达信数据目录，留空则生成合成数据")
+    parser.add_argument("--codes", default="", help="股票代码文件，每行一个；使用 --tdx-path 时必填")
+    parser.add_argument("--count", type=int, default=500, help="合成数据的股票数量")
+    parser.add_argument("--bars", type=int, default=5000, help="合成数据每只股票的K线数量")
+    parser.add_argument("--workers", default="1,2,4,8", help="逗号分隔的进程数列表")
+    parser.add_argument("--max-days", type=int, default=0, help="每只股票只读取最近N条记录，0表示全部")
+    args = parser.parse_args()
+
+    worker_counts = [int(w) for w in args.workers.split(",") if w.strip()]
+    max_days = args.max_days or None
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.tdx_path:
+            tdx_path = args.tdx_path
+            codes = [line.strip() for line in Path(args.codes).read_text(encoding="utf-8").splitlines() if line.strip()]
+        else:
+            tdx_path = tmp_dir
+            codes = write_synthetic_tdx_files(Path(tmp_dir), args.count, args.bars)
+            logger.info(f"已生成{len(codes)}只股票的合成日线文件，每只{args.bars}条")
+
+        rows = []
+        for workers in worker_counts:
+            stats = calculate_indicators_for_universe(
+                codes,
+                sink=lambda code, df: None,
+                tdx_data_path=tdx_path,
+                max_workers=workers,
+                max_days=max_days,
+            )
+            rows.append({
+                "workers": workers,
+                "symbols": stats["succeeded"],
+                "failed": len(stats["failed"]),
+                "elapsed": round(stats["elapsed"], 3),
+                "symbols_per_second": round(stats["symbols_per_second"], 1),
+            })
+
+    result = pl.DataFrame(rows)
+    baseline = result["symbols_per_second"][0]
+    if baseline:
+        result = result.with_columns((pl.col("symbols_per_second") / baseline).round(2).alias("speedup"))
+    print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+向量化回测引擎一致性检查与性能基准。
+
+功能：
+1. 在合成日线数据上分别用BacktestEngine（逐K线）和VectorizedBacktestEngine运行
+   MAStrategy、MACDStrategy、MeanReversionStrategy，比较交易日期、交易方向和逐日权益
+2. 在约20年日线（默认5040根K线）上比较两个引擎的耗时
+
+退出码：全部策略一致返回0，否则返回1。
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+import polars as pl
+from loguru import logger
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.backtest.engine.backtest_engine import BacktestEngine
+from src.backtest.engine.vectorized_backtest_engine import VectorizedBacktestEngine
+from src.backtest.strategies.ma_strategy import MAStrategy
+from src.backtest.strategies.macd_strategy import MACDStrategy
+from src.backtest.strategies.mean_reversion_strategy import MeanReversionStrategy
+
+# 每次运行都需要全新的策略实例：逐K线策略在generate_signal中累积价格历史
+STRATEGY_FACTORIES: Dict[str, Callable] = {
+    "ma": lambda: MAStrategy(short_window=5, long_window=20),
+    "macd": lambda: MACDStrategy(fast_period=12, slow_period=26, signal_period=9),
+    "mean_reversion": lambda: MeanReversionStrategy(),
+}
+
+
+def make_synthetic_daily(bars: int, seed: int = 7) -> pl.DataFrame:
+    """生成带随机游走的合成日线数据"""
+    rng = np.random.default_rng(seed)
+    close = 10.0 * np.exp(np.cumsum(rng.normal(0.0, 0.02, bars)))
+    spread = np.abs(rng.normal(0.0, 0.01, bars)) * close
+    return pl.DataFrame({
+        "date": pl.date_range(pl.date(2000, 1, 1), pl.date(2000, 1, 1) + pl.duration(days=bars - 1),
+                              eager=True),
+        "open": close * (1 + rng.normal(0.0, 0.003, bars)),
+        "high": close + spread,
+        "low": close - spread,
+        "close": close,
+        "volume": rng.integers(10_000, 5_000_000, bars).astype(np.float64),
+    })
+
+
+def run_engine(engine_cls, df: pl.DataFrame, strategy_name: str) -> Dict:
+    engine = engine_cls(df)
+    engine.set_strategy(STRATEGY_FACTORIES[strategy_name]())
+    return engine.run_backtest(1000000.0)
+
+
+def check_parity(df: pl.DataFrame, strategy_name: str, tolerance: float) -> List[str]:
+    """返回不一致项的描述，空列表表示一致"""
+    loop = run_engine(BacktestEngine, df, strategy_name)
+    vectorized = run_engine(VectorizedBacktestEngine, df, strategy_name)
+
+    problems = []
+    loop_trades = [(t["date"], t["signal"]) for t in loop["trades"]]
+    vec_trades = list(zip(vectorized["trades"]["date"].to_list(), vectorized["trades"]["signal"].to_list()))
+    if loop_trades != vec_trades:
+        problems.append(f"交易不一致: 逐K线{len(loop_trades)}笔, 向量化{len(vec_trades)}笔")
+
+    loop_equity = np.array([e["equity"] for e in loop["equity_curve"]])
+    vec_equity = vectorized["equity_curve"]["equity"].to_numpy()
+    rel_error = np.abs(loop_equity - vec_equity) / np.maximum(np.abs(loop_equity), 1.0)
+    if rel_error.max() > tolerance:
+        problems.append(f"权益最大相对误差{rel_error.max():.3e}超出上限{tolerance:.0e}")
+
+    for key in ("total_return", "annual_return", "sharpe_ratio", "max_drawdown", "volatility", "winning_rate",
+                "average_profit_loss", "trades_count"):
+        a = loop["performance"].get(key, 0)
+        b = vectorized["performance"].get(key, 0)
+        if abs(a - b) > tolerance * max(abs(a), 1.0):
+            problems.append(f"绩效指标{key}不一致: {a} vs {b}")
+    return problems
+
+
+def benchmark(df: pl.DataFrame, strategy_name: str, repeat: int) -> Dict:
+    """返回两个引擎的最佳耗时"""
+    row = {"strategy": strategy_name, "bars": df.height}
+    for label, engine_cls in (("loop_s", BacktestEngine), ("vectorized_s", VectorizedBacktestEngine)):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run_engine(engine_cls, df, strategy_name)
+            best = min(best, time.perf_counter() - start)
+        row[label] = round(best, 4)
+    row["speedup"] = round(row["loop_s"] / max(row["vectorized_s"], 1e-9), 1)
+    return row
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="向量化回测引擎一致性检查与性能基准")
+    parser.add_argument("--bars", type=int, default=20 * 252, help="K线数量，默认约20年日线")
+    parser.add_argument("--seeds", type=int, default=5, help="一致性检查使用的随机序列个数")
+    parser.add_argument("--tolerance", type=float, default=1e-9, help="权益与绩效的最大相对误差")
+    parser.add_argument("--repeat", type=int, default=3, help="基准重复次数，0表示跳过")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    failures = []
+    for seed in range(args.seeds):
+        df = make_synthetic_daily(args.bars, seed=seed)
+        for strategy_name in STRATEGY_FACTORIES:
+            for problem in check_parity(df, strategy_name, args.tolerance):
+                failures.append(f"[seed={seed}, {strategy_name}] {problem}")
+
+    if args.repeat > 0:
+        df = make_synthetic_daily(args.bars)
+        rows = [benchmark(df, name, args.repeat) for name in STRATEGY_FACTORIES]
+        print(pl.DataFrame(rows))
+
+    if failures:
+        print("\n".join(failures))
+        sys.exit(1)
+    print(f"{len(STRATEGY_FACTORIES)}个策略在{args.seeds}组数据上与逐K线引擎一致")
+
+
+if __name__ == "__main__":
+    main()
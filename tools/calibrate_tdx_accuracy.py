@@ -6,18 +6,22 @@
 
 功能：
 1. 比较通达信原始日线数据与项目数据（OHLCVA）
-2. 计算项目指标（MA/MACD/RSI）
+2. 计算项目指标（MA/MACD/RSI/KDJ/CCI）
 3. 可选对比通达信软件导出的指标CSV
 4. 输出误差汇总与逐日明细到CSV
+5. --kernel-suite：窗口内核精度与速度回归测试，对比通达信公式的逐行参考实现，
+   不依赖数据源，失败时以非零状态码退出，可直接接入CI
 """
 
 from __future__ import annotations
 
 import argparse
 import sys
+import time
 from pathlib import Path
-from typing import Dict, List
+from typing import Callable, Dict, List
 
+import numpy as np
 import polars as pl
 from loguru import logger
 
@@ -27,9 +31,12 @@ if str(PROJECT_ROOT) not in sys.path:
 
 from src.data.data_manager import DataManager
 from src.data.tdx_handler import TdxHandler
-from src.tech_analysis.indicator_calculator import (calculate_ma_polars,
-                                                    calculate_macd_polars,
-                                                    calculate_rsi_polars)
+from src.tech_analysis.indicator_calculator import (
+    calculate_cci_polars, calculate_kdj_polars, calculate_ma_polars,
+    calculate_macd_polars, calculate_multiple_indicators_polars,
+    calculate_rsi_polars)
+from src.tech_analysis.window_kernels import (rolling_mad, tdx_dma, tdx_ema,
+                                              tdx_sma, tdx_wma)
 from src.utils.config import get_config
 
 
@@ -110,6 +117,8 @@ def build_indicator_df(df: pl.DataFrame) -> pl.DataFrame:
     out = calculate_ma_polars(out, windows=[5, 10, 20, 60])
     out = calculate_macd_polars(out, fast_period=12, slow_period=26, signal_period=9)
     out = calculate_rsi_polars(out, windows=[14])
+    out = calculate_kdj_polars(out, windows=[9])
+    out = calculate_cci_polars(out, windows=[14])
 
     if hasattr(out, "collect"):
         out = out.collect()
@@ -124,6 +133,10 @@ def build_indicator_df(df: pl.DataFrame) -> pl.DataFrame:
         "macd_signal",
         "macd_hist",
         "rsi14",
+        "k9",
+        "d9",
+        "j9",
+        "cci14",
     ]
     keep_cols = [c for c in keep_cols if c in out.columns]
     return out.select(keep_cols).sort("date")
@@ -184,6 +197,10 @@ def normalize_tdx_indicator_csv(path: Path) -> pl.DataFrame:
         "MACD": "macd_hist",
         "RSI": "rsi14",
         "RSI14": "rsi14",
+        "K": "k9",
+        "D": "d9",
+        "J": "j9",
+        "CCI": "cci14",
     }
 
     existing_map = {k: v for k, v in rename_candidates.items() if k in df.columns}
@@ -198,7 +215,7 @@ def normalize_tdx_indicator_csv(path: Path) -> pl.DataFrame:
             pl.col("date").cast(pl.Utf8).str.replace_all("/", "-").str.strptime(pl.Date, strict=False).alias("date")
         )
 
-    keep = ["date", "ma5", "ma10", "ma20", "ma60", "macd", "macd_signal", "macd_hist", "rsi14"]
+    keep = ["date", "ma5", "ma10", "ma20", "ma60", "macd", "macd_signal", "macd_hist", "rsi14", "k9", "d9", "j9", "cci14"]
     keep = [c for c in keep if c in df.columns]
     return df.select(keep).sort("date")
 
@@ -218,11 +235,207 @@ def save_summary(summary: Dict[str, Dict[str, float]], out_file: Path) -> None:
     pl.DataFrame(rows).write_csv(out_file)
 
 
+def ref_sma(x: List[float], n: int, m: int) -> List[float]:
+    """通达信SMA(X,N,M)逐行参考实现"""
+    out, prev = [], None
+    for v in x:
+        if v != v:
+            out.append(prev if prev is not None else float("nan"))
+            continue
+        prev = v if prev is None else (m * v + (n - m) * prev) / n
+        out.append(prev)
+    return out
+
+
+def ref_ema(x: List[float], n: int) -> List[float]:
+    """通达信EMA(X,N)逐行参考实现"""
+    out, prev = [], None
+    for v in x:
+        prev = v if prev is None else (2 * v + (n - 1) * prev) / (n + 1)
+        out.append(prev)
+    return out
+
+
+def ref_wma(x: List[float], n: int) -> List[float]:
+    """通达信WMA(X,N)逐行参考实现"""
+    denom = n * (n + 1) / 2
+    out = []
+    for i in range(len(x)):
+        if i < n - 1:
+            out.append(float("nan"))
+            continue
+        out.append(sum((k + 1) * x[i - n + 1 + k] for k in range(n)) / denom)
+    return out
+
+
+def ref_dma(x: List[float], a: List[float]) -> List[float]:
+    """通达信DMA(X,A)逐行参考实现"""
+    out, prev = [], None
+    for v, w in zip(x, a):
+        prev = v if prev is None else w * v + (1 - w) * prev
+        out.append(prev)
+    return out
+
+
+def ref_avedev(x: List[float], n: int) -> List[float]:
+    """通达信AVEDEV(X,N)逐行参考实现，前N-1行使用已有数据"""
+    out = []
+    for i in range(len(x)):
+        window = x[max(0, i - n + 1): i + 1]
+        mean = sum(window) / len(window)
+        out.append(sum(abs(v - mean) for v in window) / len(window))
+    return out
+
+
+def ref_rsi(close: List[float], n: int) -> List[float]:
+    """通达信RSI逐行参考实现：SMA(MAX(C-LC,0),N,1)/SMA(ABS(C-LC),N,1)*100"""
+    diff = [float("nan")] + [close[i] - close[i - 1] for i in range(1, len(close))]
+    gain = ref_sma([d if d != d else max(d, 0.0) for d in diff], n, 1)
+    total = ref_sma([d if d != d else abs(d) for d in diff], n, 1)
+    return [float("nan") if t != t else (100.0 if t == 0 else g / t * 100) for g, t in zip(gain, total)]
+
+
+def ref_kdj(high: List[float], low: List[float], close: List[float], n: int) -> Dict[str, List[float]]:
+    """通达信KDJ逐行参考实现，K=SMA(RSV,3,1)，D=SMA(K,3,1)，J=3K-2D"""
+    rsv = []
+    for i in range(len(close)):
+        hh = max(high[max(0, i - n + 1): i + 1])
+        ll = min(low[max(0, i - n + 1): i + 1])
+        rsv.append((close[i] - ll) / (hh - ll) * 100 if hh != ll else float("nan"))
+    k = ref_sma(rsv, 3, 1)
+    d = ref_sma(k, 3, 1)
+    return {"k": k, "d": d, "j": [3 * kv - 2 * dv for kv, dv in zip(k, d)]}
+
+
+def ref_cci(high: List[float], low: List[float], close: List[float], n: int) -> List[float]:
+    """通达信CCI逐行参考实现：(TYP-MA(TYP,N))/(0.015*AVEDEV(TYP,N))"""
+    tp = [(h + l + c) / 3 for h, l, c in zip(high, low, close)]
+    mad = ref_avedev(tp, n)
+    out = []
+    for i in range(len(tp)):
+        window = tp[max(0, i - n + 1): i + 1]
+        ma = sum(window) / len(window)
+        out.append((tp[i] - ma) / (0.015 * mad[i]) if mad[i] > 0 else float("nan"))
+    return out
+
+
+def make_synthetic_ohlc(bars: int, seed: int = 7) -> pl.DataFrame:
+    """生成带随机游走的合成日线数据"""
+    rng = np.random.default_rng(seed)
+    close = 10.0 * np.exp(np.cumsum(rng.normal(0.0, 0.02, bars)))
+    spread = np.abs(rng.normal(0.0, 0.01, bars)) * close
+    return pl.DataFrame({
+        "date": np.arange(bars),
+        "open": close,
+        "high": close + spread,
+        "low": close - spread,
+        "close": close,
+        "volume": rng.integers(10_000, 1_000_000, bars).astype(np.float64),
+    })
+
+
+def max_relative_error(actual: np.ndarray, expected: np.ndarray) -> float:
+    """逐点相对误差的最大值，两者均为NaN的位置视为一致"""
+    actual = np.asarray(actual, dtype=np.float64)
+    expected = np.asarray(expected, dtype=np.float64)
+    both_nan = np.isnan(actual) & np.isnan(expected)
+    mismatch_nan = np.isnan(actual) ^ np.isnan(expected)
+    if mismatch_nan.any():
+        return float("inf")
+    mask = ~both_nan
+    if not mask.any():
+        return 0.0
+    err = np.abs(actual[mask] - expected[mask]) / np.maximum(1.0, np.abs(expected[mask]))
+    return float(err.max())
+
+
+def best_time_ms(func: Callable[[], object], repeat: int) -> float:
+    """多次运行取最短耗时（毫秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best
+
+
+def run_kernel_suite(bars: int, tolerance: float, max_kernel_ms: float, repeat: int, out_dir: Path) -> bool:
+    """
+    窗口内核与指标的精度、速度回归测试
+
+    Returns:
+        bool: 所有用例均通过时返回True
+    """
+    df = make_synthetic_ohlc(bars)
+    x = df["close"].to_list()
+    high, low = df["high"].to_list(), df["low"].to_list()
+    alphas = (df["volume"] / df["volume"].max()).to_list()
+    # 两只股票逐日交错排列的面板，检查按股票分组的AVEDEV
+    x_b = [v * 2 for v in x]
+    panel = pl.DataFrame({"symbol": ["A", "B"] * bars, "close": [v for pair in zip(x, x_b) for v in pair]})
+    close_col = pl.col("close")
+
+    kernel_cases = {
+        "sma_12_1": (lambda: df.select(tdx_sma(close_col, 12, 1)).to_series(), lambda: ref_sma(x, 12, 1)),
+        "sma_3_1": (lambda: df.select(tdx_sma(close_col, 3, 1)).to_series(), lambda: ref_sma(x, 3, 1)),
+        "ema_26": (lambda: df.select(tdx_ema(close_col, 26)).to_series(), lambda: ref_ema(x, 26)),
+        "wma_20": (lambda: df.select(tdx_wma(close_col, 20)).to_series(), lambda: ref_wma(x, 20)),
+        "dma_volume": (
+            lambda: df.select(tdx_dma(close_col, pl.col("volume") / pl.col("volume").max())).to_series(),
+            lambda: ref_dma(x, alphas),
+        ),
+        "avedev_14": (lambda: df.select(rolling_mad(close_col, 14)).to_series(), lambda: ref_avedev(x, 14)),
+        "avedev_250": (lambda: df.select(rolling_mad(close_col, 250)).to_series(), lambda: ref_avedev(x, 250)),
+        "avedev_14_by_symbol": (lambda: panel.select(rolling_mad(close_col, 14, by="symbol")).to_series(),
+                                lambda: [v for pair in zip(ref_avedev(x, 14), ref_avedev(x_b, 14)) for v in pair]),
+    }
+
+    # 单个Lazy查询计划内计算，输入保持Float64，只有最终输出为Float32
+    indicators = calculate_multiple_indicators_polars(
+        df.lazy(), ["rsi", "kdj", "cci"], rsi_windows=[14], kdj_windows=[9], cci_windows=[14]
+    ).collect()
+    ref_k = ref_kdj(high, low, x, 9)
+    indicator_cases = {
+        "rsi14": (indicators["rsi14"], ref_rsi(x, 14)),
+        "k9": (indicators["k9"], ref_k["k"]),
+        "d9": (indicators["d9"], ref_k["d"]),
+        "j9": (indicators["j9"], ref_k["j"]),
+        "cci14": (indicators["cci14"], ref_cci(high, low, x, 14)),
+    }
+
+    rows = []
+    passed = True
+    for name, (kernel, reference) in kernel_cases.items():
+        error = max_relative_error(kernel().fill_null(float("nan")).to_numpy(), np.array(reference()))
+        kernel_ms = best_time_ms(kernel, repeat)
+        reference_ms = best_time_ms(reference, 1)
+        ok = error <= tolerance and kernel_ms <= max_kernel_ms
+        passed &= ok
+        rows.append({"case": name, "max_rel_error": error, "kernel_ms": round(kernel_ms, 3),
+                     "reference_ms": round(reference_ms, 3), "speedup": round(reference_ms / max(kernel_ms, 1e-6), 1),
+                     "passed": ok})
+
+    # 指标输出及K/D中间结果为Float32，J=3K-2D会放大舍入误差，使用float32精度对应的阈值
+    indicator_tolerance = max(tolerance, 1e-4)
+    for name, (actual, reference) in indicator_cases.items():
+        error = max_relative_error(actual.cast(pl.Float64).fill_null(float("nan")).to_numpy(), np.array(reference))
+        ok = error <= indicator_tolerance
+        passed &= ok
+        rows.append({"case": name, "max_rel_error": error, "kernel_ms": None, "reference_ms": None,
+                     "speedup": None, "passed": ok})
+
+    summary = pl.DataFrame(rows)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    summary.write_csv(out_dir / "kernel_suite_summary.csv")
+    print(summary)
+    return passed
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="通达信单股票数据与指标校准")
     parser.add_argument("--stock", default="000001.SZ", help="股票代码，如 000001.SZ")
-    parser.add_argument("--start", required=True, help="开始日期，格式 YYYY-MM-DD")
-    parser.add_argument("--end", required=True, help="结束日期，格式 YYYY-MM-DD")
+    parser.add_argument("--start", default="", help="开始日期，格式 YYYY-MM-DD")
+    parser.add_argument("--end", default="", help="结束日期，格式 YYYY-MM-DD")
     parser.add_argument("--tolerance", type=float, default=1e-6, help="数值误差阈值")
     parser.add_argument(
         "--tdx-indicator-csv",
@@ -234,10 +447,24 @@ def main() -> None:
         default="logs/calibration",
         help="输出目录",
     )
+    parser.add_argument("--kernel-suite", action="store_true", help="运行窗口内核精度与速度回归测试")
+    parser.add_argument("--bars", type=int, default=5000, help="回归测试的K线数量")
+    parser.add_argument("--kernel-tolerance", type=float, default=1e-9, help="内核相对误差阈值")
+    parser.add_argument("--max-kernel-ms", type=float, default=50.0, help="单个内核耗时上限（毫秒）")
+    parser.add_argument("--repeat", type=int, default=5, help="内核计时重复次数")
 
     args = parser.parse_args()
-    ts_code = normalize_stock_code(args.stock)
     out_dir = Path(args.out_dir)
+
+    if args.kernel_suite:
+        passed = run_kernel_suite(args.bars, args.kernel_tolerance, args.max_kernel_ms, args.repeat, out_dir)
+        logger.info(f"内核回归测试{'通过' if passed else '失败'}，结果目录: {out_dir.resolve()}")
+        sys.exit(0 if passed else 1)
+
+    if not args.start or not args.end:
+        parser.error("数据校准需要 --start 和 --end")
+
+    ts_code = normalize_stock_code(args.stock)
     out_dir.mkdir(parents=True, exist_ok=True)
 
     logger.info(f"开始校准: {ts_code}, 区间 {args.start} ~ {args.end}")
@@ -269,7 +496,7 @@ def main() -> None:
 
     if args.tdx_indicator_csv:
         tdx_indicator_df = normalize_tdx_indicator_csv(Path(args.tdx_indicator_csv))
-        indicator_fields = ["ma5", "ma10", "ma20", "ma60", "macd", "macd_signal", "macd_hist", "rsi14"]
+        indicator_fields = ["ma5", "ma10", "ma20", "ma60", "macd", "macd_signal", "macd_hist", "rsi14", "k9", "d9", "j9", "cci14"]
         ind_detail, ind_summary = compare_frames(
             left=tdx_indicator_df,
             right=project_indicators,
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+批量成本模型一致性检查与性能基准。
+
+功能：
+1. 一致性：以逐笔公式（原CostModel/AdvancedCostModel.calculate_cost的实现）为参照，
+   在随机交易上检查 CostModel 与 AdvancedCostModel 在 cn/hk/us/other 各市场
+   （_get_market_defaults 的默认参数）下的逐笔接口与批量接口，
+   要求总成本及各分项逐位相等；另外检查混合市场批量计算、印花税起征点和最低佣金边界
+2. 逐笔快速路径：CostModel.calculate_cost（round_trip_cost_arrays的标量分支）在各市场参数下与批量接口逐位相等
+3. 性能：比较逐笔循环与批量接口计算大量交易成本的耗时，并输出两个模型逐笔调用的单次耗时
+
+退出码：全部一致返回0，否则返回1。
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+import timeit
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.backtest.costs.advanced_cost_model import AdvancedCostModel
+from src.backtest.costs.cost_model import CostModel
+
+MARKETS = ("cn", "hk", "us", "other")
+
+
+def reference_cost(params: Dict[str, Any], shares: float, buy_price: float, sell_price: float) -> Dict[str, float]:
+    """逐笔参照实现，与原AdvancedCostModel.calculate_cost的公式和运算顺序一致"""
+    commission_rate = params.get('commission_rate', 0.0003)
+    min_commission = params.get('min_commission', 5.0)
+    slippage = params.get('slippage', 0.0001)
+    tax_rate = params.get('tax_rate', 0.001)
+    transfer_fee = params.get('transfer_fee', 0.0)
+    handling_fee = params.get('handling_fee', 0.0)
+    regulatory_fee = params.get('regulatory_fee', 0.0)
+    stamp_tax_threshold = params.get('stamp_tax_threshold', 0)
+
+    buy_amount = shares * buy_price
+    sell_amount = shares * sell_price
+    costs = {
+        'buy_commission': max(buy_amount * commission_rate, min_commission),
+        'sell_commission': max(sell_amount * commission_rate, min_commission),
+        'stamp_tax': sell_amount * tax_rate if sell_amount > stamp_tax_threshold else 0,
+        'buy_transfer_fee': buy_amount * transfer_fee,
+        'sell_transfer_fee': sell_amount * transfer_fee,
+        'buy_handling_fee': buy_amount * handling_fee,
+        'sell_handling_fee': sell_amount * handling_fee,
+        'buy_regulatory_fee': buy_amount * regulatory_fee,
+        'sell_regulatory_fee': sell_amount * regulatory_fee,
+        'slippage': shares * (sell_price - buy_price) * slippage,
+    }
+    costs['total_cost'] = (
+        costs['buy_commission'] + costs['sell_commission'] + costs['stamp_tax'] +
+        costs['buy_transfer_fee'] + costs['sell_transfer_fee'] +
+        costs['buy_handling_fee'] + costs['sell_handling_fee'] +
+        costs['buy_regulatory_fee'] + costs['sell_regulatory_fee'] +
+        costs['slippage']
+    )
+    return costs
+
+
+def reference_simple_cost(params: Dict[str, Any], shares: float, buy_price: float, sell_price: float) -> float:
+    """逐笔参照实现，与原CostModel.calculate_cost一致"""
+    buy_amount = shares * buy_price
+    sell_amount = shares * sell_price
+    buy_commission = max(buy_amount * params['commission_rate'], params['min_commission'])
+    sell_commission = max(sell_amount * params['commission_rate'], params['min_commission'])
+    stamp_tax = sell_amount * params['tax_rate']
+    slippage_cost = shares * (sell_price - buy_price) * params['slippage']
+    return buy_commission + sell_commission + stamp_tax + slippage_cost
+
+
+def random_trades(count: int, seed: int) -> tuple:
+    """生成随机交易，包含低于最低佣金的小额交易、零股数和亏损卖出"""
+    rng = np.random.default_rng(seed)
+    shares = rng.integers(0, 50, count) * 100.0
+    small = rng.random(count) < 0.3
+    shares[small] = rng.integers(1, 100, int(small.sum()))
+    buy_prices = np.round(rng.uniform(1.0, 200.0, count), 2)
+    sell_prices = np.round(buy_prices * rng.uniform(0.8, 1.2, count), 2)
+    return shares, buy_prices, sell_prices
+
+
+def check_simple(shares: np.ndarray, buy_prices: np.ndarray, sell_prices: np.ndarray) -> bool:
+    """检查CostModel逐笔与批量接口和原逐笔公式一致"""
+    model = CostModel()
+    batch = model.calculate_costs(shares, buy_prices, sell_prices)['total_cost']
+    for i in range(len(shares)):
+        expected = reference_simple_cost(model.params, shares[i], buy_prices[i], sell_prices[i])
+        if model.calculate_cost(shares[i], buy_prices[i], sell_prices[i]) != expected or batch[i] != expected:
+            print(f"CostModel不一致: 第{i}笔 期望{expected}")
+            return False
+    return True
+
+
+def check_scalar_fast_path(shares: np.ndarray, buy_prices: np.ndarray, sell_prices: np.ndarray) -> bool:
+    """检查CostModel逐笔快速路径在含过户费/经手费/证管费和印花税起征点的参数下与批量接口一致"""
+    for market in MARKETS:
+        model = CostModel()
+        model.set_params(AdvancedCostModel('cn')._get_market_defaults(market))
+        if market == 'hk':
+            model.set_params({'stamp_tax_threshold': 50000})
+        batch = model.calculate_costs(shares, buy_prices, sell_prices)['total_cost']
+        for i in range(len(shares)):
+            # 同时检查numpy标量与Python浮点输入
+            for args in ((shares[i], buy_prices[i], sell_prices[i]),
+                         (float(shares[i]), float(buy_prices[i]), float(sell_prices[i]))):
+                if model.calculate_cost(*args) != batch[i]:
+                    print(f"CostModel逐笔快速路径({market})不一致: 第{i}笔 期望{batch[i]}")
+                    return False
+    return True
+
+
+def per_call_us(func, args: tuple, number: int = 100_000) -> float:
+    """逐笔调用的单次耗时（微秒，取多次重复的最小值）"""
+    return min(timeit.repeat(lambda: func(*args), number=number, repeat=5)) / number * 1e6
+
+
+def check_advanced(shares: np.ndarray, buy_prices: np.ndarray, sell_prices: np.ndarray, seed: int) -> bool:
+    """检查AdvancedCostModel各市场逐笔与批量接口、混合市场批量接口和原逐笔公式一致"""
+    ok = True
+    markets = np.random.default_rng(seed).choice(MARKETS, len(shares))
+    mixed = AdvancedCostModel('cn').calculate_costs(shares, buy_prices, sell_prices, markets=markets)
+    for market in MARKETS:
+        model = AdvancedCostModel(market)
+        if market == 'hk':
+            # 检查印花税起征点
+            model.set_params({'stamp_tax_threshold': 50000})
+        batch = model.calculate_costs(shares, buy_prices, sell_prices)
+        defaults = model._get_market_defaults(market)
+        for i in range(len(shares)):
+            expected = reference_cost(model.params, shares[i], buy_prices[i], sell_prices[i])
+            details = model.calculate_cost(shares[i], buy_prices[i], sell_prices[i])
+            actual = {
+                'total_cost': details['total_cost'],
+                'buy_commission': details['buy_costs']['commission'],
+                'sell_commission': details['sell_costs']['commission'],
+                'stamp_tax': details['sell_costs']['stamp_tax'],
+                'buy_transfer_fee': details['buy_costs']['transfer_fee'],
+                'sell_transfer_fee': details['sell_costs']['transfer_fee'],
+                'buy_handling_fee': details['buy_costs']['handling_fee'],
+                'sell_handling_fee': details['sell_costs']['handling_fee'],
+                'buy_regulatory_fee': details['buy_costs']['regulatory_fee'],
+                'sell_regulatory_fee': details['sell_costs']['regulatory_fee'],
+                'slippage': details['other_costs']['slippage'],
+            }
+            for name, value in expected.items():
+                if actual[name] != value or batch[name][i] != value:
+                    print(f"AdvancedCostModel({market})不一致: 第{i}笔 {name} 期望{value}")
+                    ok = False
+                    break
+            if markets[i] == market:
+                if mixed['total_cost'][i] != reference_cost(defaults, shares[i], buy_prices[i],
+                                                            sell_prices[i])['total_cost']:
+                    print(f"混合市场批量计算不一致: 第{i}笔 ({market})")
+                    ok = False
+            if not ok:
+                return False
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="批量成本模型一致性检查与性能基准")
+    parser.add_argument("--trades", type=int, default=20_000, help="一致性检查的交易笔数")
+    parser.add_argument("--benchmark-trades", type=int, default=1_000_000, help="性能基准的交易笔数")
+    args = parser.parse_args()
+
+    shares, buy_prices, sell_prices = random_trades(args.trades, seed=1)
+    simple_ok = check_simple(shares, buy_prices, sell_prices)
+    advanced_ok = check_advanced(shares, buy_prices, sell_prices, seed=2)
+    scalar_ok = check_scalar_fast_path(shares, buy_prices, sell_prices)
+    print(f"CostModel逐笔/批量与参照公式一致: {simple_ok}")
+    print(f"CostModel逐笔快速路径与批量接口在各市场参数下一致: {scalar_ok}")
+    print(f"AdvancedCostModel各市场逐笔/批量与参照公式一致: {advanced_ok}")
+
+    shares, buy_prices, sell_prices = random_trades(args.benchmark_trades, seed=3)
+    model = AdvancedCostModel('cn')
+    start = time.perf_counter()
+    model.calculate_costs(shares, buy_prices, sell_prices)
+    batch_s = time.perf_counter() - start
+    sample = min(args.benchmark_trades, 100_000)
+    start = time.perf_counter()
+    for i in range(sample):
+        model.calculate_cost(shares[i], buy_prices[i], sell_prices[i])
+    scalar_s = (time.perf_counter() - start) * args.benchmark_trades / sample
+    print(f"{args.benchmark_trades}笔交易: 批量 {batch_s:.3f}s, 逐笔（按{sample}笔外推） {scalar_s:.2f}s, "
+          f"加速 {scalar_s / batch_s:.0f}x")
+    print(f"逐笔单次耗时: CostModel {per_call_us(CostModel().calculate_cost, (1000.0, 10.5, 11.2)):.2f}us, "
+          f"AdvancedCostModel {per_call_us(model.calculate_cost, (1000.0, 10.5, 11.2)):.2f}us")
+
+    if not (simple_ok and advanced_ok and scalar_ok):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()